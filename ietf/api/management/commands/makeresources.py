@@ -23,12 +23,12 @@ resource_head_template = """# Copyright The IETF Trust {{date}}, All Rights Rese
 # Generated by the makeresources management command {{date}}
 
 
-from tastypie.resources import ModelResource
 from tastypie.fields import ToManyField                 # pyflakes:ignore
 from tastypie.constants import ALL, ALL_WITH_RELATIONS  # pyflakes:ignore
 from tastypie.cache import SimpleCache
 
 from ietf import api
+from ietf.api import ModelResource
 from ietf.api import ToOneField                         # pyflakes:ignore
 
 from {{app}}.models import *                            # pyflakes:ignore
@@ -13,7 +13,7 @@ from pathlib import Path
 
 from django.apps import apps
 from django.conf import settings
-from django.test import Client
+from django.test import Client, override_settings
 from django.urls import reverse as urlreverse
 from django.utils import timezone
 
@@ -22,6 +22,8 @@ from tastypie.test import ResourceTestCaseMixin
 import debug                            # pyflakes:ignore
 
 import ietf
+from ietf.doc.factories import WgDraftFactory
+from ietf.doc.models import DocEvent
 from ietf.doc.utils import get_unicode_document_content
 from ietf.group.factories import RoleFactory
 from ietf.meeting.factories import MeetingFactory, SessionFactory
@@ -521,6 +523,41 @@ class CustomApiTests(TestCase):
         self.assertEqual(data['dumptime'], "2022-08-31 07:10:01 -0700")
 
 
+    def test_api_sql_profile_metrics(self):
+        url = urlreverse('ietf.api.views.sql_profile_metrics')
+        robot = PersonFactory(user__is_staff=True)
+        RoleFactory(group__acronym='secretariat', name_id='robot', person=robot)
+        apikey = PersonalApiKey.objects.create(endpoint=url, person=robot)
+        robot.user.last_login = timezone.now()
+        robot.user.save()
+
+        r = self.client.get(url)
+        self.assertContains(r, 'Missing apikey parameter', status_code=400)
+
+        with patch('ietf.api.views.PROFILE_STATS.totals', return_value={'ietf.some.view': dict(requests=1, queries=7, writes=0,
+                duplicate_queries=2, db_seconds=0.5, template_seconds=0.25, seconds=1.0)}):
+            r = self.client.get(url, {'apikey': apikey.hash()})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(r, 'datatracker_sql_profile_queries_total{view="ietf.some.view"} 7')
+
+    def test_api_external_command_metrics(self):
+        url = urlreverse('ietf.api.views.external_command_metrics')
+        robot = PersonFactory(user__is_staff=True)
+        RoleFactory(group__acronym='secretariat', name_id='robot', person=robot)
+        apikey = PersonalApiKey.objects.create(endpoint=url, person=robot)
+        robot.user.last_login = timezone.now()
+        robot.user.save()
+
+        r = self.client.get(url)
+        self.assertContains(r, 'Missing apikey parameter', status_code=400)
+
+        with patch('ietf.api.views.COMMAND_STATS.totals', return_value={'idnits': dict(runs=3, failures=1, timeouts=0, seconds=4.5)}):
+            r = self.client.get(url, {'apikey': apikey.hash()})
+        self.assertEqual(r.status_code, 200)
+        self.assertTrue(r['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(r, 'datatracker_external_command_runs_total{tool="idnits"} 3')
+
     def test_api_appauth(self):
         url = urlreverse('ietf.api.views.app_auth')
         person = PersonFactory()
@@ -589,3 +626,52 @@ class TastypieApiTestCase(ResourceTestCaseMixin, TestCase):
                     #print("There doesn't seem to be any resource for model %s.models.%s"%(app.__name__,model.__name__,))
                     self.assertIn(model._meta.model_name, list(app_resources.keys()),
                         "There doesn't seem to be any API resource for model %s.models.%s"%(app.__name__,model.__name__,))
+
+    def test_keyset_pagination(self):
+        WgDraftFactory.create_batch(6)
+        event_ids = list(DocEvent.objects.order_by('pk').values_list('pk', flat=True))
+        self.assertGreater(len(event_ids), 4)
+        client = Client(Accept='application/json')
+        url = "/api/v1/doc/docevent/"
+
+        seen = []
+        r = client.get(url, {'after_id': '', 'limit': 2})
+        while True:
+            self.assertValidJSONResponse(r)
+            data = r.json()
+            self.assertIsNone(data['meta']['total_count'])
+            seen += [ obj['id'] for obj in data['objects'] ]
+            if not data['meta']['next']:
+                break
+            r = client.get(data['meta']['next'])
+        self.assertEqual(seen, event_ids)
+
+        # the related objects are fetched with the events
+        with self.assertNumQueries(1):
+            r = client.get(url, {'after_id': event_ids[0], 'limit': 3})
+        self.assertEqual([ obj['id'] for obj in r.json()['objects'] ], event_ids[1:4])
+        self.assertTrue(r.json()['objects'][0]['doc'].startswith('/api/v1/doc/document/'))
+
+        r = client.get(url, {'after_id': 'foo'})
+        self.assertEqual(r.status_code, 400)
+        r = client.get(url, {'after_id': event_ids[0], 'order_by': 'id'})
+        self.assertEqual(r.status_code, 400)
+
+    def test_export(self):
+        drafts = WgDraftFactory.create_batch(3)
+        event_ids = list(DocEvent.objects.order_by('pk').values_list('pk', flat=True))
+        client = Client(Accept='application/json')
+        url = "/api/v1/doc/docevent/export/"
+
+        def export(params):
+            r = client.get(url, params)
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r['Content-Type'].startswith('application/x-ndjson'))
+            lines = b''.join(r.streaming_content).decode('utf-8').splitlines()
+            return [ json.loads(line)['id'] for line in lines ]
+
+        with override_settings(API_EXPORT_CHUNK_SIZE=2):
+            self.assertEqual(export({}), event_ids)
+            self.assertEqual(export({'after_id': event_ids[1]}), event_ids[2:])
+            doc_event_ids = list(drafts[1].docevent_set.order_by('pk').values_list('pk', flat=True))
+            self.assertEqual(export({'doc': drafts[1].pk}), doc_event_ids)
@@ -27,6 +27,10 @@ urlpatterns = [
     url(r'^iesg/position', views_ballot.api_set_position),
     # Let Meetecho set session video URLs
     url(r'^meeting/session/video/url$', meeting_views.api_set_session_video_url),
+    # Per-view database query profiles, for Prometheus
+    url(r'^metrics/sql-profile$', api_views.sql_profile_metrics),
+    # Per-tool external command timings, for Prometheus
+    url(r'^metrics/external-commands$', api_views.external_command_metrics),
     # Meeting agenda + floorplan data
     url(r'^meeting/(?P<num>[A-Za-z0-9._+-]+)/agenda-data$', meeting_views.api_get_agenda_data),
     # Meeting session materials
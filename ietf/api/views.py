@@ -37,6 +37,8 @@ from ietf.meeting.models import Meeting
 from ietf.stats.models import MeetingRegistration
 from ietf.utils.decorators import require_api_key
 from ietf.utils.models import DumpInfo
+from ietf.utils.pipe import COMMAND_STATS
+from ietf.utils.queryprofile import PROFILE_STATS
 
 
 def top_level(request):
@@ -219,6 +221,22 @@ def version(request):
             )
     
 
+@require_api_key
+@role_required('Robot')
+def sql_profile_metrics(request):
+    """Per-view totals of the requests profiled by this process, in the
+    Prometheus text format"""
+    return HttpResponse(PROFILE_STATS.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_api_key
+@role_required('Robot')
+def external_command_metrics(request):
+    """Per-tool totals of the external commands run by this process, in
+    the Prometheus text format"""
+    return HttpResponse(COMMAND_STATS.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @require_api_key
 @csrf_exempt
 def app_auth(request):
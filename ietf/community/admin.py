@@ -8,7 +8,7 @@ from ietf.community.models import CommunityList, SearchRule, EmailSubscription
 
 class CommunityListAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'group']
-    raw_id_fields = ['user', 'group', 'added_docs']
+    raw_id_fields = ['user', 'group', 'added_docs', 'tracked_docs']
 admin.site.register(CommunityList, CommunityListAdmin)
 
 class SearchRuleAdmin(admin.ModelAdmin):
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0050_populate_documentsearchindex'),
+        ('community', '0009_add_group_exp_rule_to_groups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='communitylist',
+            name='tracked_docs',
+            field=models.ManyToManyField(blank=True, related_name='tracking_community_lists', to='doc.Document'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+from django.db import migrations
+from django.db.models import Q
+
+
+def forward(apps, schema_editor):
+    CommunityList = apps.get_model('community', 'CommunityList')
+    Document = apps.get_model('doc', 'Document')
+
+    def docs_matching_rule(rule):
+        docs = Document.objects.all()
+        if rule.rule_type in ['group', 'area', 'group_rfc', 'area_rfc']:
+            return docs.filter(Q(group=rule.group_id) | Q(group__parent=rule.group_id), states=rule.state_id)
+        elif rule.rule_type in ['group_exp']:
+            return docs.filter(group=rule.group_id, states=rule.state_id)
+        elif rule.rule_type.startswith("state_"):
+            return docs.filter(states=rule.state_id)
+        elif rule.rule_type in ["author", "author_rfc"]:
+            return docs.filter(states=rule.state_id, documentauthor__person=rule.person_id)
+        elif rule.rule_type == "ad":
+            return docs.filter(states=rule.state_id, ad=rule.person_id)
+        elif rule.rule_type == "shepherd":
+            return docs.filter(states=rule.state_id, shepherd__person=rule.person_id)
+        elif rule.rule_type == "name_contains":
+            return docs.filter(states=rule.state_id, searchrule=rule)
+        return docs.none()
+
+    for clist in CommunityList.objects.all():
+        doc_ids = set(clist.added_docs.values_list("pk", flat=True))
+        for rule in clist.searchrule_set.all():
+            doc_ids |= set(docs_matching_rule(rule).values_list("pk", flat=True))
+        clist.tracked_docs.set(doc_ids)
+
+def reverse(apps, schema_editor):
+    pass
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0010_communitylist_tracked_docs'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
@@ -7,7 +7,7 @@ from django.db import models
 from django.db.models import signals
 from django.urls import reverse as urlreverse
 
-from ietf.doc.models import Document, DocEvent, State
+from ietf.doc.models import Document, DocEvent, DocumentAuthor, State
 from ietf.group.models import Group
 from ietf.person.models import Person, Email
 from ietf.utils.models import ForeignKey
@@ -17,6 +17,13 @@ class CommunityList(models.Model):
     group = ForeignKey(Group, blank=True, null=True)
     added_docs = models.ManyToManyField(Document)
 
+    # materialized view of the documents tracked by the list, that is
+    # the added documents plus the documents matched by the search
+    # rules - maintained by the signal handlers at the end of this
+    # file, and by the update_community_list_membership management
+    # command for full rebuilds
+    tracked_docs = models.ManyToManyField(Document, related_name='tracking_community_lists', blank=True)
+
     def long_name(self):
         if self.user:
             return 'Personal ID list of %s' % self.user.username
@@ -112,3 +119,88 @@ def notify_events(sender, instance, **kwargs):
 
 
 signals.post_save.connect(notify_events)
+
+
+def update_list_on_rule_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.community.utils import update_community_list_membership
+    # a removed rule can only remove documents, and the list may be
+    # being deleted as well, so don't add anything in that case
+    update_community_list_membership(instance.community_list_id, add=kwargs.get('signal') is not signals.post_delete)
+
+def invalidate_name_contains_matcher_on_rule_change(sender, instance, raw=False, **kwargs):
+    if instance.rule_type == "name_contains":
+        from ietf.community.utils import invalidate_name_contains_matcher
+        invalidate_name_contains_matcher()
+
+def update_lists_on_added_docs_change(sender, instance, action, reverse, pk_set, **kwargs):
+    from ietf.community.utils import update_community_list_membership, update_community_lists_for_doc
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            update_community_lists_for_doc(instance)
+    elif action == "post_add":
+        instance.tracked_docs.add(*pk_set)
+    elif action in ("post_remove", "post_clear"):
+        update_community_list_membership(instance.pk, add=False)
+
+def update_lists_on_name_contains_index_change(sender, instance, action, reverse, pk_set, **kwargs):
+    from ietf.community.utils import update_community_list_membership, update_community_lists_for_doc
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        update_community_lists_for_doc(instance)
+    else:
+        update_community_list_membership(instance.community_list_id, add=(action == "post_add"))
+
+# the fields of a document, besides its states and authors, which rules match
+DOC_FIELDS_MATCHED_BY_RULES = ("group_id", "ad_id", "shepherd_id")
+
+def check_doc_fields_matched_by_rules(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    old = Document.objects.filter(pk=instance.pk).values_list(*DOC_FIELDS_MATCHED_BY_RULES).first()
+    new = tuple(getattr(instance, f) for f in DOC_FIELDS_MATCHED_BY_RULES)
+    instance._doc_fields_matched_by_rules_changed = old != new
+
+def update_lists_on_doc_change(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    changed = instance.__dict__.pop("_doc_fields_matched_by_rules_changed", True)
+    if not (created or changed):
+        return
+    from ietf.community.utils import update_community_lists_for_doc
+    update_community_lists_for_doc(instance)
+
+def update_lists_on_doc_states_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse or action not in ("post_add", "post_remove", "post_clear"):
+        return
+    # set_state() removes a state and adds another, which mostly aren't
+    # states any rule is for, such as the IESG states
+    if action != "post_clear" and not SearchRule.objects.filter(state__in=pk_set).exists():
+        return
+    from ietf.community.utils import update_community_lists_for_doc
+    update_community_lists_for_doc(instance)
+
+def update_lists_on_doc_author_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.community.utils import update_community_lists_for_doc
+    doc = Document.objects.filter(pk=instance.document_id).first()
+    if doc:
+        # a removed author can only remove documents, and the document
+        # may be being deleted as well, so don't add anything in that case
+        update_community_lists_for_doc(doc, add=kwargs.get('signal') is not signals.post_delete)
+
+
+signals.post_save.connect(update_list_on_rule_change, sender=SearchRule)
+signals.post_delete.connect(update_list_on_rule_change, sender=SearchRule)
+signals.post_save.connect(invalidate_name_contains_matcher_on_rule_change, sender=SearchRule)
+signals.post_delete.connect(invalidate_name_contains_matcher_on_rule_change, sender=SearchRule)
+signals.m2m_changed.connect(update_lists_on_added_docs_change, sender=CommunityList.added_docs.through)
+signals.m2m_changed.connect(update_lists_on_name_contains_index_change, sender=SearchRule.name_contains_index.through)
+signals.pre_save.connect(check_doc_fields_matched_by_rules, sender=Document)
+signals.post_save.connect(update_lists_on_doc_change, sender=Document)
+signals.m2m_changed.connect(update_lists_on_doc_states_change, sender=Document.states.through)
+signals.post_save.connect(update_lists_on_doc_author_change, sender=DocumentAuthor)
+signals.post_delete.connect(update_lists_on_doc_author_change, sender=DocumentAuthor)
@@ -2,8 +2,10 @@
 # -*- coding: utf-8 -*-
 
 
+from mock import patch
 from pyquery import PyQuery
 
+from django.core.management import call_command
 from django.urls import reverse as urlreverse
 from django.contrib.auth.models import User
 
@@ -13,11 +15,12 @@ import debug                            # pyflakes:ignore
 
 from ietf.community.models import CommunityList, SearchRule, EmailSubscription
 from ietf.community.utils import docs_matching_community_list_rule, community_list_rules_matching_doc
-from ietf.community.utils import reset_name_contains_index_for_rule
+from ietf.community.utils import reset_name_contains_index_for_rule, docs_tracked_by_community_list, community_lists_tracking_doc
+from ietf.community.utils import NameContainsMatcher, update_name_contains_indexes_with_new_doc
 import ietf.community.views
 from ietf.group.models import Group
 from ietf.group.utils import setup_default_community_list_for_group
-from ietf.doc.models import State
+from ietf.doc.models import DocumentAuthor, State
 from ietf.doc.utils import add_state_change_event
 from ietf.person.models import Person, Email
 from ietf.utils.test_utils import login_testing_unauthorized
@@ -89,6 +92,113 @@ class CommunityListTests(WebTest):
         # rule -> docs
         self.assertTrue(draft in list(docs_matching_community_list_rule(rule_group_exp)))
 
+    def test_tracked_docs_maintenance(self):
+        plain = PersonFactory(user__username='plain')
+        ad = Person.objects.get(user__username='ad')
+        draft = WgDraftFactory(authors=[plain], states=[('draft','active')])
+        other_draft = WgDraftFactory(states=[('draft','active')])
+        clist = CommunityList.objects.create(user=plain.user)
+        active = State.objects.get(type="draft", slug="active")
+
+        def tracked():
+            return set(docs_tracked_by_community_list(clist))
+
+        author_rule = SearchRule.objects.create(rule_type="author", state=active, person=plain, community_list=clist)
+        self.assertEqual(tracked(), {draft})
+        self.assertEqual(list(community_lists_tracking_doc(draft)), [clist])
+
+        draft.documentauthor_set.all().delete()
+        self.assertEqual(tracked(), set())
+
+        SearchRule.objects.create(rule_type="ad", state=active, person=ad, community_list=clist)
+        self.assertEqual(tracked(), set())
+        other_draft.ad = ad
+        other_draft.save()
+        self.assertEqual(tracked(), {other_draft})
+
+        other_draft.set_state(State.objects.get(type="draft", slug="expired"))
+        self.assertEqual(tracked(), set())
+
+        clist.added_docs.add(draft)
+        self.assertEqual(tracked(), {draft})
+        clist.added_docs.remove(draft)
+        self.assertEqual(tracked(), set())
+
+        DocumentAuthor.objects.create(document=draft, person=plain, email=plain.email())
+        self.assertEqual(tracked(), {draft})
+        author_rule.delete()
+        self.assertEqual(tracked(), set())
+
+        other_draft.set_state(active)
+        clist.tracked_docs.clear()
+        call_command('update_community_list_membership', verbosity=0)
+        self.assertEqual(tracked(), {other_draft})
+
+    def test_tracked_docs_maintenance_skips_unrelated_changes(self):
+        draft = WgDraftFactory(states=[('draft','active'), ('draft-iesg','pub-req')])
+        clist = CommunityList.objects.create(user=PersonFactory().user)
+        SearchRule.objects.create(rule_type="group", state=State.objects.get(type="draft", slug="active"), group=draft.group, community_list=clist)
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), {draft})
+
+        with patch('ietf.community.utils.community_list_rules_matching_doc', wraps=community_list_rules_matching_doc) as matching:
+            draft.title = "A new title"
+            draft.save()
+            # no rule is for an IESG state
+            draft.set_state(State.objects.get(type="draft-iesg", slug="ad-eval"))
+            self.assertEqual(matching.call_count, 0)
+
+            draft.set_state(State.objects.get(type="draft", slug="expired"))
+            self.assertEqual(matching.call_count, 1)
+            self.assertEqual(set(docs_tracked_by_community_list(clist)), set())
+
+            draft.group = GroupFactory()
+            draft.save()
+            self.assertEqual(matching.call_count, 2)
+
+    def test_name_contains_matcher(self):
+        matcher = NameContainsMatcher([
+            (1, "^draft-[^-]+-mars-"),
+            (2, "mars"),
+            (3, "draft-.*-(foo|bar)-"),
+            (4, r"-(\w+)-\1-"),
+            (5, "(?i)MARS"),
+            (6, "invalid("),
+            (7, "mars"),
+        ])
+        self.assertEqual(matcher.matching_rule_ids("draft-ietf-mars-test"), {1, 2, 5, 7})
+        self.assertEqual(matcher.matching_rule_ids("draft-ietf-mars-foo-foo-test"), {1, 2, 3, 4, 5, 7})
+        self.assertEqual(matcher.matching_rule_ids("draft-ietf-ames-test"), set())
+
+    def test_update_name_contains_indexes_with_new_doc(self):
+        plain = PersonFactory(user__username='plain')
+        clist = CommunityList.objects.create(user=plain.user)
+        active = State.objects.get(type="draft", slug="active")
+        rule = SearchRule.objects.create(rule_type="name_contains", state=active, text="^draft-[^-]+-matcher-", community_list=clist)
+        other_rule = SearchRule.objects.create(rule_type="name_contains", state=active, text="nomatch", community_list=clist)
+
+        draft = WgDraftFactory(name="draft-ietf-matcher-test", states=[('draft','active')])
+        update_name_contains_indexes_with_new_doc(draft)
+        self.assertEqual(list(rule.name_contains_index.all()), [draft])
+        self.assertEqual(list(other_rule.name_contains_index.all()), [])
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), {draft})
+
+        # doing it again doesn't add anything
+        update_name_contains_indexes_with_new_doc(draft)
+        self.assertEqual(rule.name_contains_index.count(), 1)
+
+        # a new rule is picked up by the matcher
+        new_rule = SearchRule.objects.create(rule_type="name_contains", state=active, text="-test$", community_list=clist)
+        update_name_contains_indexes_with_new_doc(draft)
+        self.assertEqual(list(new_rule.name_contains_index.all()), [draft])
+
+        rule.text = "^draft-[^-]+-other-"
+        rule.save()
+        reset_name_contains_index_for_rule(rule)
+        self.assertEqual(list(rule.name_contains_index.all()), [])
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), {draft})
+        new_rule.delete()
+        self.assertEqual(set(docs_tracked_by_community_list(clist)), set())
+
     def test_view_list(self):
         PersonFactory(user__username='plain')
         draft = WgDraftFactory()
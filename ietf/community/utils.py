@@ -3,9 +3,13 @@
 
 
 import re
+import uuid
+
+from collections import defaultdict
 
 from django.db.models import Q
 from django.conf import settings
+from django.core.cache import cache
 
 import debug                            # pyflakes:ignore
 
@@ -19,6 +23,8 @@ from django.shortcuts import get_object_or_404
 
 from ietf.utils.mail import send_mail
 
+NAME_CONTAINS_RULES_VERSION_CACHE_KEY = "community:name_contains_rules_version"
+
 def states_of_significant_change():
     return State.objects.filter(used=True).filter(
         Q(type="draft-stream-ietf", slug__in=['adopt-wg', 'wg-lc', 'writeupw', 'parked', 'dead']) |
@@ -56,20 +62,103 @@ def can_manage_community_list(user, clist):
 
     return False
 
+class NameContainsMatcher(object):
+    """Match a document name against the texts of all name_contains
+    rules in one pass.
+
+    The rule texts are combined into a single regexp with one optional
+    lookahead per distinct text, so a single match at the start of the
+    name tells which of the texts can be found somewhere in it.  Texts
+    which can't be combined (backreferences, clashing group names,
+    inline flags) are matched separately."""
+
+    def __init__(self, rules, version=None):
+        self.version = version
+        self.rule_ids_by_text = defaultdict(set)
+        for pk, text in rules:
+            self.rule_ids_by_text[text].add(pk)
+
+        self.texts = []
+        self.separate = []
+        for text in self.rule_ids_by_text:
+            try:
+                compiled = re.compile(text)
+            except re.error:
+                continue        # invalid regexps never match
+            if re.search(r"\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)", text):
+                self.separate.append((text, compiled))
+            else:
+                self.texts.append(text)
+
+        self.combined = None
+        if self.texts:
+            try:
+                self.combined = re.compile("".join("(?=(?:.*?(?P<r%d>%s))?)" % (i, t) for i, t in enumerate(self.texts)))
+            except re.error:
+                self.separate.extend((t, re.compile(t)) for t in self.texts)
+                self.texts = []
+
+    def matching_texts(self, name):
+        texts = []
+        if self.combined:
+            m = self.combined.match(name)
+            texts.extend(t for i, t in enumerate(self.texts) if m.group("r%d" % i) is not None)
+        texts.extend(t for t, compiled in self.separate if compiled.search(name))
+        return texts
+
+    def matching_rule_ids(self, name):
+        rule_ids = set()
+        for text in self.matching_texts(name):
+            rule_ids |= self.rule_ids_by_text[text]
+        return rule_ids
+
+_name_contains_matcher = None
+
+def name_contains_matcher():
+    """Return a NameContainsMatcher for the current name_contains rules.
+
+    The matcher is kept around in the process, and rebuilt when the
+    rules version in the cache has been bumped by
+    invalidate_name_contains_matcher() in any process."""
+    global _name_contains_matcher
+    version = cache.get(NAME_CONTAINS_RULES_VERSION_CACHE_KEY)
+    if _name_contains_matcher is None or _name_contains_matcher.version != version:
+        rules = SearchRule.objects.filter(rule_type="name_contains").values_list("pk", "text")
+        _name_contains_matcher = NameContainsMatcher(rules, version)
+    return _name_contains_matcher
+
+def invalidate_name_contains_matcher():
+    global _name_contains_matcher
+    _name_contains_matcher = None
+    cache.set(NAME_CONTAINS_RULES_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
 def reset_name_contains_index_for_rule(rule):
     if not rule.rule_type == "name_contains":
         return
 
-    rule.name_contains_index.set(Document.objects.filter(docalias__name__regex=rule.text))
+    Index = SearchRule.name_contains_index.through
+    doc_ids = set(Document.objects.filter(docalias__name__regex=rule.text).values_list("pk", flat=True))
+    existing = set(Index.objects.filter(searchrule=rule).values_list("document", flat=True))
+    if not (existing ^ doc_ids):
+        return
+    Index.objects.filter(searchrule=rule, document__in=existing - doc_ids).delete()
+    Index.objects.bulk_create([Index(searchrule=rule, document_id=pk) for pk in doc_ids - existing])
+    # the bulk operations bypass the m2m signals
+    update_community_list_membership(rule.community_list_id)
 
 def update_name_contains_indexes_with_new_doc(doc):
-    for r in SearchRule.objects.filter(rule_type="name_contains"):
-        # in theory we could use the database to do this query, but
-        # Django doesn't support a reversed regex operator, and regexp
-        # support needs backend-specific code so custom SQL is a bit
-        # cumbersome too
-        if re.search(r.text, doc.name) and not doc in r.name_contains_index.all():
-            r.name_contains_index.add(doc)
+    # Django doesn't support a reversed regex operator, so match the
+    # name against all the rules at once here instead
+    rule_ids = name_contains_matcher().matching_rule_ids(doc.name)
+    if not rule_ids:
+        return
+
+    Index = SearchRule.name_contains_index.through
+    existing = set(Index.objects.filter(document=doc, searchrule__in=rule_ids).values_list("searchrule", flat=True))
+    if rule_ids - existing:
+        Index.objects.bulk_create([Index(searchrule_id=pk, document=doc) for pk in rule_ids - existing])
+        # the bulk insert bypasses the m2m signals
+        update_community_lists_for_doc(doc)
 
 def docs_matching_community_list_rule(rule):
     docs = Document.objects.all()
@@ -139,21 +228,58 @@ def community_list_rules_matching_doc(doc):
     return rules
 
 
-def docs_tracked_by_community_list(clist):
-    if clist.pk is None:
-        return Document.objects.none()
-
+def doc_ids_matching_community_list(clist):
+    """Compute the ids of the documents tracked by clist from its added
+    documents and its rules.  This is expensive for lists with many
+    rules, so it's only used to maintain clist.tracked_docs."""
     # in theory, we could use an OR query, but databases seem to have
     # trouble with OR queries and complicated joins so do the OR'ing
     # manually
     doc_ids = set(clist.added_docs.values_list("pk", flat=True))
     for rule in clist.searchrule_set.all():
         doc_ids = doc_ids | set(docs_matching_community_list_rule(rule).values_list("pk", flat=True))
+    return doc_ids
+
+def update_community_list_membership(clist_id, add=True):
+    """Bring the materialized clist.tracked_docs up to date with the
+    added documents and rules of the list.  If add is False, only
+    remove documents no longer tracked."""
+    clist = CommunityList.objects.filter(pk=clist_id).first()
+    if clist is None:
+        return
+
+    doc_ids = doc_ids_matching_community_list(clist)
+    existing = set(clist.tracked_docs.values_list("pk", flat=True))
+    if existing - doc_ids:
+        clist.tracked_docs.remove(*(existing - doc_ids))
+    if add and doc_ids - existing:
+        clist.tracked_docs.add(*(doc_ids - existing))
+
+def update_community_lists_for_doc(doc, add=True):
+    """Bring the materialized tracked_docs of all community lists up to
+    date for a document which has changed.  If add is False, only
+    remove the document from lists no longer tracking it."""
+    if doc.pk is None:
+        return
+
+    clist_ids = set(CommunityList.added_docs.through.objects.filter(document=doc).values_list("communitylist", flat=True))
+    clist_ids |= set(community_list_rules_matching_doc(doc).values_list("community_list", flat=True))
+
+    Membership = CommunityList.tracked_docs.through
+    existing = set(Membership.objects.filter(document=doc).values_list("communitylist", flat=True))
+    if existing - clist_ids:
+        Membership.objects.filter(document=doc, communitylist__in=existing - clist_ids).delete()
+    if add and clist_ids - existing:
+        Membership.objects.bulk_create([Membership(communitylist_id=pk, document=doc) for pk in clist_ids - existing])
+
+def docs_tracked_by_community_list(clist):
+    if clist.pk is None:
+        return Document.objects.none()
 
-    return Document.objects.filter(pk__in=doc_ids)
+    return Document.objects.filter(tracking_community_lists=clist)
 
 def community_lists_tracking_doc(doc):
-    return CommunityList.objects.filter(Q(added_docs=doc) | Q(searchrule__in=community_list_rules_matching_doc(doc)))
+    return CommunityList.objects.filter(tracked_docs=doc)
 
 
 def notify_event_to_subscribers(event):
@@ -162,7 +288,7 @@ def notify_event_to_subscribers(event):
     except AttributeError:
         significant = False
 
-    subscriptions = EmailSubscription.objects.filter(community_list__in=community_lists_tracking_doc(event.doc)).distinct()
+    subscriptions = EmailSubscription.objects.filter(community_list__tracked_docs=event.doc)
 
     if not significant:
         subscriptions = subscriptions.filter(notify_on="all")
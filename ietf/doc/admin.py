@@ -12,7 +12,8 @@ from .models import (StateType, State, RelatedDocument, DocumentAuthor, Document
     TelechatDocEvent, BallotPositionDocEvent, ReviewRequestDocEvent, InitialReviewDocEvent,
     AddedMessageEvent, SubmissionDocEvent, DeletedEvent, EditedAuthorsDocEvent, DocumentURL,
     ReviewAssignmentDocEvent, IanaExpertDocEvent, IRSGBallotDocEvent, DocExtResource, DocumentActionHolder,
-    BofreqEditorDocEvent, BofreqResponsibleDocEvent )
+    BofreqEditorDocEvent, BofreqResponsibleDocEvent, DocumentSearchIndex,
+    DocumentSearchTrigram )
 
 from ietf.utils.validators import validate_external_resource_value
 
@@ -219,3 +220,16 @@ class DocExtResourceAdmin(admin.ModelAdmin):
     search_fields = ['doc__name', 'value', 'display_name', 'name__slug',]
     raw_id_fields = ['doc', ]
 admin.site.register(DocExtResource, DocExtResourceAdmin)
+
+class DocumentSearchIndexAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'title', ]
+    search_fields = ['document__name', 'names', 'title', 'authors', ]
+    raw_id_fields = ['document', ]
+admin.site.register(DocumentSearchIndex, DocumentSearchIndexAdmin)
+
+class DocumentSearchTrigramAdmin(admin.ModelAdmin):
+    list_display = ['id', 'document', 'field', 'trigram', ]
+    list_filter = ['field', ]
+    search_fields = ['document__name', ]
+    raw_id_fields = ['document', ]
+admin.site.register(DocumentSearchTrigram, DocumentSearchTrigramAdmin)
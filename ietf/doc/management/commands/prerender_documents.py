@@ -0,0 +1,27 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+from django.core.management.base import BaseCommand
+
+from ietf.doc.models import Document
+from ietf.doc.utils import documents_to_prerender, prerender_documents
+
+
+class Command(BaseCommand):
+    help = ('Render the htmlized and pdfized versions of documents into the render caches, '
+            'for the named documents, or for recent revisions and RFCs and the most referenced RFCs')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Names of documents to render')
+        parser.add_argument('--days', type=int, default=1,
+            help='Render drafts with new revisions and RFCs published in the last number of days (default %(default)s)')
+        parser.add_argument('--most-referenced', type=int, default=0,
+            help='Also render this number of the most referenced RFCs (default %(default)s)')
+
+    def handle(self, *args, **options):
+        if options['names']:
+            docs = Document.objects.filter(name__in=options['names'])
+        else:
+            docs = documents_to_prerender(days=options['days'], most_referenced=options['most_referenced'])
+        count = prerender_documents(docs)
+        if options['verbosity'] > 0:
+            self.stdout.write("Prerendered %d documents" % count)
@@ -0,0 +1,76 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import Document
+from ietf.doc.utils import rebuild_reference_relations
+
+
+def archived_draft_filenames(doc):
+    """Find the xml and plaintext files of the current revision of doc,
+    or of the RFC if it has been published as one"""
+    if doc.get_state_slug() == 'rfc':
+        base = os.path.join(settings.RFC_PATH, doc.canonical_name())
+    else:
+        base = os.path.join(settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR, '%s-%s' % (doc.name, doc.rev))
+    candidates = { ext: '%s.%s' % (base, ext) for ext in ('xml', 'txt') }
+    return { ext: filename for ext, filename in candidates.items() if os.path.exists(filename) }
+
+def rebuild_batch(names):
+    results = []
+    for doc in Document.objects.filter(name__in=names, type_id='draft'):
+        filenames = archived_draft_filenames(doc)
+        if filenames:
+            results.append((doc.name, rebuild_reference_relations(doc, filenames)))
+    return results
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the reference relations of drafts and RFCs from their xml or plaintext files, '
+            'e.g. after the reference parsers have been improved')
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*',
+            help='Names of the drafts to process (default all drafts)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes (default %(default)s)')
+        parser.add_argument('--batch-size', type=int, default=100,
+            help='Number of drafts per worker batch (default %(default)s)')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        names = options['names']
+        if not names:
+            names = list(Document.objects.filter(type_id='draft').order_by('name').values_list('name', flat=True))
+        batch_size = options['batch_size']
+        batches = [ names[i:i + batch_size] for i in range(0, len(names), batch_size) ]
+
+        if options['workers'] > 1 and len(batches) > 1:
+            # the forked workers must not share the database connection
+            # of this process, they'll open their own
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                results = pool.imap_unordered(rebuild_batch, batches)
+                self.report(results, verbosity)
+        else:
+            self.report(map(rebuild_batch, batches), verbosity)
+
+    def report(self, batch_results, verbosity):
+        processed = 0
+        for results in batch_results:
+            for name, result in results:
+                processed += 1
+                if verbosity > 1 and result:
+                    for error in result.get('errors', []):
+                        self.stderr.write('%s: %s' % (name, error))
+                    if 'unfound' in result:
+                        self.stdout.write('%s: no matching DocAlias for %s' % (name, ', '.join(sorted(result['unfound']))))
+        if verbosity > 0:
+            self.stdout.write('Rebuilt the reference relations of %d documents' % processed)
@@ -0,0 +1,20 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+from django.core.management.base import BaseCommand
+
+from ietf.doc.utils_search import rebuild_document_search_index
+
+
+class Command(BaseCommand):
+    help = ('Recompute the document search index from the documents, their aliases and their authors')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Number of documents to process per batch (default %(default)s)')
+        parser.add_argument('--missing', action='store_true', default=False,
+            help='Only index the documents which have no search index entry')
+
+    def handle(self, *args, **options):
+        count = rebuild_document_search_index(batch_size=options['batch_size'], missing_only=options['missing'])
+        if options['verbosity'] > 0:
+            self.stdout.write("Rebuilt the search index for %d documents" % count)
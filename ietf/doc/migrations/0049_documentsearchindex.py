@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0048_allow_longer_notify'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearchIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('names', models.TextField(blank=True, help_text='Document name and alias names')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('authors', models.TextField(blank=True, help_text='Author names, name aliases and email addresses')),
+                ('document', ietf.utils.models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='searchindex', to='doc.Document')),
+            ],
+            options={
+                'verbose_name_plural': 'document search indexes',
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def text(values):
+    return "\n".join(sorted(set(v.lower() for v in values if v)))
+
+def forward(apps, schema_editor):
+    Document = apps.get_model("doc", "Document")
+    DocAlias = apps.get_model("doc", "DocAlias")
+    DocumentAuthor = apps.get_model("doc", "DocumentAuthor")
+    DocumentSearchIndex = apps.get_model("doc", "DocumentSearchIndex")
+    Alias = apps.get_model("person", "Alias")
+    Email = apps.get_model("person", "Email")
+
+    names = defaultdict(list)
+    for pk, name in DocAlias.objects.values_list("docs", "name"):
+        names[pk].append(name)
+
+    person_docs = defaultdict(set)
+    for pk, person_id in DocumentAuthor.objects.values_list("document", "person"):
+        person_docs[person_id].add(pk)
+    person_strings = defaultdict(list)
+    for person_id, name in Alias.objects.filter(person__in=person_docs).values_list("person", "name"):
+        person_strings[person_id].append(name)
+    for person_id, address in Email.objects.filter(person__in=person_docs).values_list("person", "address"):
+        person_strings[person_id].append(address)
+    authors = defaultdict(list)
+    for person_id, doc_ids in person_docs.items():
+        for pk in doc_ids:
+            authors[pk].extend(person_strings[person_id])
+
+    batch = []
+    for pk, name, title in Document.objects.values_list("pk", "name", "title").iterator():
+        batch.append(DocumentSearchIndex(
+            document_id=pk,
+            names=text([name] + names[pk]),
+            title=title.lower(),
+            authors=text(authors[pk]),
+        ))
+        if len(batch) >= 1000:
+            DocumentSearchIndex.objects.bulk_create(batch)
+            batch = []
+    DocumentSearchIndex.objects.bulk_create(batch)
+
+def reverse(apps, schema_editor):
+    DocumentSearchIndex = apps.get_model("doc", "DocumentSearchIndex")
+    DocumentSearchIndex.objects.all().delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0049_documentsearchindex'),
+        ('person', '0029_use_timezone_now_for_person_models'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0050_populate_documentsearchindex'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentSearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('n', 'Names and title'), ('a', 'Authors')], max_length=1)),
+                ('trigram', models.CharField(max_length=3)),
+                ('document', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='searchtrigrams', to='doc.Document')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='documentsearchtrigram',
+            index=models.Index(fields=['field', 'trigram', 'document'], name='doc_documen_field_792223_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+from django.db import migrations
+
+
+def trigrams(*texts):
+    return set(line[i:i+3] for text in texts for line in text.split("\n") for i in range(len(line) - 2))
+
+def forward(apps, schema_editor):
+    DocumentSearchIndex = apps.get_model("doc", "DocumentSearchIndex")
+    DocumentSearchTrigram = apps.get_model("doc", "DocumentSearchTrigram")
+
+    batch = []
+    for pk, names, title, authors in DocumentSearchIndex.objects.values_list("document", "names", "title", "authors").iterator():
+        batch.extend(DocumentSearchTrigram(document_id=pk, field="n", trigram=t) for t in trigrams(names, title))
+        batch.extend(DocumentSearchTrigram(document_id=pk, field="a", trigram=t) for t in trigrams(authors))
+        if len(batch) >= 10000:
+            DocumentSearchTrigram.objects.bulk_create(batch)
+            batch = []
+    DocumentSearchTrigram.objects.bulk_create(batch)
+
+def reverse(apps, schema_editor):
+    DocumentSearchTrigram = apps.get_model("doc", "DocumentSearchTrigram")
+    DocumentSearchTrigram.objects.all().delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0051_documentsearchtrigram'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, reverse),
+    ]
@@ -3,6 +3,7 @@
 
 
 import datetime
+import hashlib
 import logging
 import io
 import os
@@ -11,7 +12,7 @@ import rfc2html
 from pathlib import Path
 from lxml import etree
 from typing import Optional, TYPE_CHECKING
-from weasyprint import HTML as wpHTML
+from weasyprint import HTML as wpHTML, __version__ as weasyprint_version
 
 from django.db import models
 from django.core import checks
@@ -31,14 +32,14 @@ from ietf.group.models import Group
 from ietf.name.models import ( DocTypeName, DocTagName, StreamName, IntendedStdLevelName, StdLevelName,
     DocRelationshipName, DocReminderTypeName, BallotPositionName, ReviewRequestStateName, ReviewAssignmentStateName, FormalLanguageName,
     DocUrlTagName, ExtResourceName)
-from ietf.person.models import Email, Person
+from ietf.person.models import Alias, Email, Person
 from ietf.person.utils import get_active_balloters
 from ietf.utils import log
 from ietf.utils.admin import admin_link
 from ietf.utils.decorators import memoize
 from ietf.utils.validators import validate_no_control_chars
 from ietf.utils.mail import formataddr
-from ietf.utils.models import ForeignKey
+from ietf.utils.models import ForeignKey, OneToOneField
 from ietf.utils.timezone import date_today, RPC_TZINFO, DEADLINE_TZINFO
 if TYPE_CHECKING:
     # importing other than for type checking causes errors due to cyclic imports
@@ -88,6 +89,22 @@ IESG_CHARTER_ACTIVE_STATES = ("intrev", "extrev", "iesgrev")
 IESG_STATCHG_CONFLREV_ACTIVE_STATES = ("iesgeval", "defer")
 IESG_SUBSTATE_TAGS = ('ad-f-up', 'need-rev', 'extpty')
 
+def htmlizer_version():
+    return "%s-%s" % (settings.HTMLIZER_VERSION, rfc2html.__version__)
+
+def pdfizer_version():
+    return "%s-%s-%s" % (settings.PDFIZER_VERSION, htmlizer_version(), weasyprint_version)
+
+def render_cache_key(base_name, sources, version):
+    """Return the htmlized/pdfized cache key for a rendering of the
+    given sources (str or bytes).  The key changes with the contents of
+    the sources and the renderer version, so stale renderings are never
+    served, and don't have to be invalidated explicitly."""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(source.encode('utf-8') if isinstance(source, str) else source)
+    return "%s:%s:%s" % (base_name, version, digest.hexdigest())
+
 class DocumentInfo(models.Model):
     """Any kind of document.  Draft, RFC, Charter, IPR Statement, Liaison Statement"""
     time = models.DateTimeField(default=timezone.now) # should probably have auto_now=True
@@ -597,7 +614,7 @@ class DocumentInfo(models.Model):
         html = ""
         if text:
             cache = caches['htmlized']
-            cache_key = name.split('.')[0]
+            cache_key = render_cache_key(name.split('.')[0], [text], htmlizer_version())
             try:
                 html = cache.get(cache_key)
             except EOFError:
@@ -611,7 +628,7 @@ class DocumentInfo(models.Model):
                     cache.set(cache_key, html, settings.HTMLIZER_CACHE_TIME)
         return html
 
-    def pdfized(self):
+    def _pdfized_source(self):
         name = self.get_base_name()
         text = self.html_body(classes="rfchtml")
         stylesheets = [finders.find("ietf/css/document_html_referenced.css")]
@@ -619,9 +636,12 @@ class DocumentInfo(models.Model):
             stylesheets.append(finders.find("ietf/css/document_html_txt.css"))
         else:
             text = self.htmlized()
+        cache_key = render_cache_key(name.split(".")[0], [text or ""] + [Path(s).read_bytes() for s in stylesheets if s], pdfizer_version())
+        return text, stylesheets, cache_key
 
+    def pdfized(self, source=None):
+        text, stylesheets, cache_key = source or self._pdfized_source()
         cache = caches["pdfized"]
-        cache_key = name.split(".")[0]
         try:
             pdf = cache.get(cache_key)
         except EOFError:
@@ -641,6 +661,20 @@ class DocumentInfo(models.Model):
                 cache.set(cache_key, pdf, settings.PDFIZER_CACHE_TIME)
         return pdf
 
+    def pdfized_file(self):
+        """Return the pdfized document as an open binary file, or None.
+        If the pdf cache can hand out its entries as files, the cached
+        pdf is returned without reading it into memory, so that it can
+        be streamed from disk."""
+        cache = caches["pdfized"]
+        source = self._pdfized_source()
+        if hasattr(cache, "get_file"):
+            f = cache.get_file(source[2])
+            if f is not None:
+                return f
+        pdf = self.pdfized(source)
+        return io.BytesIO(pdf) if pdf else None
+
     def references(self):
         return self.relations_that_doc(('refnorm','refinfo','refunk','refold'))
 
@@ -1191,6 +1225,63 @@ class DocAlias(models.Model):
         verbose_name = "document alias"
         verbose_name_plural = "document aliases"
 
+class DocumentSearchIndex(models.Model):
+    """Denormalized, lower-cased copy of the text which the document
+    search matches against, so that a search is a scan over a single
+    narrow table instead of joins over aliases, authors, person aliases
+    and email addresses.  Multiple values in a field are separated by
+    newlines, so that a search term can't match across two values.
+
+    Kept up to date by signal handlers, see the end of this file; the
+    rebuild_search_index management command recreates it from scratch.
+    """
+    document = OneToOneField(Document, related_name='searchindex')
+    names = models.TextField(blank=True, help_text="Document name and alias names")
+    title = models.CharField(max_length=255, blank=True)
+    authors = models.TextField(blank=True, help_text="Author names, name aliases and email addresses")
+
+    def __str__(self):
+        return "Search index for %s" % self.document.name
+
+    class Meta:
+        verbose_name_plural = "document search indexes"
+
+@checks.register('db-consistency')
+def check_document_search_index(app_configs, **kwargs):
+    errors = []
+    missing = Document.objects.filter(searchindex__isnull=True).count()
+    if missing:
+        errors.append(checks.Warning(
+            "%d documents have no doc.DocumentSearchIndex entry, and won't be found by the document search" % missing,
+            hint="Run 'ietf/manage.py rebuild_search_index --missing' to index them.",
+            id='datatracker.doc.W0016',
+        ))
+    return errors
+
+class DocumentSearchTrigram(models.Model):
+    """Inverted index over DocumentSearchIndex: one row for each distinct
+    three-character substring of a document's names and title (field
+    'n') or of its authors (field 'a').  A substring search first looks
+    up the documents having every trigram of the search term through the
+    (field, trigram) index, and only matches the term against the
+    DocumentSearchIndex text of those candidates.
+
+    Maintained together with DocumentSearchIndex, see
+    ietf.doc.utils_search.update_document_search_index.
+    """
+    FIELD_CHOICES = [('n', 'Names and title'), ('a', 'Authors')]
+    document = ForeignKey(Document, related_name='searchtrigrams')
+    field = models.CharField(max_length=1, choices=FIELD_CHOICES)
+    trigram = models.CharField(max_length=3)
+
+    def __str__(self):
+        return "%s %s '%s'" % (self.document.name, self.field, self.trigram)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['field', 'trigram', 'document']),
+        ]
+
 class DocReminder(models.Model):
     event = ForeignKey('DocEvent')
     type = ForeignKey(DocReminderTypeName)
@@ -1483,3 +1574,69 @@ class BofreqEditorDocEvent(DocEvent):
 class BofreqResponsibleDocEvent(DocEvent):
     """ Capture the responsible leadership (IAB and IESG members) for a BOF Request """
     responsible = models.ManyToManyField('person.Person', blank=True)
+
+
+def update_search_index_for_document(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if not created:
+        # the document name is immutable, so only the title can have changed
+        titles = DocumentSearchIndex.objects.filter(document=instance).values_list('title', flat=True)
+        if instance.title.lower() in titles:
+            return
+    from ietf.doc.utils_search import update_document_search_index
+    update_document_search_index([instance.pk], create=True)
+
+def delete_search_index_for_document(sender, instance, **kwargs):
+    # delete the index up front, so the signal handlers of the authors
+    # deleted along with the document don't recreate its trigrams
+    DocumentSearchTrigram.objects.filter(document=instance).delete()
+    DocumentSearchIndex.objects.filter(document=instance).delete()
+
+def update_search_index_for_author(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from ietf.doc.utils_search import update_document_search_index
+    update_document_search_index([instance.document_id])
+
+def update_search_index_for_person(sender, instance, raw=False, **kwargs):
+    if raw or not instance.person_id:
+        return
+    from ietf.doc.utils_search import update_document_search_index
+    update_document_search_index(DocumentAuthor.objects.filter(person=instance.person_id).values_list('document', flat=True))
+
+def update_search_index_for_aliases(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and not reverse:
+        instance._search_index_cleared_docs = list(instance.docs.values_list('pk', flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        doc_ids = [instance.pk]
+    elif action == "post_clear":
+        doc_ids = getattr(instance, '_search_index_cleared_docs', [])
+    else:
+        doc_ids = pk_set
+    from ietf.doc.utils_search import update_document_search_index
+    update_document_search_index(doc_ids)
+
+def update_alias_filter_for_added_alias(sender, instance, created=False, raw=False, **kwargs):
+    if created:
+        from ietf.doc.utils_names import alias_added
+        alias_added(instance.name)
+
+def update_alias_filter_for_removed_alias(sender, instance, **kwargs):
+    from ietf.doc.utils_names import alias_removed
+    alias_removed(instance.name)
+
+models.signals.post_save.connect(update_search_index_for_document, sender=Document)
+models.signals.pre_delete.connect(delete_search_index_for_document, sender=Document)
+models.signals.post_save.connect(update_search_index_for_author, sender=DocumentAuthor)
+models.signals.post_delete.connect(update_search_index_for_author, sender=DocumentAuthor)
+models.signals.post_save.connect(update_search_index_for_person, sender=Email)
+models.signals.post_delete.connect(update_search_index_for_person, sender=Email)
+models.signals.post_save.connect(update_search_index_for_person, sender=Alias)
+models.signals.post_delete.connect(update_search_index_for_person, sender=Alias)
+models.signals.m2m_changed.connect(update_search_index_for_aliases, sender=DocAlias.docs.through)
+models.signals.post_save.connect(update_alias_filter_for_added_alias, sender=DocAlias)
+models.signals.post_delete.connect(update_alias_filter_for_removed_alias, sender=DocAlias)
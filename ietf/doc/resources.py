@@ -18,7 +18,8 @@ from ietf.doc.models import (BallotType, DeletedEvent, StateType, State, Documen
     RelatedDocHistory, BallotPositionDocEvent, AddedMessageEvent, SubmissionDocEvent,
     ReviewRequestDocEvent, ReviewAssignmentDocEvent, EditedAuthorsDocEvent, DocumentURL,
     IanaExpertDocEvent, IRSGBallotDocEvent, DocExtResource, DocumentActionHolder, 
-    BofreqEditorDocEvent,BofreqResponsibleDocEvent)
+    BofreqEditorDocEvent,BofreqResponsibleDocEvent, DocumentSearchIndex,
+    DocumentSearchTrigram)
 
 from ietf.name.resources import BallotPositionNameResource, DocTypeNameResource
 class BallotTypeResource(ModelResource):
@@ -859,3 +860,38 @@ class BofreqResponsibleDocEventResource(ModelResource):
             "responsible": ALL_WITH_RELATIONS,
         }
 api.doc.register(BofreqResponsibleDocEventResource())
+
+
+class DocumentSearchIndexResource(ModelResource):
+    document         = ToOneField(DocumentResource, 'document')
+    class Meta:
+        queryset = DocumentSearchIndex.objects.all()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'documentsearchindex'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "names": ALL,
+            "title": ALL,
+            "authors": ALL,
+            "document": ALL_WITH_RELATIONS,
+        }
+api.doc.register(DocumentSearchIndexResource())
+
+
+class DocumentSearchTrigramResource(ModelResource):
+    document         = ToOneField(DocumentResource, 'document')
+    class Meta:
+        queryset = DocumentSearchTrigram.objects.all()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'documentsearchtrigram'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "field": ALL,
+            "trigram": ALL,
+            "document": ALL_WITH_RELATIONS,
+        }
+api.doc.register(DocumentSearchTrigramResource())
@@ -0,0 +1,13 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+#
+# Celery task definitions
+#
+from celery import shared_task
+
+from ietf.doc.models import Document
+from ietf.doc.utils import prerender_documents
+
+
+@shared_task
+def prerender_documents_task(names):
+    prerender_documents(Document.objects.filter(name__in=names))
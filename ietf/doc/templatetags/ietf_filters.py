@@ -16,18 +16,18 @@ from django.utils.html import strip_tags
 from django.utils.encoding import force_text
 from django.utils.encoding import force_str # pyflakes:ignore force_str is used in the doctests
 from django.urls import reverse as urlreverse
-from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.urls import NoReverseMatch
 from django.utils import timezone
 
 import debug                            # pyflakes:ignore
 
-from ietf.doc.models import BallotDocEvent, DocAlias
+from ietf.doc.models import BallotDocEvent
 from ietf.doc.models import ConsensusDocEvent
 from ietf.utils.html import sanitize_fragment
 from ietf.utils import log
 from ietf.doc.utils import prettify_std_name
+from ietf.doc.utils_names import resolve_doc_names
 from ietf.utils.text import wordwrap, fill, wrap_text_if_unwrapped, bleach_linker, bleach_cleaner, validate_url
 
 register = template.Library()
@@ -139,25 +139,14 @@ def rfceditor_info_url(rfcnum : str):
     return urljoin(settings.RFC_EDITOR_INFO_BASE_URL, f'rfc{rfcnum}')
 
 
-def doc_canonical_name(name):
-    """Check whether a given document exists, and return its canonical name"""
-
-    def find_unique(n):
-        key = hash(n)
-        found = cache.get(key)
-        if not found:
-            exact = DocAlias.objects.filter(name=n).first()
-            found = exact.name if exact else "_"
-            cache.set(key, found, timeout=60*60*24)  # cache for one day
-        return None if found == "_" else found
-
+def doc_name_candidates(name):
+    """The names under which a document mentioned as name could exist, in
+    the order doc_canonical_name() tries them"""
     # chop away extension
     extension_split = re.search(r"^(.+)\.(txt|ps|pdf|html)$", name)
     if extension_split:
         name = extension_split.group(1)
-
-    if find_unique(name):
-        return name
+    candidates = [name]
 
     # check for embedded rev - this may be ambiguous, so don't
     # chop it off if we don't find a match
@@ -165,15 +154,30 @@ def doc_canonical_name(name):
         r"^(.+)-(\d{2}|[1-9]\d{2,})$", name
     )
     if rev_split:
-        name = rev_split.group(1)
-        if find_unique(name):
-            return name
-
+        candidates.append(rev_split.group(1))
+    return candidates
+
+
+def doc_canonical_name(name, found=None):
+    """Check whether a given document exists, and return its canonical name.
+
+    found is a dictionary from lower case names to whether they exist, as
+    returned by resolve_doc_names(); the names not in it are looked up and
+    added to it."""
+    if found is None:
+        found = {}
+    candidates = doc_name_candidates(name)
+    missing = [ n for n in candidates if n.lower() not in found ]
+    if missing:
+        found.update(resolve_doc_names(missing))
+    for n in candidates:
+        if found[n.lower()]:
+            return n
     return ""
 
 
-def link_charter_doc_match(match):
-    if not doc_canonical_name(match[0]):
+def link_charter_doc_match(match, found=None):
+    if not doc_canonical_name(match[0], found):
         return match[0]
     url = urlreverse(
         "ietf.doc.views_doc.document_main",
@@ -182,11 +186,14 @@ def link_charter_doc_match(match):
     return f'<a href="{url}">{match[0]}</a>'
 
 
-def link_non_charter_doc_match(match):
-    name = match[0]
+def non_charter_doc_name(match):
     # handle "I-D.*"" reference-style matches
-    name = re.sub(r"^i-d\.(.*)", r"draft-\1", name, flags=re.IGNORECASE)
-    cname = doc_canonical_name(name)
+    return re.sub(r"^i-d\.(.*)", r"draft-\1", match[0], flags=re.IGNORECASE)
+
+
+def link_non_charter_doc_match(match, found=None):
+    name = non_charter_doc_name(match)
+    cname = doc_canonical_name(name, found)
     if not cname:
         return match[0]
     if name == cname:
@@ -201,7 +208,7 @@ def link_non_charter_doc_match(match):
         url = urlreverse("ietf.doc.views_doc.document_main", kwargs=dict(name=cname))
         return f'<a href="{url}">{match[0]}</a>'
 
-    cname = doc_canonical_name(name)
+    cname = doc_canonical_name(name, found)
     if not cname:
         return match[0]
     if name == cname:
@@ -218,15 +225,48 @@ def link_non_charter_doc_match(match):
     return match[0]
 
 
-def link_other_doc_match(match):
-    doc = match[2].strip().lower()
-    rev = match[3]
-    if not doc_canonical_name(doc + rev):
+def other_doc_name(match):
+    return match[2].strip().lower() + match[3]
+
+
+def link_other_doc_match(match, found=None):
+    if not doc_canonical_name(other_doc_name(match), found):
         return match[0]
-    url = urlreverse("ietf.doc.views_doc.document_main", kwargs=dict(name=doc + rev))
+    url = urlreverse("ietf.doc.views_doc.document_main", kwargs=dict(name=other_doc_name(match)))
     return f'<a href="{url}">{match[1]}</a>'
 
 
+# The document name patterns linkified by urlize_ietf_docs, in the order
+# they are applied, with the function linking a match, and the function
+# giving the name to look up for a match
+urlize_doc_patterns = [
+    (
+        re.compile(
+            r"\b(?<![/\-:=#\"\'])(charter-(?:[\d\w\.+]+-)*)(\d{2}(?:-\d{2}))(\.(?:txt|ps|pdf|html))?\b",
+            flags=re.IGNORECASE | re.ASCII,
+        ),
+        link_charter_doc_match,
+        lambda match: match[0],
+    ),
+    (
+        re.compile(
+            r"\b(?<![/\-:=#\"\'])((?:draft-|i-d\.|bofreq-|conflict-review-|status-change-)[\d\w\.+-]+(?![-@]))",
+            flags=re.IGNORECASE | re.ASCII,
+        ),
+        link_non_charter_doc_match,
+        non_charter_doc_name,
+    ),
+    (
+        re.compile(
+            r"\b(?<![/\-:=#\"\'])((RFC|BCP|STD|FYI) *\n? *0*(\d+))\b",
+            flags=re.IGNORECASE | re.ASCII,
+        ),
+        link_other_doc_match,
+        other_doc_name,
+    ),
+]
+
+
 @register.filter(name="urlize_ietf_docs", is_safe=True, needs_autoescape=True)
 def urlize_ietf_docs(string, autoescape=None):
     """
@@ -237,24 +277,14 @@ def urlize_ietf_docs(string, autoescape=None):
             string = escape(string)
         else:
             string = mark_safe(string)
-    string = re.sub(
-        r"\b(?<![/\-:=#\"\'])(charter-(?:[\d\w\.+]+-)*)(\d{2}(?:-\d{2}))(\.(?:txt|ps|pdf|html))?\b",
-        link_charter_doc_match,
-        string,
-        flags=re.IGNORECASE | re.ASCII,
-    )
-    string = re.sub(
-        r"\b(?<![/\-:=#\"\'])((?:draft-|i-d\.|bofreq-|conflict-review-|status-change-)[\d\w\.+-]+(?![-@]))",
-        link_non_charter_doc_match,
-        string,
-        flags=re.IGNORECASE | re.ASCII,
-    )
-    string = re.sub(
-        r"\b(?<![/\-:=#\"\'])((RFC|BCP|STD|FYI) *\n? *0*(\d+))\b",
-        link_other_doc_match,
-        string,
-        flags=re.IGNORECASE | re.ASCII,
-    )
+    # look up all the names mentioned at once
+    names = set()
+    for pattern, link, doc_name in urlize_doc_patterns:
+        for match in pattern.finditer(string):
+            names.update(doc_name_candidates(doc_name(match)))
+    found = resolve_doc_names(names)
+    for pattern, link, doc_name in urlize_doc_patterns:
+        string = pattern.sub(lambda match: link(match, found), string)
     return mark_safe(string)
 
 
@@ -1,6 +1,11 @@
 # Copyright The IETF Trust 2022, All Rights Reserved
 
+import copy
+
+from mock import patch
+
 from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
 
 from ietf.doc.factories import (
     WgDraftFactory,
@@ -9,7 +14,9 @@ from ietf.doc.factories import (
     NewRevisionDocEventFactory,
 )
 from ietf.doc.models import State, DocEvent, DocAlias
+from ietf.doc import utils_names
 from ietf.doc.templatetags.ietf_filters import urlize_ietf_docs, is_valid_url
+from ietf.doc.utils_names import get_alias_filter
 from ietf.person.models import Person
 from ietf.utils.test_utils import TestCase
 
@@ -149,3 +156,35 @@ class IetfFiltersTests(TestCase):
         for input, output in cases:
             # debug.show("(input, urlize_ietf_docs(input), output)")
             self.assertEqual(urlize_ietf_docs(input), output)
+
+    def test_urlize_ietf_docs_batched(self):
+        drafts = IndividualDraftFactory.create_batch(5)
+        text = "\n".join(f"{d.name}, {d.name}-{d.rev}.txt and draft-none-such-{i}" for i, d in enumerate(drafts))
+        with patch('ietf.doc.utils_names.cache', LocMemCache('urlize-test', {})):
+            result = urlize_ietf_docs(text)
+            for d in drafts:
+                self.assertIn(f'<a href="/doc/{d.name}/">{d.name}</a>', result)
+                self.assertIn(f'<a href="/doc/{d.name}/{d.rev}/">{d.name}-{d.rev}.txt</a>', result)
+            self.assertNotIn('/doc/draft-none-such', result)
+            # everything is known now
+            with self.assertNumQueries(0):
+                self.assertEqual(urlize_ietf_docs(text), result)
+            # a new document is found right away
+            new = IndividualDraftFactory(name="draft-none-such-0")
+            self.assertIn(f'<a href="/doc/{new.name}/">{new.name}</a>', urlize_ietf_docs(text))
+
+    def test_alias_filter_additions(self):
+        utils_names._alias_filter.clear()
+        with patch('ietf.doc.utils_names.cache', LocMemCache('alias-filter-test', {})):
+            self.assertNotIn('draft-added-later', get_alias_filter())
+            # the state of another process, which has seen the filter
+            other = dict(utils_names._alias_filter, filter=copy.deepcopy(utils_names._alias_filter['filter']))
+            with patch('ietf.doc.utils_names.build_alias_filter', wraps=utils_names.build_alias_filter) as build:
+                IndividualDraftFactory(name='draft-added-later')
+                # added in place, not rebuilt
+                self.assertIn('draft-added-later', get_alias_filter())
+                self.assertNotIn('draft-added-later', other['filter'])
+                other['checked'] = 0
+                with patch.dict(utils_names._alias_filter, other):
+                    self.assertIn('draft-added-later', get_alias_filter())
+                self.assertFalse(build.called)
@@ -11,21 +11,25 @@ import mock
 import json
 import copy
 import random
+import shutil
 
 from http.cookies import SimpleCookie
 from pathlib import Path
 from pyquery import PyQuery
 from urllib.parse import urlparse, parse_qs
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, mkdtemp
 from collections import defaultdict
 from zoneinfo import ZoneInfo
 
+from django.contrib.auth.models import AnonymousUser
 from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse as urlreverse
 from django.conf import settings
 from django.forms import Form
 from django.utils.html import escape
-from django.test import override_settings
+from django.test import override_settings, RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.utils.text import slugify
 
@@ -35,7 +39,8 @@ import debug                            # pyflakes:ignore
 
 from ietf.doc.models import ( Document, DocAlias, DocRelationshipName, RelatedDocument, State,
     DocEvent, BallotPositionDocEvent, LastCallDocEvent, WriteupDocEvent, NewRevisionDocEvent, BallotType,
-    EditedAuthorsDocEvent )
+    EditedAuthorsDocEvent, DocumentSearchIndex, DocumentSearchTrigram, render_cache_key,
+    check_document_search_index )
 from ietf.doc.factories import ( DocumentFactory, DocEventFactory, CharterFactory, 
     ConflictReviewFactory, WgDraftFactory, IndividualDraftFactory, WgRfcFactory, 
     IndividualRfcFactory, StateDocEventFactory, BallotPositionDocEventFactory, 
@@ -43,7 +48,9 @@ from ietf.doc.factories import ( DocumentFactory, DocEventFactory, CharterFactor
     StatusChangeFactory, BofreqFactory, DocExtResourceFactory)
 from ietf.doc.forms import NotifyForm
 from ietf.doc.fields import SearchableDocumentsField
-from ietf.doc.utils import create_ballot_if_not_open, uppercase_std_abbreviated_name
+from ietf.doc.utils import create_ballot_if_not_open, uppercase_std_abbreviated_name, documents_to_prerender
+from ietf.doc.utils import generate_idnits2_rfc_status, generate_idnits2_rfcs_obsoleted, update_idnits2_file
+from ietf.doc.utils_search import prepare_document_table, rebuild_document_search_index, search_index_q
 from ietf.doc.views_search import ad_dashboard_group, ad_dashboard_group_type, shorten_group_name # TODO: red flag that we're importing from views in tests. Move these to utils.
 from ietf.group.models import Group, Role
 from ietf.group.factories import GroupFactory, RoleFactory
@@ -55,14 +62,25 @@ from ietf.meeting.factories import ( MeetingFactory, SessionFactory, SessionPres
 from ietf.name.models import SessionStatusName, BallotPositionName, DocTypeName
 from ietf.person.models import Person
 from ietf.person.factories import PersonFactory, EmailFactory
+from ietf.review.factories import ReviewAssignmentFactory
 from ietf.utils.mail import outbox, empty_outbox
-from ietf.utils.test_utils import login_testing_unauthorized, unicontent, reload_db_objects
+from ietf.utils.test_utils import login_testing_unauthorized, unicontent, reload_db_objects, assert_query_budget
 from ietf.utils.test_utils import TestCase
 from ietf.utils.text import normalize_text
 from ietf.utils.timezone import date_today, datetime_today, DEADLINE_TZINFO, RPC_TZINFO
 
 
 class SearchTests(TestCase):
+    def test_search_query_budget(self):
+        group = GroupFactory(acronym='mars', parent=Group.objects.get(acronym='farfut'))
+        drafts = [ WgDraftFactory(group=group, authors=PersonFactory.create_batch(2), ad=PersonFactory()) for i in range(10) ]
+        url = urlreverse('ietf.doc.views_search.search') + "?activedrafts=on&by=group&group=mars"
+        with assert_query_budget(self, 140, max_repeats=25):
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        for draft in drafts:
+            self.assertContains(r, draft.name)
+
     def test_search(self):
 
         draft = WgDraftFactory(name='draft-ietf-mars-test',group=GroupFactory(acronym='mars',parent=Group.objects.get(acronym='farfut')),authors=[PersonFactory()],ad=PersonFactory())
@@ -146,6 +164,113 @@ class SearchTests(TestCase):
         self.assertEqual(r.status_code, 200)
         self.assertContains(r, draft.title)
 
+    def test_search_index(self):
+        draft = IndividualDraftFactory(title="Optimizing Martian Network Topologies")
+        index = DocumentSearchIndex.objects.get(document=draft)
+        self.assertIn(draft.name, index.names.split("\n"))
+        self.assertEqual(index.title, "optimizing martian network topologies")
+
+        draft.title = "Pessimizing Martian Network Topologies"
+        draft.save()
+        index.refresh_from_db()
+        self.assertEqual(index.title, "pessimizing martian network topologies")
+
+        alias = DocAlias.objects.create(name="rfc9999")
+        alias.docs.add(draft)
+        index.refresh_from_db()
+        self.assertIn("rfc9999", index.names.split("\n"))
+
+        author = PersonFactory(name="Zaphod Beeblebrox")
+        DocumentAuthorFactory(document=draft, person=author)
+        index.refresh_from_db()
+        self.assertIn("zaphod beeblebrox", index.authors.split("\n"))
+
+        email = EmailFactory(person=author, address="zaphod@heartofgold.example")
+        index.refresh_from_db()
+        self.assertIn(email.address, index.authors.split("\n"))
+
+        base_url = urlreverse('ietf.doc.views_search.search')
+        for query in ("name=RFC9999", "name=pessimizing", "by=author&author=Beeblebrox", "by=author&author=heartofgold"):
+            r = self.client.get(base_url + "?activedrafts=on&" + query)
+            self.assertEqual(r.status_code, 200)
+            self.assertContains(r, draft.title)
+
+        DocumentSearchIndex.objects.all().delete()
+        self.assertEqual(rebuild_document_search_index(), Document.objects.count())
+        rebuilt = DocumentSearchIndex.objects.get(document=draft)
+        self.assertEqual((rebuilt.names, rebuilt.title, rebuilt.authors), (index.names, index.title, index.authors))
+
+    def test_search_index_trigrams(self):
+        draft = IndividualDraftFactory(title="Optimizing Martian Network Topologies")
+        other = IndividualDraftFactory(title="Martian Networking")
+        trigrams = set(DocumentSearchTrigram.objects.filter(document=draft, field='n').values_list('trigram', flat=True))
+        self.assertIn("mar", trigrams)
+        self.assertIn("top", trigrams)
+        self.assertNotIn("s\nd", trigrams)
+
+        draft.title = "Pessimizing Martian Network Topologies"
+        draft.save()
+        trigrams = set(DocumentSearchTrigram.objects.filter(document=draft, field='n').values_list('trigram', flat=True))
+        self.assertIn("pes", trigrams)
+        self.assertNotIn("opt", trigrams)
+
+        def search(term, *fields):
+            return set(Document.objects.filter(search_index_q(term, *fields)))
+        self.assertEqual(search("tian netw", 'names', 'title'), set([draft, other]))
+        self.assertEqual(search("network top", 'names', 'title'), set([draft]))
+        # all the trigrams of the term, but not the term itself
+        self.assertEqual(search("network martian", 'names', 'title'), set())
+        # too short for the trigram index
+        self.assertEqual(search("pe", 'title'), set([draft]))
+        self.assertEqual(search(draft.name[6:], 'names'), set([draft]))
+
+    def test_search_index_missing(self):
+        draft = IndividualDraftFactory()
+        DocumentSearchIndex.objects.filter(document=draft).delete()
+        DocumentSearchTrigram.objects.filter(document=draft).delete()
+        self.assertEqual([ w.id for w in check_document_search_index(None) ], ['datatracker.doc.W0016'])
+
+        r = self.client.get(urlreverse('ietf.doc.views_search.search') + "?activedrafts=on&name=%s" % draft.name)
+        self.assertNotContains(r, draft.title)
+
+        self.assertEqual(rebuild_document_search_index(missing_only=True), 1)
+        self.assertEqual(check_document_search_index(None), [])
+        r = self.client.get(urlreverse('ietf.doc.views_search.search') + "?activedrafts=on&name=%s" % draft.name)
+        self.assertContains(r, draft.title)
+
+    def test_prepare_document_table_query_count(self):
+        def make_docs():
+            draft = WgDraftFactory()
+            ReviewAssignmentFactory(review_request__doc=draft, state_id='completed', result_id='ready')
+            old_rfc = WgRfcFactory()
+            rfc = WgRfcFactory(relations=[('obs', old_rfc.docalias.filter(name__startswith='rfc').first())])
+            return [draft, old_rfc, rfc, ConflictReviewFactory(), CharterFactory()]
+
+        def count_queries(docs, sort):
+            request = RequestFactory().get('/')
+            request.user = PersonFactory().user
+            with CaptureQueriesContext(connection) as context:
+                results, meta = prepare_document_table(request, Document.objects.filter(pk__in=[d.pk for d in docs]), {'sort': sort})
+            self.assertEqual(len(results), len(docs))
+            return len(context.captured_queries)
+
+        docs = make_docs()
+        count_queries(docs, '')     # warm up module level caches
+        for sort in ('', 'title', 'ipr', 'ad', '-status'):
+            few = count_queries(docs, sort)
+            many = count_queries(docs + make_docs() + make_docs(), sort)
+            self.assertEqual(few, many, "Query count for sort '%s' grew with the number of documents" % sort)
+
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        results, meta = prepare_document_table(request, Document.objects.filter(pk__in=[d.pk for d in docs]))
+        draft, old_rfc, rfc, conflrev, charter = sorted(results, key=lambda d: [d.pk for d in docs].index(d.pk))
+        self.assertEqual(len(draft.review_assignments), 1)
+        self.assertEqual(rfc.rfc_number(), rfc.canonical_name()[3:])
+        self.assertEqual(old_rfc.obsoleted_by_list, ["RFC %s" % rfc.rfc_number()])
+        self.assertEqual(charter.canonical_name(), "charter-ietf-%s" % charter.chartered_group.acronym)
+        self.assertEqual(conflrev.pages, conflrev.related_that_doc('conflrev')[0].document.pages)
+
     def test_search_for_name(self):
         draft = WgDraftFactory(name='draft-ietf-mars-test',group=GroupFactory(acronym='mars',parent=Group.objects.get(acronym='farfut')),authors=[PersonFactory()],ad=PersonFactory())
         draft.set_state(State.objects.get(used=True, type="draft-iesg", slug="pub-req"))
@@ -585,6 +710,15 @@ Man                    Expires September 22, 2015               [Page 3]
             with (Path(dir) / 'draft-ietf-mars-test-01.txt').open('w') as f:
                 f.write(self.draft_text)
 
+    def test_document_draft_query_budget(self):
+        draft = WgDraftFactory(authors=PersonFactory.create_batch(3))
+        for i in range(5):
+            draft.relateddocument_set.create(relationship_id='replaces', source=draft, target=IndividualDraftFactory().docalias.first())
+        url = urlreverse("ietf.doc.views_doc.document_main", kwargs=dict(name=draft.name))
+        with assert_query_budget(self, 100, max_repeats=12):
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+
     def test_document_draft(self):
         draft = WgDraftFactory(name='draft-ietf-mars-test',rev='01')
         HolderIprDisclosureFactory(docs=[draft])
@@ -2642,6 +2776,35 @@ class Idnits2SupportTests(TestCase):
         blob = unicontent(r).replace('\n','')
         self.assertEqual(blob[6312-1],'O')
 
+    def test_rfc_status_values(self):
+        ps = WgRfcFactory(alias2__name='rfc1001', std_level_id='ps')
+        WgRfcFactory(alias2__name='rfc1002', std_level_id='inf', relations=[('obs', ps)])
+        WgRfcFactory(alias2__name='rfc1003', std_level_id='bcp')
+        blob = generate_idnits2_rfc_status().replace('\n','')
+        self.assertEqual(blob[1000:1003], 'OIB')
+
+    def test_etag(self):
+        rfc = WgRfcFactory(alias2__name='rfc1001')
+        WgRfcFactory(alias2__name='rfc1003',relations=[('obs',rfc)])
+        call_command('generate_idnits2_rfcs_obsoleted')
+        url = urlreverse('ietf.doc.views_doc.idnits2_rfcs_obsoleted')
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        etag = r['ETag']
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        # regenerating an unchanged file doesn't change the ETag
+        self.assertFalse(update_idnits2_file('idnits2-rfcs-obsoleted', generate_idnits2_rfcs_obsoleted))
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        WgRfcFactory(alias2__name='rfc1005',relations=[('obs',rfc)])
+        self.assertTrue(update_idnits2_file('idnits2-rfcs-obsoleted', generate_idnits2_rfcs_obsoleted))
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.content, b'1001 1003 1005\n')
+
     def test_idnits2_state(self):
         rfc = WgRfcFactory()
         url = urlreverse('ietf.doc.views_doc.idnits2_state', kwargs=dict(name=rfc.canonical_name()))
@@ -2943,6 +3106,47 @@ class PdfizedTests(TestCase):
                 self.should_succeed(dict(name=rfc.name,rev=f'{r:02d}',ext=ext))
         self.should_404(dict(name=rfc.name,rev='02'))
 
+    def test_pdfized_from_file_cache(self):
+        draft = WgDraftFactory()
+        for dir in (settings.INTERNET_DRAFT_PATH, settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR):
+            with (Path(dir) / f'{draft.name}-{draft.rev}.txt').open('w') as f:
+                f.write('text content')
+        cache_dir = mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        caches = dict(settings.CACHES, pdfized={'BACKEND': 'ietf.utils.cache.ShardedFileCache', 'LOCATION': cache_dir})
+        url = urlreverse(self.view, kwargs=dict(name=draft.name))
+        with override_settings(CACHES=caches), mock.patch('ietf.doc.models.wpHTML') as wpHTML:
+            wpHTML.return_value.write_pdf.return_value = b'%PDF-1.7 pdfized'
+            # rendered, and then streamed from the cache entry file
+            for i in range(2):
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                body = b''.join(r.streaming_content)
+                self.assertEqual(body, b'%PDF-1.7 pdfized')
+                self.assertEqual(int(r['Content-Length']), len(body))
+            self.assertEqual(wpHTML.call_count, 1)
+
+    def test_render_cache_key(self):
+        key = render_cache_key("rfc1234", ["text content"], "1")
+        self.assertEqual(key, render_cache_key("rfc1234", [b"text content"], "1"))
+        self.assertNotEqual(key, render_cache_key("rfc1234", ["other content"], "1"))
+        self.assertNotEqual(key, render_cache_key("rfc1234", ["text content"], "2"))
+        self.assertNotEqual(key, render_cache_key("rfc1235", ["text content"], "1"))
+
+    def test_prerender_documents(self):
+        draft = WgDraftFactory()
+        with (Path(settings.INTERNET_DRAFT_PATH) / f'{draft.name}-{draft.rev}.txt').open('w') as f:
+            f.write('text content')
+        NewRevisionDocEvent.objects.create(doc=draft, rev=draft.rev, type="new_revision", by=Person.objects.get(name="(System)"))
+        self.assertEqual(documents_to_prerender(days=1), [draft])
+
+        out = io.StringIO()
+        with mock.patch('ietf.doc.models.wpHTML') as wpHTML:
+            wpHTML.return_value.write_pdf.return_value = b'%PDF'
+            call_command('prerender_documents', stdout=out)
+            self.assertIn("Prerendered 1 documents", out.getvalue())
+            self.assertIn("text content", wpHTML.call_args[1]["string"])
+
 class NotifyValidationTests(TestCase):
     def test_notify_validation(self):
         valid_values = [
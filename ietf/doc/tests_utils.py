@@ -1,9 +1,13 @@
 # Copyright The IETF Trust 2020, All Rights Reserved
 import datetime
+import io
+import os
 import debug  # pyflakes:ignore
 
 from unittest.mock import patch
 
+from django.conf import settings
+from django.core.management import call_command
 from django.db import IntegrityError
 from django.test.utils import override_settings
 from django.utils import timezone
@@ -455,3 +459,62 @@ class RebuildReferenceRelationsTests(TestCase):
                 (self.updated.docalias.first().name, 'updates'),
             ]
         )
+
+    @patch.object(XMLDraft, 'get_refs')
+    @patch.object(XMLDraft, '__init__', return_value=None)
+    def test_unchanged_relations_kept(self, mock_init, mock_get_refs):
+        """Should only touch the reference relations that changed, with a fixed number of queries"""
+        mock_get_refs.return_value = self._get_refs_return_value()
+        rebuild_reference_relations(self.doc, {'xml': 'file.xml'})
+        before = dict(self.doc.relateddocument_set.values_list('target__name', 'pk'))
+
+        refs = self._get_refs_return_value()
+        refs[self.unknown.canonical_name()] = Draft.REF_TYPE_INFORMATIVE
+        refs.update({ rfc.canonical_name(): Draft.REF_TYPE_NORMATIVE for rfc in WgRfcFactory.create_batch(5) })
+        mock_get_refs.return_value = refs
+        with self.assertNumQueries(5):
+            rebuild_reference_relations(self.doc, {'xml': 'file.xml'})
+
+        after = dict(self.doc.relateddocument_set.values_list('target__name', 'pk'))
+        self.assertEqual(after[self.normative.canonical_name()], before[self.normative.canonical_name()])
+        self.assertEqual(after[self.informative.canonical_name()], before[self.informative.canonical_name()])
+        self.assertNotEqual(after[self.unknown.canonical_name()], before[self.unknown.canonical_name()])
+        self.assertEqual(self.doc.relateddocument_set.get(target__name=self.unknown.canonical_name()).relationship_id, 'refinfo')
+        self.assertEqual(len(after), 4 + 5)
+
+    @patch.object(PlaintextDraft, 'get_refs')
+    @patch.object(PlaintextDraft, '__init__', return_value=None)
+    def test_reference_case(self, mock_init, mock_get_refs):
+        """References in another case than the alias names should be found"""
+        mock_get_refs.return_value = {
+            self.normative.canonical_name().upper(): Draft.REF_TYPE_NORMATIVE,
+            'Draft-Not-Found': Draft.REF_TYPE_NORMATIVE,
+        }
+        with name_of_file_containing('contents') as temp_file_name:
+            result = rebuild_reference_relations(self.doc, {'txt': temp_file_name})
+        self.assertEqual(result['unfound'], ['Draft-Not-Found'])
+        self.assertCountEqual(
+            self.doc.relateddocument_set.values_list('target__name', 'relationship__slug'),
+            [
+                (self.normative.canonical_name(), 'refnorm'),
+                (self.updated.docalias.first().name, 'updates'),
+            ]
+        )
+
+    @patch.object(PlaintextDraft, 'get_refs')
+    def test_rebuild_command(self, mock_get_refs):
+        mock_get_refs.return_value = self._get_refs_return_value()
+        with open(os.path.join(settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR, '%s-%s.txt' % (self.doc.name, self.doc.rev)), 'w') as f:
+            f.write('contents')
+        out = io.StringIO()
+        call_command('rebuild_reference_relations', self.doc.name, '--workers', '1', stdout=out)
+        self.assertIn('Rebuilt the reference relations of 1 documents', out.getvalue())
+        self.assertCountEqual(
+            self.doc.relateddocument_set.values_list('target__name', 'relationship__slug'),
+            [
+                (self.normative.canonical_name(), 'refnorm'),
+                (self.informative.canonical_name(), 'refinfo'),
+                (self.unknown.canonical_name(), 'refunk'),
+                (self.updated.docalias.first().name, 'updates'),
+            ]
+        )
@@ -18,6 +18,8 @@ from zoneinfo import ZoneInfo
 
 from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
 from django.forms import ValidationError
 from django.http import Http404
 from django.template.loader import render_to_string
@@ -764,30 +766,46 @@ def rebuild_reference_relations(doc, filenames):
     else:
         return {'errors': ['No draft text available for rebuilding reference relations. Need XML or plaintext.']}
 
-    doc.relateddocument_set.filter(relationship__slug__in=['refnorm','refinfo','refold','refunk']).delete()
-
     warnings = []
-    errors = []
-    unfound = set()
-    for ( ref, refType ) in refs.items():
-        # As of Dec 2021, DocAlias has a unique constraint on the name field, so count > 1 should not occur
-        refdoc = DocAlias.objects.filter( name=ref )
-        count = refdoc.count()
-        if count == 0:
-            unfound.add( "%s" % ref )
-            continue
-        elif count > 1:
-            errors.append("Too many DocAlias objects found for %s"%ref)
+
+    # resolve all the reference names at once - as of Dec 2021, DocAlias
+    # has a unique constraint on the name field, so there is at most one
+    # alias per name.  The references keep the case of the draft text,
+    # and are matched without regard to case, as the database does.
+    refs_by_name = defaultdict(list)
+    for ref in refs:
+        refs_by_name[ref.lower()].append(ref)
+    targets = defaultdict(set)
+    for alias_id, name, doc_id in DocAlias.objects.filter(name__in=list(refs_by_name)).values_list('id', 'name', 'docs'):
+        targets[(name.lower(), alias_id)].add(doc_id)
+    found = set(name for name, alias_id in targets)
+    unfound = set(ref for ref in refs if ref.lower() not in found)
+
+    wanted = set()
+    for ( name, alias_id ), doc_ids in targets.items():
+        # Don't add references to ourself
+        if doc.pk not in doc_ids:
+            for ref in refs_by_name[name]:
+                wanted.add((alias_id, 'ref%s' % refs[ref]))
+
+    # only touch the relations that changed
+    existing = set()
+    stale = []
+    for pk, target_id, relationship_id in doc.relateddocument_set.filter(relationship__slug__in=['refnorm','refinfo','refold','refunk']).values_list('pk', 'target_id', 'relationship_id'):
+        if (target_id, relationship_id) in wanted and (target_id, relationship_id) not in existing:
+            existing.add((target_id, relationship_id))
         else:
-            # Don't add references to ourself
-            if doc != refdoc[0].document:
-                RelatedDocument.objects.get_or_create( source=doc, target=refdoc[ 0 ], relationship=DocRelationshipName.objects.get( slug='ref%s' % refType ) )
+            stale.append(pk)
+    if stale:
+        RelatedDocument.objects.filter(pk__in=stale).delete()
+    RelatedDocument.objects.bulk_create([
+        RelatedDocument(source=doc, target_id=target_id, relationship_id=relationship_id)
+        for target_id, relationship_id in sorted(wanted - existing)
+    ])
     if unfound:
         warnings.append('There were %d references with no matching DocAlias'%len(unfound))
 
     ret = {}
-    if errors:
-        ret['errors']=errors
     if warnings:
         ret['warnings']=warnings
     if unfound:
@@ -1093,6 +1111,29 @@ def update_doc_extresources(doc, new_resources, by):
     doc.save_with_history([e])
     return True
 
+def rfc_numbers_by_document_id():
+    """Return a dictionary mapping the id of each RFC to its RFC number.
+    Like Document.canonical_name(), this uses the lexically highest
+    alias starting with 'rfc' if there are more than one."""
+    rfc_names = {}
+    for doc_id, name in DocAlias.objects.filter(docs__type_id='draft', docs__states__type='draft', docs__states__slug='rfc', name__startswith='rfc').values_list('docs__id', 'name'):
+        if name > rfc_names.get(doc_id, ''):
+            rfc_names[doc_id] = name
+    return { doc_id: int(name[3:]) for doc_id, name in rfc_names.items() if name[3:].isdigit() }
+
+def idnits2_rfc_set_version():
+    """Return a value that changes when the RFCs, their standards levels
+    or the obsoletes relations change, that is, when the idnits2 files
+    need to be regenerated."""
+    rfcs = Document.objects.filter(type_id='draft',states__slug='rfc',states__type='draft')
+    version = (
+        sorted(rfcs.values_list('std_level_id').annotate(Count('id'))),
+        rfcs.aggregate(Max('time'))['time__max'],
+        RelatedDocument.objects.filter(relationship_id='obs').aggregate(Count('id'), Max('id')),
+        DocAlias.objects.filter(name__startswith='rfc').aggregate(Count('id'), Max('id')),
+    )
+    return hashlib.sha256(repr(version).encode()).hexdigest()
+
 def generate_idnits2_rfc_status():
 
     blob=['N']*10000
@@ -1108,12 +1149,14 @@ def generate_idnits2_rfc_status():
         'unkn': 'U',
     }
 
-    rfcs = Document.objects.filter(type_id='draft',states__slug='rfc',states__type='draft')
-    for rfc in rfcs:
-        offset = int(rfc.rfcnum)-1
-        blob[offset] = symbols[rfc.std_level_id]
-        if rfc.related_that('obs'):
-            blob[offset] = 'O'
+    rfc_numbers = rfc_numbers_by_document_id()
+    obsoleted = set(RelatedDocument.objects.filter(relationship_id='obs').values_list('target__docs', flat=True))
+    rfcs = Document.objects.filter(type_id='draft',states__slug='rfc',states__type='draft').values_list('id', 'std_level_id')
+    for doc_id, std_level_id in rfcs:
+        if doc_id not in rfc_numbers:
+            continue
+        offset = rfc_numbers[doc_id]-1
+        blob[offset] = 'O' if doc_id in obsoleted else symbols[std_level_id]
 
     # Workarounds for unusual states in the datatracker
 
@@ -1136,13 +1179,42 @@ def generate_idnits2_rfc_status():
     return blob
 
 def generate_idnits2_rfcs_obsoleted():
+    rfc_numbers = rfc_numbers_by_document_id()
     obsdict = defaultdict(list)
-    for r in RelatedDocument.objects.filter(relationship_id='obs'):
-        obsdict[int(r.target.document.rfc_number())].append(int(r.source.rfc_number()))
+    for source_id, target_id in RelatedDocument.objects.filter(relationship_id='obs').values_list('source_id', 'target__docs'):
+        if source_id in rfc_numbers and target_id in rfc_numbers:
+            obsdict[rfc_numbers[target_id]].append(rfc_numbers[source_id])
     for k in obsdict:
         obsdict[k] = sorted(obsdict[k])
     return render_to_string('doc/idnits2-rfcs-obsoleted.txt', context={'obsitems':sorted(obsdict.items())})
 
+def update_idnits2_file(filename, generate):
+    """Regenerate the idnits2 file filename in DERIVED_DIR with generate(),
+    unless the RFC set hasn't changed since it was last generated.  The
+    file is only rewritten if its contents change, so that its
+    modification time, and the ETag it is served with, stay the same.
+    Returns True if the file was written."""
+    path = os.path.join(settings.DERIVED_DIR, filename)
+    version_cache_key = 'doc:idnits2:%s:version' % filename
+    version = idnits2_rfc_set_version()
+    if os.path.exists(path) and cache.get(version_cache_key) == version:
+        return False
+    blob = generate().encode('utf-8')
+    written = False
+    try:
+        with open(path, 'rb') as f:
+            unchanged = f.read() == blob
+    except FileNotFoundError:
+        unchanged = False
+    if not unchanged:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        written = True
+    cache.set(version_cache_key, version, None)
+    return written
+
 
 def fuzzy_find_documents(name, rev=None):
     """Find a document based on name/rev
@@ -1214,3 +1286,30 @@ def bibxml_for_draft(doc, rev=None):
         
     return render_to_string('doc/bibxml.xml', {'name':name, 'doc':doc, 'doc_bibtype':'I-D'})
 
+
+def documents_to_prerender(days=1, most_referenced=0):
+    """Return the drafts which got a new revision or were published as
+    RFC in the last days, plus the most_referenced RFCs with the most
+    references to them."""
+    since = timezone.now() - datetime.timedelta(days=days)
+    docs = set(Document.objects.filter(type="draft", docevent__type__in=["new_revision", "published_rfc"], docevent__time__gte=since))
+    if most_referenced:
+        docs |= set(Document.objects.filter(type="draft", states__type="draft", states__slug="rfc").annotate(
+            reference_count=Count("docalias__relateddocument", filter=Q(docalias__relateddocument__relationship__in=["refnorm", "refinfo", "refunk", "refold"]))
+        ).order_by("-reference_count")[:most_referenced])
+    return sorted(docs, key=lambda d: d.name)
+
+def prerender_documents(docs):
+    """Render the htmlized and pdfized versions of docs into their
+    caches, so that the first requests for them don't have to wait for
+    the rendering.  Returns the number of documents rendered."""
+    count = 0
+    for doc in docs:
+        try:
+            doc.htmlized()
+            doc.pdfized()
+        except Exception as e:
+            log.log(f"Could not prerender {doc.name}: {e}")
+        else:
+            count += 1
+    return count
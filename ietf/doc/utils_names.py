@@ -0,0 +1,166 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""Batched lookup of whether document names exist.
+
+Text which is linkified with urlize_ietf_docs can mention hundreds of
+document names, many of them not in the database.  The names are looked
+up together: those which a Bloom filter of all the DocAlias names says
+don't exist are settled without any round-trip, the others with one
+cache get_many and, for those not cached, one DocAlias query.
+
+The Bloom filter is kept in each process, and shared through the cache.
+A DocAlias which is added is put in the filter in place, and appended to
+a log of additions kept in the cache next to the filter, from which the
+other processes add it to their copies within ALIAS_FILTER_CHECK_INTERVAL
+seconds.  The filter is only built from scratch, under a new version,
+when it is older than ALIAS_FILTER_MAX_AGE.
+"""
+
+import hashlib
+import time
+import uuid
+
+from django.core.cache import cache
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import DocAlias
+from ietf.utils.bloom import BloomFilter
+
+
+DOC_NAME_CACHE_TIME = 60*60*24
+ALIAS_FILTER_CHECK_INTERVAL = 10
+# rebuild the filter now and then, in case aliases were added without
+# going through the signal handlers, e.g. with bulk_create()
+ALIAS_FILTER_MAX_AGE = 60*60
+
+ALIAS_FILTER_VERSION_KEY = "doc:alias-filter:version"
+
+_alias_filter = {}
+
+
+def doc_name_cache_key(name):
+    return "doc:name-exists:%s" % hashlib.md5(name.encode('utf-8')).hexdigest()
+
+
+def alias_filter_cache_key(version):
+    return "doc:alias-filter:%s" % version
+
+def alias_additions_count_key(version):
+    return "doc:alias-filter:%s:added" % version
+
+def alias_addition_key(version, index):
+    return "doc:alias-filter:%s:added:%d" % (version, index)
+
+
+def build_alias_filter():
+    names = DocAlias.objects.values_list('name', flat=True)
+    alias_filter = BloomFilter(names.count())
+    alias_filter.update(name.lower() for name in names.iterator())
+    return alias_filter
+
+
+def get_alias_filter():
+    """The Bloom filter of the lower case names of all the DocAliases"""
+    now = time.time()
+    if _alias_filter and now - _alias_filter['checked'] < ALIAS_FILTER_CHECK_INTERVAL:
+        return _alias_filter['filter']
+    version = cache.get(ALIAS_FILTER_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(ALIAS_FILTER_VERSION_KEY, version, None):
+            version = cache.get(ALIAS_FILTER_VERSION_KEY) or version
+    if _alias_filter.get('version') != version or now - _alias_filter['built'] > ALIAS_FILTER_MAX_AGE:
+        key = alias_filter_cache_key(version)
+        built, alias_filter = cache.get(key) or (None, None)
+        if alias_filter is None or now - built > ALIAS_FILTER_MAX_AGE:
+            if alias_filter is not None:
+                # start over under a new version, with a new log of additions
+                version = uuid.uuid4().hex
+                cache.set(ALIAS_FILTER_VERSION_KEY, version, None)
+                key = alias_filter_cache_key(version)
+            built, alias_filter = now, build_alias_filter()
+            cache.set(key, (built, alias_filter), ALIAS_FILTER_MAX_AGE)
+        _alias_filter.update(version=version, built=built, filter=alias_filter, applied=0)
+    apply_alias_additions()
+    _alias_filter['checked'] = now
+    return _alias_filter['filter']
+
+
+def apply_alias_additions():
+    """Add the names added by other processes since the last check to the
+    filter of this process"""
+    version = _alias_filter['version']
+    count = cache.get(alias_additions_count_key(version)) or 0
+    applied = _alias_filter['applied']
+    if count < applied:
+        # the log expired and was started over
+        applied = 0
+    if count > applied:
+        keys = [ alias_addition_key(version, i) for i in range(applied, count) ]
+        added = cache.get_many(keys)
+        for key in keys:
+            if key not in added:
+                # the name isn't stored yet, pick it up at the next check
+                break
+            _alias_filter['filter'].add(added[key])
+            applied += 1
+        _alias_filter['applied'] = applied
+
+
+def alias_added(name):
+    """Note that a DocAlias was added, so that the name is found: add it to
+    the filter of this process and the one in the cache, and log it for
+    the other processes"""
+    name = name.lower()
+    cache.delete(doc_name_cache_key(name))
+    version = cache.get(ALIAS_FILTER_VERSION_KEY)
+    if version is None:
+        # no filter yet, it will have the name when it is built
+        _alias_filter.clear()
+        return
+    count_key = alias_additions_count_key(version)
+    if cache.add(count_key, 1, ALIAS_FILTER_MAX_AGE):
+        index = 0
+    else:
+        try:
+            index = cache.incr(count_key) - 1
+        except ValueError:
+            # the log expired along with the filter
+            _alias_filter.clear()
+            return
+    cache.set(alias_addition_key(version, index), name, ALIAS_FILTER_MAX_AGE)
+    if _alias_filter.get('version') == version:
+        _alias_filter['filter'].add(name)
+    key = alias_filter_cache_key(version)
+    cached = cache.get(key)
+    if cached is not None:
+        built, alias_filter = cached
+        alias_filter.add(name)
+        cache.set(key, (built, alias_filter), max(1, int(built + ALIAS_FILTER_MAX_AGE - time.time())))
+
+
+def alias_removed(name):
+    cache.delete(doc_name_cache_key(name.lower()))
+
+
+def resolve_doc_names(names):
+    """Find out which of the document names exist, in any case, with at
+    most one cache round-trip and one query.  Returns a dictionary from the
+    lower case names to whether they exist."""
+    names = set(name.lower() for name in names)
+    if not names:
+        return {}
+    alias_filter = get_alias_filter()
+    found = dict( (name, False) for name in names if name not in alias_filter )
+    maybe = dict( (doc_name_cache_key(name), name) for name in names if name not in found )
+    if maybe:
+        for key, exists in cache.get_many(list(maybe)).items():
+            found[maybe[key]] = exists
+        missing = [ name for name in maybe.values() if name not in found ]
+        if missing:
+            existing = set( name.lower() for name in DocAlias.objects.filter(name__in=missing).values_list('name', flat=True) )
+            looked_up = dict( (name, name in existing) for name in missing )
+            cache.set_many(dict( (doc_name_cache_key(name), exists) for name, exists in looked_up.items() ), DOC_NAME_CACHE_TIME)
+            found.update(looked_up)
+    return found
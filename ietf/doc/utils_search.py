@@ -5,14 +5,21 @@ import re
 import datetime
 import debug                            # pyflakes:ignore
 
+from collections import Counter, defaultdict
 from zoneinfo import ZoneInfo
 
 from django.conf import settings
+from django.db.models import Count, Q, prefetch_related_objects
 
-from ietf.doc.models import Document, DocAlias, RelatedDocument, DocEvent, TelechatDocEvent, BallotDocEvent
+from ietf.doc.models import ( Document, DocAlias, RelatedDocument, DocEvent, TelechatDocEvent, BallotDocEvent,
+    DocumentAuthor, DocumentSearchIndex, DocumentSearchTrigram )
 from ietf.doc.expire import expirable_drafts
 from ietf.doc.utils import augment_docs_and_user_with_user_info
-from ietf.meeting.models import SessionPresentation, Meeting, Session
+from ietf.doc.utils_charter import charter_name_for_group
+from ietf.group.models import Group
+from ietf.ipr.models import IprDocRel
+from ietf.meeting.models import SessionPresentation
+from ietf.person.models import Alias, Email
 from ietf.review.utils import review_assignments_to_list_for_docs
 from ietf.utils.timezone import date_today
 
@@ -21,6 +28,113 @@ def wrap_value(v):
     return lambda: v
 
 
+def search_index_text(values):
+    """Join a set of strings to the form stored in DocumentSearchIndex."""
+    return "\n".join(sorted(set(v.lower() for v in values if v)))
+
+def search_index_trigrams(*texts):
+    """Return the set of trigrams of the given DocumentSearchIndex texts.
+    Trigrams don't span the newlines separating values, since a search
+    term can't match across them either."""
+    return set(line[i:i+3] for text in texts for line in text.split("\n") for i in range(len(line) - 2))
+
+# DocumentSearchIndex field -> DocumentSearchTrigram field
+SEARCH_TRIGRAM_FIELDS = { 'names': 'n', 'title': 'n', 'authors': 'a' }
+
+def search_index_q(term, *fields):
+    """Return a Q object matching the documents which have the term as a
+    substring of any of the given DocumentSearchIndex fields, which must
+    share a trigram field.
+
+    Terms of three characters or more are first looked up in
+    DocumentSearchTrigram, so only documents having all the trigrams of
+    the term are matched against the text itself, instead of every row of
+    DocumentSearchIndex.
+    """
+    term = term.lower()
+    q = Q()
+    for f in fields:
+        q |= Q(**{ 'searchindex__%s__contains' % f: term })
+    trigrams = search_index_trigrams(term)
+    if trigrams:
+        trigram_fields = set(SEARCH_TRIGRAM_FIELDS[f] for f in fields)
+        assert len(trigram_fields) == 1
+        candidates = (DocumentSearchTrigram.objects
+                      .filter(field=trigram_fields.pop(), trigram__in=trigrams)
+                      .values('document').annotate(count=Count('pk'))
+                      .filter(count__gte=len(trigrams)).values('document'))
+        q &= Q(pk__in=candidates)
+    return q
+
+def update_document_search_index(doc_ids, create=False):
+    """Recompute the DocumentSearchIndex entries, and their
+    DocumentSearchTrigram rows, for the given documents with a fixed
+    number of queries.  Missing entries are only created if create is
+    set, so that the signal handlers running while a document is being
+    deleted don't resurrect its entry."""
+    doc_ids = set(doc_ids)
+    if not doc_ids:
+        return
+
+    titles = {}
+    names = defaultdict(list)
+    for pk, name, title in Document.objects.filter(pk__in=doc_ids).values_list('pk', 'name', 'title'):
+        titles[pk] = title
+        names[pk].append(name)
+    for pk, name in DocAlias.objects.filter(docs__in=titles).values_list('docs', 'name'):
+        names[pk].append(name)
+
+    person_docs = defaultdict(set)
+    for pk, person_id in DocumentAuthor.objects.filter(document__in=titles).values_list('document', 'person'):
+        person_docs[person_id].add(pk)
+    authors = defaultdict(list)
+    for person_id, name in Alias.objects.filter(person__in=person_docs).values_list('person', 'name'):
+        for pk in person_docs[person_id]:
+            authors[pk].append(name)
+    for person_id, address in Email.objects.filter(person__in=person_docs).values_list('person', 'address'):
+        for pk in person_docs[person_id]:
+            authors[pk].append(address)
+
+    existing = { i.document_id: i for i in DocumentSearchIndex.objects.filter(document__in=titles) }
+    new, changed = [], []
+    for pk, title in titles.items():
+        values = dict(names=search_index_text(names[pk]), title=title.lower(), authors=search_index_text(authors[pk]))
+        index = existing.get(pk)
+        if index is None:
+            if create:
+                new.append(DocumentSearchIndex(document_id=pk, **values))
+        elif any(getattr(index, k) != v for k, v in values.items()):
+            for k, v in values.items():
+                setattr(index, k, v)
+            changed.append(index)
+    if new:
+        DocumentSearchIndex.objects.bulk_create(new)
+    if changed:
+        DocumentSearchIndex.objects.bulk_update(changed, ['names', 'title', 'authors'])
+
+    if new or changed:
+        DocumentSearchTrigram.objects.filter(document__in=[i.document_id for i in new + changed]).delete()
+        trigrams = []
+        for index in new + changed:
+            for field, texts in (('n', (index.names, index.title)), ('a', (index.authors, ))):
+                trigrams.extend(DocumentSearchTrigram(document_id=index.document_id, field=field, trigram=t)
+                                for t in search_index_trigrams(*texts))
+        DocumentSearchTrigram.objects.bulk_create(trigrams, batch_size=5000)
+
+def rebuild_document_search_index(batch_size=1000, missing_only=False):
+    """Recompute the DocumentSearchIndex for all documents, or with
+    missing_only for the documents which don't have an entry, such as
+    documents created with bulk_create() which doesn't send the signals
+    that maintain the index.  Returns the number of documents processed."""
+    docs = Document.objects.order_by('pk')
+    if missing_only:
+        docs = docs.filter(searchindex__isnull=True)
+    doc_ids = list(docs.values_list('pk', flat=True))
+    for i in range(0, len(doc_ids), batch_size):
+        update_document_search_index(doc_ids[i:i+batch_size], create=True)
+    return len(doc_ids)
+
+
 def fill_in_telechat_date(docs, doc_dict=None, doc_ids=None):
     if doc_dict is None:
         doc_dict = dict((d.pk, d) for d in docs)
@@ -39,27 +153,43 @@ def fill_in_document_sessions(docs, doc_dict, doc_ids):
     today = date_today()
     beg_date = today-datetime.timedelta(days=7)
     end_date = today+datetime.timedelta(days=30)
-    meetings = Meeting.objects.filter(date__gte=beg_date, date__lte=end_date).prefetch_related('session_set')
-    # get sessions
-    sessions = Session.objects.filter(meeting_id__in=[ m.id for m in meetings ])
-    # get presentations
-    presentations = SessionPresentation.objects.filter(session_id__in=[ s.id for s in sessions ])
-    session_list = [ (p.document_id, p.session) for p in presentations ]
     for d in list(doc_dict.values()):
         d.sessions = []
-    for (i, s) in session_list:
-        if i in doc_ids:
-            doc_dict[i].sessions.append(s)
+    presentations = SessionPresentation.objects.filter(
+        document_id__in=doc_ids,
+        session__meeting__date__gte=beg_date,
+        session__meeting__date__lte=end_date,
+    ).select_related('session__meeting', 'session__group')
+    for p in presentations:
+        doc_dict[p.document_id].sessions.append(p.session)
 
 def fill_in_document_table_attributes(docs, have_telechat_date=False):
     # fill in some attributes for the document table results to save
-    # some hairy template code and avoid repeated SQL queries
+    # some hairy template code and avoid repeated SQL queries; the
+    # number of queries issued here doesn't depend on the number of
+    # documents
     # TODO - this function evolved from something that assumed it was handling only drafts. It still has places where it assumes all docs are drafts where that is not a correct assumption
 
     doc_dict = dict((d.pk, d) for d in docs)
     doc_ids = list(doc_dict.keys())
 
-    rfc_aliases = dict([ (a.document.id, a.name) for a in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=doc_ids) ])
+    prefetch_related_objects(docs, "states__type", "groupmilestone_set__group")
+
+    rfc_aliases = {}
+    for doc_id, name in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=doc_ids).values_list("docs", "name"):
+        if doc_id not in rfc_aliases or name > rfc_aliases[doc_id]:
+            rfc_aliases[doc_id] = name
+    charter_groups = { g.charter_id: g for g in Group.objects.filter(charter__in=doc_ids) }
+
+    # prime the per-document caches used by rfc_number() and canonical_name()
+    for d in docs:
+        d._cached_is_rfc = d.type_id == "draft" and d.get_state_slug("draft") == "rfc"
+        if d._cached_is_rfc and d.pk in rfc_aliases:
+            d._canonical_name = rfc_aliases[d.pk]
+        elif d.type_id == "charter":
+            d._canonical_name = charter_name_for_group(charter_groups[d.pk]) if d.pk in charter_groups else d.name
+        else:
+            d._canonical_name = d.name
 
     # latest event cache
     event_types = ("published_rfc",
@@ -89,6 +219,7 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
 
     # misc
     expirable_pks = expirable_drafts(Document.objects.filter(pk__in=doc_ids)).values_list('pk', flat=True)
+    review_assignments = review_assignments_to_list_for_docs([d for d in docs if d.get_state_slug() != "rfc"])
     for d in docs:
         # emulate canonical name which is used by a lot of the utils
         # d.canonical_name = wrap_value(rfc_aliases[d.pk] if d.pk in rfc_aliases else d.name)
@@ -119,8 +250,8 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
             d.expirable = False
 
         if d.get_state_slug() != "rfc":
-            d.milestones = [ m for (t, s, v, m) in sorted(((m.time, m.state.slug, m.desc, m) for m in d.groupmilestone_set.all() if m.state_id == "active")) ]
-            d.review_assignments = review_assignments_to_list_for_docs([d]).get(d.name, [])
+            d.milestones = [ m for (t, s, v, m) in sorted(((m.time, m.state_id, m.desc, m) for m in d.groupmilestone_set.all() if m.state_id == "active")) ]
+            d.review_assignments = review_assignments.get(d.name, [])
 
         e = d.latest_event_cache.get('started_iesg_process', None)
         d.balloting_started = e.time if e else datetime.datetime.min
@@ -140,28 +271,37 @@ def fill_in_document_table_attributes(docs, have_telechat_date=False):
         d.obsoleted_by_list = []
         d.updated_by_list = []
 
-    xed_by = RelatedDocument.objects.filter(target__name__in=list(rfc_aliases.values()),
-                                            relationship__in=("obs", "updates")).select_related('target')
-    rel_rfc_aliases = dict([ (a.document.id, re.sub(r"rfc(\d+)", r"RFC \1", a.name, flags=re.IGNORECASE)) for a in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=[rel.source_id for rel in xed_by]) ])
-    for rel in xed_by:
-        d = doc_dict[rel.target.document.id]
-        if rel.relationship_id == "obs":
+    xed_by = list(RelatedDocument.objects.filter(target__name__in=list(rfc_aliases.values()),
+                                                 relationship__in=("obs", "updates")).values_list("source", "target__docs", "relationship"))
+    rel_rfc_aliases = dict([ (doc_id, re.sub(r"rfc(\d+)", r"RFC \1", name, flags=re.IGNORECASE)) for doc_id, name in DocAlias.objects.filter(name__startswith="rfc", docs__id__in=[source_id for source_id, _, _ in xed_by]).values_list("docs", "name") ])
+    for source_id, target_id, relationship_id in xed_by:
+        if target_id not in doc_dict:
+            continue
+        d = doc_dict[target_id]
+        if relationship_id == "obs":
             l = d.obsoleted_by_list
-        elif rel.relationship_id == "updates":
+        elif relationship_id == "updates":
             l = d.updated_by_list
-        l.append(rel_rfc_aliases[rel.source_id])
+        l.append(rel_rfc_aliases[source_id])
         l.sort()
 
 def augment_docs_with_related_docs_info(docs):
     """Augment all documents with related documents information.
     At first, it handles only conflict review document page count to mirror the original document page count."""
 
+    conflrev_pks = [d.pk for d in docs if d.type_id == 'conflrev']
+    if not conflrev_pks:
+        return
+
+    targets = defaultdict(dict)
+    for source_id, target_id, pages in RelatedDocument.objects.filter(source__in=conflrev_pks, relationship='conflrev').values_list('source', 'target', 'target__docs__pages'):
+        targets[source_id].setdefault(target_id, pages)
+
     for d in docs:
         if d.type_id == 'conflrev':
-            if len(d.related_that_doc('conflrev')) != 1:
+            if len(targets[d.pk]) != 1:
                 continue
-            originalDoc = d.related_that_doc('conflrev')[0].document
-            d.pages = originalDoc.pages
+            d.pages = list(targets[d.pk].values())[0]
             
 def prepare_document_table(request, docs, query=None, max_results=200):
     """Take a queryset of documents and a QueryDict with sorting info
@@ -172,7 +312,7 @@ def prepare_document_table(request, docs, query=None, max_results=200):
     if not isinstance(docs, list):
         # evaluate and fill in attribute results immediately to decrease
         # the number of queries
-        docs = docs.select_related("ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
+        docs = docs.select_related("type", "ad", "std_level", "intended_std_level", "group", "stream", "shepherd", )
         docs = docs.prefetch_related("states__type", "tags", "groupmilestone_set__group", "reviewrequest_set__team",
                                      "ad__email_set", "docalias__iprdocrel_set")
         docs = docs[:max_results] # <- that is still a queryset, but with a LIMIT now
@@ -190,6 +330,9 @@ def prepare_document_table(request, docs, query=None, max_results=200):
     sort_reversed = sort_key.startswith("-")
     sort_key = sort_key.lstrip("-")
 
+    if sort_key == "ipr":
+        ipr_counts = Counter(IprDocRel.objects.filter(document__docs__in=docs, disclosure__state__in=('posted','removed')).values_list('document__docs', flat=True))
+
     # sort
     def generate_sort_key(d):
         def num(i):
@@ -218,7 +361,7 @@ def prepare_document_table(request, docs, query=None, max_results=200):
             else:
                 res.append(num(d.get_state().order) if d.get_state() else None)
         elif sort_key == "ipr":
-            res.append(len(d.ipr()))
+            res.append(ipr_counts[d.pk])
         elif sort_key == "ad":
             if rfc_num != None:
                 res.append(num(rfc_num))
@@ -43,13 +43,14 @@ import re
 from urllib.parse import quote
 from pathlib import Path
 
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, FileResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse as urlreverse
 from django.conf import settings
 from django import forms
 from django.contrib.staticfiles import finders
+from django.views.decorators.http import condition
 
 
 import debug                            # pyflakes:ignore
@@ -849,9 +850,13 @@ def document_pdfized(request, name, rev=None, ext=None):
     if not os.path.exists(doc.get_file_name()):
         raise Http404("File not found: %s" % doc.get_file_name())
 
-    pdf = doc.pdfized()
+    pdf = doc.pdfized_file()
     if pdf:
-        return HttpResponse(pdf,content_type='application/pdf;charset=utf-8')
+        response = FileResponse(pdf,content_type='application/pdf;charset=utf-8')
+        if hasattr(pdf, 'size'):
+            # a cache entry file, FileResponse would count its header too
+            response['Content-Length'] = pdf.size
+        return response
     else:
         raise Http404
 
@@ -1851,6 +1856,16 @@ def all_presentations(request, name):
         })
 
 
+def idnits2_file_etag(filename):
+    # the files are only rewritten when their content changes, see
+    # ietf.doc.utils.update_idnits2_file()
+    try:
+        st = os.stat(os.path.join(settings.DERIVED_DIR, filename))
+    except OSError:
+        return None
+    return '"%x-%x"' % (st.st_mtime_ns, st.st_size)
+
+@condition(etag_func=lambda request: idnits2_file_etag('idnits2-rfcs-obsoleted'))
 def idnits2_rfcs_obsoleted(request):
     filename = os.path.join(settings.DERIVED_DIR,'idnits2-rfcs-obsoleted')
     try:
@@ -1862,6 +1877,7 @@ def idnits2_rfcs_obsoleted(request):
         raise Http404
 
 
+@condition(etag_func=lambda request: idnits2_file_etag('idnits2-rfc-status'))
 def idnits2_rfc_status(request):
     filename = os.path.join(settings.DERIVED_DIR,'idnits2-rfc-status')
     try:
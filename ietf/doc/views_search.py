@@ -65,7 +65,7 @@ from ietf.name.models import DocTagName, DocTypeName, StreamName
 from ietf.person.models import Person
 from ietf.person.utils import get_active_ads
 from ietf.utils.draft_search import normalize_draftname
-from ietf.doc.utils_search import prepare_document_table
+from ietf.doc.utils_search import prepare_document_table, search_index_q
 
 
 class SearchForm(forms.Form):
@@ -165,8 +165,7 @@ def retrieve_search_results(form, all_types=False):
 
     # name
     if query["name"]:
-        docs = docs.filter(Q(docalias__name__icontains=query["name"]) |
-                           Q(title__icontains=query["name"])).distinct()
+        docs = docs.filter(search_index_q(query["name"], 'names', 'title'))
 
     # rfc/active/old check buttons
     allowed_draft_states = []
@@ -183,10 +182,7 @@ def retrieve_search_results(form, all_types=False):
     # radio choices
     by = query["by"]
     if by == "author":
-        docs = docs.filter(
-            Q(documentauthor__person__alias__name__icontains=query["author"]) |
-            Q(documentauthor__person__email__address__icontains=query["author"])
-        )
+        docs = docs.filter(search_index_q(query["author"], 'authors'))
     elif by == "group":
         docs = docs.filter(group__acronym=query["group"])
     elif by == "area":
@@ -846,11 +842,12 @@ def ajax_select2_search_docs(request, model_name, doc_type):
 
         if model == Document:
             qs = qs.filter(type=doc_type)
+            for t in q:
+                qs = qs.filter(search_index_q(t, 'names'))
         elif model == DocAlias:
             qs = qs.filter(docs__type=doc_type)
-
-        for t in q:
-            qs = qs.filter(name__icontains=t)
+            for t in q:
+                qs = qs.filter(name__icontains=t)
 
         objs = qs.distinct().order_by("name")[:20]
 
@@ -41,7 +41,7 @@ from ietf.person.models import Person, Email
 from ietf.person.factories import PersonFactory, EmailFactory
 from ietf.review.factories import ReviewRequestFactory, ReviewAssignmentFactory
 from ietf.utils.mail import outbox, empty_outbox, get_payload_text
-from ietf.utils.test_utils import login_testing_unauthorized, TestCase, unicontent, reload_db_objects
+from ietf.utils.test_utils import login_testing_unauthorized, TestCase, unicontent, reload_db_objects, assert_query_budget
 from ietf.utils.timezone import date_today, DEADLINE_TZINFO
 
 
@@ -201,6 +201,17 @@ class GroupPagesTests(TestCase):
         q = PyQuery(r.content)
         self.assertEqual(len(q('#content a:contains("%s")' % group.acronym)), 1)
         
+    def test_group_documents_query_budget(self):
+        group = GroupFactory()
+        setup_default_community_list_for_group(group)
+        for i in range(10):
+            draft = WgDraftFactory(group=group, authors=PersonFactory.create_batch(2))
+            draft.action_holders.set([PersonFactory()])
+        url = urlreverse('ietf.group.views.group_documents', kwargs=dict(acronym=group.acronym))
+        with assert_query_budget(self, 95, max_repeats=25):
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+
     def test_group_documents(self):
         group = GroupFactory()
         setup_default_community_list_for_group(group)
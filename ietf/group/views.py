@@ -114,7 +114,7 @@ from ietf.utils.mail import send_mail_text, parse_preformatted
 from ietf.ietfauth.utils import user_is_person
 from ietf.dbtemplate.models import DBTemplate
 from ietf.mailtrigger.utils import gather_address_lists
-from ietf.mailtrigger.models import Recipient
+from ietf.mailtrigger.models import get_recipient
 from ietf.settings import MAILING_LIST_INFO_URL
 from ietf.utils.response import permission_denied
 from ietf.utils.text import strip_suffix
@@ -1733,7 +1733,7 @@ def email_open_review_assignments(request, acronym, group_type=None):
             return HttpResponseRedirect(back_url)
     else:
         (to,cc) = gather_address_lists('review_assignments_summarized',group=group)
-        reply_to = Recipient.objects.get(slug='group_secretaries').gather(group=group)
+        reply_to = get_recipient('group_secretaries').gather(group=group)
         frm = request.user.person.formatted_email()
 
         templateqs = DBTemplate.objects.filter(path="/group/%s/email/open_assignments.txt" % group.acronym)
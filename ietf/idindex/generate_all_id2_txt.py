@@ -35,9 +35,10 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import argparse
 import os
 import sys
-
+import time
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 
 import django
@@ -45,4 +46,13 @@ django.setup()
 
 from ietf.idindex.index import all_id2_txt
 
-sys.stdout.write(all_id2_txt())
+parser = argparse.ArgumentParser(description="Write all_id2.txt to stdout.")
+parser.add_argument("--incremental", action="store_true",
+                    help="only regenerate the entries of drafts which have changed since the last incremental run")
+parser.add_argument("--timing", action="store_true", help="report the time taken to stderr")
+args = parser.parse_args()
+
+start = time.time()
+sys.stdout.write(all_id2_txt(incremental=args.incremental))
+if args.timing:
+    sys.stderr.write("Generated all_id2.txt in %.2f seconds%s\n" % (time.time() - start, " (incremental)" if args.incremental else ""))
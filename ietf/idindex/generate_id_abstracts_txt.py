@@ -34,8 +34,10 @@
 # OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 
+import argparse
 import os
 import sys
+import time
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ietf.settings")
 
 import django
@@ -43,5 +45,13 @@ django.setup()
 
 from ietf.idindex.index import id_index_txt
 
-sys.stdout.write(id_index_txt(with_abstracts=True))
+parser = argparse.ArgumentParser(description="Write 1id-abstracts.txt to stdout.")
+parser.add_argument("--incremental", action="store_true",
+                    help="only regenerate the entries of drafts which have changed since the last incremental run")
+parser.add_argument("--timing", action="store_true", help="report the time taken to stderr")
+args = parser.parse_args()
 
+start = time.time()
+sys.stdout.write(id_index_txt(with_abstracts=True, incremental=args.incremental))
+if args.timing:
+    sys.stderr.write("Generated 1id-abstracts.txt in %.2f seconds%s\n" % (time.time() - start, " (incremental)" if args.incremental else ""))
@@ -7,8 +7,13 @@
 
 import datetime
 import os
+import pickle
+import tempfile
+
+from collections import defaultdict
 
 from django.conf import settings
+from django.db.models import Max
 from django.template.loader import render_to_string
 from django.utils import timezone
 
@@ -21,55 +26,166 @@ from ietf.doc.templatetags.ietf_filters import clean_whitespace
 from ietf.group.models import Group
 from ietf.person.models import Person, Email
 
-def all_id_txt():
+class IndexLineCache(object):
+    """Cache of the per-draft lines of an index file, stored on disk in
+    settings.IDINDEX_CACHE_DIR between runs so that incremental runs
+    only have to regenerate the lines of the drafts which have changed.
+
+    The entries map a draft name to a (key, value) tuple, and are
+    reused as long as the key is unchanged.  The whole cache is
+    dropped when it's older than settings.IDINDEX_CACHE_MAX_AGE, to
+    pick up changes which don't show up in the keys, like a changed
+    person name."""
+
+    def __init__(self, name):
+        self.path = os.path.join(settings.IDINDEX_CACHE_DIR, "%s.pickle" % name)
+        self.created = None
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return
+        if timezone.now() - data["created"] < datetime.timedelta(seconds=settings.IDINDEX_CACHE_MAX_AGE):
+            self.created = data["created"]
+            self.entries = data["entries"]
+
+    def get(self, name, key):
+        entry = self.entries.get(name)
+        if entry and entry[0] == key:
+            return entry
+        return None
+
+    def save(self, entries):
+        # write to a temporary file and move it in place, so a
+        # concurrent run never sees a partially written cache
+        os.makedirs(settings.IDINDEX_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile("wb", dir=settings.IDINDEX_CACHE_DIR, delete=False) as f:
+            pickle.dump({ "created": self.created or timezone.now(), "entries": entries }, f)
+        os.replace(f.name, self.path)
+
+def draft_change_keys():
+    """Return a dict with a key for each draft which changes when the
+    draft, its events, states or tags change."""
+    drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc")
+
+    states = defaultdict(list)
+    for name, state_id in Document.states.through.objects.filter(document__in=drafts).order_by("state").values_list("document__name", "state"):
+        states[name].append(state_id)
+
+    tags = defaultdict(list)
+    for name, tag in Document.tags.through.objects.filter(document__in=drafts).order_by("doctagname").values_list("document__name", "doctagname"):
+        tags[name].append(tag)
+
+    return dict((name, (rev, time, last_event_id, tuple(states[name]), tuple(tags[name])))
+                for name, rev, time, last_event_id in drafts.annotate(last_event_id=Max("docevent__id")).values_list("name", "rev", "time", "last_event_id"))
+
+def incremental_entries(cache_name, keys, generate, incremental=False):
+    """Return a dict with the value for each name in keys.  The values
+    are computed with generate(names), which returns a dict with the
+    values for the given names, or for all drafts if names is None.
+
+    If incremental is set, values are reused from the IndexLineCache
+    cache_name where the key is unchanged, and the cache is updated
+    afterwards."""
+    cache = IndexLineCache(cache_name)
+    if incremental:
+        cache.load()
+
+    stale = [name for name, key in keys.items() if not cache.get(name, key)]
+    if len(stale) > len(keys) // 2:
+        # cheaper to just do them all than to select them by name
+        generated = generate(None)
+    elif stale:
+        generated = generate(stale)
+    else:
+        generated = {}
+
+    entries = {}
+    for name, key in keys.items():
+        if name in generated:
+            entries[name] = (key, generated[name])
+        else:
+            # there's no value if the draft isn't in the index
+            entries[name] = cache.get(name, key) or (key, None)
+
+    if incremental:
+        cache.save(entries)
+
+    return dict((name, value) for name, (key, value) in entries.items() if value is not None)
+
+def iesg_substate_tags(docs):
+    """Return a dict with the names of the IESG substate tags of each of docs."""
+    tags = defaultdict(list)
+    for name, tag in (Document.tags.through.objects.filter(document__in=docs, doctagname__in=IESG_SUBSTATE_TAGS)
+                      .order_by("doctagname__order", "doctagname__name").values_list("document__name", "doctagname__name")):
+        tags[name].append(tag)
+    return tags
+
+def all_id_lines(names=None):
+    """Return a dict with a (sort key, line) tuple for each draft in
+    all_id.txt, optionally restricted to the drafts with the given
+    names."""
     # this returns a lot of data so try to be efficient
 
+    # we need a distinct to prevent the queries below from multiplying the result
+    all_ids = Document.objects.filter(type="draft").exclude(name__startswith="rfc").distinct()
+    revision_events = NewRevisionDocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-")
+    rfc_aliases = DocAlias.objects.filter(name__startswith="rfc", docs__states=State.objects.get(type="draft", slug="rfc"))
+    replacements = RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"), relationship="replaces")
+    if names is not None:
+        all_ids = all_ids.filter(name__in=names)
+        revision_events = revision_events.filter(doc__name__in=names)
+        rfc_aliases = rfc_aliases.filter(docs__name__in=names)
+        replacements = replacements.filter(target__docs__name__in=names)
+
     # precalculations
-    revision_time = dict(NewRevisionDocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+    revision_time = dict(revision_events.order_by('time').values_list("doc__name", "time"))
 
     def formatted_rev_date(name):
         t = revision_time.get(name)
         return t.strftime("%Y-%m-%d") if t else ""
 
-    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
-                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
-
-    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
-                                                       relationship="replaces").values_list("target__name", "source__name"))
+    rfc_aliases = dict(rfc_aliases.values_list("docs__name", "name"))
 
+    replacements = dict(replacements.values_list("target__name", "source__name"))
 
-    # we need a distinct to prevent the queries below from multiplying the result
-    all_ids = Document.objects.filter(type="draft").order_by('name').exclude(name__startswith="rfc").distinct()
+    res = {}
 
-    res = ["\nInternet-Drafts Status Summary\n"]
-
-    def add_line(f1, f2, f3, f4):
+    def add_line(sort_key, name, f1, f2, f3, f4):
         # each line must have exactly 4 tab-separated fields
-        res.append(f1 + "\t" + f2 + "\t" + f3 + "\t" + f4)
+        res[name] = (sort_key, f1 + "\t" + f2 + "\t" + f3 + "\t" + f4)
 
 
     inactive_states = ["idexists", "pub", "watching", "dead"]
 
     excludes = list(State.objects.filter(type="draft", slug__in=["rfc","repl"]))
     includes = list(State.objects.filter(type="draft-iesg").exclude(slug__in=inactive_states))
-    in_iesg_process = all_ids.exclude(states__in=excludes).filter(states__in=includes).only("name", "rev")
+    in_iesg_process = all_ids.exclude(states__in=excludes).filter(states__in=includes)
+
+    iesg_states = dict(Document.states.through.objects.filter(document__in=in_iesg_process, state__type="draft-iesg").values_list("document__name", "state__name"))
+    iesg_tags = iesg_substate_tags(in_iesg_process)
 
-    # handle those actively in the IESG process
-    for d in in_iesg_process:
-        state = d.get_state("draft-iesg").name
-        tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+    # handle those actively in the IESG process, they go first
+    for name, rev in in_iesg_process.values_list("name", "rev"):
+        state = iesg_states[name]
+        tags = iesg_tags.get(name)
         if tags:
             state += "::" + "::".join(tags)
-        add_line(d.name + "-" + d.rev,
-                 formatted_rev_date(d.name),
+        add_line((0, 0, name),
+                 name,
+                 name + "-" + rev,
+                 formatted_rev_date(name),
                  "In IESG processing - ID Tracker state <" + state + ">",
                  "",
                  )
 
 
-    # handle the rest
+    # handle the rest, ordered by state
 
-    not_in_process = all_ids.exclude(pk__in=[d.pk for d in in_iesg_process])
+    not_in_process = all_ids.exclude(pk__in=in_iesg_process.values("pk"))
 
     for s in State.objects.filter(type="draft").order_by("order"):
         for name, rev in not_in_process.filter(states=s).values_list("name", "rev"):
@@ -83,16 +199,40 @@ def all_id_txt():
             elif s.slug == "repl":
                 state += " replaced by " + replacements.get(name, "0")
 
-            add_line(name + "-" + rev,
+            add_line((1, s.order, name),
+                     name,
+                     name + "-" + rev,
                      formatted_rev_date(name),
                      state,
                      last_field,
                     )
 
+    return res
+
+def all_id_txt(incremental=False):
+    if incremental:
+        lines = incremental_entries("all_id", draft_change_keys(), all_id_lines, incremental=True)
+    else:
+        lines = all_id_lines()
+
+    res = ["\nInternet-Drafts Status Summary\n"]
+    res.extend(line for sort_key, line in sorted(lines.values()))
+
     return "\n".join(res) + "\n"
 
-def file_types_for_drafts():
-    """Look in the draft directory and return file types found as dict (name + rev -> [t1, t2, ...])."""
+def file_types_for_drafts(incremental=False):
+    """Look in the draft directory and return file types found as dict (name + rev -> [t1, t2, ...]).
+
+    If incremental is set, the result is cached and reused as long as
+    the modification time of the draft directory is unchanged."""
+    if incremental:
+        cache = IndexLineCache("file_types")
+        cache.load()
+        mtime = os.stat(settings.INTERNET_DRAFT_PATH).st_mtime_ns
+        entry = cache.get("file_types", mtime)
+        if entry:
+            return entry[1]
+
     file_types = {}
     for filename in os.listdir(settings.INTERNET_DRAFT_PATH):
         if filename.startswith("draft-"):
@@ -103,42 +243,59 @@ def file_types_for_drafts():
                 else:
                     file_types[base].append(ext)
 
+    if incremental:
+        cache.save({ "file_types": (mtime, file_types) })
+
     return file_types
 
-def all_id2_txt():
+def all_id2_lines(file_types, names=None):
+    """Return a dict with the line for each draft in all_id2.txt,
+    optionally restricted to the drafts with the given names."""
     # this returns a lot of data so try to be efficient
 
-    drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc").order_by('name')
+    drafts = Document.objects.filter(type="draft").exclude(name__startswith="rfc")
+    authors = DocumentAuthor.objects.filter(document__name__startswith="draft-")
+    rfc_aliases = DocAlias.objects.filter(name__startswith="rfc", docs__states=State.objects.get(type="draft", slug="rfc"))
+    replacements = RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"), relationship="replaces")
+    revision_events = DocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-")
+    if names is not None:
+        drafts = drafts.filter(name__in=names)
+        authors = authors.filter(document__name__in=names)
+        rfc_aliases = rfc_aliases.filter(docs__name__in=names)
+        replacements = replacements.filter(target__docs__name__in=names)
+        revision_events = revision_events.filter(doc__name__in=names)
+
     drafts = drafts.select_related('group', 'group__parent', 'ad', 'intended_std_level', 'shepherd', )
     drafts = drafts.prefetch_related("states")
 
-    rfc_aliases = dict(DocAlias.objects.filter(name__startswith="rfc",
-                                               docs__states=State.objects.get(type="draft", slug="rfc")).values_list("docs__name", "name"))
+    rfc_aliases = dict(rfc_aliases.values_list("docs__name", "name"))
+
+    replacements = dict(replacements.values_list("target__name", "source__name"))
 
-    replacements = dict(RelatedDocument.objects.filter(target__docs__states=State.objects.get(type="draft", slug="repl"),
-                                                       relationship="replaces").values_list("target__name", "source__name"))
+    revision_time = dict(revision_events.order_by('time').values_list("doc__name", "time"))
 
-    revision_time = dict(DocEvent.objects.filter(type="new_revision", doc__name__startswith="draft-").order_by('time').values_list("doc__name", "time"))
+    iesg_tags = iesg_substate_tags(drafts)
 
-    file_types = file_types_for_drafts()
+    lc_expires_dates = dict(LastCallDocEvent.objects.filter(doc__in=drafts.filter(states__type="draft-iesg", states__slug="lc"), type="sent_last_call")
+                            .order_by("time", "id").values_list("doc__name", "expires"))
 
-    authors = {}
-    for a in DocumentAuthor.objects.filter(document__name__startswith="draft-").order_by("order").select_related("email", "person").iterator():
-        if a.document.name not in authors:
-            l = authors[a.document.name] = []
+    author_names = {}
+    for a in authors.order_by("order").select_related("email", "person").iterator():
+        if a.document_id not in author_names:
+            l = author_names[a.document_id] = []
         else:
-            l = authors[a.document.name]
+            l = author_names[a.document_id]
         if a.email:
             l.append('%s <%s>' % (a.person.plain_name().replace("@", ""), a.email.address.replace(",", "")))
         else:
             l.append(a.person.plain_name())
 
     shepherds = dict((e.pk, e.formatted_ascii_email().replace('"', ''))
-                     for e in Email.objects.filter(shepherd_document_set__type="draft").select_related("person").distinct())
+                     for e in Email.objects.filter(shepherd_document_set__in=drafts).select_related("person").distinct())
     ads = dict((p.pk, p.formatted_ascii_email().replace('"', ''))
-               for p in Person.objects.filter(ad_document_set__type="draft").distinct())
+               for p in Person.objects.filter(ad_document_set__in=drafts).distinct())
 
-    res = []
+    res = {}
     for d in drafts:
         state = d.get_state_slug()
         iesg_state = d.get_state("draft-iesg")
@@ -155,7 +312,7 @@ def all_id2_txt():
             s = "I-D Exists"
             if iesg_state:
                 s = iesg_state.name
-                tags = d.tags.filter(slug__in=IESG_SUBSTATE_TAGS).values_list("name", flat=True)
+                tags = iesg_tags.get(d.name)
                 if tags:
                     s += "::" + "::".join(tags)
             fields.append(s)
@@ -196,27 +353,39 @@ def all_id2_txt():
         # 11
         lc_expires = ""
         if iesg_state and iesg_state.slug == "lc":
-            e = d.latest_event(LastCallDocEvent, type="sent_last_call")
-            if e:
-                lc_expires = e.expires.strftime("%Y-%m-%d")
+            expires = lc_expires_dates.get(d.name)
+            if expires:
+                lc_expires = expires.strftime("%Y-%m-%d")
         fields.append(lc_expires)
         # 12
-        doc_file_types = file_types.get(d.name + "-" + d.rev, [])
-        doc_file_types.sort()           # make the order consistent (and the result testable)
+        doc_file_types = sorted(file_types.get(d.name + "-" + d.rev, [])) # make the order consistent (and the result testable)
         fields.append(",".join(doc_file_types) if state == "active" else "")
         # 13
         fields.append(clean_whitespace(d.title)) # FIXME: we should make sure this is okay in the database and in submit
         # 14
-        fields.append(", ".join(authors.get(d.name, [])))
+        fields.append(", ".join(author_names.get(d.pk, [])))
         # 15
         fields.append(shepherds.get(d.shepherd_id, ""))
         # 16 Responsible AD name and email
         fields.append(ads.get(d.ad_id, ""))
 
         #
-        res.append("\t".join(fields))
+        res[d.name] = "\t".join(fields)
+
+    return res
+
+def all_id2_txt(incremental=False):
+    file_types = file_types_for_drafts(incremental)
+
+    if incremental:
+        # the file types aren't tied to the draft events, so they are part of the keys
+        keys = dict((name, key + (tuple(sorted(file_types.get(name + "-" + key[0], []))), ))
+                    for name, key in draft_change_keys().items())
+        lines = incremental_entries("all_id2", keys, lambda names: all_id2_lines(file_types, names), incremental=True)
+    else:
+        lines = all_id2_lines(file_types)
 
-    return render_to_string("idindex/all_id2.txt", {'data': "\n".join(res) })
+    return render_to_string("idindex/all_id2.txt", {'data': "\n".join(line for name, line in sorted(lines.items())) })
 
 def active_drafts_index_by_group(extra_values=()):
     """Return active drafts grouped into their corresponding
@@ -276,13 +445,14 @@ def active_drafts_index_by_group(extra_values=()):
 
     return groups
     
-def id_index_txt(with_abstracts=False):
+def id_index_txt(with_abstracts=False, incremental=False):
     extra_values = ()
     if with_abstracts:
         extra_values = ("abstract",)
     groups = active_drafts_index_by_group(extra_values)
 
-    file_types = file_types_for_drafts()
+    file_types = file_types_for_drafts(incremental)
+    drafts = {}
     for g in groups:
         for d in g.active_drafts:
             # we need to output a multiple extension thing
@@ -293,6 +463,23 @@ def id_index_txt(with_abstracts=False):
             if ".pdf" in types:
                 exts += ",.pdf"
             d["exts"] = exts
+            drafts[d["name"]] = d
+
+    def render_entries(names):
+        return dict((name, render_to_string("idindex/id_index_entry.txt", { 'd': d, 'with_abstracts': with_abstracts }))
+                    for name, d in drafts.items() if names is None or name in names)
+
+    if incremental:
+        # we already have everything that goes into the entries at hand,
+        # so key them on that rather than on the draft change keys
+        keys = dict((name, (d["rev"], d["title"], tuple(d.get("authors", [])), d.get("rev_time"), d["exts"], d.get("abstract")))
+                    for name, d in drafts.items())
+        entries = incremental_entries("id_abstracts" if with_abstracts else "id_index", keys, render_entries, incremental=True)
+    else:
+        entries = render_entries(None)
+
+    for name, d in drafts.items():
+        d["entry"] = entries[name]
 
     return render_to_string("idindex/id_index.txt", {
             'groups': groups,
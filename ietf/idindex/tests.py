@@ -20,6 +20,8 @@ from ietf.person.factories import PersonFactory, EmailFactory
 from ietf.utils.test_utils import TestCase
 
 class IndexTests(TestCase):
+    settings_temp_path_overrides = TestCase.settings_temp_path_overrides + ['IDINDEX_CACHE_DIR']
+
     def write_draft_file(self, name, size):
         with (Path(settings.INTERNET_DRAFT_PATH) / name).open('w') as f:
             f.write("a" * size)
@@ -140,3 +142,31 @@ class IndexTests(TestCase):
         txt = id_index_txt(with_abstracts=True)
 
         self.assertTrue(draft.abstract[:20] in txt)
+
+    def test_incremental(self):
+        draft = WgDraftFactory(states=[('draft','active'),('draft-iesg','lc')],abstract='a'*20,authors=[PersonFactory()])
+        self.write_draft_file("%s-%s.txt" % (draft.name, draft.rev), 5000)
+
+        for generate in (all_id_txt, all_id2_txt, id_index_txt, lambda **kwargs: id_index_txt(with_abstracts=True, **kwargs)):
+            self.assertEqual(generate(incremental=True), generate())
+
+        # lines are reused as long as the draft hasn't changed
+        Document.objects.filter(pk=draft.pk).update(title="Changed behind the back of the index")
+        self.assertNotIn("Changed behind the back", all_id2_txt(incremental=True))
+        self.assertIn("Changed behind the back", all_id2_txt())
+
+        draft.set_state(State.objects.get(type="draft-iesg", slug="iesg-eva"))
+        txt = all_id_txt(incremental=True)
+        self.assertIn(draft.get_state("draft-iesg").name, txt)
+        self.assertEqual(txt, all_id_txt())
+        self.assertEqual(all_id2_txt(incremental=True), all_id2_txt())
+
+        # new file types show up
+        self.write_draft_file("%s-%s.pdf" % (draft.name, draft.rev), 5000)
+        self.assertIn(",.pdf", id_index_txt(incremental=True))
+        self.assertIn(".pdf,.txt", all_id2_txt(incremental=True))
+
+        # so do new drafts
+        new_draft = WgDraftFactory(states=[('draft','active')])
+        self.assertIn(new_draft.name, all_id_txt(incremental=True))
+        self.assertIn(new_draft.name, id_index_txt(incremental=True))
@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 """Tests of ipr management commands"""
 import mock
-import sys
 
 from django.core.management import call_command
 from django.test.utils import override_settings
@@ -65,13 +64,13 @@ class ProcessEmailTests(TestCase):
         (msg,) = process_mock.call_args.args
         self.assertEqual(msg, invalid_characters, 'Invalid unicode should be passed to process_email()')
 
-    @mock.patch.object(sys.stdin.buffer, 'read')
+    @mock.patch('sys.stdin')
     @mock.patch('ietf.utils.management.base.send_smtp')
     @mock.patch('ietf.ipr.management.commands.process_email.process_response_email')
-    def test_invalid_character_encodings_via_stdin(self, process_mock, send_smtp_mock, stdin_read_mock):
+    def test_invalid_character_encodings_via_stdin(self, process_mock, send_smtp_mock, stdin_mock):
         """The process_email command should attach messages with invalid encoding when using stdin"""
         invalid_characters = b'\xfe\xff'
-        stdin_read_mock.return_value = invalid_characters
+        stdin_mock.buffer.read.return_value = invalid_characters
         call_command('process_email')
 
         self.assertFalse(send_smtp_mock.called)  # should not send an error email
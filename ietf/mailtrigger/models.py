@@ -4,6 +4,7 @@
 
 from django.db import models
 from django.template import Template, Context
+from django.utils.functional import cached_property
 
 from email.utils import parseaddr
 
@@ -58,15 +59,36 @@ class Recipient(models.Model):
 
     def gather(self, **kwargs):
         retval = []
-        if hasattr(self,'gather_%s'%self.slug):
-            retval.extend(eval('self.gather_%s(**kwargs)'%self.slug))
+        if self.gatherer:
+            retval.extend(self.gatherer(**kwargs))
         if self.template:
-            rendering = Template('{%% autoescape off %%}%s{%% endautoescape %%}'%self.template).render(Context(kwargs))
+            rendering = self.compiled_template.render(Context(kwargs))
             if rendering:
                 retval.extend( get_email_addresses_from_text(rendering) )
 
         return clean_duplicates(retval)
 
+    @cached_property
+    def gatherer(self):
+        """The gather_<slug> method of this recipient, if there is one"""
+        return getattr(self, 'gather_%s'%self.slug, None)
+
+    @cached_property
+    def compiled_template(self):
+        return Template('{%% autoescape off %%}%s{%% endautoescape %%}'%self.template)
+
+    def role_addresses(self, group, role_name, kwargs):
+        """The addresses of the group's roles with the name.  Within an
+        expansion, all the roles of the group are looked up at once."""
+        if kwargs.get('expansion'):
+            return kwargs['expansion'].group_role_addresses(group, role_name)
+        return list(group.role_set.filter(name=role_name).values_list('email__address',flat=True))
+
+    def related_that_doc(self, doc, relationship_types, kwargs):
+        if kwargs.get('expansion'):
+            return kwargs['expansion'].related_that_doc(doc, relationship_types)
+        return doc.related_that_doc(relationship_types)
+
     def gather_doc_group_chairs(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
@@ -80,7 +102,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc=kwargs['doc']
             if doc.group and doc.group.features.acts_like_wg:
-                addrs.extend(doc.group.role_set.filter(name='delegate').values_list('email__address',flat=True))
+                addrs.extend(self.role_addresses(doc.group, 'delegate', kwargs))
         return addrs
 
     def gather_doc_group_mail_list(self, **kwargs):
@@ -95,35 +117,35 @@ class Recipient(models.Model):
     def gather_doc_affecteddoc_authors(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_authors').gather(**{'doc':reldoc.document}))
+            for reldoc in self.related_that_doc(kwargs['doc'], ('conflrev','tohist','tois','tops'), kwargs):
+                addrs.extend(get_recipient('doc_authors').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_doc_affecteddoc_group_chairs(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_group_chairs').gather(**{'doc':reldoc.document}))
+            for reldoc in self.related_that_doc(kwargs['doc'], ('conflrev','tohist','tois','tops'), kwargs):
+                addrs.extend(get_recipient('doc_group_chairs').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_doc_affecteddoc_notify(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            for reldoc in kwargs['doc'].related_that_doc(('conflrev','tohist','tois','tops')):
-                addrs.extend(Recipient.objects.get(slug='doc_notify').gather(**{'doc':reldoc.document}))
+            for reldoc in self.related_that_doc(kwargs['doc'], ('conflrev','tohist','tois','tops'), kwargs):
+                addrs.extend(get_recipient('doc_notify').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_conflict_review_stream_manager(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            for reldoc in kwargs['doc'].related_that_doc(('conflrev',)):
-                addrs.extend(Recipient.objects.get(slug='doc_stream_manager').gather(**{'doc':reldoc.document}))
+            for reldoc in self.related_that_doc(kwargs['doc'], ('conflrev',), kwargs):
+                addrs.extend(get_recipient('doc_stream_manager').gather(**{'doc':reldoc.document}))
         return addrs
 
     def gather_conflict_review_steering_group(self,**kwargs):
         addrs = []
         if 'doc' in kwargs:
-            for reldoc in kwargs['doc'].related_that_doc(('conflrev',)):
+            for reldoc in self.related_that_doc(kwargs['doc'], ('conflrev',), kwargs):
                 if reldoc.document.stream_id=='irtf':
                     addrs.append('"Internet Research Steering Group" <irsg@irtf.org>')
         return addrs
@@ -150,7 +172,7 @@ class Recipient(models.Model):
     def gather_doc_stream_manager(self, **kwargs):
         addrs = []
         if 'doc' in kwargs:
-            addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[kwargs['doc'].stream_id]}))
+            addrs.extend(get_recipient('stream_managers').gather(**{'streams':[kwargs['doc'].stream_id]}))
         return addrs
 
     def gather_doc_non_ietf_stream_manager(self, **kwargs):
@@ -158,7 +180,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc = kwargs['doc']
             if doc.stream_id and doc.stream_id != 'ietf':
-                addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[doc.stream_id,]}))
+                addrs.extend(get_recipient('stream_managers').gather(**{'streams':[doc.stream_id,]}))
         return addrs
 
     def gather_group_responsible_directors(self, **kwargs):
@@ -166,11 +188,11 @@ class Recipient(models.Model):
         if 'group' in kwargs:
             group = kwargs['group']
             if not group.acronym=='none':
-                addrs.extend(group.role_set.filter(name='ad').values_list('email__address',flat=True))
+                addrs.extend(self.role_addresses(group, 'ad', kwargs))
             if group.type_id=='rg':
-                addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':['irtf']}))
+                addrs.extend(get_recipient('stream_managers').gather(**{'streams':['irtf']}))
             elif group.type_id=='program':
-                addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
+                addrs.extend(get_recipient('iab').gather(**{}))
         return addrs
 
     def gather_group_secretaries(self, **kwargs):
@@ -182,8 +204,7 @@ class Recipient(models.Model):
                 if rts and rts.secr_mail_alias and len(rts.secr_mail_alias) > 1:
                     addrs = get_email_addresses_from_text(rts.secr_mail_alias)
                 else:
-                    for role in group.role_set.filter(name='secr'):
-                        addrs.append(role.email.address)
+                    addrs.extend(self.role_addresses(group, 'secr', kwargs))
         return addrs
     
     def gather_review_req_reviewers(self, **kwargs):
@@ -204,7 +225,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             group = kwargs['doc'].group
             if group and not group.acronym=='none':
-                addrs.extend(Recipient.objects.get(slug='group_responsible_directors').gather(**{'group':group}))
+                addrs.extend(get_recipient('group_responsible_directors').gather(**{'group':group}))
         return addrs
 
     def gather_submission_authors(self, **kwargs):
@@ -241,7 +262,7 @@ class Recipient(models.Model):
         if 'submission' in kwargs: 
             submission = kwargs['submission']
             if submission.group: 
-                addrs.extend(Recipient.objects.get(slug='group_chairs').gather(**{'group':submission.group}))
+                addrs.extend(get_recipient('group_chairs').gather(**{'group':submission.group}))
         return addrs
 
     def gather_sub_group_parent_directors(self, **kwargs):
@@ -250,8 +271,7 @@ class Recipient(models.Model):
             submission = kwargs['submission']
             if submission.group and submission.group.parent:
                 addrs.extend(
-                    Recipient.objects.get(
-                        slug='group_responsible_directors').gather(group=submission.group.parent)
+                    get_recipient('group_responsible_directors').gather(group=submission.group.parent)
                 )
         return addrs
 
@@ -260,8 +280,7 @@ class Recipient(models.Model):
         doc = kwargs.get('doc')
         if doc and doc.group and doc.group.parent:
             addrs.extend(
-                Recipient.objects.get(
-                    slug='group_responsible_directors').gather(group=doc.group.parent)
+                get_recipient('group_responsible_directors').gather(group=doc.group.parent)
             )
         return addrs
 
@@ -285,13 +304,13 @@ class Recipient(models.Model):
 
                 if doc.group and old_author_email_set != new_author_email_set:
                     if doc.group.features.acts_like_wg:
-                        addrs.extend(Recipient.objects.get(slug='group_chairs').gather(**{'group':doc.group}))
+                        addrs.extend(get_recipient('group_chairs').gather(**{'group':doc.group}))
                     elif doc.group.type_id in ['area']:
-                        addrs.extend(Recipient.objects.get(slug='group_responsible_directors').gather(**{'group':doc.group}))
+                        addrs.extend(get_recipient('group_responsible_directors').gather(**{'group':doc.group}))
                     else:
                         pass
                     if doc.stream_id and doc.stream_id not in ['ietf']:
-                        addrs.extend(Recipient.objects.get(slug='stream_managers').gather(**{'streams':[doc.stream_id]}))
+                        addrs.extend(get_recipient('stream_managers').gather(**{'streams':[doc.stream_id]}))
             else:
                 # This is a bit roundabout, but we do it to get consistent and unicode-compliant
                 # email names for known persons, without relying on the name parsed from the
@@ -308,7 +327,7 @@ class Recipient(models.Model):
         if 'submission' in kwargs:
             submission = kwargs['submission']
             if submission.group:  
-                addrs.extend(Recipient.objects.get(slug='group_mail_list').gather(**{'group':submission.group}))
+                addrs.extend(get_recipient('group_mail_list').gather(**{'group':submission.group}))
         return addrs
 
     def gather_rfc_editor_if_doc_in_queue(self, **kwargs):
@@ -316,7 +335,7 @@ class Recipient(models.Model):
         if 'doc' in kwargs:
             doc = kwargs['doc']
             if doc.get_state_slug("draft-rfceditor") is not None:
-                addrs.extend(Recipient.objects.get(slug='rfc_editor').gather(**{}))
+                addrs.extend(get_recipient('rfc_editor').gather(**{}))
         return addrs
 
     def gather_doc_discussing_ads(self, **kwargs):
@@ -359,18 +378,18 @@ class Recipient(models.Model):
             doc=kwargs['doc']
             if doc.group and doc.group.acronym == 'none':
                 if doc.ad and doc.get_state_slug('draft')=='active':
-                    addrs.extend(Recipient.objects.get(slug='doc_ad').gather(**kwargs))
+                    addrs.extend(get_recipient('doc_ad').gather(**kwargs))
                 else:
                     pass
             else:
-                addrs.extend(Recipient.objects.get(slug='doc_group_mail_list').gather(**kwargs)) 
+                addrs.extend(get_recipient('doc_group_mail_list').gather(**kwargs)) 
         return addrs
 
     def gather_liaison_manager(self, **kwargs):
         addrs=[]
         if 'group' in kwargs:
             group=kwargs['group']
-            addrs.extend(group.role_set.filter(name='liaiman').values_list('email__address',flat=True))
+            addrs.extend(self.role_addresses(group, 'liaiman', kwargs))
         return addrs
 
     def gather_session_requester(self, **kwargs):
@@ -388,8 +407,7 @@ class Recipient(models.Model):
         if 'review_req' in kwargs:
             review_req = kwargs['review_req']
             if review_req.team.parent:
-                for role in review_req.team.parent.role_set.filter(name='ad'):
-                    addrs.append(role.email.address)
+                addrs.extend(self.role_addresses(review_req.team.parent, 'ad', kwargs))
         return addrs
 
     def gather_yang_doctors_secretaries(self, **kwargs):
@@ -412,8 +430,8 @@ class Recipient(models.Model):
                 if responsible:
                     addrs.extend([leader.email_address() for leader in responsible])
                 else:
-                    addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
-                    addrs.extend(Recipient.objects.get(slug='iesg').gather(**{}))
+                    addrs.extend(get_recipient('iab').gather(**{}))
+                    addrs.extend(get_recipient('iesg').gather(**{}))
         return addrs
 
     def gather_bofreq_previous_responsible(self, **kwargs):
@@ -424,7 +442,32 @@ class Recipient(models.Model):
         if previous_responsible:
             addrs = [p.email_address() for p in previous_responsible]
         else:
-            addrs.extend(Recipient.objects.get(slug='iab').gather(**{}))
-            addrs.extend(Recipient.objects.get(slug='iesg').gather(**{}))
+            addrs.extend(get_recipient('iab').gather(**{}))
+            addrs.extend(get_recipient('iesg').gather(**{}))
         return addrs
 
+
+def get_recipient(slug):
+    """The Recipient with the slug, from the registry of mail triggers and
+    recipients, see ietf.mailtrigger.utils"""
+    from ietf.mailtrigger.utils import get_registry
+    try:
+        return get_registry().recipients[slug]
+    except KeyError:
+        raise Recipient.DoesNotExist("Recipient matching query does not exist.")
+
+
+def mail_triggers_changed(sender, **kwargs):
+    from ietf.mailtrigger.utils import registry_changed
+    registry_changed()
+
+def mail_trigger_recipients_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        mail_triggers_changed(sender, **kwargs)
+
+models.signals.post_save.connect(mail_triggers_changed, sender=MailTrigger)
+models.signals.post_delete.connect(mail_triggers_changed, sender=MailTrigger)
+models.signals.post_save.connect(mail_triggers_changed, sender=Recipient)
+models.signals.post_delete.connect(mail_triggers_changed, sender=Recipient)
+models.signals.m2m_changed.connect(mail_trigger_recipients_changed, sender=MailTrigger.to.through)
+models.signals.m2m_changed.connect(mail_trigger_recipients_changed, sender=MailTrigger.cc.through)
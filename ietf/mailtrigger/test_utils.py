@@ -2,9 +2,14 @@
 # -*- coding: utf-8 -*-
 
 
+from mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+
 from ietf.doc.factories import WgDraftFactory
-from ietf.mailtrigger.models import MailTrigger
-from .utils import gather_address_lists
+from ietf.group.factories import RoleFactory
+from ietf.mailtrigger.models import MailTrigger, Recipient
+from .utils import gather_address_lists, gather_relevant_expansions, MailTriggerRegistry, _registry
 from ietf.utils.test_utils import TestCase
 
 
@@ -42,3 +47,28 @@ class GatherAddressListsTests(TestCase):
                                         'mars-chairs@ietf.org', 'iesg-secretary@ietf.org'])
         new_trigger = MailTrigger.objects.get(slug=new_slug)
         self.assertEqual(new_trigger.desc, new_desc)
+
+    def test_registry(self):
+        _registry.clear()
+        with patch('ietf.mailtrigger.utils.cache', LocMemCache('mailtrigger-test', {})), \
+             patch('ietf.mailtrigger.utils.MailTriggerRegistry', wraps=MailTriggerRegistry) as registry_class:
+            gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
+            to, cc = gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
+            self.assertEqual(registry_class.call_count, 1)
+            self.assertNotIn('The IAB <iab@iab.org>', to)
+            # a change is seen at once
+            MailTrigger.objects.get(slug='doc_pulled_from_rfc_queue').to.add(Recipient.objects.get(slug='iab'))
+            to, cc = gather_address_lists('doc_pulled_from_rfc_queue', doc=self.doc)
+            self.assertIn('The IAB <iab@iab.org>', to)
+        _registry.clear()
+
+    def test_relevant_expansions(self):
+        RoleFactory(group__type_id='review', group__acronym='yangdoctors', name_id='secr')
+        RoleFactory(group=self.doc.group, name_id='delegate', person__user__email='delegate@example.com')
+        RoleFactory(group=self.doc.group.parent, name_id='ad', person__user__email='ad@example.com')
+        expansions = gather_relevant_expansions(doc=self.doc)
+        self.assertIn('doc_state_edited', [ slug for slug, desc, to, cc in expansions ])
+        # the expansions of the triggers together are the same as one by one
+        for slug, desc, to, cc in expansions:
+            self.assertEqual(gather_address_lists(slug, doc=self.doc), (to, cc))
+            self.assertEqual(desc, MailTrigger.objects.get(slug=slug).desc)
@@ -1,10 +1,16 @@
 # Copyright The IETF Trust 2015-2019, All Rights Reserved
 
-from collections import namedtuple
+import time
+import uuid
+
+from collections import namedtuple, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
 
 import debug                            # pyflakes:ignore
 
-from ietf.mailtrigger.models import MailTrigger, Recipient
+from ietf.mailtrigger.models import MailTrigger, Recipient, get_recipient
 from ietf.submit.models import Submission
 from ietf.utils.mail import excludeaddrs
 
@@ -21,26 +27,134 @@ class AddrLists(namedtuple('AddrLists',['to','cc'])):
         return namedtuple('AddrListsAsStrings',['to','cc'])(to=to_string,cc=cc_string)
 
 
-def gather_address_lists(slug, skipped_recipients=None, create_from_slug_if_not_exists=None, 
-                         desc_if_not_exists=None, **kwargs):
-    mailtrigger = get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists)
+# The mail triggers and recipients are read from the database once, and
+# kept in a registry in each process.  Changing them moves the registry to
+# a new version, which the other processes notice within
+# REGISTRY_CHECK_INTERVAL seconds.  A registry read while this process has
+# uncommitted changes to them isn't kept, since the changes may be rolled
+# back.
+REGISTRY_CHECK_INTERVAL = 10
+REGISTRY_UNCOMMITTED_TIMEOUT = 60
+REGISTRY_VERSION_KEY = "mailtrigger:registry:version"
+
+_registry = {}
+
+Trigger = namedtuple('Trigger', ['slug', 'desc', 'to', 'cc'])
+
+class MailTriggerRegistry(object):
+    """All the mail triggers, with the Recipients they send to, and all the
+    Recipients by slug"""
+
+    def __init__(self):
+        self.recipients = dict( (r.slug, r) for r in Recipient.objects.all() )
+        to = defaultdict(list)
+        for trigger_id, recipient_id in MailTrigger.to.through.objects.values_list('mailtrigger_id', 'recipient_id'):
+            to[trigger_id].append(self.recipients[recipient_id])
+        cc = defaultdict(list)
+        for trigger_id, recipient_id in MailTrigger.cc.through.objects.values_list('mailtrigger_id', 'recipient_id'):
+            cc[trigger_id].append(self.recipients[recipient_id])
+        self.triggers = dict(
+            (slug, Trigger(slug, desc, sorted(to[slug], key=lambda r: r.slug), sorted(cc[slug], key=lambda r: r.slug)))
+            for slug, desc in MailTrigger.objects.values_list('slug', 'desc')
+        )
+
+    def starting_with(self, prefix):
+        return [ slug for slug in self.triggers if slug.startswith(prefix) ]
+
+def get_registry():
+    now = time.time()
+    if now - _registry.get('uncommitted', 0) < REGISTRY_UNCOMMITTED_TIMEOUT:
+        return MailTriggerRegistry()
+    if 'registry' in _registry and now - _registry['checked'] < REGISTRY_CHECK_INTERVAL:
+        return _registry['registry']
+    version = cache.get(REGISTRY_VERSION_KEY)
+    if version is None:
+        cache.add(REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+        # without a shared cache, only the changes made by this process are noticed
+        version = cache.get(REGISTRY_VERSION_KEY) or 'local'
+    if _registry.get('version') != version or 'registry' not in _registry:
+        _registry.update(version=version, registry=MailTriggerRegistry())
+    _registry['checked'] = now
+    return _registry['registry']
+
+def registry_changed():
+    """Note that mail triggers or recipients were changed"""
+    def committed():
+        _registry.clear()
+        cache.set(REGISTRY_VERSION_KEY, uuid.uuid4().hex, None)
+    _registry.clear()
+    if transaction.get_connection().in_atomic_block:
+        _registry['uncommitted'] = time.time()
+    transaction.on_commit(committed)
+
+
+class RecipientExpansion(object):
+    """The expansion of recipients for one set of arguments.  Each recipient
+    is gathered only once, however many triggers it is used in, and the
+    roles and related documents the recipients look at are looked up once
+    for all of them."""
+
+    def __init__(self, **kwargs):
+        kwargs['expansion'] = self
+        self.kwargs = kwargs
+        self.addresses = {}
+        self.roles = {}
+        self.related = {}
+
+    def gather(self, recipient):
+        if recipient.slug not in self.addresses:
+            self.addresses[recipient.slug] = recipient.gather(**self.kwargs)
+        return self.addresses[recipient.slug]
+
+    def group_role_addresses(self, group, role_name):
+        if group.pk not in self.roles:
+            roles = defaultdict(list)
+            for name, address in group.role_set.values_list('name_id', 'email__address'):
+                roles[name].append(address)
+            self.roles[group.pk] = roles
+        return self.roles[group.pk][role_name]
+
+    def related_that_doc(self, doc, relationship_types):
+        key = (doc.pk, tuple(relationship_types))
+        if key not in self.related:
+            self.related[key] = doc.related_that_doc(relationship_types)
+        return self.related[key]
+
+
+def gather_address_lists(slug, skipped_recipients=None, create_from_slug_if_not_exists=None,
+                         desc_if_not_exists=None, expansion=None, **kwargs):
+    """The to and cc addresses of the mail trigger with the slug, for the
+    kwargs.  An expansion can be given instead of the kwargs, to share it
+    among several triggers."""
+    trigger = get_trigger(slug, create_from_slug_if_not_exists, desc_if_not_exists)
+    if expansion is None:
+        expansion = RecipientExpansion(**kwargs)
 
     to = set()
-    for recipient in mailtrigger.to.all():
-        to.update(recipient.gather(**kwargs))
+    for recipient in trigger.to:
+        to.update(expansion.gather(recipient))
     to.discard('')
     if skipped_recipients:
         to = excludeaddrs(to, skipped_recipients)
 
     cc = set()
-    for recipient in mailtrigger.cc.all():
-        cc.update(recipient.gather(**kwargs))
+    for recipient in trigger.cc:
+        cc.update(expansion.gather(recipient))
     cc.discard('')
     if skipped_recipients:
         cc = excludeaddrs(cc, skipped_recipients)
 
     return AddrLists(to=sorted(list(to)),cc=sorted(list(cc)))
 
+def get_trigger(slug, create_from_slug_if_not_exists=None, desc_if_not_exists=None):
+    trigger = get_registry().triggers.get(slug)
+    if trigger is None:
+        get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists)
+        # created just now, or by another process since the registry was read
+        _registry.pop('registry', None)
+        trigger = get_registry().triggers[slug]
+    return trigger
+
 def get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists):
     try:
         mailtrigger = MailTrigger.objects.get(slug=slug)
@@ -59,8 +173,8 @@ def get_mailtrigger(slug, create_from_slug_if_not_exists, desc_if_not_exists):
 
 def gather_relevant_expansions(**kwargs):
 
-    def starts_with(prefix):
-        return MailTrigger.objects.filter(slug__startswith=prefix).values_list('slug',flat=True)
+    registry = get_registry()
+    starts_with = registry.starting_with
 
     relevant = set() 
     
@@ -110,17 +224,22 @@ def gather_relevant_expansions(**kwargs):
 
         relevant.update(starts_with('sub_'))
 
+    # the recipients used by several of the triggers are gathered only once
+    expansion = RecipientExpansion(**kwargs)
     rule_list = []
-    for mailtrigger in MailTrigger.objects.filter(slug__in=relevant):
-        addrs = gather_address_lists(mailtrigger.slug,**kwargs)
+    for slug in relevant:
+        trigger = registry.triggers.get(slug)
+        if trigger is None:
+            continue
+        addrs = gather_address_lists(slug, expansion=expansion)
         if addrs.to or addrs.cc:
-            rule_list.append((mailtrigger.slug,mailtrigger.desc,addrs.to,addrs.cc))
+            rule_list.append((trigger.slug,trigger.desc,addrs.to,addrs.cc))
     return sorted(rule_list)
 
 def get_base_submission_message_address():
-    return Recipient.objects.get(slug='submission_manualpost_handling').gather()[0]
+    return get_recipient('submission_manualpost_handling').gather()[0]
 
 def get_base_ipr_request_address():
-    return Recipient.objects.get(slug='ipr_requests').gather()[0]
+    return get_recipient('ipr_requests').gather()[0]
 
 
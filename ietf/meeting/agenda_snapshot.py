@@ -0,0 +1,357 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""Agenda snapshots.
+
+The agenda of a meeting is served in several formats (the agenda data API
+used by the agenda page, agenda.json, agenda.txt, agenda.csv and the
+iCalendar feeds), which are all requested often, and all the more so
+during a meeting.  Rather than having each of them process the schedule's
+assignments, the assignments are processed once per version of the
+agenda into a snapshot of plain data, which is cached, and which each
+format is rendered from.
+
+The version of the agenda changes whenever the meeting, its schedule,
+sessions, timeslots or materials are modified (see Meeting.updated()), so
+a snapshot never has to be invalidated; it just isn't asked for any more.
+The version is also used for the ETag of the agenda responses, and for the
+cached events of the iCalendar feeds (see ietf.meeting.ical).
+"""
+
+import hashlib
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.urls import reverse
+
+import debug                            # pyflakes:ignore
+
+from ietf.doc.models import NewRevisionDocEvent
+from ietf.group.models import Group
+from ietf.meeting.helpers import preprocess_assignments_for_agenda, AgendaFilterOrganizer, AgendaKeywordTagger
+from ietf.meeting.models import SchedTimeSessAssignment, SessionPresentation, FloorPlan
+from ietf.utils.cache import get_or_compute
+from ietf.utils.templatetags.textfilters import format as format_with
+from ietf.utils.text import xslugify
+
+
+# Bump this when the content of the snapshots changes, so that snapshots
+# made by earlier code are not used
+AGENDA_SNAPSHOT_FORMAT = 1
+
+
+def get_assignments_for_agenda(schedule):
+    """Get queryset containing assignments to show on the agenda"""
+    return SchedTimeSessAssignment.objects.filter(
+        schedule__in=[schedule, schedule.base],
+        session__on_agenda=True,
+    )
+
+
+def agenda_snapshot_version(meeting, schedule):
+    """Get a string which changes whenever the agenda of meeting for
+    schedule changes"""
+    parts = [
+        AGENDA_SNAPSHOT_FORMAT,
+        meeting.pk,
+        schedule.pk,
+        schedule.base_id,
+        meeting.updated().isoformat(),
+    ]
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def agenda_etag(meeting, schedule, *extra):
+    """ETag for an agenda response, extra identifying the representation"""
+    version = agenda_snapshot_version(meeting, schedule)
+    return '"%s"' % hashlib.md5(repr((version,) + extra).encode()).hexdigest()
+
+
+def get_agenda_snapshot(meeting, schedule):
+    """Get the agenda snapshot of meeting for schedule, from the cache if
+    possible.  Only one process builds a given snapshot at a time."""
+    version = agenda_snapshot_version(meeting, schedule)
+    return get_or_compute(
+        cache,
+        "meeting:agenda-snapshot:%s" % version,
+        lambda: build_agenda_snapshot(meeting, schedule, version),
+        settings.AGENDA_SNAPSHOT_CACHE_TIME,
+        lock_timeout=settings.AGENDA_SNAPSHOT_LOCK_TIMEOUT,
+        prefix="meeting:agenda-snapshot",
+    )
+
+
+def build_agenda_snapshot(meeting, schedule, version=None):
+    """Process the agenda of meeting for schedule into a dict of plain data
+    that all agenda formats can be rendered from"""
+    assignments = preprocess_assignments_for_agenda(get_assignments_for_agenda(schedule), meeting)
+    AgendaKeywordTagger(assignments=assignments).apply()
+    filter_organizer = AgendaFilterOrganizer(assignments=assignments)
+
+    sessions = [a.session for a in assignments]
+    presentations = defaultdict(list)
+    for pres in SessionPresentation.objects.filter(session__in=sessions, document__type__slug='slides').select_related('document'):
+        presentations[pres.session_id].append({
+            'name': pres.document.name,
+            'title': pres.document.title,
+            'order': pres.order,
+            'rev': pres.rev,
+            'resource_uri': '/api/v1/meeting/sessionpresentation/%s/' % pres.id,
+        })
+    # the time of the latest revision of the materials of each session
+    materials_updated = {}
+    material_revisions = dict(
+        NewRevisionDocEvent.objects.filter(doc__session__in=sessions, type='new_revision').values_list('doc_id').annotate(Max('time'))
+    )
+    for session_id, doc_id in SessionPresentation.objects.filter(session__in=sessions).values_list('session_id', 'document_id'):
+        if doc_id in material_revisions:
+            materials_updated[session_id] = max(materials_updated.get(session_id, material_revisions[doc_id]), material_revisions[doc_id])
+
+    items = []
+    rooms = {}
+    parent_acronyms = set()
+    for a in assignments:
+        item = agenda_snapshot_item(a, meeting, presentations, materials_updated)
+        items.append(item)
+        if a.timeslot.location:
+            rooms[a.timeslot.location.pk] = agenda_snapshot_room(a.timeslot.location)
+        if item['json_parent']:
+            parent_acronyms.add(item['session']['group_parent_at_the_time']['acronym'])
+
+    return {
+        'version': version,
+        'updated': meeting.updated(),
+        'filter_categories': filter_organizer.get_filter_categories(),
+        'non_area_keywords': filter_organizer.get_non_area_keywords(),
+        'items': items,
+        # the rooms and group parents for agenda.json
+        'rooms': rooms,
+        'parents': {
+            parent.acronym: {
+                'id': parent.pk,
+                'objtype': 'parent',
+                'name': parent.acronym,
+                'description': parent.name,
+                'modified': parent.time,
+            } for parent in Group.objects.filter(acronym__in=parent_acronyms)
+        },
+        'floors': [agenda_extract_floorplan(f) for f in FloorPlan.objects.filter(meeting=meeting).order_by('order')],
+    }
+
+
+def agenda_snapshot_item(a, meeting, presentations, materials_updated):
+    """The data of one assignment in an agenda snapshot.  The keys follow
+    the names of the model attributes, so that templates can use an item
+    just like an assignment."""
+    session = a.session
+    timeslot = a.timeslot
+    location = timeslot.location
+    group = session.group_at_the_time()
+    parent = session.group_parent_at_the_time()
+    agenda = session.agenda()
+    minutes = session.minutes()
+    rescheduled_to = getattr(session, 'rescheduled_to', None)
+    video_stream_url = location.video_stream_url() if location else None
+
+    return {
+        'api': agenda_extract_schedule(a),
+        'pk': a.pk,
+        'slug': a.slug(),
+        'filter_keywords': a.filter_keywords,
+        'slot_type': {
+            'slug': a.slot_type().slug,
+            'name': a.slot_type().name,
+        },
+        'timeslot': {
+            'pk': timeslot.pk,
+            'name': timeslot.name,
+            'time': timeslot.time,
+            'end_time': timeslot.end_time(),
+            'local_start_time': timeslot.local_start_time(),
+            'local_end_time': timeslot.local_end_time(),
+            'utc_start_time': timeslot.utc_start_time(),
+            'time_desc': timeslot.time_desc,
+            'duration': timeslot.duration,
+            'modified': timeslot.modified,
+            'show_location': timeslot.show_location,
+            'get_location': timeslot.get_location(),
+            'location': {
+                'pk': location.pk,
+                'name': location.name,
+                'webex_url': location.webex_url(),
+                'video_stream_url': format_with(video_stream_url, session) if video_stream_url else None,
+            } if location else None,
+        },
+        'session': {
+            'pk': session.pk,
+            'name': session.name,
+            'short': session.short,
+            'type_id': session.type_id,
+            'agenda_note': session.agenda_note,
+            'remote_instructions': session.remote_instructions,
+            'current_status': session.current_status,
+            'ical_status': ical_session_status(a),
+            'modified': max(session.modified, materials_updated.get(session.pk, session.modified)),
+            'agenda_text': session.agenda_text() if a.slot_type().slug == 'plenary' else None,
+            'rescheduled_to': {
+                'time': rescheduled_to.time,
+                'end_time': rescheduled_to.end_time(),
+            } if rescheduled_to else None,
+            # the group as it is now, rather than at the time of the meeting
+            'group': {
+                'acronym': session.group.acronym,
+            } if session.group else None,
+            'group_at_the_time': {
+                'acronym': group.acronym,
+                'name': group.name,
+                'type_id': group.type_id,
+                'type_name': group.type.name,
+                'state_id': group.state_id,
+                'is_bof': group.is_bof(),
+            } if group else None,
+            'group_parent_at_the_time': {
+                'acronym': parent.acronym,
+            } if parent else None,
+            'agenda': {
+                'type': str(agenda.type),
+                'get_href': agenda.get_href(meeting=meeting),
+                'get_versionless_href': agenda.get_versionless_href(meeting=meeting),
+                'uploaded_filename': agenda.uploaded_filename,
+            } if agenda else None,
+            'minutes': {
+                'get_href': minutes.get_href(meeting=meeting),
+            } if minutes else None,
+            'slides': [{'uploaded_filename': slide.uploaded_filename} for slide in session.slides()],
+            'presentations': presentations.get(session.pk, []),
+        },
+        # agenda.json only lists the parents of these groups
+        'json_parent': bool(parent and (group.type_id in ['wg', 'rg', 'ag', 'rag'] or group.acronym in ['iesg', ])),
+    }
+
+
+def agenda_snapshot_room(room):
+    roomdict = dict()
+    roomdict['id'] = room.pk
+    roomdict['objtype'] = 'location'
+    roomdict['name'] = room.name
+    if room.floorplan:
+        roomdict['level_name'] = room.floorplan.name
+        roomdict['level_sort'] = room.floorplan.order
+    if room.x1 is not None:
+        roomdict['x'] = (room.x1+room.x2)/2.0
+        roomdict['y'] = (room.y1+room.y2)/2.0
+    roomdict['modified'] = room.modified
+    if room.floorplan and room.floorplan.image:
+        roomdict['map'] = room.floorplan.image.url
+        roomdict['modified'] = max(room.modified, room.floorplan.modified)
+    return roomdict
+
+
+def ical_session_status(assignment):
+    if assignment.session.current_status == 'canceled':
+        return "CANCELLED"
+    elif assignment.session.current_status == 'resched':
+        t = "RESCHEDULED"
+        if assignment.session.tombstone_for_id is not None:
+            other_assignment = SchedTimeSessAssignment.objects.filter(schedule=assignment.schedule_id, session=assignment.session.tombstone_for_id).first()
+            if other_assignment:
+                t = "RESCHEDULED TO {}-{}".format(
+                    other_assignment.timeslot.time.strftime("%A %H:%M").upper(),
+                    other_assignment.timeslot.end_time().strftime("%H:%M")
+                )
+        return t
+    else:
+        return "CONFIRMED"
+
+
+def agenda_extract_schedule (item):
+    return {
+        "id": item.id,
+        "sessionId": item.session.id,
+        "room": item.room_name if item.timeslot.show_location else None,
+        "location": {
+            "short": item.timeslot.location.floorplan.short,
+            "name": item.timeslot.location.floorplan.name,
+        } if (item.timeslot.show_location and item.timeslot.location and item.timeslot.location.floorplan) else {},
+        "acronym": item.acronym,
+        "duration": item.timeslot.duration.seconds,
+        "name": item.timeslot.name,
+        "startDateTime": item.timeslot.time.isoformat(),
+        "status": item.session.current_status,
+        "type": item.session.type.slug,
+        "isBoF": item.session.group_at_the_time().state_id == "bof",
+        "filterKeywords": item.filter_keywords,
+        "groupAcronym": item.session.group_at_the_time().acronym,
+        "groupName": item.session.group_at_the_time().name,
+        "groupParent": {
+            "acronym": item.session.group_parent_at_the_time().acronym
+        } if item.session.group_parent_at_the_time() else {},
+        "note": item.session.agenda_note,
+        "remoteInstructions": item.session.remote_instructions,
+        "flags": {
+            "agenda": True if item.session.agenda() is not None else False,
+            "showAgenda": True if (item.session.agenda() is not None or item.session.remote_instructions or item.session.agenda_note) else False
+        },
+        "agenda": {
+            "url": item.session.agenda().get_href()
+        } if item.session.agenda() is not None else {
+            "url": None
+        },
+        "orderInMeeting": item.session.order_number,
+        "short": item.session.short if item.session.short else item.session.short_name,
+        "sessionToken": item.session.docname_token_only_for_multiple(),
+        "links": {
+            "chat" : item.session.chat_room_url(),
+            "chatArchive" : item.session.chat_archive_url(),
+            "recordings": list(map(agenda_extract_recording, item.session.recordings())),
+            "videoStream": item.timeslot.location.video_stream_url() if item.timeslot.location else "",
+            "audioStream": item.timeslot.location.audio_stream_url() if item.timeslot.location else "",
+            "webex": item.timeslot.location.webex_url() if item.timeslot.location else "",
+            "onsiteTool": item.timeslot.location.onsite_tool_url() if item.timeslot.location else "",
+            "calendar": reverse(
+                'ietf.meeting.views.agenda_ical',
+                kwargs={'num': item.schedule.meeting.number, 'session_id': item.session.id},
+            ),
+        }
+        # "slotType": {
+        #     "slug": item.slot_type.slug
+        # }
+    }
+
+def agenda_extract_floorplan (item):
+    try:
+        item.image.width
+    except FileNotFoundError:
+        return {}
+
+    return {
+        "id": item.id,
+        "image": item.image.url,
+        "name": item.name,
+        "short": item.short,
+        "width": item.image.width,
+        "height": item.image.height,
+        "rooms": list(map(agenda_extract_room, item.room_set.all()))
+    }
+
+def agenda_extract_room (item):
+    return {
+        "id": item.id,
+        "name": item.name,
+        "functionalName": item.functional_name,
+        "slug": xslugify(item.name),
+        "left": item.left(),
+        "right": item.right(),
+        "top": item.top(),
+        "bottom": item.bottom()
+    }
+
+def agenda_extract_recording (item):
+    return {
+        "id": item.id,
+        "name": item.name,
+        "title": item.title,
+        "url": item.external_url
+    }
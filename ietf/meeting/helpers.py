@@ -3,17 +3,22 @@
 
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+import hashlib
 import io
 import os
 import re
-from tempfile import mkstemp
+import tarfile
+import time
+from tempfile import mkstemp, NamedTemporaryFile
 
 from django.http import Http404
 from django.db.models import F, Prefetch
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache, caches
 from django.urls import reverse
 from django.shortcuts import get_object_or_404
 from django.template.loader import render_to_string
@@ -32,7 +37,8 @@ from ietf.meeting.utils import session_requested_by, add_event_info_to_session_q
 from ietf.name.models import ImportantDateName, SessionPurposeName
 from ietf.utils import log, meetecho
 from ietf.utils.mail import send_mail
-from ietf.utils.pipe import pipe
+from ietf.utils.pdf import pdf_pages
+from ietf.utils.pipe import run_command
 from ietf.utils.text import xslugify
 
 
@@ -115,47 +121,50 @@ def preprocess_assignments_for_agenda(assignments_queryset, meeting, extra_prefe
     # assignments = list(assignments_queryset) # make sure we're set in stone
     assignments = assignments_queryset
 
-    # replace groups with historic counterparts
-    groups = [ ]
+    # Everything below is done in a single pass over the assignments, with
+    # dicts for the lookups, so that the time taken grows linearly with the
+    # size of the agenda
+    sessions_per_group = defaultdict(int)
+    timeslot_by_session_pk = {}
+    rescheduled = []
+    href_by_doc_pk = {}
     for a in assignments:
+        timeslot_by_session_pk[a.session_id] = a.timeslot
         if a.session:
             # Ensure that all Sessions refer to the same Meeting instance so they can share the
             # _groups_at_the_time() cache. The Sessions should all belong to the same meeting, but
             # check before blindly assigning to meeting just in case.
             if a.session.meeting.pk == meeting.pk:
                 a.session.meeting = meeting
-            a.session.order_number = None
 
-            if a.session.group and a.session.group not in groups:
-                groups.append(a.session.group)
-
-    sessions_for_groups = defaultdict(list)
-    for a in assignments:
-        if a.session and a.session.group:
-            sessions_for_groups[(a.session.group, a.session.type_id)].append(a)
-
-    for a in assignments:
-        if a.session and a.session.group:
-
-            l = sessions_for_groups.get((a.session.group, a.session.type_id), [])
-            a.session.order_number = l.index(a) + 1 if a in l else 0
-
-    timeslot_by_session_pk = {a.session_id: a.timeslot for a in assignments}
-
-    for a in assignments:
+            if a.session.group:
+                key = (a.session.group_id, a.session.type_id)
+                sessions_per_group[key] += 1
+                a.session.order_number = sessions_per_group[key]
+            else:
+                a.session.order_number = None
 
-        if a.session.current_status == 'resched':
-            a.session.rescheduled_to = timeslot_by_session_pk.get(a.session.tombstone_for_id)
+            if a.session.current_status == 'resched':
+                rescheduled.append(a.session)
 
         for d in a.session.prefetched_active_materials:
-            # make sure these are precomputed with the meeting instead
-            # of having to look it up
-            d.get_href(meeting=meeting)
-            d.get_versionless_href(meeting=meeting)
+            # make sure the hrefs are precomputed with the meeting instead
+            # of having to look it up, once per document; get_href() and
+            # get_versionless_href() share the cached value
+            if d.pk in href_by_doc_pk:
+                d._cached_href, d.is_meeting_related = href_by_doc_pk[d.pk]
+            else:
+                d.get_href(meeting=meeting)
+                if hasattr(d, '_cached_href'):
+                    href_by_doc_pk[d.pk] = (d._cached_href, getattr(d, 'is_meeting_related', False))
 
         a.start_timestamp = int(a.timeslot.utc_start_time().timestamp())
         a.end_timestamp = int(a.timeslot.utc_end_time().timestamp())
 
+    # the tombstones may come after the rescheduled sessions
+    for session in rescheduled:
+        session.rescheduled_to = timeslot_by_session_pk.get(session.tombstone_for_id)
+
     return assignments
 
 
@@ -684,10 +693,110 @@ def convert_draft_to_pdf(doc_name):
     tempfile.close()
     t,psname = mkstemp()
     os.close(t)
-    pipe("enscript --margins 76::76: -B -q -p "+psname + " " +tempname)
-    os.unlink(tempname)
-    pipe("ps2pdf "+psname+" "+outpath)
-    os.unlink(psname)
+    pdfname = None
+    try:
+        # convert to a temporary file first, so that nobody sees a partial
+        # pdf while another process converts the same draft
+        t,pdfname = mkstemp(suffix=".pdf", dir=os.path.dirname(outpath))
+        os.close(t)
+        result = run_command(["enscript", "--margins", "76::76:", "-B", "-q", "-p", psname, tempname])
+        if result.code != 0:
+            log.log("enscript failed to convert %s: %s" % (doc_name, result.err.decode(errors="replace")))
+            return
+        result = run_command(["ps2pdf", psname, pdfname])
+        if result.code != 0:
+            log.log("ps2pdf failed to convert %s: %s" % (doc_name, result.err.decode(errors="replace")))
+            return
+        os.chmod(pdfname, 0o644)
+        os.replace(pdfname, outpath)
+    except OSError as e:
+        log.log("Could not convert %s to pdf: %s" % (doc_name, e))
+    finally:
+        for name in (tempname, psname, pdfname):
+            if name and os.path.exists(name):
+                os.unlink(name)
+
+def convert_drafts_to_pdf(doc_names):
+    """Make the missing pdfs of the drafts doc_names (names with revisions),
+    in parallel"""
+    missing = [ d for d in doc_names if not os.path.exists(os.path.join(settings.INTERNET_DRAFT_PDF_PATH, d + ".pdf")) ]
+    if missing:
+        # the conversion is done by external programs, so threads will do
+        with ThreadPoolExecutor(max_workers=settings.MEETING_DRAFT_PDF_WORKERS) as executor:
+            list(executor.map(convert_draft_to_pdf, missing))
+
+def session_draft_bundle_key(kind, doc_names):
+    """Cache key for the bundle of kind ('tgz' or 'pdf') of the drafts
+    doc_names.  The names include the revisions, so a new revision of any
+    of the drafts makes a new bundle."""
+    digest = hashlib.sha256("\n".join(doc_names).encode()).hexdigest()
+    return "meeting:draft-bundle:%s:%s" % (kind, digest)
+
+def build_session_draft_tarfile(doc_names):
+    """Return a gzipped tarball with the pdfs of the drafts doc_names and a
+    manifest listing what was included"""
+    convert_drafts_to_pdf(doc_names)
+    manifest = []
+    out = io.BytesIO()
+    with tarfile.open(fileobj=out, mode='w:gz') as tarstream:
+        for doc_name in doc_names:
+            pdf_path = os.path.join(settings.INTERNET_DRAFT_PDF_PATH, doc_name + ".pdf")
+            if os.path.exists(pdf_path):
+                try:
+                    tarstream.add(pdf_path, str(doc_name + ".pdf"))
+                    manifest.append("Included:  "+pdf_path+"\n")
+                except Exception as e:
+                    manifest.append(("Failed (%s): "%e)+pdf_path+"\n")
+            else:
+                manifest.append("Not found: "+pdf_path+"\n")
+        data = "".join(manifest).encode()
+        info = tarfile.TarInfo("manifest.txt")
+        info.size = len(data)
+        info.mtime = time.time()
+        tarstream.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+def build_session_draft_pdf(doc_names):
+    """Return one pdf with the pdfs of the drafts doc_names, with a bookmark
+    for each draft, or None if Ghostscript fails"""
+    convert_drafts_to_pdf(doc_names)
+    curr_page = 1
+    pdf_paths = []
+    with NamedTemporaryFile("w", suffix=".pdfmarks") as pdfmarks, NamedTemporaryFile(suffix=".pdf") as pdf:
+        for doc_name in doc_names:
+            pdf_path = os.path.join(settings.INTERNET_DRAFT_PDF_PATH, doc_name + ".pdf")
+            if os.path.exists(pdf_path):
+                pdfmarks.write("[/Page "+str(curr_page)+" /View [/XYZ 0 792 1.0] /Title (" + doc_name + ") /OUT pdfmark\n")
+                pdf_paths.append(pdf_path)
+                curr_page = curr_page + pdf_pages(pdf_path)
+        pdfmarks.flush()
+        result = run_command(
+            [settings.GHOSTSCRIPT_COMMAND, "-dBATCH", "-dNOPAUSE", "-q", "-sDEVICE=pdfwrite", "-sOutputFile=" + pdf.name]
+            + pdf_paths + [pdfmarks.name],
+        )
+        if result.code != 0:
+            log.log("Ghostscript failed to combine the session drafts: %s" % result.err.decode(errors="replace"))
+            return None
+        return pdf.read() or None
+
+SESSION_DRAFT_BUNDLE_BUILDERS = {
+    'tgz': build_session_draft_tarfile,
+    'pdf': build_session_draft_pdf,
+}
+
+def cache_session_draft_bundle(kind, doc_names):
+    """Build the bundle of kind of the drafts doc_names and put it in the
+    draft bundle cache.  A build which fails isn't cached, but noted for
+    MEETING_DRAFT_BUNDLE_BUILD_TIMEOUT, so that it isn't retried at once."""
+    key = session_draft_bundle_key(kind, doc_names)
+    try:
+        bundle = SESSION_DRAFT_BUNDLE_BUILDERS[kind](doc_names)
+        if bundle is None:
+            cache.set(key + ":failed", True, settings.MEETING_DRAFT_BUNDLE_BUILD_TIMEOUT)
+        else:
+            caches['draftbundles'].set(key, bundle, settings.MEETING_DRAFT_BUNDLE_CACHE_TIME)
+    finally:
+        cache.delete(key + ":building")
 
 def schedule_permissions(meeting, schedule, user):
     # do this in positive logic.
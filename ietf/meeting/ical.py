@@ -0,0 +1,108 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""iCalendar feeds of meeting sessions.
+
+Calendar clients poll the agenda and upcoming feeds often, each with its
+own show/hide filter, so caching whole responses gets few hits.  Instead,
+the VEVENT of each session is rendered once per version of its meeting's
+agenda (see Meeting.updated()) and cached, and a feed is put together by
+streaming the cached events of the sessions that pass the filter.
+"""
+
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+
+import debug                            # pyflakes:ignore
+
+from ietf.meeting.agenda_snapshot import ical_session_status
+
+
+# Bump this when the VEVENT templates change, so that events rendered by
+# earlier templates are not used
+ICAL_EVENT_FORMAT = 1
+
+
+def ics_line_endings(text):
+    """Use the CRLF line endings RFC 5545 asks for"""
+    return re.sub("\r(?!\n)|(?<!\r)\n", "\r\n", text)
+
+
+def get_vevents(keyed_items, render):
+    """Get the VEVENTs of a list of (cache key, item) pairs, in order.
+
+    The events which are not in the cache are rendered with render(item),
+    and cached for the next request."""
+    events = cache.get_many([key for key, item in keyed_items])
+    rendered = {key: render(item) for key, item in keyed_items if key not in events}
+    if rendered:
+        cache.set_many(rendered, settings.AGENDA_SNAPSHOT_CACHE_TIME)
+        events.update(rendered)
+    return [events[key] for key, item in keyed_items]
+
+
+def ical_calendar(prodid, vtimezones, events, crlf=False):
+    """Generate the parts of a VCALENDAR holding events.  With crlf, the
+    events must already have CRLF line endings."""
+    header = "BEGIN:VCALENDAR\nVERSION:2.0\nMETHOD:PUBLISH\nPRODID:-//IETF//datatracker.ietf.org ical %s//EN\n%s" % (prodid, vtimezones)
+    footer = "END:VCALENDAR\n"
+    if crlf:
+        header, footer = ics_line_endings(header), ics_line_endings(footer)
+    yield header
+    yield from events
+    yield footer
+
+
+def agenda_vevent_key(version, item):
+    return "meeting:agenda-vevent:%s:%s:%s" % (ICAL_EVENT_FORMAT, version, item['pk'])
+
+
+def render_agenda_vevent(meeting, item):
+    return render_to_string("meeting/agenda_vevent.ics", {"meeting": meeting, "item": item})
+
+
+def agenda_ical_response(meeting, snapshot, items):
+    """Stream an iCalendar feed of items, a selection of the items of the
+    agenda snapshot of meeting"""
+    events = get_vevents(
+        [(agenda_vevent_key(snapshot['version'], item), item) for item in items],
+        lambda item: render_agenda_vevent(meeting, item),
+    )
+    return StreamingHttpResponse(ical_calendar('agenda', meeting.vtimezone() or '', events),
+                                 content_type="text/calendar")
+
+
+def upcoming_vevent_key(assignment):
+    meeting = assignment.schedule.meeting
+    return "meeting:upcoming-vevent:%s:%s:%s:%s" % (
+        ICAL_EVENT_FORMAT, meeting.pk, meeting.updated().isoformat(), assignment.pk)
+
+
+def render_upcoming_vevent(assignment):
+    return ics_line_endings(render_to_string("meeting/upcoming_vevent.ics", {"item": assignment}))
+
+
+def upcoming_ical_response(request, assignments, sessions, ietfs, vtimezones):
+    """Stream an iCalendar feed of the upcoming session assignments and
+    IETF meetings.  The sessions dict maps session pks to sessions with
+    their current_status already looked up."""
+    def render(assignment):
+        if assignment.session_id is not None:
+            assignment.session = sessions.get(assignment.session_id) or assignment.session
+            assignment.session.ical_status = ical_session_status(assignment)
+        return render_upcoming_vevent(assignment)
+
+    events = get_vevents([(upcoming_vevent_key(a), a) for a in assignments], render)
+    # the IETF meeting events are few and link to the requested host, so
+    # they are not cached
+    events += [
+        ics_line_endings(render_to_string("meeting/upcoming_meeting_vevent.ics", {"meeting": m}, request=request))
+        for m in ietfs
+    ]
+    response = StreamingHttpResponse(ical_calendar('upcoming', vtimezones, events, crlf=True),
+                                     content_type="text/calendar")
+    response['Content-Disposition'] = 'attachment; filename="upcoming.ics"'
+    return response
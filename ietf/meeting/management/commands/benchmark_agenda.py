@@ -0,0 +1,63 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+# This command times the processing of a meeting agenda, by default that of
+# the IETF 999 test meeting made by create_test_meeting, once its schedule has
+# been filled by generate_schedule:
+#
+#   ietf/manage.py create_test_meeting
+#   ietf/manage.py generate_schedule 999
+#   ietf/manage.py benchmark_agenda
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import debug                            # pyflakes:ignore
+
+from ietf.meeting.helpers import preprocess_assignments_for_agenda, AgendaKeywordTagger
+from ietf.meeting.models import Meeting
+
+
+class Command(BaseCommand):
+    help = "Time preprocess_assignments_for_agenda() and the keyword tagging for a meeting agenda."
+
+    def add_arguments(self, parser):
+        parser.add_argument('meeting', nargs='?', default='999',
+                            help='Number of the meeting (default %(default)s)')
+        parser.add_argument('--schedule', '-s', help='Name of the schedule (default the official one)')
+        parser.add_argument('--repeat', '-r', type=int, default=5,
+                            help='Number of times to process the agenda (default %(default)s)')
+        parser.add_argument('--tag', action='store_true', help='also run the AgendaKeywordTagger')
+
+    def handle(self, *args, **options):
+        meeting = Meeting.objects.filter(number=options['meeting']).first()
+        if meeting is None:
+            raise CommandError('Meeting %s does not exist' % options['meeting'])
+        if options['schedule']:
+            schedule = meeting.schedule_set.filter(name=options['schedule']).first()
+        else:
+            schedule = meeting.schedule
+        if schedule is None:
+            raise CommandError('Meeting %s has no such schedule' % meeting.number)
+        if not schedule.assignments.exists():
+            raise CommandError('Schedule %s has no assignments, fill it with generate_schedule first' % schedule.name)
+
+        timings = []
+        for i in range(options['repeat']):
+            # a fresh meeting instance every time, so nothing is cached between runs
+            meeting = Meeting.objects.get(pk=meeting.pk)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                assignments = preprocess_assignments_for_agenda(schedule.assignments.all(), meeting)
+                count = len(assignments)
+                if options['tag']:
+                    AgendaKeywordTagger(assignments=assignments).apply()
+                timings.append(time.perf_counter() - start)
+            if options['verbosity'] > 1:
+                self.stdout.write('Run %d: %.3fs, %d queries' % (i + 1, timings[-1], len(queries)))
+
+        self.stdout.write('Processed %d assignments of %s: best %.3fs, mean %.3fs over %d runs' % (
+            count, schedule.name, min(timings), sum(timings) / len(timings), len(timings)))
@@ -6,6 +6,7 @@ from __future__ import absolute_import, print_function, unicode_literals
 import calendar
 import datetime
 import math
+import multiprocessing
 import random
 import string
 import sys
@@ -34,6 +35,53 @@ from ietf.meeting.helpers import get_person_by_email
 
 OPTIMISER_MAX_CYCLES = 160
 
+# With --restarts, a number of independent optimiser runs with different
+# random seeds are done in a pool of --workers processes, and the best
+# schedule is kept.  The workers are forked after the meeting has been
+# loaded, so they share the loaded data rather than each querying it.
+
+
+class RestartResult(NamedTuple):
+    """Outcome of one optimiser run with --restarts"""
+    seed: int
+    cost: float
+    dynamic_cost: float
+    violation_count: int
+    runs: int
+    assignments: list  # (timeslot index, session index) tuples
+
+
+# The ScheduleHandler and stop event for the optimiser runs with --restarts.
+# These are set before the worker processes are forked.
+_restart_handler = None
+_restart_stop = None
+
+
+def _restart_worker(seed):
+    """Do one optimiser run in a worker process, starting from a fresh schedule"""
+    if _restart_stop.is_set():
+        return None  # another run has already found a zero-cost schedule
+    schedule = _restart_handler.schedule
+    schedule.verbosity = 0
+    schedule.stop_event = _restart_stop
+    schedule.schedule = dict()
+    schedule.best_cost = math.inf
+    schedule.best_schedule = None
+
+    random.seed(seed)
+    schedule.fill_initial_schedule()
+    runs = schedule.optimise_schedule()
+    violations, cost = schedule.total_schedule_cost()
+    dynamic_cost = schedule.cost_tracker.cost
+    if dynamic_cost == 0:
+        _restart_stop.set()
+    schedule.optimise_timeslot_capacity()
+
+    timeslot_index = {t: i for i, t in enumerate(schedule.ordered_timeslots)}
+    session_index = {s: i for i, s in enumerate(schedule.ordered_sessions)}
+    assignments = [(timeslot_index[t], session_index[s]) for t, s in schedule.schedule.items()]
+    return RestartResult(seed, cost, dynamic_cost, len(violations), runs, assignments)
+
 
 class ScheduleId(NamedTuple):
     """Represents a schedule id as name and owner"""
@@ -72,18 +120,28 @@ class Command(BaseCommand):
                                 'Base schedule for generated schedule, specified as "[owner/]name"'
                                 ' (default is no base schedule; owner not required if name is unique)'
                             ))
+        parser.add_argument('-k', '--restarts', type=int, default=1,
+                            help='number of independent optimiser runs, the best schedule is kept')
+        parser.add_argument('-w', '--workers', type=int, default=1,
+                            help='number of worker processes for the optimiser runs')
+        parser.add_argument('-s', '--seed', type=int, default=None,
+                            help='random seed, optimiser run i uses seed+i (default is a random seed)')
 
-    def handle(self, meeting, name, max_cycles, verbosity, base_id, *args, **kwargs):
-        ScheduleHandler(self.stdout, meeting, name, max_cycles, verbosity, base_id).run()
+    def handle(self, meeting, name, max_cycles, verbosity, base_id, restarts, workers, seed, *args, **kwargs):
+        ScheduleHandler(self.stdout, meeting, name, max_cycles, verbosity, base_id,
+                        restarts=restarts, workers=workers, seed=seed).run()
 
 
 class ScheduleHandler(object):
     def __init__(self, stdout, meeting_number, name=None, max_cycles=OPTIMISER_MAX_CYCLES,
-                 verbosity=1, base_id=None):
+                 verbosity=1, base_id=None, restarts=1, workers=1, seed=None):
         self.stdout = stdout
         self.verbosity = verbosity
         self.name = name
         self.max_cycles = max_cycles
+        self.restarts = max(restarts, 1)
+        self.workers = max(workers, 1)
+        self.seed = seed
         if meeting_number:
             try:
                 self.meeting = models.Meeting.objects.get(type="ietf", number=meeting_number)
@@ -117,6 +175,16 @@ class ScheduleHandler(object):
 
     def run(self):
         """Schedule all sessions"""
+        if self.restarts > 1:
+            violations, cost = self._run_restarts()
+        else:
+            if self.seed is not None:
+                random.seed(self.seed)
+            violations, cost = self._run_once()
+        self._save_schedule(cost)
+        return violations, cost
+
+    def _run_once(self):
         beg_time = time.time()
         self.schedule.fill_initial_schedule()
         violations, cost = self.schedule.total_schedule_cost()
@@ -141,8 +209,55 @@ class ScheduleHandler(object):
                 self.stdout.write(v)
                 
         self.schedule.optimise_timeslot_capacity()
+        return violations, cost
 
-        self._save_schedule(cost)
+    def _run_restarts(self):
+        """Do independent optimiser runs in worker processes, and keep the best schedule
+
+        Stops as soon as one of the runs finds a zero-cost schedule.
+        """
+        global _restart_handler, _restart_stop
+
+        seed = self.seed if self.seed is not None else random.randrange(2**32)
+        seeds = [seed + i for i in range(self.restarts)]
+        if self.verbosity >= 1:
+            self.stdout.write('Starting %d optimiser runs in %d worker processes, with seeds %d to %d'
+                              % (self.restarts, self.workers, seeds[0], seeds[-1]))
+
+        beg_time = time.time()
+        self.schedule.cost_matrices  # compute these once, before forking the workers
+        context = multiprocessing.get_context('fork')
+        _restart_handler = self
+        _restart_stop = context.Event()
+        best = None
+        try:
+            with context.Pool(self.workers) as pool:
+                for result in pool.imap_unordered(_restart_worker, seeds):
+                    if result is None:
+                        continue
+                    if self.verbosity >= 2:
+                        self.stdout.write('Seed %d: %d violations, cost %s, %d runs'
+                                          % (result.seed, result.violation_count, intcomma(result.cost), result.runs))
+                    if best is None or (result.cost, result.seed) < (best.cost, best.seed):
+                        best = result
+        finally:
+            _restart_handler = None
+            _restart_stop = None
+        tot_time = time.time() - beg_time
+
+        self.schedule.schedule = {
+            self.schedule.ordered_timeslots[t]: self.schedule.ordered_sessions[s]
+            for t, s in best.assignments
+        }
+        violations, cost = self.schedule.total_schedule_cost()
+        if self.verbosity >= 1:
+            vc = len(violations)
+            self.stdout.write('Best schedule from seed %d with %s violation%s, cost %s, in %dm %.2fs'
+                              % (best.seed, vc, '' if vc==1 else 's', intcomma(cost), tot_time//60, tot_time%60))
+        if self.verbosity >= 1 and violations:
+            self.stdout.write('Remaining violations:')
+            for v in violations:
+                self.stdout.write(v)
         return violations, cost
     
     def _save_schedule(self, cost):
@@ -262,6 +377,13 @@ class Schedule(object):
         self._fixed_violations = dict()  # key = type of cost
         self.max_cycles = max_cycles
         self.base_schedule = self._load_base_schedule(base_schedule) if base_schedule else None
+        self._cost_tracker = None
+        self._cost_matrices = None
+        self.stop_event = None  # optimise_schedule() stops when this is set
+        # Fixed orders of the timeslots and sessions, so that runs with the same random seed
+        # make the same choices
+        self.ordered_timeslots = sorted(self.timeslots, key=lambda t: (not t.is_scheduled, getattr(t, 'timeslot_pk', 0)))
+        self.ordered_sessions = sorted(self.sessions, key=lambda s: s.session_pk)
 
     def __str__(self):
         return 'Schedule ({} timeslots, {} sessions, {} scheduled, {} in base schedule)'.format(
@@ -310,6 +432,21 @@ class Schedule(object):
     def fixed_violations(self):
         return sum(self._fixed_violations.values(), [])
 
+    @property
+    def cost_tracker(self):
+        """The DynamicCostTracker for the current schedule"""
+        if self._cost_tracker is None or self._cost_tracker.schedule is not self.schedule:
+            self._cost_tracker = DynamicCostTracker(self.timeslots, self.schedule, self.base_schedule,
+                                                    self.cost_matrices)
+        return self._cost_tracker
+
+    @property
+    def cost_matrices(self):
+        """The CostMatrices for the sessions and timeslots, computed on first use"""
+        if self._cost_matrices is None:
+            self._cost_matrices = CostMatrices(self.ordered_sessions, self.ordered_timeslots)
+        return self._cost_matrices
+
     def add_fixed_cost(self, label, violations, cost):
         self._fixed_costs[label] = cost
         self._fixed_violations[label] = violations
@@ -317,12 +454,12 @@ class Schedule(object):
     @property
     def free_sessions(self):
         """Sessions that can be moved by the schedule"""
-        return (sess for sess in self.sessions if not sess.is_fixed)
+        return (sess for sess in self.ordered_sessions if not sess.is_fixed)
 
     @property
     def free_timeslots(self):
         """Timeslots that can be filled by the schedule"""
-        return (t for t in self.timeslots if not t.is_fixed)
+        return (t for t in self.ordered_timeslots if not t.is_fixed)
 
     def _load_base_schedule(self, db_base_schedule):
         session_lut = {s.session_pk: s for s in self.sessions}
@@ -476,10 +613,8 @@ class Schedule(object):
             random.shuffle(possible_slots)
             
             def timeslot_preference(t):
-                proposed_schedule = self.schedule.copy()
-                proposed_schedule[t] = session
                 return (
-                    self.calculate_dynamic_cost(proposed_schedule)[1],
+                    self.cost_tracker.cost_with_changes({t: session}),
                     t.duration if t.is_scheduled else datetime.timedelta(hours=1000),  # unscheduled slots sort to the end
                     t.capacity if t.is_scheduled else math.inf,  # unscheduled slots sort to the end
                 )
@@ -533,7 +668,7 @@ class Schedule(object):
             for original_timeslot, session in items:
                 if session.is_fixed:
                     continue
-                best_cost = self.calculate_dynamic_cost()[1]
+                best_cost = self.cost_tracker.cost
                 if best_cost == 0:
                     if self.verbosity >= 1 and self.stdout.isatty():
                         sys.stderr.write('\n')
@@ -565,12 +700,16 @@ class Schedule(object):
                 sys.stderr.write('*' if last_run_cost == self.best_cost else '.')
                 sys.stderr.flush()
 
+            if self.stop_event is not None and self.stop_event.is_set():
+                break
+
         if self.verbosity >= 1 and self.stdout.isatty():
             sys.stderr.write('\n')
         if self.verbosity >= 2:
             self.stdout.write('Optimiser did not find perfect schedule, using best schedule at dynamic cost {:,}'
                               .format(self.best_cost))
         self.schedule = self.best_schedule
+        self._cost_tracker = None
 
         return run_count
 
@@ -630,31 +769,28 @@ class Schedule(object):
                 
             optimised_timeslots.add(timeslot)
             optimised_timeslots.update(timeslot_overlaps)    
+        self._cost_tracker = None
 
     def _schedule_session(self, session, timeslot):
+        self.cost_tracker.apply_changes({timeslot: session})
         self.schedule[timeslot] = session
 
     def _cost_for_switch(self, timeslot1, timeslot2):
         """
         Calculate the total cost of self.schedule, if the sessions in timeslot1 and timeslot2 
         would be switched. Does not perform the switch, self.schedule remains unchanged.
+        Only the costs affected by the switch are recalculated, see DynamicCostTracker.
         """
-        proposed_schedule = self.schedule.copy()
-        session1 = proposed_schedule.get(timeslot1)
-        session2 = proposed_schedule.get(timeslot2)
-        if session1 and not session1.fits_in_timeslot(timeslot2):
+        session1 = self.schedule.get(timeslot1)
+        session2 = self.schedule.get(timeslot2)
+        fits = self.cost_matrices.fits
+        if session1 and not fits[session1.index][timeslot2.index]:
             return math.inf
-        if session2 and not session2.fits_in_timeslot(timeslot1):
+        if session2 and not fits[session2.index][timeslot1.index]:
             return math.inf
-        if session1:
-            proposed_schedule[timeslot2] = session1
-        elif session2:
-            del proposed_schedule[timeslot2]
-        if session2:
-            proposed_schedule[timeslot1] = session2
-        elif session1:
-            del proposed_schedule[timeslot1]
-        return self.calculate_dynamic_cost(proposed_schedule)[1]
+        if timeslot1 == timeslot2:
+            return self.cost_tracker.cost
+        return self.cost_tracker.cost_with_changes({timeslot1: session2, timeslot2: session1})
 
     def _switch_sessions(self, timeslot1, timeslot2) -> Optional['Session']:
         """
@@ -669,6 +805,7 @@ class Schedule(object):
             return None
         if session2 and not session2.fits_in_timeslot(timeslot1):
             return None
+        self.cost_tracker.apply_changes({timeslot1: session2, timeslot2: session1})
         if session1:
             self.schedule[timeslot2] = session1
         elif session2:
@@ -685,6 +822,160 @@ class Schedule(object):
             self.best_schedule = self.schedule.copy()
 
 
+class CostMatrices:
+    """
+    Tables of the costs that depend only on a pair of sessions, or on a
+    session and a timeslot, computed once for the sessions and timeslots of
+    a schedule. The sessions and timeslots are numbered by setting their
+    index attribute, and the tables are indexed by these numbers:
+
+      overlap_costs[i][j]   cost for session i of session j being in an overlapping timeslot
+      timeslot_costs[i][k]  cost of session i being in timeslot k
+      fits[i][k]            whether session i fits in timeslot k
+
+    This must be created after the session durations and attendees have been
+    trimmed by Schedule.adjust_for_timeslot_availability().
+    """
+    def __init__(self, sessions, timeslots):
+        for index, session in enumerate(sessions):
+            session.index = index
+        for index, timeslot in enumerate(timeslots):
+            timeslot.index = index
+        self.overlap_costs = [
+            [0 if other is session else session.overlap_cost(other) for other in sessions]
+            for session in sessions
+        ]
+        self.timeslot_costs = [[session.timeslot_cost(t) for t in timeslots] for session in sessions]
+        self.fits = [[session.fits_in_timeslot(t) for t in timeslots] for session in sessions]
+
+
+class DynamicCostTracker:
+    """
+    Keeps track of the dynamic cost of a schedule, as calculated by
+    Schedule.calculate_dynamic_cost(), one timeslot at a time.
+
+    The cost of the session in a timeslot only depends on the sessions in
+    the timeslots overlapping or adjacent to it, and on the other sessions
+    of its group. When the sessions in some timeslots change, only the costs
+    of the sessions in those timeslots, in the timeslots that overlap or are
+    adjacent to them, and of the sessions of the groups involved need to be
+    recalculated, rather than the cost of the whole schedule.
+    """
+    def __init__(self, timeslots, schedule, base_schedule, cost_matrices):
+        self.schedule = schedule  # the schedule being tracked
+        self.matrices = cost_matrices
+        self.assignments = dict(schedule)
+        if base_schedule is not None:
+            self.assignments.update(base_schedule)
+
+        # for each timeslot, the timeslots whose cost depends on its session
+        self.dependents = defaultdict(set)
+        for timeslot in timeslots:
+            for other in timeslot.overlaps | timeslot.adjacent:
+                self.dependents[other].add(timeslot)
+
+        self.group_timeslots = defaultdict(set)
+        for timeslot, session in self.assignments.items():
+            self.group_timeslots[session.group].add(timeslot)
+
+        self.timeslot_costs = {t: self._timeslot_cost(t) for t in self.assignments}
+        self.finite_cost, self.infinite_costs = self._sum(self.timeslot_costs.values())
+
+    @property
+    def cost(self):
+        """The dynamic cost of the schedule"""
+        return math.inf if self.infinite_costs else self.finite_cost
+
+    def cost_with_changes(self, changes):
+        """
+        The dynamic cost the schedule would have with the changes made, without
+        making them. changes is a dict of timeslot to the session to put in it,
+        or None to empty the timeslot.
+        """
+        affected = self._affected_timeslots(changes)
+        old_finite, old_infinite = self._sum(self.timeslot_costs[t] for t in affected if t in self.timeslot_costs)
+        undo = self._assign(changes)
+        try:
+            new_finite, new_infinite = self._sum(self._timeslot_cost(t) for t in affected if t in self.assignments)
+        finally:
+            self._assign(undo)
+        if self.infinite_costs - old_infinite + new_infinite:
+            return math.inf
+        return self.finite_cost - old_finite + new_finite
+
+    def apply_changes(self, changes):
+        """Make the changes, see cost_with_changes()"""
+        affected = self._affected_timeslots(changes)
+        old_finite, old_infinite = self._sum(self.timeslot_costs.pop(t) for t in affected if t in self.timeslot_costs)
+        self._assign(changes)
+        new_costs = {t: self._timeslot_cost(t) for t in affected if t in self.assignments}
+        self.timeslot_costs.update(new_costs)
+        new_finite, new_infinite = self._sum(new_costs.values())
+        self.finite_cost += new_finite - old_finite
+        self.infinite_costs += new_infinite - old_infinite
+
+    def _affected_timeslots(self, changes):
+        affected = set()
+        for timeslot, session in changes.items():
+            affected.add(timeslot)
+            affected.update(self.dependents[timeslot])
+            for s in (self.assignments.get(timeslot), session):
+                if s:
+                    affected.update(self.group_timeslots[s.group])
+        return affected
+
+    def _assign(self, changes):
+        """Put the sessions in the timeslots, returns the changes that undo this"""
+        undo = {}
+        for timeslot in changes:
+            old_session = self.assignments.pop(timeslot, None)
+            undo[timeslot] = old_session
+            if old_session:
+                self.group_timeslots[old_session.group].discard(timeslot)
+        for timeslot, session in changes.items():
+            if session:
+                self.assignments[timeslot] = session
+                self.group_timeslots[session.group].add(timeslot)
+        return undo
+
+    def _timeslot_cost(self, timeslot):
+        """The cost of the session in timeslot, as Session.calculate_cost() would calculate it"""
+        session = self.assignments[timeslot]
+        overlap_costs = self.matrices.overlap_costs[session.index]
+        cost = self.matrices.timeslot_costs[session.index][timeslot.index]
+        for t in timeslot.overlaps:
+            other = self.assignments.get(t)
+            if other is not None:
+                cost += overlap_costs[other.index]
+
+        my_sessions = sorted(((t, self.assignments[t]) for t in self.group_timeslots[session.group]),
+                             key=timeslot_session_order)
+        cost += session._calculate_cost_my_other_sessions(tuple(my_sessions))[1]
+
+        if session.wg_adjacent and not session.is_fixed:
+            if not any(self.assignments[t].group == session.wg_adjacent
+                       for t in timeslot.adjacent if t in self.assignments):
+                cost += session.wg_adjacent_penalty
+        return cost
+
+    @staticmethod
+    def _sum(costs):
+        """Sum costs, returns the sum of the finite costs and the number of infinite ones"""
+        finite, infinite = 0, 0
+        for cost in costs:
+            if cost == math.inf:
+                infinite += 1
+            else:
+                finite += cost
+        return finite, infinite
+
+
+def timeslot_session_order(item):
+    """Sort key for (timeslot, session) tuples, in time order with unscheduled timeslots last"""
+    timeslot, session = item
+    return (not timeslot.is_scheduled, timeslot.start, session.session_pk)
+
+
 class GeneratorTimeSlot:
     """Representation of a timeslot for the schedule generator"""
     def __init__(self, *, verbosity=0, is_fixed=False):
@@ -884,6 +1175,15 @@ class Session(object):
 
         The return value is a tuple of violations (list of strings) and a cost (integer).        
         """
+        violations, cost = self.cost_in_schedule(schedule, my_timeslot, overlapping_sessions, my_sessions, include_fixed)
+        self.last_cost = cost
+        return violations, cost
+
+    def cost_in_schedule(self, schedule, my_timeslot, overlapping_sessions, my_sessions, include_fixed=False):
+        """
+        Calculate the cost of this session like calculate_cost(), without
+        recording it as the last cost of the session.
+        """
         violations, cost = [], 0
         # Ignore overlap between two fixed sessions when calculating dynamic cost
         overlapping_sessions = tuple(
@@ -892,19 +1192,10 @@ class Session(object):
         )
 
         if include_fixed or (not self.is_fixed):
-            if not my_timeslot.has_space_for(self.attendees):
-                violations.append('{}: scheduled in too small room'.format(self.group))
-                cost += self.business_constraint_costs['session_requires_trim']
-
-            if not my_timeslot.has_time_for(self.requested_duration):
-                violations.append('{}: scheduled in too short timeslot'.format(self.group))
-                cost += self.business_constraint_costs['session_requires_trim']
-
-            if my_timeslot.time_group in self.timeranges_unavailable:
-                violations.append('{}: scheduled in unavailable timerange {}'
-                                  .format(self.group, my_timeslot.time_group))
-                cost += self.timeranges_unavailable_penalty
-            
+            v, c = self._calculate_cost_timeslot(my_timeslot)
+            violations += v
+            cost += c
+
         v, c = self._calculate_cost_overlapping_groups(overlapping_sessions)
         violations += v
         cost += c
@@ -913,7 +1204,9 @@ class Session(object):
         violations += v
         cost += c
 
-        v, c = self._calculate_cost_my_other_sessions(tuple(my_sessions))
+        # Order the sessions of the group in time, so the result doesn't depend on
+        # the order in which my_sessions was put together
+        v, c = self._calculate_cost_my_other_sessions(tuple(sorted(my_sessions, key=timeslot_session_order)))
         violations += v
         cost += c
 
@@ -924,7 +1217,37 @@ class Session(object):
                                   .format(self.group, self.wg_adjacent, ', '.join(adjacent_groups)))
                 cost += self.wg_adjacent_penalty
 
-        self.last_cost = cost
+        return violations, cost
+
+    def overlap_cost(self, other):
+        """Dynamic cost of this session due to other being in an overlapping timeslot"""
+        if self.is_fixed and other.is_fixed:
+            return 0
+        return sum([
+            self._calculate_cost_overlapping_groups((other, ))[1],
+            self._calculate_cost_business_logic((other, ))[1],
+        ])
+
+    def timeslot_cost(self, timeslot):
+        """Dynamic cost of this session due to being in timeslot"""
+        if self.is_fixed:
+            return 0
+        return self._calculate_cost_timeslot(timeslot)[1]
+
+    def _calculate_cost_timeslot(self, my_timeslot):
+        violations, cost = [], 0
+        if not my_timeslot.has_space_for(self.attendees):
+            violations.append('{}: scheduled in too small room'.format(self.group))
+            cost += self.business_constraint_costs['session_requires_trim']
+
+        if not my_timeslot.has_time_for(self.requested_duration):
+            violations.append('{}: scheduled in too short timeslot'.format(self.group))
+            cost += self.business_constraint_costs['session_requires_trim']
+
+        if my_timeslot.time_group in self.timeranges_unavailable:
+            violations.append('{}: scheduled in unavailable timerange {}'
+                              .format(self.group, my_timeslot.time_group))
+            cost += self.timeranges_unavailable_penalty
         return violations, cost
 
     @lru_cache(maxsize=10000)
@@ -997,7 +1320,7 @@ class Session(object):
     def _calculate_cost_my_other_sessions(self, my_sessions):
         """Calculate cost due to other sessions for same group
 
-        my_sessions is a set of (GeneratorTimeSlot, Session) tuples.
+        my_sessions is a tuple of (GeneratorTimeSlot, Session) tuples, in time order.
         """
         def sort_sessions(timeslot_session_pairs):
             return sorted(timeslot_session_pairs, key=lambda item: item[1].session_pk)
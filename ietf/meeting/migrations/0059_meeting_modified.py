@@ -0,0 +1,45 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.utils.timezone
+
+
+def forward(apps, schema_editor):
+    """Set modified to what Meeting.updated() used to compute"""
+    Meeting = apps.get_model('meeting', 'Meeting')
+    Schedule = apps.get_model('meeting', 'Schedule')
+    SchedTimeSessAssignment = apps.get_model('meeting', 'SchedTimeSessAssignment')
+    for meeting in Meeting.objects.all():
+        times = [
+            meeting.timeslot_set.aggregate(Max('modified'))['modified__max'],
+            meeting.session_set.aggregate(Max('modified'))['modified__max'],
+        ]
+        if meeting.schedule_id:
+            schedule = Schedule.objects.get(pk=meeting.schedule_id)
+            times.append(SchedTimeSessAssignment.objects.filter(
+                schedule__in=[schedule.pk, schedule.base_id]).aggregate(Max('modified'))['modified__max'])
+        times = [t for t in times if t is not None]
+        if times:
+            Meeting.objects.filter(pk=meeting.pk).update(modified=max(times))
+
+
+def reverse(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('meeting', '0058_meeting_time_zone_not_blank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meeting',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When the meeting or its agenda was last changed'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(forward, reverse),
+    ]
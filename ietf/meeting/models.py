@@ -20,7 +20,7 @@ import debug                            # pyflakes:ignore
 
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
-from django.db.models import Max, Subquery, OuterRef, TextField, Value, Q
+from django.db.models import Subquery, OuterRef, TextField, Value, Q
 from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.urls import reverse as urlreverse
@@ -116,6 +116,8 @@ class Meeting(models.Model):
     group_conflict_types = models.ManyToManyField(
         ConstraintName, blank=True, limit_choices_to=dict(is_group_conflict=True),
         help_text='Types of scheduling conflict between groups to consider')
+    # Kept up to date by the signal handlers at the end of this file
+    modified = models.DateTimeField(auto_now=True, help_text="When the meeting or its agenda was last changed")
 
     def __str__(self):
         if self.type_id == "ietf":
@@ -393,14 +395,8 @@ class Meeting(models.Model):
             self.save()
 
     def updated(self):
-        # should be Meeting.modified, but we don't have that
-        min_time = pytz.utc.localize(datetime.datetime(1970, 1, 1, 0, 0, 0))
-        timeslots_updated = self.timeslot_set.aggregate(Max('modified'))["modified__max"] or min_time
-        sessions_updated = self.session_set.aggregate(Max('modified'))["modified__max"] or min_time
-        assignments_updated = min_time
-        if self.schedule:
-            assignments_updated = SchedTimeSessAssignment.objects.filter(schedule__in=[self.schedule, self.schedule.base if self.schedule else None]).aggregate(Max('modified'))["modified__max"] or min_time
-        return max(timeslots_updated, sessions_updated, assignments_updated)
+        """When the meeting or its agenda was last changed"""
+        return self.modified
 
     @memoize
     def previous_meeting(self):
@@ -1460,3 +1456,39 @@ class Attended(models.Model):
 
     def __str__(self):
         return f'{self.person} at {self.session}'
+
+
+MEETING_MATERIAL_TYPES = ("agenda", "minutes", "bluesheets", "slides", "recording", "procmaterials", "chatlog", "polls")
+
+def touch_meetings(meetings):
+    """Record that the agendas of meetings (a queryset of meeting pks) changed"""
+    Meeting.objects.filter(pk__in=meetings).update(modified=timezone.now())
+
+def update_meeting_modified(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if sender in (TimeSlot, Session):
+        touch_meetings([instance.meeting_id])
+    elif sender is SchedTimeSessAssignment:
+        # only the official schedule and its base make up the agenda, so
+        # changes to private schedules leave the meeting alone
+        touch_meetings(Meeting.objects.filter(Q(schedule=instance.schedule_id) | Q(schedule__base=instance.schedule_id)).values('pk'))
+    elif sender in (SchedulingEvent, SessionPresentation):
+        touch_meetings(Session.objects.filter(pk=instance.session_id).values('meeting'))
+    elif sender is Document:
+        if instance.type_id in MEETING_MATERIAL_TYPES:
+            touch_meetings(Session.objects.filter(sessionpresentation__document=instance).values('meeting'))
+
+def update_meeting_modified_for_materials(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        touch_meetings(Session.objects.filter(sessionpresentation__document=instance).values('meeting'))
+    else:
+        touch_meetings([instance.meeting_id])
+
+for sender in (TimeSlot, Session, SchedTimeSessAssignment, SchedulingEvent, SessionPresentation):
+    models.signals.post_save.connect(update_meeting_modified, sender=sender)
+    models.signals.post_delete.connect(update_meeting_modified, sender=sender)
+models.signals.post_save.connect(update_meeting_modified, sender=Document)
+models.signals.m2m_changed.connect(update_meeting_modified_for_materials, sender=Session.materials.through)
@@ -0,0 +1,12 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+#
+# Celery task definitions
+#
+from celery import shared_task
+
+from ietf.meeting.helpers import cache_session_draft_bundle
+
+
+@shared_task
+def build_session_draft_bundle_task(kind, doc_names):
+    cache_session_draft_bundle(kind, doc_names)
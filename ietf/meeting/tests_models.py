@@ -5,8 +5,13 @@ import datetime
 
 from mock import patch
 
+from django.utils import timezone
+
+from ietf.doc.factories import DocumentFactory
 from ietf.group.factories import GroupFactory, GroupHistoryFactory
-from ietf.meeting.factories import MeetingFactory, SessionFactory, AttendedFactory
+from ietf.meeting.factories import MeetingFactory, SessionFactory, AttendedFactory, TimeSlotFactory, ScheduleFactory
+from ietf.meeting.models import Meeting, SchedulingEvent
+from ietf.person.factories import PersonFactory
 from ietf.stats.factories import MeetingRegistrationFactory
 from ietf.utils.test_utils import TestCase
 from ietf.utils.timezone import date_today, datetime_today
@@ -114,6 +119,43 @@ class MeetingTests(TestCase):
         self.assertEqual(m.group_at_the_time(uncached_group_hist.group), uncached_group_hist)
         self.assertIn(uncached_group_hist.group.pk, m.cached_groups_at_the_time)
 
+    def test_updated(self):
+        meeting = MeetingFactory(type_id='ietf')
+        long_ago = timezone.now() - datetime.timedelta(days=100)
+
+        def assert_touched(change):
+            Meeting.objects.filter(pk=meeting.pk).update(modified=long_ago)
+            change()
+            meeting.refresh_from_db()
+            self.assertGreater(meeting.updated(), long_ago)
+
+        session = SessionFactory(meeting=meeting, add_to_schedule=False)
+        timeslot = TimeSlotFactory(meeting=meeting)
+        doc = DocumentFactory(type_id='slides')
+        assert_touched(lambda: meeting.save())
+        assert_touched(lambda: session.save())
+        assert_touched(lambda: timeslot.save())
+        assert_touched(lambda: session.timeslotassignments.create(schedule=meeting.schedule, timeslot=timeslot))
+        base = ScheduleFactory(meeting=meeting)
+        meeting.schedule.base = base
+        meeting.schedule.save()
+        assert_touched(lambda: base.assignments.create(session=session, timeslot=timeslot))
+        assert_touched(lambda: SchedulingEvent.objects.create(session=session, status_id='canceled', by=PersonFactory()))
+        assert_touched(lambda: session.sessionpresentation_set.create(document=doc, rev='00'))
+        assert_touched(lambda: doc.save())
+        assert_touched(lambda: session.sessionpresentation_set.all().delete())
+        assert_touched(lambda: timeslot.delete())
+
+        # unrelated changes leave the meeting alone
+        private = ScheduleFactory(meeting=meeting)
+        timeslot = TimeSlotFactory(meeting=meeting)
+        Meeting.objects.filter(pk=meeting.pk).update(modified=long_ago)
+        SessionFactory(add_to_schedule=False)
+        DocumentFactory(type_id='slides').save()
+        private.assignments.create(session=session, timeslot=timeslot).delete()
+        meeting.refresh_from_db()
+        self.assertEqual(meeting.updated(), long_ago)
+
 
 class SessionTests(TestCase):
     def test_chat_archive_url_with_jabber(self):
@@ -1,7 +1,9 @@
 # Copyright The IETF Trust 2020, All Rights Reserved
 import calendar
 import datetime
+import math
 import pytz
+import random
 from io import StringIO
 from warnings import filterwarnings
 
@@ -86,6 +88,31 @@ class ScheduleGeneratorTest(TestCase):
         schedule = self.meeting.schedule_set.get(name__startswith='Auto-')
         self.assertEqual(schedule.assignments.count(), 13)
 
+    def test_restarts(self):
+        self._create_basic_sessions()
+        generator = generate_schedule.ScheduleHandler(self.stdout, self.meeting.number, verbosity=2,
+                                                      restarts=3, workers=2, seed=1)
+        violations, cost = generator.run()
+        self.assertEqual(violations, self.fixed_violations)
+        self.assertEqual(cost, self.fixed_cost)
+
+        self.stdout.seek(0)
+        output = self.stdout.read()
+        self.assertIn('Starting 3 optimiser runs in 2 worker processes, with seeds 1 to 3', output)
+        self.assertIn('Best schedule from seed', output)
+        schedule = self.meeting.schedule_set.get(name=generator.name)
+        self.assertEqual(schedule.assignments.count(), 13)
+
+    def test_seed(self):
+        self._create_basic_sessions()
+        assignments = []
+        for _ in range(2):
+            generator = generate_schedule.ScheduleHandler(self.stdout, self.meeting.number, verbosity=0, seed=42)
+            generator.run()
+            schedule = self.meeting.schedule_set.get(name=generator.name)
+            assignments.append(set(schedule.assignments.values_list('session_id', 'timeslot_id')))
+        self.assertEqual(assignments[0], assignments[1])
+
     def test_unresolvable_schedule(self):
         self._create_basic_sessions()
         for group in self.all_groups:
@@ -263,6 +290,30 @@ class ScheduleGeneratorTest(TestCase):
         )
 
 
+    def test_cost_tracker(self):
+        """The incrementally tracked dynamic cost should match the full calculation"""
+        self._create_basic_sessions()
+        base_schedule = self._create_base_schedule()
+        handler = generate_schedule.ScheduleHandler(
+            self.stdout,
+            self.meeting.number,
+            verbosity=0,
+            base_id=generate_schedule.ScheduleId.from_schedule(base_schedule),
+        )
+        schedule = handler.schedule
+        schedule.fill_initial_schedule()
+        self.assertEqual(schedule.cost_tracker.cost, schedule.calculate_dynamic_cost()[1])
+
+        random.seed(1)
+        free_timeslots = list(schedule.free_timeslots)
+        for _ in range(50):
+            timeslot1, timeslot2 = random.sample(free_timeslots, 2)
+            cost = schedule._cost_for_switch(timeslot1, timeslot2)
+            if schedule._switch_sessions(timeslot1, timeslot2) is None and cost == math.inf:
+                continue  # sessions did not fit
+            self.assertEqual(cost, schedule.calculate_dynamic_cost()[1])
+            self.assertEqual(schedule.cost_tracker.cost, cost)
+
     def _create_basic_sessions(self):
         for group in self.all_groups:
             SessionFactory(meeting=self.meeting, group=group, add_to_schedule=False, attendees=5,
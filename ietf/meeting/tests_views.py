@@ -7,6 +7,7 @@ import os
 import random
 import re
 import shutil
+import tarfile
 import pytz
 import requests.exceptions
 import requests_mock
@@ -20,12 +21,15 @@ from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urlsplit
 from PIL import Image
 from pathlib import Path
-from tempfile import NamedTemporaryFile
+from tempfile import NamedTemporaryFile, mkdtemp
 from zoneinfo import ZoneInfo
 
 from django.urls import reverse as urlreverse
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache.backends.locmem import LocMemCache
 from django.test import Client, override_settings
 from django.db.models import F, Max
 from django.http import QueryDict, FileResponse
@@ -42,16 +46,19 @@ from ietf.person.models import Person
 from ietf.meeting.helpers import can_approve_interim_request, can_view_interim_request, preprocess_assignments_for_agenda
 from ietf.meeting.helpers import send_interim_approval_request, AgendaKeywordTagger
 from ietf.meeting.helpers import send_interim_meeting_cancellation_notice, send_interim_session_cancellation_notice
+from ietf.meeting.helpers import cache_session_draft_bundle, session_draft_bundle_key
 from ietf.meeting.helpers import send_interim_minutes_reminder, populate_important_dates, update_important_dates
 from ietf.meeting.models import Session, TimeSlot, Meeting, SchedTimeSessAssignment, Schedule, SessionPresentation, SlideSubmission, SchedulingEvent, Room, Constraint, ConstraintName
 from ietf.meeting.test_data import make_meeting_test_data, make_interim_meeting, make_interim_test_data
 from ietf.meeting.utils import finalize, condition_slide_order
 from ietf.meeting.utils import add_event_info_to_session_qs
-from ietf.meeting.views import session_draft_list, parse_agenda_filter_params, sessions_post_save, agenda_extract_schedule
+from ietf.meeting.views import session_draft_list, parse_agenda_filter_params, sessions_post_save
+from ietf.meeting.ical import render_agenda_vevent, render_upcoming_vevent
+from ietf.meeting.agenda_snapshot import agenda_extract_schedule, agenda_snapshot_version, build_agenda_snapshot, get_agenda_snapshot, get_assignments_for_agenda
 from ietf.name.models import SessionStatusName, ImportantDateName, RoleName, ProceedingsMaterialTypeName
 from ietf.utils.decorators import skip_coverage
 from ietf.utils.mail import outbox, empty_outbox, get_payload_text
-from ietf.utils.test_utils import TestCase, login_testing_unauthorized, unicontent
+from ietf.utils.test_utils import TestCase, login_testing_unauthorized, unicontent, assert_query_budget
 from ietf.utils.timezone import date_today, time_now
 
 from ietf.person.factories import PersonFactory
@@ -62,7 +69,9 @@ from ietf.meeting.factories import ( SessionFactory, ScheduleFactory,
     ConstraintFactory, MeetingHostFactory, ProceedingsMaterialFactory )
 from ietf.doc.factories import DocumentFactory, WgDraftFactory
 from ietf.submit.tests import submission_file
-from ietf.utils.test_utils import assert_ical_response_is_valid
+from ietf.utils.cache import ShardedFileCache
+from ietf.utils.pipe import CommandResult
+from ietf.utils.test_utils import assert_ical_response_is_valid, buffered_response
 
 if os.path.exists(settings.GHOSTSCRIPT_COMMAND):
     skip_pdf_tests = False
@@ -173,6 +182,138 @@ class AgendaApiTests(TestCase):
         self.assertEqual(shown['location'], {'name': room.floorplan.name, 'short': room.floorplan.short})
 
 
+    def test_preprocess_assignments_for_agenda(self):
+        meeting = MeetingFactory(type_id='ietf')
+        group = GroupFactory()
+        other_group = GroupFactory()
+        sessions = SessionFactory.create_batch(3, meeting=meeting, group=group, add_to_schedule=False)
+        other_session = SessionFactory(meeting=meeting, group=other_group, add_to_schedule=False)
+        new_session = SessionFactory(meeting=meeting, group=other_group, type_id='plenary', add_to_schedule=False)
+        tombstone = SessionFactory(meeting=meeting, group=other_group, type_id='plenary', add_to_schedule=False, status_id='resched', tombstone_for=new_session)
+        slides = DocumentFactory(type_id='slides')
+        for session in sessions:
+            SessionPresentationFactory(session=session, document=slides)
+        timeslots = []
+        for i, session in enumerate(sessions + [tombstone, other_session, new_session]):
+            ts = TimeSlotFactory(meeting=meeting, time=meeting.tz().localize(datetime.datetime.combine(meeting.date, datetime.time(9 + i, 0))))
+            timeslots.append(ts)
+            meeting.schedule.assignments.create(timeslot=ts, session=session)
+
+        processed = preprocess_assignments_for_agenda(
+            meeting.schedule.assignments.order_by('timeslot__time'),
+            meeting
+        )
+        by_session = {a.session.pk: a for a in processed}
+        self.assertEqual([by_session[s.pk].session.order_number for s in sessions], [1, 2, 3])
+        self.assertEqual(by_session[other_session.pk].session.order_number, 1)
+        # the plenary sessions of the other group are numbered separately
+        self.assertEqual(by_session[tombstone.pk].session.order_number, 1)
+        self.assertEqual(by_session[new_session.pk].session.order_number, 2)
+        # the tombstone comes before the session it was rescheduled to
+        self.assertEqual(by_session[tombstone.pk].session.rescheduled_to, timeslots[5])
+        for session in sessions:
+            a = by_session[session.pk]
+            self.assertEqual(a.start_timestamp, int(a.timeslot.utc_start_time().timestamp()))
+            material = a.session.prefetched_active_materials[0]
+            self.assertEqual(material._cached_href, slides.get_href(meeting=meeting))
+            # no further queries are needed for the hrefs
+            with self.assertNumQueries(0):
+                material.get_href(meeting=meeting)
+                material.get_versionless_href(meeting=meeting)
+
+
+    def test_benchmark_agenda_command(self):
+        meeting = make_meeting_test_data()
+        out = StringIO()
+        call_command('benchmark_agenda', meeting.number, repeat=2, tag=True, stdout=out)
+        self.assertIn('over 2 runs', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('benchmark_agenda', meeting.number, schedule='no-such-schedule', stdout=out)
+
+
+    def test_agenda_snapshot(self):
+        meeting = make_meeting_test_data()
+        with patch('ietf.meeting.agenda_snapshot.cache', LocMemCache('agenda-snapshot-test', {})), \
+             patch('ietf.meeting.agenda_snapshot.build_agenda_snapshot', wraps=build_agenda_snapshot) as build:
+            snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+            self.assertEqual(
+                sorted(item['session']['pk'] for item in snapshot['items']),
+                sorted(get_assignments_for_agenda(meeting.schedule).values_list('session_id', flat=True)),
+            )
+            mars = [item for item in snapshot['items'] if item['session']['group_at_the_time'] and item['session']['group_at_the_time']['acronym'] == 'mars'][0]
+            self.assertEqual(mars['api']['groupAcronym'], 'mars')
+            self.assertIn('mars', mars['filter_keywords'])
+            # the snapshot is cached until the agenda changes
+            self.assertEqual(get_agenda_snapshot(meeting, meeting.schedule), snapshot)
+            self.assertEqual(build.call_count, 1)
+            version = agenda_snapshot_version(meeting, meeting.schedule)
+            TimeSlot.objects.get(pk=mars['timeslot']['pk']).save()
+            meeting.refresh_from_db()
+            self.assertNotEqual(agenda_snapshot_version(meeting, meeting.schedule), version)
+            get_agenda_snapshot(meeting, meeting.schedule)
+            self.assertEqual(build.call_count, 2)
+
+    def test_agenda_etags(self):
+        meeting = make_meeting_test_data()
+        urls = [
+            urlreverse('ietf.meeting.views.agenda_plain', kwargs=dict(num=meeting.number, ext='.txt')),
+            urlreverse('ietf.meeting.views.agenda_plain', kwargs=dict(num=meeting.number, ext='.csv')),
+            urlreverse('ietf.meeting.views.agenda_ical', kwargs=dict(num=meeting.number)),
+            urlreverse('ietf.meeting.views.agenda_json', kwargs=dict(num=meeting.number)),
+            urlreverse('ietf.meeting.views.api_get_agenda_data', kwargs=dict(num=meeting.number)),
+        ]
+        etags = {}
+        for url in urls:
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.has_header('ETag'))
+            etags[url] = r['ETag']
+            r = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(r.status_code, 304)
+        self.assertEqual(len(set(etags.values())), len(urls))
+
+        # changing the agenda changes the etags
+        session = Session.objects.filter(meeting=meeting, group__acronym="mars").first()
+        session.agenda_note = 'Changed'
+        session.save()
+        for url in urls:
+            r = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(r.status_code, 200)
+            self.assertNotEqual(r['ETag'], etags[url])
+
+    def test_agenda_query_budget(self):
+        # the agenda page itself is static, the agenda is fetched from the api
+        meeting = make_meeting_test_data()
+        url = urlreverse('ietf.meeting.views.api_get_agenda_data', kwargs=dict(num=meeting.number))
+        with assert_query_budget(self, 105, max_repeats=15):
+            r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+
+    def test_agenda_ical_events_cached(self):
+        meeting = make_meeting_test_data()
+        url = urlreverse('ietf.meeting.views.agenda_ical', kwargs=dict(num=meeting.number))
+        with patch('ietf.meeting.ical.cache', LocMemCache('ical-test', {})), \
+             patch('ietf.meeting.ical.render_agenda_vevent', wraps=render_agenda_vevent) as render:
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.streaming)
+            event_count = b''.join(r.streaming_content).count(b'BEGIN:VEVENT')
+            self.assertEqual(render.call_count, event_count)
+            # filtered feeds are put together from the cached events
+            r = self.client.get(url + '?show=mars')
+            assert_ical_response_is_valid(self, r,
+                                          expected_event_summaries=['mars - Martian Special Interest Group'],
+                                          expected_event_count=1)
+            self.assertEqual(render.call_count, event_count)
+            # until the agenda changes
+            session = Session.objects.filter(meeting=meeting, group__acronym="mars").first()
+            session.agenda_note = 'Changed'
+            session.save()
+            r = buffered_response(self.client.get(url + '?show=mars'))
+            self.assertContains(r, 'SUMMARY:mars - Martian Special Interest Group (Changed)')
+            self.assertEqual(render.call_count, event_count + 1)
+
+
 class MeetingTests(BaseMeetingTestCase):
     def test_meeting_agenda(self):
         meeting = make_meeting_test_data()
@@ -275,8 +416,8 @@ class MeetingTests(BaseMeetingTestCase):
         self.assertNotContains(r, session.materials.filter(type='slides',states__type__slug='slides',states__slug='deleted').first().uploaded_filename)
 
         # iCal
-        r = self.client.get(urlreverse("ietf.meeting.views.agenda_ical", kwargs=dict(num=meeting.number))
-                            + "?show=" + session.group.parent.acronym.upper())
+        r = buffered_response(self.client.get(urlreverse("ietf.meeting.views.agenda_ical", kwargs=dict(num=meeting.number))
+                                              + "?show=" + session.group.parent.acronym.upper()))
         assert_ical_response_is_valid(self, r)
         self.assertContains(r, session.group.acronym)
         self.assertContains(r, session.group.name)
@@ -614,7 +755,7 @@ class MeetingTests(BaseMeetingTestCase):
         SchedTimeSessAssignment.objects.create(timeslot=t2, session=s2, schedule=meeting.schedule)
         #
         url = urlreverse('ietf.meeting.views.agenda_ical', kwargs={'num':meeting.number, 'acronym':s1.group.acronym, })
-        r = self.client.get(url)
+        r = buffered_response(self.client.get(url))
         assert_ical_response_is_valid(self,
                                       r,
                                       expected_event_summaries=['mars - Martian Special Interest Group'],
@@ -623,7 +764,7 @@ class MeetingTests(BaseMeetingTestCase):
         self.assertContains(r, t2.local_start_time().strftime('%Y%m%dT%H%M%S'))
         #
         url = urlreverse('ietf.meeting.views.agenda_ical', kwargs={'num':meeting.number, 'session_id':s1.id, })
-        r = self.client.get(url)
+        r = buffered_response(self.client.get(url))
         assert_ical_response_is_valid(self, r,
                                       expected_event_summaries=['mars - Martian Special Interest Group'],
                                       expected_event_count=1)
@@ -719,6 +860,68 @@ class MeetingTests(BaseMeetingTestCase):
         for filename in filenames:
             os.unlink(filename)
 
+    def test_session_draft_bundle_cached(self):
+        session, filenames = self.build_session_setup()
+        drafts = session_draft_list(session.meeting.number, session.group.acronym)
+        url = urlreverse('ietf.meeting.views.session_draft_tarfile', kwargs={'num':session.meeting.number,'acronym':session.group.acronym})
+        bundle_dir = mkdtemp()
+        bundles = {'draftbundles': ShardedFileCache(bundle_dir, {})}
+        cache = LocMemCache('draft-bundle-test', {})
+        try:
+            with patch('ietf.meeting.views.caches', bundles), patch('ietf.meeting.helpers.caches', bundles), \
+                 patch('ietf.meeting.views.cache', cache), patch('ietf.meeting.helpers.cache', cache), \
+                 patch('ietf.meeting.views.build_session_draft_bundle_task') as task:
+                # the bundle is built in the background
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 202)
+                self.assertTrue(r.has_header('Retry-After'))
+                self.assertEqual(task.delay.call_args.args, ('tgz', drafts))
+                # and only once
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 202)
+                self.assertEqual(task.delay.call_count, 1)
+
+                cache_session_draft_bundle('tgz', drafts)
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                self.assertTrue(r.streaming)
+                self.assertEqual(r.get('Content-Type'), 'application/octet-stream')
+                self.assertIn('%s-drafts.tgz' % session.group.acronym, r['Content-Disposition'])
+                content = b''.join(r.streaming_content)
+                self.assertEqual(int(r['Content-Length']), len(content))
+                with tarfile.open(fileobj=BytesIO(content)) as tar:
+                    self.assertIn('manifest.txt', tar.getnames())
+                self.assertEqual(task.delay.call_count, 1)
+        finally:
+            shutil.rmtree(bundle_dir)
+        for filename in filenames:
+            os.unlink(filename)
+
+    def test_session_draft_bundle_failed(self):
+        session, filenames = self.build_session_setup()
+        drafts = session_draft_list(session.meeting.number, session.group.acronym)
+        url = urlreverse('ietf.meeting.views.session_draft_pdf', kwargs={'num':session.meeting.number,'acronym':session.group.acronym})
+        bundle_dir = mkdtemp()
+        bundles = {'draftbundles': ShardedFileCache(bundle_dir, {})}
+        cache = LocMemCache('draft-bundle-test', {})
+        failed = CommandResult(1, b'', b'failed', 0.1, False)
+        try:
+            with patch('ietf.meeting.views.caches', bundles), patch('ietf.meeting.helpers.caches', bundles), \
+                 patch('ietf.meeting.views.cache', cache), patch('ietf.meeting.helpers.cache', cache), \
+                 patch('ietf.meeting.helpers.run_command', return_value=failed), \
+                 patch('ietf.meeting.views.build_session_draft_bundle_task') as task:
+                # a failed build isn't cached, and isn't retried at once
+                cache_session_draft_bundle('pdf', drafts)
+                self.assertFalse(bundles['draftbundles'].has_key(session_draft_bundle_key('pdf', drafts)))
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 503)
+                self.assertTrue(r.has_header('Retry-After'))
+                self.assertFalse(task.delay.called)
+        finally:
+            shutil.rmtree(bundle_dir)
+        for filename in filenames:
+            os.unlink(filename)
+
     @skipIf(skip_pdf_tests, skip_message)
     @skip_coverage
     def test_session_draft_pdf(self):
@@ -787,7 +990,7 @@ class MeetingTests(BaseMeetingTestCase):
     def test_cancelled_ics(self):
         session=SessionFactory(meeting__type_id='ietf',status_id='canceled')
         url = urlreverse('ietf.meeting.views.agenda_ical', kwargs=dict(num=session.meeting.number))
-        r = self.client.get(url)
+        r = buffered_response(self.client.get(url))
         self.assertEqual(r.status_code,200)
         self.assertIn('STATUS:CANCELLED',unicontent(r))
         self.assertNotIn('STATUS:CONFIRMED',unicontent(r))
@@ -4525,6 +4728,21 @@ class InterimTests(TestCase):
                                       ],
                                       expected_event_count=2)
 
+    def test_upcoming_ical_events_cached(self):
+        make_meeting_test_data(create_interims=True)
+        url = urlreverse("ietf.meeting.views.upcoming_ical")
+        with patch('ietf.meeting.ical.cache', LocMemCache('ical-test', {})), \
+             patch('ietf.meeting.ical.render_upcoming_vevent', wraps=render_upcoming_vevent) as render:
+            r = self.client.get(url)
+            self.assertTrue(r.streaming)
+            assert_ical_response_is_valid(self, r, expected_event_count=3)
+            self.assertEqual(render.call_count, 2)
+            r = self.client.get(url + '?show=mars')
+            assert_ical_response_is_valid(self, r,
+                                          expected_event_summaries=['mars - Martian Special Interest Group'],
+                                          expected_event_count=1)
+            self.assertEqual(render.call_count, 2)
+
 
     def test_upcoming_json(self):
         make_meeting_test_data(create_interims=True)
@@ -5563,7 +5781,7 @@ class InterimTests(TestCase):
         SchedTimeSessAssignment.objects.create(timeslot=t2, session=s2, schedule=meeting.schedule)
         #
         url = urlreverse('ietf.meeting.views.agenda_ical', kwargs={'num':meeting.number, 'acronym':s1.group.acronym, })
-        r = self.client.get(url)
+        r = buffered_response(self.client.get(url))
         self.assertEqual(r.get('Content-Type'), "text/calendar")
         self.assertContains(r, 'BEGIN:VEVENT')
         self.assertEqual(r.content.count(b'UID'), 2)
@@ -5573,7 +5791,7 @@ class InterimTests(TestCase):
         self.assertContains(r, 'END:VEVENT')
         #
         url = urlreverse('ietf.meeting.views.agenda_ical', kwargs={'num':meeting.number, 'session_id':s1.id, })
-        r = self.client.get(url)
+        r = buffered_response(self.client.get(url))
         self.assertEqual(r.get('Content-Type'), "text/calendar")
         self.assertContains(r, 'BEGIN:VEVENT')
         self.assertEqual(r.content.count(b'UID'), 1)
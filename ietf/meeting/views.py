@@ -12,23 +12,22 @@ import math
 import os
 import pytz
 import re
-import tarfile
 import tempfile
 
 from calendar import timegm
 from collections import OrderedDict, Counter, deque, defaultdict, namedtuple
 from urllib.parse import unquote
-from tempfile import mkstemp
 from wsgiref.handlers import format_date_time
 
 from django import forms
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import (HttpResponse, HttpResponseRedirect, HttpResponseForbidden,
                          HttpResponseNotFound, Http404, HttpResponseBadRequest,
-                         JsonResponse, HttpResponseGone)
+                         JsonResponse, HttpResponseGone, FileResponse)
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache, caches
 from django.core.exceptions import ValidationError
 from django.core.validators import URLValidator
 from django.urls import reverse,reverse_lazy
@@ -41,6 +40,7 @@ from django.utils.encoding import force_str
 from django.utils.functional import curry
 from django.utils.text import slugify
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from django.views.generic import RedirectView
 
@@ -53,7 +53,7 @@ from ietf.group.utils import can_manage_session_materials, can_manage_some_group
 from ietf.person.models import Person, User
 from ietf.ietfauth.utils import role_required, has_role, user_is_person
 from ietf.mailtrigger.utils import gather_address_lists
-from ietf.meeting.models import Meeting, Session, Schedule, FloorPlan, SessionPresentation, TimeSlot, SlideSubmission
+from ietf.meeting.models import Meeting, Session, Schedule, SessionPresentation, TimeSlot, SlideSubmission
 from ietf.meeting.models import SessionStatusName, SchedulingEvent, SchedTimeSessAssignment, Room, TimeSlotTypeName
 from ietf.meeting.forms import ( CustomDurationField, SwapDaysForm, SwapTimeslotsForm, ImportMinutesForm,
                                  TimeSlotCreateForm, TimeSlotEditForm, SessionCancelForm, SessionEditForm )
@@ -62,7 +62,10 @@ from ietf.meeting.helpers import get_meeting, get_ietf_meeting, get_current_ietf
 from ietf.meeting.helpers import get_schedule, schedule_permissions
 from ietf.meeting.helpers import preprocess_assignments_for_agenda, read_agenda_file
 from ietf.meeting.helpers import AgendaFilterOrganizer, AgendaKeywordTagger
-from ietf.meeting.helpers import convert_draft_to_pdf, get_earliest_session_date
+from ietf.meeting.agenda_snapshot import get_agenda_snapshot, agenda_etag
+from ietf.meeting.ical import agenda_ical_response, upcoming_ical_response
+from ietf.meeting.helpers import get_earliest_session_date
+from ietf.meeting.helpers import session_draft_bundle_key, SESSION_DRAFT_BUNDLE_BUILDERS
 from ietf.meeting.helpers import can_view_interim_request, can_approve_interim_request
 from ietf.meeting.helpers import can_edit_interim_request
 from ietf.meeting.helpers import can_request_interim_meeting, get_announcement_initial
@@ -71,6 +74,7 @@ from ietf.meeting.helpers import send_interim_meeting_cancellation_notice, send_
 from ietf.meeting.helpers import send_interim_approval
 from ietf.meeting.helpers import send_interim_approval_request
 from ietf.meeting.helpers import send_interim_announcement_request, sessions_post_cancel
+from ietf.meeting.tasks import build_session_draft_bundle_task
 from ietf.meeting.utils import finalize, sort_accept_tuple, condition_slide_order
 from ietf.meeting.utils import add_event_info_to_session_qs
 from ietf.meeting.utils import session_time_for_sorting
@@ -92,10 +96,7 @@ from ietf.utils.hedgedoc import Note, NoteError
 from ietf.utils.log import assertion
 from ietf.utils.mail import send_mail_message, send_mail_text
 from ietf.utils.mime import get_mime_type
-from ietf.utils.pipe import pipe
-from ietf.utils.pdf import pdf_pages
 from ietf.utils.response import permission_denied
-from ietf.utils.text import xslugify
 from ietf.utils.timezone import datetime_today, date_today
 
 from .forms import (InterimMeetingModelForm, InterimAnnounceForm, InterimSessionModelForm,
@@ -1501,15 +1502,24 @@ def session_materials(request, session_id):
     return render(request, 'meeting/session_materials.html', dict(item=assignment))
 
 
-def get_assignments_for_agenda(schedule):
-    """Get queryset containing assignments to show on the agenda"""
-    return SchedTimeSessAssignment.objects.filter(
-        schedule__in=[schedule, schedule.base],
-        session__on_agenda=True,
-    )
+def get_agenda_plain_schedule(meeting, name=None, owner=None):
+    if name is None:
+        return get_schedule(meeting, name)
+    else:
+        person   = get_person_by_email(owner)
+        return get_schedule_by_name(meeting, person, name)
 
+def agenda_plain_etag(request, num=None, name=None, base=None, ext=None, owner=None, utc=""):
+    meeting = get_ietf_meeting(num)
+    if meeting is None or int(meeting.number) <= 64:
+        return None
+    schedule = get_agenda_plain_schedule(meeting, name, owner)
+    if schedule is None:
+        return None
+    return agenda_etag(meeting, schedule, base, ext, utc)
 
 @ensure_csrf_cookie
+@condition(etag_func=agenda_plain_etag)
 def agenda_plain(request, num=None, name=None, base=None, ext=None, owner=None, utc=""):
     base = base if base else 'agenda'
     ext = ext if ext else '.txt'
@@ -1533,30 +1543,17 @@ def agenda_plain(request, num=None, name=None, base=None, ext=None, owner=None,
         pass
 
     # Select the schedule to show
-    if name is None:
-        schedule = get_schedule(meeting, name)
-    else:
-        person   = get_person_by_email(owner)
-        schedule = get_schedule_by_name(meeting, person, name)
+    schedule = get_agenda_plain_schedule(meeting, name, owner)
 
     if schedule == None:
         base = base.replace("-utc", "")
         return render(request, "meeting/no-"+base+ext, {'meeting':meeting }, content_type=mimetype[ext])
 
-    updated = meeting.updated()
-
-    # Select and prepare sessions that should be included
-    filtered_assignments = preprocess_assignments_for_agenda(
-        get_assignments_for_agenda(schedule),
-        meeting
-    )
-    AgendaKeywordTagger(assignments=filtered_assignments).apply()
+    snapshot = get_agenda_snapshot(meeting, schedule)
 
     # Done processing for CSV output
     if ext == ".csv":
-        return agenda_csv(schedule, filtered_assignments)
-
-    filter_organizer = AgendaFilterOrganizer(assignments=filtered_assignments)
+        return agenda_csv(schedule, snapshot['items'])
 
     is_current_meeting = (num is None) or (num == get_current_ietf_meeting_num())
 
@@ -1568,10 +1565,10 @@ def agenda_plain(request, num=None, name=None, base=None, ext=None, owner=None,
             {
                 "personalize": False,
                 "schedule": schedule,
-                "filtered_assignments": filtered_assignments,
-                "updated": updated,
-                "filter_categories": filter_organizer.get_filter_categories(),
-                "non_area_keywords": filter_organizer.get_non_area_keywords(),
+                "filtered_assignments": snapshot['items'],
+                "updated": snapshot['updated'],
+                "filter_categories": snapshot['filter_categories'],
+                "non_area_keywords": snapshot['non_area_keywords'],
                 "now": timezone.now().astimezone(meeting.tz()),
                 "display_timezone": display_timezone,
                 "is_current_meeting": is_current_meeting,
@@ -1606,7 +1603,14 @@ def agenda(request, num=None, name=None, base=None, ext=None, owner=None, utc=""
         }
     })
 
-@cache_page(5 * 60)
+def api_get_agenda_data_etag(request, num=None):
+    meeting = get_ietf_meeting(num)
+    if meeting is None or int(meeting.number) <= 64 or meeting.schedule is None:
+        return None
+    is_current_meeting = (num is None) or (num == get_current_ietf_meeting_num())
+    return agenda_etag(meeting, meeting.schedule, 'api', is_current_meeting)
+
+@condition(etag_func=api_get_agenda_data_etag)
 def api_get_agenda_data (request, num=None):
     meeting = get_ietf_meeting(num)
     if meeting is None:
@@ -1619,40 +1623,26 @@ def api_get_agenda_data (request, num=None):
     # Select the schedule to show
     schedule = get_schedule(meeting, None)
 
-    updated = meeting.updated()
-
-    # Select and prepare sessions that should be included
-    filtered_assignments = preprocess_assignments_for_agenda(
-        get_assignments_for_agenda(schedule),
-        meeting
-    )
-    AgendaKeywordTagger(assignments=filtered_assignments).apply()
-
-    filter_organizer = AgendaFilterOrganizer(assignments=filtered_assignments)
+    snapshot = get_agenda_snapshot(meeting, schedule)
 
     is_current_meeting = (num is None) or (num == get_current_ietf_meeting_num())
 
-    # Get Floor Plans
-    floors = FloorPlan.objects.filter(meeting=meeting).order_by('order')
-
-    #debug.show('all([(item.acronym,item.session.order_number,item.session.order_in_meeting()) for item in filtered_assignments])')
-
     return JsonResponse({
         "meeting": {
             "number": schedule.meeting.number,
             "city": schedule.meeting.city,
             "startDate": schedule.meeting.date.isoformat(),
             "endDate": schedule.meeting.end_date().isoformat(),
-            "updated": updated,
+            "updated": snapshot['updated'],
             "timezone": meeting.time_zone,
             "infoNote": schedule.meeting.agenda_info_note,
             "warningNote": schedule.meeting.agenda_warning_note
         },
-        "categories": filter_organizer.get_filter_categories(),
+        "categories": snapshot['filter_categories'],
         "isCurrentMeeting": is_current_meeting,
         "useNotes": meeting.uses_notes(),
-        "schedule": list(map(agenda_extract_schedule, filtered_assignments)),
-        "floors": list(map(agenda_extract_floorplan, floors))
+        "schedule": [item['api'] for item in snapshot['items']],
+        "floors": snapshot['floors'],
     })
 
 def api_get_session_materials (request, session_id=None):
@@ -1693,96 +1683,6 @@ def api_get_session_materials (request, session_id=None):
         } if minutes is not None else None
     })
 
-def agenda_extract_schedule (item):
-    return {
-        "id": item.id,
-        "sessionId": item.session.id,
-        "room": item.room_name if item.timeslot.show_location else None,
-        "location": {
-            "short": item.timeslot.location.floorplan.short,
-            "name": item.timeslot.location.floorplan.name,
-        } if (item.timeslot.show_location and item.timeslot.location and item.timeslot.location.floorplan) else {},
-        "acronym": item.acronym,
-        "duration": item.timeslot.duration.seconds,
-        "name": item.timeslot.name,
-        "startDateTime": item.timeslot.time.isoformat(),
-        "status": item.session.current_status,
-        "type": item.session.type.slug,
-        "isBoF": item.session.group_at_the_time().state_id == "bof",
-        "filterKeywords": item.filter_keywords,
-        "groupAcronym": item.session.group_at_the_time().acronym,
-        "groupName": item.session.group_at_the_time().name,
-        "groupParent": {
-            "acronym": item.session.group_parent_at_the_time().acronym
-        } if item.session.group_parent_at_the_time() else {},
-        "note": item.session.agenda_note,
-        "remoteInstructions": item.session.remote_instructions,
-        "flags": {
-            "agenda": True if item.session.agenda() is not None else False,
-            "showAgenda": True if (item.session.agenda() is not None or item.session.remote_instructions or item.session.agenda_note) else False
-        },
-        "agenda": {
-            "url": item.session.agenda().get_href()
-        } if item.session.agenda() is not None else {
-            "url": None
-        },
-        "orderInMeeting": item.session.order_number,
-        "short": item.session.short if item.session.short else item.session.short_name,
-        "sessionToken": item.session.docname_token_only_for_multiple(),
-        "links": {
-            "chat" : item.session.chat_room_url(),
-            "chatArchive" : item.session.chat_archive_url(),
-            "recordings": list(map(agenda_extract_recording, item.session.recordings())),
-            "videoStream": item.timeslot.location.video_stream_url() if item.timeslot.location else "",
-            "audioStream": item.timeslot.location.audio_stream_url() if item.timeslot.location else "",
-            "webex": item.timeslot.location.webex_url() if item.timeslot.location else "",
-            "onsiteTool": item.timeslot.location.onsite_tool_url() if item.timeslot.location else "",
-            "calendar": reverse(
-                'ietf.meeting.views.agenda_ical',
-                kwargs={'num': item.schedule.meeting.number, 'session_id': item.session.id},
-            ),
-        }
-        # "slotType": {
-        #     "slug": item.slot_type.slug
-        # }
-    }
-
-def agenda_extract_floorplan (item):
-    try:
-        item.image.width
-    except FileNotFoundError:
-        return {}
-
-    return {
-        "id": item.id,
-        "image": item.image.url,
-        "name": item.name,
-        "short": item.short,
-        "width": item.image.width,
-        "height": item.image.height,
-        "rooms": list(map(agenda_extract_room, item.room_set.all()))
-    }
-
-def agenda_extract_room (item):
-    return {
-        "id": item.id,
-        "name": item.name,
-        "functionalName": item.functional_name,
-        "slug": xslugify(item.name),
-        "left": item.left(),
-        "right": item.right(),
-        "top": item.top(),
-        "bottom": item.bottom()
-    }
-
-def agenda_extract_recording (item):
-    return {
-        "id": item.id,
-        "name": item.name,
-        "title": item.title,
-        "url": item.external_url
-    }
-
 def agenda_extract_slide (item):
     return {
         "id": item.id,
@@ -1792,6 +1692,7 @@ def agenda_extract_slide (item):
     }
 
 def agenda_csv(schedule, filtered_assignments):
+    """Render the items of an agenda snapshot as CSV"""
     response = HttpResponse(content_type="text/csv; charset=%s"%settings.DEFAULT_CHARSET)
     writer = csv.writer(response, delimiter=str(','), quoting=csv.QUOTE_ALL)
 
@@ -1806,65 +1707,70 @@ def agenda_csv(schedule, filtered_assignments):
         writer.writerow(encoded_row)
 
     def agenda_field(item):
-        agenda_doc = item.session.agenda()
+        agenda_doc = item['session']['agenda']
         if agenda_doc:
-            return "http://www.ietf.org/proceedings/{schedule.meeting.number}/agenda/{agenda.uploaded_filename}".format(schedule=schedule, agenda=agenda_doc)
+            return "http://www.ietf.org/proceedings/{schedule.meeting.number}/agenda/{agenda[uploaded_filename]}".format(schedule=schedule, agenda=agenda_doc)
         else:
             return ""
 
     def slides_field(item):
-        return "|".join("http://www.ietf.org/proceedings/{schedule.meeting.number}/slides/{slide.uploaded_filename}".format(schedule=schedule, slide=slide) for slide in item.session.slides())
+        return "|".join("http://www.ietf.org/proceedings/{schedule.meeting.number}/slides/{slide[uploaded_filename]}".format(schedule=schedule, slide=slide) for slide in item['session']['slides'])
 
     write_row(headings)
 
     for item in filtered_assignments:
+        timeslot = item['timeslot']
+        session = item['session']
+        group = session['group_at_the_time']
+        parent = session['group_parent_at_the_time']
+        slot_type = item['slot_type']
         row = []
-        row.append(item.timeslot.time.strftime("%Y-%m-%d"))
-        row.append(item.timeslot.time.strftime("%H%M"))
-        row.append(item.timeslot.end_time().strftime("%H%M"))
+        row.append(timeslot['time'].strftime("%Y-%m-%d"))
+        row.append(timeslot['time'].strftime("%H%M"))
+        row.append(timeslot['end_time'].strftime("%H%M"))
 
-        if item.slot_type().slug == "break":
-            row.append(item.slot_type().name)
+        if slot_type['slug'] == "break":
+            row.append(slot_type['name'])
             row.append(schedule.meeting.break_area)
             row.append("")
             row.append("")
             row.append("")
-            row.append(item.timeslot.name)
-            row.append("b{}".format(item.timeslot.pk))
-        elif item.slot_type().slug == "reg":
-            row.append(item.slot_type().name)
+            row.append(timeslot['name'])
+            row.append("b{}".format(timeslot['pk']))
+        elif slot_type['slug'] == "reg":
+            row.append(slot_type['name'])
             row.append(schedule.meeting.reg_area)
             row.append("")
             row.append("")
             row.append("")
-            row.append(item.timeslot.name)
-            row.append("r{}".format(item.timeslot.pk))
-        elif item.slot_type().slug == "other":
+            row.append(timeslot['name'])
+            row.append("r{}".format(timeslot['pk']))
+        elif slot_type['slug'] == "other":
             row.append("None")
-            row.append(item.timeslot.location.name if item.timeslot.location else "")
+            row.append(timeslot['location']['name'] if timeslot['location'] else "")
             row.append("")
-            row.append(item.session.group_at_the_time().acronym)
-            row.append(item.session.group_parent_at_the_time().acronym.upper() if item.session.group_parent_at_the_time() else "")
-            row.append(item.session.name)
-            row.append(item.session.pk)
-        elif item.slot_type().slug == "plenary":
-            row.append(item.session.name)
-            row.append(item.timeslot.location.name if item.timeslot.location else "")
+            row.append(group['acronym'])
+            row.append(parent['acronym'].upper() if parent else "")
+            row.append(session['name'])
+            row.append(session['pk'])
+        elif slot_type['slug'] == "plenary":
+            row.append(session['name'])
+            row.append(timeslot['location']['name'] if timeslot['location'] else "")
             row.append("")
-            row.append(item.session.group_at_the_time().acronym)
+            row.append(group['acronym'])
             row.append("")
-            row.append(item.session.name)
-            row.append(item.session.pk)
+            row.append(session['name'])
+            row.append(session['pk'])
             row.append(agenda_field(item))
             row.append(slides_field(item))
-        elif item.slot_type().slug == 'regular':
-            row.append(item.timeslot.name)
-            row.append(item.timeslot.location.name if item.timeslot.location else "")
-            row.append(item.session.group_parent_at_the_time().acronym.upper() if item.session.group_parent_at_the_time() else "")
-            row.append(item.session.group_at_the_time().acronym)
-            row.append("BOF" if item.session.group_at_the_time().state_id in ("bof", "bof-conc") else item.session.group_at_the_time().type.name)
-            row.append(item.session.group_at_the_time().name)
-            row.append(item.session.pk)
+        elif slot_type['slug'] == 'regular':
+            row.append(timeslot['name'])
+            row.append(timeslot['location']['name'] if timeslot['location'] else "")
+            row.append(parent['acronym'].upper() if parent else "")
+            row.append(group['acronym'])
+            row.append("BOF" if group['is_bof'] else group['type_name'])
+            row.append(group['name'])
+            row.append(session['pk'])
             row.append(agenda_field(item))
             row.append(slides_field(item))
 
@@ -1877,15 +1783,12 @@ def agenda_csv(schedule, filtered_assignments):
 def agenda_by_type_ics(request,num=None,type=None):
     meeting = get_meeting(num) 
     schedule = get_schedule(meeting)
-    assignments = SchedTimeSessAssignment.objects.filter(
-        schedule__in=[schedule, schedule.base if schedule else None]
-    ).prefetch_related(
-        'timeslot', 'timeslot__location', 'session', 'session__group', 'session__group__parent'
-    ).order_by('session__type__slug','timeslot__time')
+    snapshot = get_agenda_snapshot(meeting, schedule)
+    assignments = snapshot['items']
     if type:
-        assignments = assignments.filter(session__type__slug=type)
-    updated = meeting.updated()
-    return render(request,"meeting/agenda.ics",{"schedule":schedule,"updated":updated,"assignments":assignments},content_type="text/calendar")
+        assignments = [ a for a in assignments if a['session']['type_id'] == type ]
+    assignments = sorted(assignments, key=lambda a: (a['session']['type_id'], a['timeslot']['time']))
+    return agenda_ical_response(meeting, snapshot, assignments)
 
 def session_draft_list(num, acronym):
     try:
@@ -1924,86 +1827,56 @@ def session_draft_list(num, acronym):
 
     return sorted(result)
 
-def session_draft_tarfile(request, num, acronym):
-    drafts = session_draft_list(num, acronym);
-
-    response = HttpResponse(content_type='application/octet-stream')
-    response['Content-Disposition'] = 'attachment; filename=%s-drafts.tgz'%(acronym)
-    tarstream = tarfile.open('','w:gz',response)
-    mfh, mfn = mkstemp()
-    os.close(mfh)
-    manifest = io.open(mfn, "w")
-
-    for doc_name in drafts:
-        pdf_path = os.path.join(settings.INTERNET_DRAFT_PDF_PATH, doc_name + ".pdf")
-
-        if not os.path.exists(pdf_path):
-            convert_draft_to_pdf(doc_name)
+def session_draft_bundle(request, num, acronym, kind, content_type, filename=None):
+    """Serve the bundle of kind of the drafts of the session from the draft
+    bundle cache.  Missing bundles are built by a celery task, and the
+    client is asked to come back in a little while."""
+    drafts = session_draft_list(num, acronym)
+    bundles = caches['draftbundles']
+    if not hasattr(bundles, 'get_file'):
+        # without a file cache (e.g., in development) the bundle is built here
+        bundle = SESSION_DRAFT_BUNDLE_BUILDERS[kind](drafts)
+        if bundle is None:
+            return session_draft_bundle_failed(request, acronym, drafts)
+        response = HttpResponse(bundle, content_type=content_type)
+        if filename:
+            response['Content-Disposition'] = 'attachment; filename=%s' % filename
+        return response
 
-        if os.path.exists(pdf_path):
-            try:
-                tarstream.add(pdf_path, str(doc_name + ".pdf"))
-                manifest.write("Included:  "+pdf_path+"\n")
-            except Exception as e:
-                manifest.write(("Failed (%s): "%e)+pdf_path+"\n")
-        else:
-            manifest.write("Not found: "+pdf_path+"\n")
+    key = session_draft_bundle_key(kind, drafts)
+    f = bundles.get_file(key)
+    if f is not None:
+        response = FileResponse(f, content_type=content_type, as_attachment=bool(filename), filename=filename or '')
+        # FileResponse would count the header of the cache entry file too
+        response['Content-Length'] = f.size
+        return response
+    if cache.get(key + ":failed"):
+        return session_draft_bundle_failed(request, acronym, drafts)
+
+    if cache.add(key + ":building", True, settings.MEETING_DRAFT_BUNDLE_BUILD_TIMEOUT):
+        build_session_draft_bundle_task.delay(kind, drafts)
+    response = render(request, "meeting/session_draft_bundle_pending.html", {
+        'acronym': acronym,
+        'drafts': drafts,
+        'retry_after': 10,
+    }, status=202)
+    response['Retry-After'] = 10
+    return response
 
-    manifest.close()
-    tarstream.add(mfn, "manifest.txt")
-    tarstream.close()
-    os.unlink(mfn)
+def session_draft_bundle_failed(request, acronym, drafts):
+    response = render(request, "meeting/session_draft_bundle_pending.html", {
+        'acronym': acronym,
+        'drafts': drafts,
+        'failed': True,
+    }, status=503)
+    response['Retry-After'] = settings.MEETING_DRAFT_BUNDLE_BUILD_TIMEOUT
     return response
 
-def session_draft_pdf(request, num, acronym):
-    drafts = session_draft_list(num, acronym);
-    curr_page = 1
-    pmh, pmn = mkstemp()
-    os.close(pmh)
-    pdfmarks = io.open(pmn, "w")
-    pdf_list = ""
+def session_draft_tarfile(request, num, acronym):
+    return session_draft_bundle(request, num, acronym, 'tgz', 'application/octet-stream', '%s-drafts.tgz' % acronym)
 
-    for draft in drafts:
-        pdf_path = os.path.join(settings.INTERNET_DRAFT_PDF_PATH, draft + ".pdf")
-        if not os.path.exists(pdf_path):
-            convert_draft_to_pdf(draft)
-
-        if os.path.exists(pdf_path):
-            pages = pdf_pages(pdf_path)
-            pdfmarks.write("[/Page "+str(curr_page)+" /View [/XYZ 0 792 1.0] /Title (" + draft + ") /OUT pdfmark\n")
-            pdf_list = pdf_list + " " + pdf_path
-            curr_page = curr_page + pages
-
-    pdfmarks.close()
-    pdfh, pdfn = mkstemp()
-    os.close(pdfh)
-    gs = settings.GHOSTSCRIPT_COMMAND
-    code, out, err = pipe(gs + " -dBATCH -dNOPAUSE -q -sDEVICE=pdfwrite -sOutputFile=" + pdfn + " " + pdf_list + " " + pmn)
-    assertion('code == 0')
-
-    pdf = io.open(pdfn,"rb")
-    pdf_contents = pdf.read()
-    pdf.close()
-
-    os.unlink(pmn)
-    os.unlink(pdfn)
-    return HttpResponse(pdf_contents, content_type="application/pdf")
-
-def ical_session_status(assignment):
-    if assignment.session.current_status == 'canceled':
-        return "CANCELLED"
-    elif assignment.session.current_status == 'resched':
-        t = "RESCHEDULED"
-        if assignment.session.tombstone_for_id is not None:
-            other_assignment = SchedTimeSessAssignment.objects.filter(schedule=assignment.schedule_id, session=assignment.session.tombstone_for_id).first()
-            if other_assignment:
-                t = "RESCHEDULED TO {}-{}".format(
-                    other_assignment.timeslot.time.strftime("%A %H:%M").upper(),
-                    other_assignment.timeslot.end_time().strftime("%H:%M")
-                )
-        return t
-    else:
-        return "CONFIRMED"
+def session_draft_pdf(request, num, acronym):
+    return session_draft_bundle(request, num, acronym, 'pdf', 'application/pdf')
 
 def parse_agenda_filter_params(querydict):
     """Parse agenda filter parameters from a request"""
@@ -2023,11 +1896,20 @@ def parse_agenda_filter_params(querydict):
 
 
 def should_include_assignment(filter_params, assignment):
-    """Decide whether to include an assignment"""
-    shown = len(set(filter_params['show']).intersection(assignment.filter_keywords)) > 0
-    hidden = len(set(filter_params['hide']).intersection(assignment.filter_keywords)) > 0
+    """Decide whether to include an assignment, or an agenda snapshot item"""
+    filter_keywords = assignment['filter_keywords'] if isinstance(assignment, dict) else assignment.filter_keywords
+    shown = len(set(filter_params['show']).intersection(filter_keywords)) > 0
+    hidden = len(set(filter_params['hide']).intersection(filter_keywords)) > 0
     return shown and not hidden
 
+def agenda_ical_etag(request, num=None, name=None, acronym=None, session_id=None):
+    meeting = get_meeting(num, type_in=None)
+    schedule = get_schedule(meeting, name)
+    if schedule is None:
+        return None
+    return agenda_etag(meeting, schedule, 'ical')
+
+@condition(etag_func=agenda_ical_etag)
 def agenda_ical(request, num=None, name=None, acronym=None, session_id=None):
     """Agenda ical view
 
@@ -2048,17 +1930,12 @@ def agenda_ical(request, num=None, name=None, acronym=None, session_id=None):
     """
     meeting = get_meeting(num, type_in=None)
     schedule = get_schedule(meeting, name)
-    updated = meeting.updated()
 
-    if schedule is None and acronym is None and session_id is None:
+    if schedule is None:
         raise Http404
 
-    assignments = SchedTimeSessAssignment.objects.filter(
-        schedule__in=[schedule, schedule.base],
-        session__on_agenda=True,
-    )
-    assignments = preprocess_assignments_for_agenda(assignments, meeting)
-    AgendaKeywordTagger(assignments=assignments).apply()
+    snapshot = get_agenda_snapshot(meeting, schedule)
+    assignments = snapshot['items']
 
     try:
         filt_params = parse_agenda_filter_params(request.GET)
@@ -2070,129 +1947,81 @@ def agenda_ical(request, num=None, name=None, acronym=None, session_id=None):
         assignments = [a for a in assignments if should_include_assignment(filt_params, a)]
 
     if acronym:
-        assignments = [ a for a in assignments if a.session.group_at_the_time().acronym == acronym ]
+        assignments = [ a for a in assignments if a['session']['group_at_the_time'] and a['session']['group_at_the_time']['acronym'] == acronym ]
     elif session_id:
-        assignments = [ a for a in assignments if a.session_id == int(session_id) ]
+        assignments = [ a for a in assignments if a['session']['pk'] == int(session_id) ]
 
-    for a in assignments:
-        if a.session:
-            a.session.ical_status = ical_session_status(a)
+    return agenda_ical_response(meeting, snapshot, assignments)
 
-    return render(request, "meeting/agenda.ics", {
-        "schedule": schedule,
-        "assignments": assignments,
-        "updated": updated
-    }, content_type="text/calendar")
+def agenda_json_etag(request, num=None):
+    meeting = get_meeting(num, type_in=['ietf','interim'])
+    if meeting.schedule is None:
+        return None
+    return agenda_etag(meeting, meeting.schedule, 'json')
 
-@cache_page(15 * 60)
+@condition(etag_func=agenda_json_etag)
 def agenda_json(request, num=None):
     meeting = get_meeting(num, type_in=['ietf','interim'])
 
     sessions = []
-    locations = set()
-    parent_acronyms = set()
-    assignments = SchedTimeSessAssignment.objects.filter(
-        schedule__in=[meeting.schedule, meeting.schedule.base if meeting.schedule else None],
-        session__on_agenda=True,
-    ).exclude(
-        session__type__in=['break', 'reg']
-    )
-    # Update the assignments with historic information, i.e., valid at the
-    # time of the meeting
-    assignments = preprocess_assignments_for_agenda(assignments, meeting, extra_prefetches=[
-        "session__materials__docevent_set",
-        "session__sessionpresentation_set",
-        "timeslot__meeting"
-    ])
-    for asgn in assignments:
-        sessdict = dict()
-        sessdict['objtype'] = 'session'
-        sessdict['id'] = asgn.pk
-        sessdict['is_bof'] = False
-        if asgn.session.group_at_the_time():
-            sessdict['group'] = {
-                    "acronym": asgn.session.group_at_the_time().acronym,
-                    "name": asgn.session.group_at_the_time().name,
-                    "type": asgn.session.group_at_the_time().type_id,
-                    "state": asgn.session.group_at_the_time().state_id,
-                }
-            if asgn.session.group_at_the_time().is_bof():
-                sessdict['is_bof'] = True
-            if asgn.session.group_at_the_time().type_id in ['wg','rg', 'ag', 'rag'] or asgn.session.group_at_the_time().acronym in ['iesg',]: # TODO: should that first list be groupfeatures driven?
-                if asgn.session.group_parent_at_the_time():
-                    sessdict['group']['parent'] = asgn.session.group_parent_at_the_time().acronym
-                    parent_acronyms.add(asgn.session.group_parent_at_the_time().acronym)
-        if asgn.session.name:
-            sessdict['name'] = asgn.session.name
-        else:
-            sessdict['name'] = asgn.session.group_at_the_time().name
-        if asgn.session.short:
-            sessdict['short'] = asgn.session.short
-        if asgn.session.agenda_note:
-            sessdict['agenda_note'] = asgn.session.agenda_note
-        if asgn.session.remote_instructions:
-            sessdict['remote_instructions'] = asgn.session.remote_instructions
-        utc_start = asgn.timeslot.utc_start_time()
-        if utc_start:
-            sessdict['start'] = utc_start.strftime("%Y-%m-%dT%H:%M:%SZ")
-        sessdict['duration'] = str(asgn.timeslot.duration)
-        sessdict['location'] = asgn.room_name
-        if asgn.timeslot.location:      # Some socials have an assignment but no location
-            locations.add(asgn.timeslot.location)
-        if asgn.session.agenda():
-            sessdict['agenda'] = asgn.session.agenda().get_href()
-
-        if asgn.session.minutes():
-            sessdict['minutes'] = asgn.session.minutes().get_href()
-        if asgn.session.slides():
-            sessdict['presentations'] = []
-            presentations = SessionPresentation.objects.filter(session=asgn.session, document__type__slug='slides')
-            for pres in presentations:
-                sessdict['presentations'].append(
-                    {
-                        'name':     pres.document.name,
-                        'title':    pres.document.title,
-                        'order':    pres.order,
-                        'rev':      pres.rev,
-                        'resource_uri': '/api/v1/meeting/sessionpresentation/%s/'%pres.id,
-                    })
-        sessdict['session_res_uri'] = '/api/v1/meeting/session/%s/'%asgn.session.id
-        sessdict['session_id'] = asgn.session.id
-        modified = asgn.session.modified
-        for doc in asgn.session.materials.all():
-            rev_docevent = doc.latest_event(NewRevisionDocEvent,'new_revision')
-            modified = max(modified, (rev_docevent and rev_docevent.time) or modified)
-        sessdict['modified'] = modified
-        sessdict['status'] = asgn.session.current_status
-        sessions.append(sessdict)
-
     rooms = []
-    for room in locations:
-        roomdict = dict()
-        roomdict['id'] = room.pk
-        roomdict['objtype'] = 'location'
-        roomdict['name'] = room.name
-        if room.floorplan:
-            roomdict['level_name'] = room.floorplan.name
-            roomdict['level_sort'] = room.floorplan.order
-        if room.x1 is not None:
-            roomdict['x'] = (room.x1+room.x2)/2.0
-            roomdict['y'] = (room.y1+room.y2)/2.0
-        roomdict['modified'] = room.modified
-        if room.floorplan and room.floorplan.image:
-            roomdict['map'] = room.floorplan.image.url
-            roomdict['modified'] = max(room.modified, room.floorplan.modified)
-        rooms.append(roomdict)
-
     parents = []
-    for parent in Group.objects.filter(acronym__in=parent_acronyms):
-        parentdict = dict()
-        parentdict['id'] = parent.pk
-        parentdict['objtype'] = 'parent'
-        parentdict['name'] = parent.acronym
-        parentdict['description'] = parent.name
-        parentdict['modified'] = parent.time
-        parents.append(parentdict)
+    if meeting.schedule:
+        snapshot = get_agenda_snapshot(meeting, meeting.schedule)
+        room_pks = set()
+        parent_acronyms = set()
+        for item in snapshot['items']:
+            session = item['session']
+            if session['type_id'] in ['break', 'reg']:
+                continue
+            group = session['group_at_the_time']
+            sessdict = dict()
+            sessdict['objtype'] = 'session'
+            sessdict['id'] = item['pk']
+            sessdict['is_bof'] = False
+            if group:
+                sessdict['group'] = {
+                        "acronym": group['acronym'],
+                        "name": group['name'],
+                        "type": group['type_id'],
+                        "state": group['state_id'],
+                    }
+                if group['is_bof']:
+                    sessdict['is_bof'] = True
+                if item['json_parent']:
+                    sessdict['group']['parent'] = session['group_parent_at_the_time']['acronym']
+                    parent_acronyms.add(sessdict['group']['parent'])
+            if session['name']:
+                sessdict['name'] = session['name']
+            else:
+                sessdict['name'] = group['name']
+            if session['short']:
+                sessdict['short'] = session['short']
+            if session['agenda_note']:
+                sessdict['agenda_note'] = session['agenda_note']
+            if session['remote_instructions']:
+                sessdict['remote_instructions'] = session['remote_instructions']
+            utc_start = item['timeslot']['utc_start_time']
+            if utc_start:
+                sessdict['start'] = utc_start.strftime("%Y-%m-%dT%H:%M:%SZ")
+            sessdict['duration'] = str(item['timeslot']['duration'])
+            location = item['timeslot']['location']
+            sessdict['location'] = location['name'] if location else None
+            if location:      # Some socials have an assignment but no location
+                room_pks.add(location['pk'])
+            if session['agenda']:
+                sessdict['agenda'] = session['agenda']['get_href']
+            if session['minutes']:
+                sessdict['minutes'] = session['minutes']['get_href']
+            if session['slides']:
+                sessdict['presentations'] = session['presentations']
+            sessdict['session_res_uri'] = '/api/v1/meeting/session/%s/'%session['pk']
+            sessdict['session_id'] = session['pk']
+            sessdict['modified'] = session['modified']
+            sessdict['status'] = session['current_status']
+            sessions.append(sessdict)
+        rooms = [ dict(snapshot['rooms'][pk]) for pk in room_pks ]
+        parents = [ dict(snapshot['parents'][acronym]) for acronym in parent_acronyms if acronym in snapshot['parents'] ]
 
     meetinfo = []
     meetinfo.extend(sessions)
@@ -3540,10 +3369,6 @@ def upcoming_ical(request):
 
     # we already collected sessions with current_status, so reuse those
     sessions = {s.pk: s for m in meetings for s in m.sessions}
-    for a in assignments:
-        if a.session_id is not None:
-            a.session = sessions.get(a.session_id) or a.session
-            a.session.ical_status = ical_session_status(a)
 
     # Handle IETFs separately. Manually apply the 'ietf-meetings' filter.
     if filter_params is None or (
@@ -3557,17 +3382,7 @@ def upcoming_ical(request):
     meeting_vtz = {meeting.vtimezone() for meeting in meetings}
     meeting_vtz.discard(None)
 
-    # icalendar response file should have '\r\n' line endings per RFC5545
-    response = render_to_string('meeting/upcoming.ics', {
-        'vtimezones': ''.join(sorted(meeting_vtz)),
-        'assignments': assignments,
-        'ietfs': ietfs,
-    }, request=request)
-    response = re.sub("\r(?!\n)|(?<!\r)\n", "\r\n", response)
-
-    response = HttpResponse(response, content_type='text/calendar')
-    response['Content-Disposition'] = 'attachment; filename="upcoming.ics"'
-    return response
+    return upcoming_ical_response(request, assignments, sessions, ietfs, ''.join(sorted(meeting_vtz)))
     
 
 def upcoming_json(request):
@@ -10,7 +10,7 @@ from django.core.management.base import BaseCommand
 import debug                            # pyflakes:ignore
 
 from ietf.message.models import Message
-from ietf.utils.mail import send_mail_message
+from ietf.utils.mail import send_mail_message, smtp_batch
 
 class Command(BaseCommand):
     help = """
@@ -76,10 +76,11 @@ class Command(BaseCommand):
         else:
             if unsent:
                 messages = messages.filter(sent__isnull=True)
-            for m in messages:
-                to = ','.join( a[1] for a in email.utils.getaddresses([m.to]) )
-                try:
-                    send_mail_message(None, m)
-                    self.stdout.write('%s  %s -> %s  "%s"' % (m.pk, m.frm, to, m.subject.strip()))
-                except smtplib.SMTPException as e:
-                    self.stdout.write('Failure %s:  %s  %s -> %s  "%s"' % (e, m.pk, m.frm, to, m.subject.strip()))
+            with smtp_batch():
+                for m in messages:
+                    to = ','.join( a[1] for a in email.utils.getaddresses([m.to]) )
+                    try:
+                        send_mail_message(None, m)
+                        self.stdout.write('%s  %s -> %s  "%s"' % (m.pk, m.frm, to, m.subject.strip()))
+                    except smtplib.SMTPException as e:
+                        self.stdout.write('Failure %s:  %s  %s -> %s  "%s"' % (e, m.pk, m.frm, to, m.subject.strip()))
@@ -2,25 +2,38 @@
 # -*- coding: utf-8 -*-
 
 
-from django.db import connection
+from django.conf import settings
 from django.db.utils import OperationalError
 from django.shortcuts import render
 from django.http import HttpResponsePermanentRedirect
 from ietf.utils.log import log, exc_parts
 from ietf.utils.mail import log_smtp_exception
-import re
+from ietf.utils.queryprofile import QueryProfile, PROFILE_STATS
+import json
+import logging
+import random
 import smtplib
 import unicodedata
 
 
-def sql_log_middleware(get_response):
-    def sql_log(request):
-        response = get_response(request)
-        for q in connection.queries:
-            if re.match('(update|insert)', q['sql'], re.IGNORECASE):
-                log(q['sql'])
+sql_profile_logger = logging.getLogger('datatracker.sqlprofile')
+
+def sql_profile_middleware(get_response):
+    """Profile the database queries and template rendering of a sample of
+    SQL_PROFILE_SAMPLE_RATE of the requests, see ietf.utils.queryprofile"""
+    def sql_profile(request):
+        if random.random() >= settings.SQL_PROFILE_SAMPLE_RATE:
+            return get_response(request)
+        with QueryProfile() as profile:
+            response = get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        PROFILE_STATS.add(view, profile)
+        record = dict(view=view, path=request.path, method=request.method, status=response.status_code)
+        record.update(profile.as_dict(settings.SQL_PROFILE_DUPLICATE_THRESHOLD))
+        sql_profile_logger.info(json.dumps(record))
         return response
-    return sql_log
+    return sql_profile
 
 class SMTPExceptionMiddleware(object):
     def __init__(self, get_response):
@@ -2,7 +2,6 @@
 # -*- coding: utf-8 -*-
 """Tests of nomcom management commands"""
 import mock
-import sys
 
 from collections import namedtuple
 
@@ -101,13 +100,13 @@ class FeedbackEmailTests(TestCase):
         parts = msg.get_payload()
         self.assertEqual(len(parts), 2, 'Error email should contain message and original message')
 
-    @mock.patch.object(sys.stdin.buffer, 'read')
+    @mock.patch('sys.stdin')
     @mock.patch('ietf.utils.management.base.send_smtp')
-    def test_invalid_character_encodings_via_stdin(self, send_smtp_mock, stdin_read_mock):
+    def test_invalid_character_encodings_via_stdin(self, send_smtp_mock, stdin_mock):
         """The feedback_email command should send a message when stdin input has invalid encoding"""
         # mock an exception in create_feedback_email()
         invalid_characters = b'\xfe\xff'
-        stdin_read_mock.return_value = invalid_characters
+        stdin_mock.buffer.read.return_value = invalid_characters
         call_command('feedback_email', nomcom_year=self.year)
 
         self.assertTrue(send_smtp_mock.called)
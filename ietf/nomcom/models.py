@@ -93,10 +93,10 @@ class NomCom(models.Model):
         except ValueError as e:
             raise ValueError("Trying to read the NomCom public key: " + str(e))
 
-        command = "%s smime -encrypt -in /dev/stdin %s" % (settings.OPENSSL_COMMAND, cert_file)
+        command = [settings.OPENSSL_COMMAND, "smime", "-encrypt", "-in", "/dev/stdin", cert_file]
         code, out, error = pipe(command, cleartext.encode('utf-8'))
         if code != 0:
-            log("openssl error: %s:\n  Error %s: %s" %(command, code, error))
+            log("openssl error: %s:\n  Error %s: %s" %(' '.join(command), code, error))
         if not error:
             return out
         else:
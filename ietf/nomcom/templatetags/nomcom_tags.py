@@ -64,15 +64,14 @@ def decrypt(string, request, year, plain=False):
     encrypted_file.write(string)
     encrypted_file.close()
 
-    command = "%s smime -decrypt -in %s -inkey /dev/stdin"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                            encrypted_file.name), key)
+    command = [settings.OPENSSL_COMMAND, "smime", "-decrypt", "-in", encrypted_file.name, "-inkey", "/dev/stdin"]
+    code, out, error = pipe(command, key)
     try:
         out = force_text(out)
     except DjangoUnicodeDecodeError:
         pass
     if code != 0:
-        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))
+        log("openssl error: %s:\n  Error %s: %s" %(' '.join(command), code, error))
 
     os.unlink(encrypted_file.name)
 
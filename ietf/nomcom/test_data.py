@@ -68,12 +68,9 @@ def generate_cert():
     config_file.write(config)
     config_file.close()
 
-    command = "%s req -config %s -x509 -new -newkey rsa:2048 -sha256 -days 730 -nodes \
-                -keyout %s -out %s -batch"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                                       config_file.name,
-                                       privatekey_file.name,
-                                       cert_file.name))
+    command = [settings.OPENSSL_COMMAND, "req", "-config", config_file.name, "-x509", "-new", "-newkey", "rsa:2048",
+               "-sha256", "-days", "730", "-nodes", "-keyout", privatekey_file.name, "-out", cert_file.name, "-batch"]
+    code, out, error = pipe(command)
     privatekey_file.close()
     cert_file.close()
     return cert_file, privatekey_file
@@ -86,11 +83,9 @@ def check_comments(encryped, plain, privatekey_file):
 
     # to decrypt comments was encryped and check they are equal to the plain comments
     decrypted_file = tempfile.NamedTemporaryFile(delete=False)
-    command = "%s smime -decrypt -in %s -out %s -inkey %s"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                                        encrypted_file.name,
-                                        decrypted_file.name,
-                                        privatekey_file.name))
+    command = [settings.OPENSSL_COMMAND, "smime", "-decrypt", "-in", encrypted_file.name, "-out", decrypted_file.name,
+               "-inkey", privatekey_file.name]
+    code, out, error = pipe(command)
 
     decrypted_file.close()
     encrypted_file.close()
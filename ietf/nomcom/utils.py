@@ -177,16 +177,10 @@ def retrieve_nomcom_private_key(request, year):
     if not private_key:
         return private_key
 
-    command = "%s bf -d -in /dev/stdin -k \"%s\" -a"
-    code, out, error = pipe(
-        command % (
-            settings.OPENSSL_COMMAND,
-            command_line_safe_secret(settings.NOMCOM_APP_SECRET)
-        ),
-        private_key
-    )
+    command = [settings.OPENSSL_COMMAND, "bf", "-d", "-in", "/dev/stdin", "-k", command_line_safe_secret(settings.NOMCOM_APP_SECRET), "-a"]
+    code, out, error = pipe(command, private_key)
     if code != 0:
-        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))        
+        log("openssl error: %s:\n  Error %s: %s" %(' '.join(command[:2]), code, error))        
     return out
 
 
@@ -194,16 +188,10 @@ def store_nomcom_private_key(request, year, private_key):
     if not private_key:
         request.session['NOMCOM_PRIVATE_KEY_%s' % year] = ''
     else:
-        command = "%s bf -e -in /dev/stdin -k \"%s\" -a"
-        code, out, error = pipe(
-            command % (
-                settings.OPENSSL_COMMAND,
-                command_line_safe_secret(settings.NOMCOM_APP_SECRET)
-            ),
-            private_key
-        )
+        command = [settings.OPENSSL_COMMAND, "bf", "-e", "-in", "/dev/stdin", "-k", command_line_safe_secret(settings.NOMCOM_APP_SECRET), "-a"]
+        code, out, error = pipe(command, private_key)
         if code != 0:
-            log("openssl error: %s:\n  Error %s: %s" %(command, code, error))        
+            log("openssl error: %s:\n  Error %s: %s" %(' '.join(command[:2]), code, error))        
         if error and error!=b"*** WARNING : deprecated key derivation used.\nUsing -iter or -pbkdf2 would be better.\n":
             out = ''
         request.session['NOMCOM_PRIVATE_KEY_%s' % year] = out
@@ -214,11 +202,10 @@ def validate_private_key(key):
     key_file.write(key.encode('utf-8'))
     key_file.close()
 
-    command = "%s rsa -in %s -check -noout"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                                       key_file.name))
+    command = [settings.OPENSSL_COMMAND, "rsa", "-in", key_file.name, "-check", "-noout"]
+    code, out, error = pipe(command)
     if code != 0:
-        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))        
+        log("openssl error: %s:\n  Error %s: %s" %(' '.join(command), code, error))        
 
     os.unlink(key_file.name)
     return (not error, error)
@@ -230,11 +217,10 @@ def validate_public_key(public_key):
         key_file.write(chunk)
     key_file.close()
 
-    command = "%s x509 -in %s -noout"
-    code, out, error = pipe(command % (settings.OPENSSL_COMMAND,
-                                       key_file.name))
+    command = [settings.OPENSSL_COMMAND, "x509", "-in", key_file.name, "-noout"]
+    code, out, error = pipe(command)
     if code != 0:
-        log("openssl error: %s:\n  Error %s: %s" %(command, code, error))        
+        log("openssl error: %s:\n  Error %s: %s" %(' '.join(command), code, error))        
 
     os.unlink(key_file.name)
     return (not error, error)
@@ -351,6 +351,8 @@ PERSON_API_KEY_VALUES = [
     ("/api/notify/session/polls", "/api/notify/session/polls", "Recording Manager"),
     ("/api/appauth/authortools", "/api/appauth/authortools", None),
     ("/api/appauth/bibxml", "/api/appauth/bibxml", None),
+    ("/api/metrics/sql-profile", "/api/metrics/sql-profile", "Robot"),
+    ("/api/metrics/external-commands", "/api/metrics/external-commands", "Robot"),
 ]
 PERSON_API_KEY_ENDPOINTS = sorted(list(set([ (v, n) for (v, n, r) in PERSON_API_KEY_VALUES ])))
 
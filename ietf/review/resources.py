@@ -3,12 +3,12 @@
 # Autogenerated by the makeresources management command 2016-06-14 04:21 PDT
 
 
-from tastypie.resources import ModelResource
 from tastypie.fields import ToManyField                 # pyflakes:ignore
 from tastypie.constants import ALL, ALL_WITH_RELATIONS  # pyflakes:ignore
 from tastypie.cache import SimpleCache
 
 from ietf import api
+from ietf.api import ModelResource
 from ietf.api import ToOneField                         # pyflakes:ignore
 
 from ietf.review.models import (ReviewerSettings, ReviewRequest, ReviewAssignment, # type: ignore
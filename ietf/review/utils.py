@@ -29,7 +29,7 @@ from ietf.ietfauth.utils import has_role, is_authorized_in_doc_stream
 from ietf.review.models import (ReviewRequest, ReviewAssignment, ReviewRequestStateName, ReviewTypeName, 
                                 ReviewerSettings, UnavailablePeriod, ReviewSecretarySettings,
                                 ReviewTeamSettings)
-from ietf.utils.mail import send_mail
+from ietf.utils.mail import send_mail, smtp_batch
 from ietf.doc.utils import extract_complete_replaces_ancestor_mapping_for_docs
 from ietf.utils import log
 from ietf.utils.timezone import date_today, datetime_today, DEADLINE_TZINFO
@@ -73,7 +73,7 @@ def can_access_review_stats_for_team(user, team):
 def review_assignments_to_list_for_docs(docs):
     assignment_qs = ReviewAssignment.objects.filter(
         state__in=["assigned", "accepted", "part-completed", "completed"],
-    ).prefetch_related("result")
+    ).select_related("result", "review", "review_request__team", "review_request__type")
 
     doc_names = [d.name for d in docs]
 
@@ -608,6 +608,7 @@ def extract_revision_ordered_review_assignments_for_documents_and_replaced(revie
     assignments_for_each_doc = defaultdict(list)
     replacement_name_set = set(e for l in replaces.values() for e in l) | names
     for r in ( review_assignment_queryset.filter(review_request__doc__name__in=replacement_name_set)
+                                        .select_related("review_request__doc")
                                         .order_by("-reviewed_rev","-assigned_on", "-id").iterator()):
         assignments_for_each_doc[r.review_request.doc.name].append(r)
 
@@ -703,6 +704,7 @@ def get_default_filter_re(person):
         return '^draft-(%s|%s)-.*$' % ( person.last_name().lower(), '|'.join(['ietf-%s' % g.acronym for g in groups_to_avoid]))
 
 
+@smtp_batch()
 def send_unavailability_period_ending_reminder(remind_date):
     reminder_days = 3
     end_date = remind_date + datetime.timedelta(days=reminder_days)
@@ -729,6 +731,7 @@ def send_unavailability_period_ending_reminder(remind_date):
     return log
 
 
+@smtp_batch()
 def send_review_reminder_overdue_assignment(remind_date):
     min_overdue_days = 5
     min_deadline = remind_date - datetime.timedelta(days=min_overdue_days)
@@ -760,6 +763,7 @@ def send_review_reminder_overdue_assignment(remind_date):
     return log
 
 
+@smtp_batch()
 def send_reminder_all_open_reviews(remind_date):
     log = []
     days_since_origin = (remind_date - ORIGIN_DATE_PERIODIC_REMINDERS).days
@@ -796,6 +800,7 @@ def send_reminder_all_open_reviews(remind_date):
     return log
 
 
+@smtp_batch()
 def send_reminder_unconfirmed_assignments(remind_date):
     """
     Remind reviewers of any assigned ReviewAssignments which they have not
@@ -76,6 +76,12 @@ DEFAULT_FROM_EMAIL = 'IETF Secretariat <ietf-secretariat-reply@' + IETF_DOMAIN +
 UTILS_ON_BEHALF_EMAIL = 'noreply@' + IETF_DOMAIN
 UTILS_FROM_EMAIL_DOMAINS = [ 'ietf.org', 'iab.org', ]
 
+# Outgoing SMTP connections are reused for the mail sent within this many
+# seconds of each other, up to this many messages per connection, and
+# closed at the end of a request.  See ietf.utils.mail.smtp_connection().
+EMAIL_CONNECTION_MAX_IDLE = 30
+EMAIL_CONNECTION_MAX_MESSAGES = 100
+
 MANAGERS = ADMINS
 
 DATABASES = {
@@ -241,6 +247,16 @@ LOGGING = {
 	    'handlers': ['debug_console', ],
 	    'level': 'DEBUG',
 	},
+        'datatracker.sqlprofile': {
+            'handlers': ['syslog', 'debug_console', ],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'datatracker.commands': {
+            'handlers': ['syslog', 'debug_console', ],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
     #
     # No logger filters
@@ -327,6 +343,14 @@ UTILS_LOGGER_LEVELS: Dict[str, str] = {
 # ------------------------------------------------------------------------
 
 
+# The fraction of requests whose database queries and template rendering
+# are profiled by ietf.middleware.sql_profile_middleware.  The profiles are
+# logged to the datatracker.sqlprofile logger, and the per-view totals can be
+# had from /api/metrics/sql-profile.  Queries run at least
+# SQL_PROFILE_DUPLICATE_THRESHOLD times in a request are logged as duplicates.
+SQL_PROFILE_SAMPLE_RATE = 0.0
+SQL_PROFILE_DUPLICATE_THRESHOLD = 5
+
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 CSRF_TRUSTED_ORIGINS = ['ietf.org', '*.ietf.org', 'meetecho.com', '*.meetecho.com', 'gather.town', '*.gather.town', ]
 CSRF_COOKIE_SAMESITE = 'None'
@@ -397,8 +421,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.http.ConditionalGetMiddleware',
     'simple_history.middleware.HistoryRequestMiddleware',
-    # comment in this to get logging of SQL insert and update statements:
-    #'ietf.middleware.sql_log_middleware',
+    # profiles a sample of the requests, see SQL_PROFILE_SAMPLE_RATE
+    'ietf.middleware.sql_profile_middleware',
     'ietf.middleware.SMTPExceptionMiddleware',
     'ietf.middleware.Utf8ExceptionMiddleware',
     'ietf.middleware.redirect_trailing_period_middleware',
@@ -612,6 +636,9 @@ TEST_TEMPLATE_IGNORE = [
 
 TEST_COVERAGE_MAIN_FILE = os.path.join(BASE_DIR, "../release-coverage.json")
 TEST_COVERAGE_LATEST_FILE = os.path.join(BASE_DIR, "../latest-coverage.json")
+# Test case class durations of the last parallel test run, used to start the
+# longest ones first in the next
+TEST_DURATIONS_FILE = os.path.join(BASE_DIR, "../test-durations.json")
 
 TEST_CODE_COVERAGE_CHECKER = None
 if SERVER_MODE != 'production':
@@ -731,30 +758,50 @@ CACHES = {
         # No release-specific VERSION setting.
         'KEY_PREFIX': 'ietf:dt',
     },
+    'metrics': {
+        # Shared by all the processes, so that the counters served at
+        # /api/metrics/ are totals over all the workers
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': '127.0.0.1:11211',
+        'KEY_PREFIX': 'ietf:dt:metrics',
+    },
     'htmlized': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/a/cache/datatracker/htmlized',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,      # 100,000
+            'MAX_SIZE': 10 * 1024**3,   # 10 GiB
         },
     },
     'pdfized': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/a/cache/datatracker/pdfized',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,      # 100,000
+            'MAX_SIZE': 20 * 1024**3,   # 20 GiB
         },
     },
     'slowpages': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/a/cache/datatracker/slowpages',
         'OPTIONS': {
-            'MAX_ENTRIES': 5000,
+            'MAX_SIZE': 1024**3,        # 1 GiB
+        },
+    },
+    'draftbundles': {
+        'BACKEND': 'ietf.utils.cache.ShardedFileCache',
+        'LOCATION': '/a/cache/datatracker/draftbundles',
+        'OPTIONS': {
+            'MAX_SIZE': 5 * 1024**3,    # 5 GiB
         },
     },
 }
 
+# Per-draft line caches for incremental generation of the index files
+# in ietf/idindex/.  The caches are dropped when older than the max age.
+IDINDEX_CACHE_DIR = '/a/cache/datatracker/idindex'
+IDINDEX_CACHE_MAX_AGE = 60*60*24        # 1 day
+
 HTMLIZER_VERSION = 1
+PDFIZER_VERSION = 1
 HTMLIZER_URL_PREFIX = "/doc/html"
 HTMLIZER_CACHE_TIME = 60*60*24*14       # 14 days
 PDFIZER_CACHE_TIME = HTMLIZER_CACHE_TIME
@@ -929,6 +976,16 @@ MEETING_MATERIALS_DEFAULT_SUBMISSION_START_DAYS = 90
 MEETING_MATERIALS_DEFAULT_SUBMISSION_CUTOFF_DAYS = 26
 MEETING_MATERIALS_DEFAULT_SUBMISSION_CORRECTION_DAYS = 50
 
+# Agenda snapshots are cached per version of the agenda, see ietf.meeting.agenda_snapshot
+AGENDA_SNAPSHOT_CACHE_TIME = 60*60*24       # 1 day
+AGENDA_SNAPSHOT_LOCK_TIMEOUT = 60           # 1 minute
+
+# The tarballs and combined pdfs of the drafts of a session are built by a
+# celery task and kept in the 'draftbundles' cache
+MEETING_DRAFT_BUNDLE_CACHE_TIME = 60*60*24*7  # 7 days
+MEETING_DRAFT_BUNDLE_BUILD_TIMEOUT = 60*10    # 10 minutes
+MEETING_DRAFT_PDF_WORKERS = 4
+
 MEETING_VALID_UPLOAD_EXTENSIONS = {
     'agenda':       ['.txt','.html','.htm', '.md', ],
     'minutes':      ['.txt','.html','.htm', '.md', '.pdf', ],
@@ -1008,6 +1065,21 @@ HTPASSWD_FILE = "/www/htpasswd"
 # Generation of pdf files
 GHOSTSCRIPT_COMMAND = "/usr/bin/gs"
 
+# External commands run with ietf.utils.pipe are killed after running for
+# EXTERNAL_COMMAND_TIMEOUT seconds, and at most EXTERNAL_COMMAND_WORKERS of
+# those given to submit_command() or run_commands() run at once.  The time
+# each tool takes is logged to the datatracker.commands logger, and the
+# per-tool totals can be had from /api/metrics/external-commands.  The tools
+# in EXTERNAL_COMMAND_LIMITED_TOOLS are also started through prlimit, with
+# at most EXTERNAL_COMMAND_MEMORY_LIMIT bytes of address space and
+# EXTERNAL_COMMAND_CPU_LIMIT seconds of CPU time.
+EXTERNAL_COMMAND_TIMEOUT = 300
+EXTERNAL_COMMAND_WORKERS = 4
+EXTERNAL_COMMAND_MEMORY_LIMIT = 2*1024*1024*1024
+EXTERNAL_COMMAND_CPU_LIMIT = 120
+EXTERNAL_COMMAND_LIMITED_TOOLS = ['gs', 'idnits', 'pyang', 'yanglint']
+PRLIMIT_COMMAND = "/usr/bin/prlimit"
+
 # Generation of bibxml files (currently only for internet drafts)
 BIBXML_BASE_PATH = '/a/ietfdata/derived/bibxml'
 
@@ -1154,6 +1226,10 @@ if DEBUG:
         pass
 
 STATS_NAMES_LIMIT = 25
+STATS_CACHE_TIME = 60*60*24             # 1 day
+STATS_STALE_CACHE_TIME = 60*60*24*7     # 1 week
+STATS_COMPUTE_LOCK_TIMEOUT = 60*5       # 5 minutes
+STATS_REVIEW_CACHE_TIME = 60*15         # 15 minutes
 
 UTILS_MEETING_CONFERENCE_DOMAINS = ['webex.com', 'zoom.us', 'jitsi.org', 'meetecho.com', 'gather.town', ]
 UTILS_TEST_RANDOM_STATE_FILE = '.factoryboy_random_state'
@@ -1175,6 +1251,10 @@ qvNU+qRWi+YXrITsgn92/gVxX5AoK0n+s5Lx7fpjxkARVi66SF6zTJnX
 -----END PRIVATE KEY-----
 """
 
+# The number of objects fetched with each query by the streaming exports
+# of the /api/v1/ resources
+API_EXPORT_CHUNK_SIZE = 1000
+
 
 # Default timeout for HTTP requests via the requests library
 DEFAULT_REQUESTS_TIMEOUT = 20  # seconds
@@ -1232,35 +1312,46 @@ if SERVER_MODE != 'production':
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
             #'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
             #'LOCATION': '127.0.0.1:11211',
-            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
             'VERSION': __version__,
             'KEY_PREFIX': 'ietf:dt',
         },
         'sessions': {
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         },
+        'metrics': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
         'htmlized': {
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
             'LOCATION': '/var/cache/datatracker/htmlized',
             'OPTIONS': {
-                'MAX_ENTRIES': 1000,
+                'MAX_SIZE': 100 * 1024**2,
             },
         },
         'pdfized': {
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
             'LOCATION': '/var/cache/datatracker/pdfized',
             'OPTIONS': {
-                'MAX_ENTRIES': 1000,
+                'MAX_SIZE': 100 * 1024**2,
             },
         },
         'slowpages': {
             'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-            #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
             'LOCATION': '/var/cache/datatracker/',
             'OPTIONS': {
-                'MAX_ENTRIES': 5000,
+                'MAX_SIZE': 100 * 1024**2,
+            },
+        },
+        'draftbundles': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+            #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
+            'LOCATION': '/var/cache/datatracker/draftbundles',
+            'OPTIONS': {
+                'MAX_SIZE': 100 * 1024**2,
             },
         },
     }
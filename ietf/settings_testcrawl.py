@@ -31,28 +31,39 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         # No version-specific VERSION setting.
     },
+    'metrics': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
     'htmlized': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/var/cache/datatracker/htmlized',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 1024**3,
         },
     },
     'pdfized': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/var/cache/datatracker/pdfized',
         'OPTIONS': {
-            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 1024**3,
         },
     },
     'slowpages': {
         'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
-        #'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
         'LOCATION': '/var/cache/datatracker/slowpages',
         'OPTIONS': {
-            'MAX_ENTRIES': 5000,
+            'MAX_SIZE': 1024**3,
+        },
+    },
+    'draftbundles': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        #'BACKEND': 'ietf.utils.cache.ShardedFileCache',
+        'LOCATION': '/var/cache/datatracker/draftbundles',
+        'OPTIONS': {
+            'MAX_SIZE': 1024**3,
         },
     },
 }
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from ietf.stats.models import AffiliationAlias, AffiliationIgnoredEnding, CountryAlias, MeetingRegistration
+from ietf.stats.models import AffiliationAlias, AffiliationIgnoredEnding, CountryAlias, MeetingRegistration, DocumentStats, DocumentAuthorStats
 
 
 class AffiliationAliasAdmin(admin.ModelAdmin):
@@ -26,3 +26,16 @@ class MeetingRegistrationAdmin(admin.ModelAdmin):
     search_fields = ['meeting__number', 'first_name', 'last_name', 'affiliation', 'country_code', 'email', ]
     raw_id_fields = ['person']
 admin.site.register(MeetingRegistration, MeetingRegistrationAdmin)
+
+class DocumentStatsAdmin(admin.ModelAdmin):
+    list_filter = ['rfc', 'formats', ]
+    list_display = ['name', 'rfc', 'latest_time', 'pages', 'words', 'formats', 'authors', 'citations', ]
+    search_fields = ['name', ]
+    raw_id_fields = ['document']
+admin.site.register(DocumentStats, DocumentStatsAdmin)
+
+class DocumentAuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ['name', 'document_stats', 'affiliation', 'country', ]
+    search_fields = ['name', 'document_stats__name', 'affiliation', 'country', ]
+    raw_id_fields = ['document_stats', 'person']
+admin.site.register(DocumentAuthorStats, DocumentAuthorStatsAdmin)
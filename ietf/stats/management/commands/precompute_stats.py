@@ -0,0 +1,68 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+
+import syslog
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import reverse as urlreverse
+from django.utils import timezone
+from django.utils.http import urlencode
+
+import debug                            # pyflakes:ignore
+
+from ietf.meeting.models import Meeting
+from ietf.stats import views
+from ietf.stats.utils import update_document_stats
+
+logtag = __name__.split('.')[-1]
+syslog.openlog(str(logtag), syslog.LOG_PID, syslog.LOG_USER)
+
+MEETING_OVERVIEW_STATS_TYPES = ["overview", "country", "continent"]
+MEETING_STATS_TYPES = ["country", "continent"]
+
+
+class Command(BaseCommand):
+    help = "Rebuild the rollup of document and author facts the document statistics are computed from, and recompute the cached meeting statistics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--latest", type=int, default=2, help="also recompute the statistics for the latest N meetings (default 2)")
+        parser.add_argument("--document", action="store_true", help="only rebuild the document statistics rollup")
+        parser.add_argument("--meeting", action="store_true", help="only recompute the meeting statistics")
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        self.factory = RequestFactory()
+        both = not (options['document'] or options['meeting'])
+
+        if options['document'] or both:
+            start = time.time()
+            count = update_document_stats()
+            self.note("Rolled up the statistics of %d documents in %.1fs" % (count, time.time() - start))
+
+        if options['meeting'] or both:
+            for stats_type in MEETING_OVERVIEW_STATS_TYPES:
+                self.refresh(views.meeting_stats, [], stats_type=stats_type)
+            meetings = Meeting.objects.filter(type="ietf", date__lte=timezone.now()).order_by("-date")[:options['latest']]
+            for meeting in meetings:
+                for stats_type in MEETING_STATS_TYPES:
+                    self.refresh(views.meeting_stats, [], num=meeting.number, stats_type=stats_type)
+
+    def refresh(self, view, params, **kwargs):
+        url = urlreverse(view, kwargs=kwargs)
+        if params:
+            url += "?" + urlencode(params)
+        request = self.factory.get(url)
+        request.user = AnonymousUser()
+        start = time.time()
+        view(request, refresh=True, **kwargs)
+        self.note("Recomputed %s in %.1fs" % (url, time.time() - start))
+
+    def note(self, msg):
+        if self.verbosity > 1:
+            self.stdout.write(msg)
+        else:
+            syslog.syslog(msg)
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-19 14:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import ietf.utils.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doc', '0052_populate_documentsearchtrigram'),
+        ('person', '0031_external_command_metrics_apikey'),
+        ('stats', '0005_meetingregistration_checkedin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The RFC name for RFCs', max_length=255)),
+                ('rfc', models.BooleanField(default=False)),
+                ('latest_time', models.DateTimeField(help_text='Time of the latest revision or publication', null=True)),
+                ('years', models.CharField(blank=True, help_text='Years of the revisions and publication, comma-separated', max_length=255)),
+                ('pages', models.IntegerField(null=True)),
+                ('words', models.IntegerField(null=True)),
+                ('formats', models.CharField(blank=True, help_text='Formats the document was submitted in, comma-separated', max_length=255)),
+                ('formal_languages', models.CharField(blank=True, help_text='Names of the formal languages used, comma-separated', max_length=255)),
+                ('authors', models.IntegerField(default=0)),
+                ('citations', models.IntegerField(default=0, help_text='Number of references to the document')),
+                ('document', ietf.utils.models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='doc.Document')),
+            ],
+            options={
+                'verbose_name_plural': 'document stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DocumentAuthorStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('affiliation', models.CharField(blank=True, max_length=100)),
+                ('country', models.CharField(blank=True, max_length=255)),
+                ('document_stats', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='author_stats', to='stats.DocumentStats')),
+                ('person', ietf.utils.models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='person.Person')),
+            ],
+            options={
+                'verbose_name_plural': 'document author stats',
+            },
+        ),
+    ]
@@ -6,10 +6,11 @@ from django.db import models
 
 import debug                            # pyflakes:ignore
 
+from ietf.doc.models import Document
 from ietf.meeting.models import Meeting
 from ietf.name.models import CountryName
 from ietf.person.models import Person
-from ietf.utils.models import ForeignKey
+from ietf.utils.models import ForeignKey, OneToOneField
 
 
 class AffiliationAlias(models.Model):
@@ -66,3 +67,41 @@ class MeetingRegistration(models.Model):
 
     def __str__(self):
         return "{} {}".format(self.first_name, self.last_name)
+
+class DocumentStats(models.Model):
+    """Facts about a draft, or the RFC it became, which the document
+    statistics are computed from.  Rolled up nightly from the documents
+    and their aliases, events, submissions and references by
+    ietf.stats.utils.update_document_stats()."""
+    document = OneToOneField(Document, related_name="stats")
+    name = models.CharField(max_length=255, help_text="The RFC name for RFCs")
+    rfc = models.BooleanField(default=False)
+    latest_time = models.DateTimeField(null=True, help_text="Time of the latest revision or publication")
+    years = models.CharField(max_length=255, blank=True, help_text="Years of the revisions and publication, comma-separated")
+    pages = models.IntegerField(null=True)
+    words = models.IntegerField(null=True)
+    formats = models.CharField(max_length=255, blank=True, help_text="Formats the document was submitted in, comma-separated")
+    formal_languages = models.CharField(max_length=255, blank=True, help_text="Names of the formal languages used, comma-separated")
+    authors = models.IntegerField(default=0)
+    citations = models.IntegerField(default=0, help_text="Number of references to the document")
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name_plural = "document stats"
+
+class DocumentAuthorStats(models.Model):
+    """An author of a document in DocumentStats, with the affiliation and
+    country given for that document"""
+    document_stats = ForeignKey(DocumentStats, related_name="author_stats")
+    person = ForeignKey(Person)
+    name = models.CharField(max_length=255)
+    affiliation = models.CharField(max_length=100, blank=True)
+    country = models.CharField(max_length=255, blank=True)
+
+    def __str__(self):
+        return "{} of {}".format(self.name, self.document_stats.name)
+
+    class Meta:
+        verbose_name_plural = "document author stats"
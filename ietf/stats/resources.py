@@ -3,15 +3,15 @@
 # Autogenerated by the makeresources management command 2017-02-15 10:10 PST
 
 
-from tastypie.resources import ModelResource
 from tastypie.fields import ToManyField                 # pyflakes:ignore
 from tastypie.constants import ALL, ALL_WITH_RELATIONS  # pyflakes:ignore
 from tastypie.cache import SimpleCache
 
 from ietf import api
+from ietf.api import ModelResource
 from ietf.api import ToOneField                         # pyflakes:ignore
 
-from ietf.stats.models import CountryAlias, AffiliationIgnoredEnding, AffiliationAlias, MeetingRegistration
+from ietf.stats.models import CountryAlias, AffiliationIgnoredEnding, AffiliationAlias, MeetingRegistration, DocumentStats, DocumentAuthorStats
 
 
 from ietf.name.resources import CountryNameResource
@@ -82,3 +82,47 @@ class MeetingRegistrationResource(ModelResource):
             "person": ALL_WITH_RELATIONS,
         }
 api.stats.register(MeetingRegistrationResource())
+
+from ietf.doc.resources import DocumentResource
+class DocumentStatsResource(ModelResource):
+    document         = ToOneField(DocumentResource, 'document')
+    class Meta:
+        queryset = DocumentStats.objects.all()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'documentstats'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "name": ALL,
+            "rfc": ALL,
+            "latest_time": ALL,
+            "years": ALL,
+            "pages": ALL,
+            "words": ALL,
+            "formats": ALL,
+            "formal_languages": ALL,
+            "authors": ALL,
+            "citations": ALL,
+            "document": ALL_WITH_RELATIONS,
+        }
+api.stats.register(DocumentStatsResource())
+
+class DocumentAuthorStatsResource(ModelResource):
+    document_stats   = ToOneField(DocumentStatsResource, 'document_stats')
+    person           = ToOneField(PersonResource, 'person')
+    class Meta:
+        queryset = DocumentAuthorStats.objects.all()
+        serializer = api.Serializer()
+        cache = SimpleCache()
+        #resource_name = 'documentauthorstats'
+        ordering = ['id', ]
+        filtering = { 
+            "id": ALL,
+            "name": ALL,
+            "affiliation": ALL,
+            "country": ALL,
+            "document_stats": ALL_WITH_RELATIONS,
+            "person": ALL_WITH_RELATIONS,
+        }
+api.stats.register(DocumentAuthorStatsResource())
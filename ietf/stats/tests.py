@@ -4,6 +4,7 @@
 
 import calendar
 import datetime
+import hashlib
 import json
 
 from mock import patch
@@ -12,6 +13,9 @@ from requests import Response
 
 import debug    # pyflakes:ignore
 
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.http import HttpResponse
 from django.urls import reverse as urlreverse
 from django.utils import timezone
 
@@ -27,9 +31,11 @@ from ietf.person.factories import PersonFactory
 from ietf.person.models import Person, Email
 from ietf.name.models import FormalLanguageName, DocRelationshipName, CountryName
 from ietf.review.factories import ReviewRequestFactory, ReviewerSettingsFactory, ReviewAssignmentFactory
-from ietf.stats.models import MeetingRegistration, CountryAlias
+from ietf.stats.models import MeetingRegistration, CountryAlias, DocumentStats
 from ietf.stats.factories import MeetingRegistrationFactory
-from ietf.stats.utils import get_meeting_registration_data
+from ietf.stats.utils import get_meeting_registration_data, get_or_compute_stats, update_document_stats, document_stats_version
+from ietf.person.name import plain_name
+from ietf.review.utils import extract_review_assignment_data
 from ietf.utils.timezone import date_today
 
 
@@ -94,6 +100,7 @@ class StatisticsTests(TestCase):
             time=timezone.now() - datetime.timedelta(days=1000)
         )
 
+        call_command('precompute_stats', '--document')
 
         # check redirect
         url = urlreverse(ietf.stats.views.document_stats)
@@ -122,6 +129,49 @@ class StatisticsTests(TestCase):
                     if not stats_type.startswith("yearly"):
                         self.assertTrue(q('table.stats-data'))
 
+        url = urlreverse(ietf.stats.views.document_stats, kwargs={ "stats_type": "author/citations" })
+        r = self.client.get(url)
+        self.assertContains(r, plain_name(Person.objects.get(email__address="aread@example.org").name))
+
+    def test_document_stats_rollup(self):
+        rfc = WgRfcFactory()
+        draft = WgDraftFactory(pages=30, words=4000, authors=[PersonFactory()])
+        author = draft.documentauthor_set.first()
+        DocumentAuthor.objects.filter(pk=author.pk).update(affiliation="Some Inc.", country="Germany")
+        Submission.objects.create(draft=draft, rev=draft.rev, file_types=".txt,.xml", state_id="posted")
+        draft.formal_languages.add(FormalLanguageName.objects.get(slug="xml"))
+        referencing_draft = WgDraftFactory()
+        for relationship in ["refinfo", "refnorm", "updates"]:
+            RelatedDocument.objects.create(source=referencing_draft, target=draft.docalias.first(),
+                                           relationship=DocRelationshipName.objects.get(slug=relationship))
+
+        self.assertEqual(update_document_stats(), 3)
+        self.assertEqual(DocumentStats.objects.count(), 3)
+
+        stats = DocumentStats.objects.get(document=draft)
+        self.assertEqual(stats.name, draft.name)
+        self.assertFalse(stats.rfc)
+        self.assertEqual((stats.pages, stats.words), (30, 4000))
+        self.assertEqual(stats.formats, "TXT,XML")
+        self.assertEqual(stats.formal_languages, "XML")
+        self.assertEqual(stats.citations, 2)
+        self.assertEqual(stats.authors, draft.documentauthor_set.count())
+        self.assertEqual(stats.latest_time, draft.latest_event(type="new_revision").time)
+        self.assertIn(str(stats.latest_time.year), stats.years.split(","))
+        author_stats = stats.author_stats.get(person=author.person)
+        self.assertEqual((author_stats.name, author_stats.affiliation, author_stats.country), (author.person.name, "Some Inc.", "Germany"))
+
+        stats = DocumentStats.objects.get(document=rfc)
+        self.assertTrue(stats.rfc)
+        self.assertEqual(stats.name, rfc.canonical_name())
+
+        # a rebuild replaces the rollup, and gives the statistics new cache keys
+        version = document_stats_version()
+        draft.delete()
+        self.assertEqual(update_document_stats(), 2)
+        self.assertEqual(set(DocumentStats.objects.values_list("document", flat=True)), {rfc.pk, referencing_draft.pk})
+        self.assertNotEqual(document_stats_version(), version)
+
     def test_meeting_stats(self):
         # create some data for the statistics
         meeting = MeetingFactory(type_id='ietf', date=date_today(), number="96")
@@ -156,7 +206,57 @@ class StatisticsTests(TestCase):
             q = PyQuery(r.content)
             self.assertTrue(q('#chart'))
             self.assertTrue(q('table.stats-data'))
-                
+
+    def test_precompute_stats(self):
+        meeting = MeetingFactory(type_id='ietf', date=date_today(), number="96")
+        MeetingRegistrationFactory(country_code='US', meeting=meeting, attended=True)
+        WgRfcFactory()
+
+        with patch('ietf.stats.views.get_or_compute_stats') as mock_compute, patch('ietf.stats.views.render') as mock_render:
+            mock_compute.return_value = {}
+            mock_render.return_value = HttpResponse()
+            call_command('precompute_stats', '--latest', '1')
+            # the meeting overview pages and the pages for the latest meeting
+            self.assertEqual(mock_compute.call_count, 3 + 2)
+            self.assertTrue(all(c[1]['refresh'] for c in mock_compute.call_args_list))
+            keys = set(c[0][0] for c in mock_compute.call_args_list)
+            self.assertEqual(len(keys), mock_compute.call_count)
+        # and the document statistics rollup
+        self.assertEqual(DocumentStats.objects.count(), Document.objects.filter(type="draft").count())
+
+        # the parameter order doesn't change the cache key
+        with patch('ietf.stats.views.get_or_compute_stats') as mock_compute, patch('ietf.stats.views.render') as mock_render:
+            mock_compute.return_value = {}
+            mock_render.return_value = HttpResponse()
+            url = urlreverse(ietf.stats.views.document_stats, kwargs={ "stats_type": "authors" })
+            self.client.get(url + "?type=rfc&time=5y")
+            self.client.get(url + "?time=5y&type=rfc")
+            self.assertEqual(mock_compute.call_args_list[0][0][0], mock_compute.call_args_list[1][0][0])
+
+    def test_get_or_compute_stats(self):
+        computed = []
+        def compute():
+            computed.append(True)
+            return {"computed": len(computed)}
+
+        with patch('ietf.stats.utils.cache', LocMemCache('stats-test', {})) as cache:
+            self.assertEqual(get_or_compute_stats('key', compute, 60), {"computed": 1})
+            self.assertEqual(get_or_compute_stats('key', compute, 60), {"computed": 1})
+            self.assertEqual(get_or_compute_stats('key', compute, 60, refresh=True), {"computed": 2})
+            self.assertEqual(len(computed), 2)
+
+            # while another process is computing the data, the stale copy
+            # is served rather than computing it again
+            cache.delete('key')
+            cache.add("stats:lock:%s" % hashlib.md5(b'key').hexdigest(), True, 60)
+            self.assertEqual(get_or_compute_stats('key', compute, 60), {"computed": 2})
+            self.assertEqual(len(computed), 2)
+
+            # without a stale copy, the request computes the data itself
+            # rather than waiting for the other process
+            cache.delete("stats:stale:%s" % hashlib.md5(b'key').hexdigest())
+            self.assertEqual(get_or_compute_stats('key', compute, 60), {"computed": 3})
+
     def test_known_country_list(self):
         # check redirect
         url = urlreverse(ietf.stats.views.known_countries_list)
@@ -230,6 +330,20 @@ class StatisticsTests(TestCase):
         q = PyQuery(r.content)
         self.assertTrue(q('.review-stats td:contains("1")'))
 
+        # the aggregations are computed once, and shared by the users with
+        # access to the same teams
+        url = urlreverse(ietf.stats.views.review_stats, kwargs={ "stats_type": "completion" })
+        with patch('ietf.stats.utils.cache', LocMemCache('stats-test', {})), \
+             patch('ietf.stats.views.extract_review_assignment_data', wraps=extract_review_assignment_data) as extract:
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.client.logout()
+            self.client.login(username="ad", password="ad+password")
+            r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(PyQuery(r.content)('.review-stats td:contains("1")'))
+            self.assertEqual(extract.call_count, 1)
+
     @patch('requests.get')
     def test_get_meeting_registration_data(self, mock_get):
         '''Test function to get reg data.  Confirm leading/trailing spaces stripped'''
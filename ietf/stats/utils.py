@@ -2,24 +2,139 @@
 # -*- coding: utf-8 -*-
 
 
+import os
 import re
 import requests
 from collections import defaultdict
 
 from django.conf import settings
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
 
 import debug                            # pyflakes:ignore
 
-from ietf.stats.models import AffiliationAlias, AffiliationIgnoredEnding, CountryAlias, MeetingRegistration
+from ietf.doc.models import Document, DocAlias, DocEvent, DocumentAuthor, RelatedDocument, State
+from ietf.stats.models import AffiliationAlias, AffiliationIgnoredEnding, CountryAlias, MeetingRegistration, DocumentStats, DocumentAuthorStats
 from ietf.name.models import CountryName
 from ietf.person.models import Person, Email
+from ietf.submit.models import Submission
+from ietf.utils.cache import get_or_compute, ComputeInProgress
 from ietf.utils.log import log
+from ietf.utils.timezone import RPC_TZINFO
 
 import logging
 logger = logging.getLogger('django')
 
 
+def get_or_compute_stats(cache_key, compute, timeout, refresh=False):
+    """Return the statistics data cached under cache_key, computing it
+    with compute() if it isn't cached, or if refresh is set.
+
+    Only one process computes the data for a key at a time.  While it
+    does so, other requests for the same key get the previous data if
+    there is a stale copy of it, so an expired entry doesn't make every
+    request redo the computation at the same time.  Without a stale
+    copy, the data is computed without waiting for the other process;
+    the statistics are computed from the DocumentStats rollup and the
+    like, so that doesn't take long.  A refresh waits for its turn."""
+    try:
+        return get_or_compute(cache, cache_key, compute, timeout,
+                              lock_timeout=settings.STATS_COMPUTE_LOCK_TIMEOUT,
+                              stale_timeout=max(timeout, settings.STATS_STALE_CACHE_TIME),
+                              refresh=refresh, prefix="stats", wait=refresh)
+    except ComputeInProgress:
+        return compute()
+
+CITATION_RELATIONSHIPS = ['refnorm', 'refinfo', 'refunk', 'refold']
+
+def update_document_stats():
+    """Rebuild the DocumentStats and DocumentAuthorStats rollup of the
+    drafts and RFCs, which the document statistics are computed from.
+    Returns the number of documents."""
+    docs = Document.objects.filter(type="draft")
+
+    rfc_state = State.objects.get(type="draft", slug="rfc")
+    rfc_ids = set(docs.filter(states=rfc_state).values_list("pk", flat=True))
+    rfc_names = dict(DocAlias.objects.filter(docs__type="draft", name__startswith="rfc").values_list("docs", "name"))
+
+    years = defaultdict(set)
+    latest_time = {}
+    events = DocEvent.objects.filter(doc__type="draft", type__in=["published_rfc", "new_revision"]).values_list("doc", "time")
+    for doc_id, time in events.iterator():
+        # RPC_TZINFO is used to match the timezone handling in Document.pub_date()
+        years[doc_id].add(time.astimezone(RPC_TZINFO).year)
+        if doc_id not in latest_time or time > latest_time[doc_id]:
+            latest_time[doc_id] = time
+
+    formal_languages = defaultdict(list)
+    for doc_id, language in docs.filter(formal_languages__isnull=False).values_list("pk", "formal_languages__name"):
+        formal_languages[doc_id].append(language)
+
+    citations = dict(
+        RelatedDocument.objects.filter(relationship__in=CITATION_RELATIONSHIPS, target__docs__type="draft")
+        .values_list("target__docs").annotate(Count("pk"))
+    )
+
+    authors = defaultdict(list)
+    for row in DocumentAuthor.objects.filter(document__type="draft").values_list("document", "person", "person__name", "affiliation", "country").iterator():
+        authors[row[0]].append(row[1:])
+
+    # the formats are those of the latest submission, or the files on disk
+    # for documents which predate the submission tool
+    formats = {}
+    for doc_id, file_types in Submission.objects.filter(draft__type="draft").values_list("draft", "file_types").order_by("submission_date", "id"):
+        if file_types:
+            formats[doc_id] = [ t.lstrip(".").upper() for t in file_types.split(",") ]
+
+    stats = []
+    missing_formats = {}
+    for doc_id, name, rev, pages, words in docs.values_list("pk", "name", "rev", "pages", "words").iterator():
+        s = DocumentStats(
+            document_id=doc_id,
+            name=rfc_names.get(doc_id, name),
+            rfc=doc_id in rfc_ids,
+            latest_time=latest_time.get(doc_id),
+            years=",".join(str(y) for y in sorted(years[doc_id])),
+            pages=pages,
+            words=words,
+            formal_languages=",".join(sorted(formal_languages[doc_id])),
+            authors=len(authors[doc_id]),
+            citations=citations.get(doc_id, 0),
+        )
+        if doc_id not in formats:
+            missing_formats[s.name if s.name.startswith("rfc") else s.name + "-" + rev] = doc_id
+        stats.append(s)
+
+    for filename in os.listdir(settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR) + os.listdir(settings.RFC_PATH):
+        basename, dot, ext = filename.partition(".")
+        ext = ext.lower()
+        if basename in missing_formats and ext in settings.DOCUMENT_FORMAT_ALLOWLIST:
+            formats.setdefault(missing_formats[basename], []).append(ext.upper())
+
+    for s in stats:
+        s.formats = ",".join(sorted(set(formats.get(s.document_id, []))))
+
+    with transaction.atomic():
+        DocumentAuthorStats.objects.all().delete()
+        DocumentStats.objects.all().delete()
+        DocumentStats.objects.bulk_create(stats, batch_size=1000)
+        # bulk_create() doesn't set the ids with every database backend
+        stats_ids = dict(DocumentStats.objects.values_list("document", "pk"))
+        DocumentAuthorStats.objects.bulk_create([
+            DocumentAuthorStats(document_stats_id=stats_ids[doc_id], person_id=person_id, name=name, affiliation=affiliation, country=country)
+            for doc_id, rows in authors.items() if doc_id in stats_ids
+            for person_id, name, affiliation, country in rows
+        ], batch_size=1000)
+
+    return len(stats)
+
+def document_stats_version():
+    """Tells the builds of the DocumentStats rollup apart, for the cache keys
+    of the statistics computed from it.  Each build adds new rows, with
+    higher ids."""
+    return DocumentStats.objects.order_by("-pk").values_list("pk", flat=True).first() or 0
+
 def compile_affiliation_ending_stripping_regexp():
     parts = []
     for ending_re in AffiliationIgnoredEnding.objects.values_list("ending", flat=True):
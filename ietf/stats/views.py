@@ -2,10 +2,10 @@
 # -*- coding: utf-8 -*-
 
 
-import os
 import calendar
 import datetime
 import email.utils
+import hashlib
 import itertools
 import json
 import dateutil.relativedelta
@@ -13,8 +13,7 @@ from collections import defaultdict
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse as urlreverse
@@ -29,18 +28,16 @@ from ietf.review.utils import (extract_review_assignment_data,
                                ReviewAssignmentData,
                                sum_period_review_assignment_stats,
                                sum_raw_review_assignment_aggregations)
-from ietf.submit.models import Submission
 from ietf.group.models import Role, Group
 from ietf.person.models import Person
-from ietf.name.models import ReviewResultName, CountryName, DocRelationshipName, ReviewAssignmentStateName
+from ietf.name.models import ReviewResultName, CountryName, ReviewAssignmentStateName
 from ietf.person.name import plain_name
-from ietf.doc.models import DocAlias, Document, State, DocEvent
 from ietf.meeting.models import Meeting
-from ietf.stats.models import MeetingRegistration, CountryAlias
-from ietf.stats.utils import get_aliased_affiliations, get_aliased_countries, compute_hirsch_index
+from ietf.stats.models import MeetingRegistration, CountryAlias, DocumentStats, DocumentAuthorStats
+from ietf.stats.utils import get_aliased_affiliations, get_aliased_countries, compute_hirsch_index, get_or_compute_stats, document_stats_version
 from ietf.ietfauth.utils import has_role
 from ietf.utils.response import permission_denied
-from ietf.utils.timezone import date_today, DEADLINE_TZINFO, RPC_TZINFO
+from ietf.utils.timezone import date_today, DEADLINE_TZINFO
 
 
 def stats_index(request):
@@ -70,6 +67,11 @@ def generate_query_string(query_dict, overrides):
 
     return query_part
 
+def normalized_query_string(request):
+    # the order of the parameters depends on the path the user took
+    # through the links, but shouldn't matter for the cached data
+    return slugify("&".join(sorted(request.META.get('QUERY_STRING','').split("&"))))
+
 def get_choice(request, get_parameter, possible_choices, multiple=False):
     # the statistics are built with links to make navigation faster,
     # so we don't really have a form in most cases, so just use this
@@ -134,7 +136,7 @@ def add_labeled_top_series_from_bins(chart_data, bins, limit):
             "name": label
         })
 
-def document_stats(request, stats_type=None):
+def document_stats(request, stats_type=None, refresh=False):
     def build_document_stats_url(stats_type_override=Ellipsis, get_overrides=None):
         if get_overrides is None:
             get_overrides={}
@@ -146,9 +148,9 @@ def document_stats(request, stats_type=None):
 
     # the length limitation is to keep the key shorter than memcached's limit
     # of 250 after django has added the key_prefix and key_version parameters
-    cache_key = ("stats:document_stats:%s:%s" % (stats_type, slugify(request.META.get('QUERY_STRING',''))))[:228]
-    data = cache.get(cache_key)
-    if not data:
+    cache_key = ("stats:document_stats:%s:%s:%s" % (document_stats_version(), stats_type, normalized_query_string(request)))[:228]
+
+    def compute_data():
         names_limit = settings.STATS_NAMES_LIMIT
         # statistics types
         possible_document_stats_types = add_url_to_choices([
@@ -175,10 +177,6 @@ def document_stats(request, stats_type=None):
         ], lambda slug: build_document_stats_url(stats_type_override=slug))
 
 
-        if not stats_type:
-            return HttpResponseRedirect(build_document_stats_url(stats_type_override=possible_document_stats_types[0][0]))
-
-
         possible_document_types = add_url_to_choices([
             ("", "All"),
             ("rfc", "RFCs"),
@@ -212,58 +210,33 @@ def document_stats(request, stats_type=None):
         eu_countries = None
 
 
-        if any(stats_type == t[0] for t in possible_document_stats_types):
-            # filter documents
-            docalias_filters = Q(docs__type="draft")
+        # the statistics are computed from the DocumentStats rollup
+        doc_qs = DocumentStats.objects.all()
+        if document_type == "rfc":
+            doc_qs = doc_qs.filter(rfc=True)
+        elif document_type == "draft":
+            doc_qs = doc_qs.filter(rfc=False)
 
-            rfc_state = State.objects.get(type="draft", slug="rfc")
-            if document_type == "rfc":
-                docalias_filters &= Q(docs__states=rfc_state)
-            elif document_type == "draft":
-                docalias_filters &= ~Q(docs__states=rfc_state)
+        if document_type == "rfc":
+            doc_label = "RFC"
+        elif document_type == "draft":
+            doc_label = "draft"
+        else:
+            doc_label = "document"
 
+        if any(stats_type == t[0] for t in possible_document_stats_types):
             if from_time:
-                # this is actually faster than joining in the database,
-                # despite the round-trip back and forth
-                docs_within_time_constraint = list(Document.objects.filter(
-                    type="draft",
-                    docevent__time__gte=from_time,
-                    docevent__type__in=["published_rfc", "new_revision"],
-                ).values_list("pk"))
-
-                docalias_filters &= Q(docs__in=docs_within_time_constraint)
-
-            docalias_qs = DocAlias.objects.filter(docalias_filters)
-
-            if document_type == "rfc":
-                doc_label = "RFC"
-            elif document_type == "draft":
-                doc_label = "draft"
-            else:
-                doc_label = "document"
-
-            total_docs = docalias_qs.values_list("docs__name").distinct().count()
+                doc_qs = doc_qs.filter(latest_time__gte=from_time)
 
-            def generate_canonical_names(values):
-                for doc_id, ts in itertools.groupby(values.order_by("docs__name"), lambda a: a[0]):
-                    chosen = None
-                    for t in ts:
-                        if chosen is None:
-                            chosen = t
-                        else:
-                            if t[1].startswith("rfc"):
-                                chosen = t
-                            elif t[1].startswith("draft") and not chosen[1].startswith("rfc"):
-                                chosen = t
-                    yield chosen
+            total_docs = doc_qs.count()
 
             if stats_type == "authors":
                 stats_title = "Number of authors for each {}".format(doc_label)
 
                 bins = defaultdict(set)
 
-                for name, canonical_name, author_count in generate_canonical_names(docalias_qs.values_list("docs__name", "name").annotate(Count("docs__documentauthor"))):
-                    bins[author_count or 0].add(canonical_name)
+                for name, author_count in doc_qs.values_list("name", "authors"):
+                    bins[author_count or 0].add(name)
 
                 series_data = []
                 for author_count, names in sorted(bins.items(), key=lambda t: t[0]):
@@ -278,8 +251,8 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                for name, canonical_name, pages in generate_canonical_names(docalias_qs.values_list("docs__name", "name", "docs__pages")):
-                    bins[pages or 0].add(canonical_name)
+                for name, pages in doc_qs.values_list("name", "pages"):
+                    bins[pages or 0].add(name)
 
                 series_data = []
                 for pages, names in sorted(bins.items(), key=lambda t: t[0]):
@@ -297,8 +270,8 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                for name, canonical_name, words in generate_canonical_names(docalias_qs.values_list("docs__name", "name", "docs__words")):
-                    bins[put_into_bin(words, bin_size)].add(canonical_name)
+                for name, words in doc_qs.values_list("name", "words"):
+                    bins[put_into_bin(words, bin_size)].add(name)
 
                 series_data = []
                 for (value, words), names in sorted(bins.items(), key=lambda t: t[0][0]):
@@ -315,43 +288,10 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                # on new documents, we should have a Submission row with the file types
-                submission_types = {}
-
-                for doc_name, file_types in Submission.objects.values_list("draft", "file_types").order_by("submission_date", "id"):
-                    submission_types[doc_name] = file_types
-
-                doc_names_with_missing_types = {}
-                for doc_name, canonical_name, rev in generate_canonical_names(docalias_qs.values_list("docs__name", "name", "docs__rev")):
-                    types = submission_types.get(doc_name)
-                    if types:
-                        for dot_ext in types.split(","):
-                            bins[dot_ext.lstrip(".").upper()].add(canonical_name)
-
-                    else:
-
-                        if canonical_name.startswith("rfc"):
-                            filename = canonical_name
-                        else:
-                            filename = canonical_name + "-" + rev
-
-                        doc_names_with_missing_types[filename] = canonical_name
-
-                # look up the remaining documents on disk
-                for filename in itertools.chain(os.listdir(settings.INTERNET_ALL_DRAFTS_ARCHIVE_DIR), os.listdir(settings.RFC_PATH)):
-                    t = filename.split(".", 1)
-                    if len(t) != 2:
-                        continue
-
-                    basename, ext = t
-                    ext = ext.lower()
-                    if not any(ext==allowlisted_ext for allowlisted_ext in settings.DOCUMENT_FORMAT_ALLOWLIST):
-                        continue
-
-                    canonical_name = doc_names_with_missing_types.get(basename)
-
-                    if canonical_name:
-                        bins[ext.upper()].add(canonical_name)
+                for name, formats in doc_qs.values_list("name", "formats"):
+                    for fmt in formats.split(","):
+                        if fmt:
+                            bins[fmt].add(name)
 
                 series_data = []
                 for fmt, names in sorted(bins.items(), key=lambda t: t[0]):
@@ -367,56 +307,30 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                for name, canonical_name, formal_language_name in generate_canonical_names(docalias_qs.values_list("docs__name", "name", "docs__formal_languages__name")):
-                    bins[formal_language_name or ""].add(canonical_name)
+                for name, formal_languages in doc_qs.values_list("name", "formal_languages"):
+                    for formal_language in formal_languages.split(","):
+                        bins[formal_language].add(name)
 
                 series_data = []
                 for formal_language, names in sorted(bins.items(), key=lambda t: t[0]):
                     percentage = len(names) * 100.0 / (total_docs or 1)
-                    if formal_language is not None:
-                        series_data.append((formal_language, len(names)))
-                        table_data.append((formal_language, percentage, len(names), list(names)[:names_limit]))
+                    series_data.append((formal_language, len(names)))
+                    table_data.append((formal_language, percentage, len(names), list(names)[:names_limit]))
 
                 chart_data.append({ "data": series_data })
 
         elif any(stats_type == t[0] for t in possible_author_stats_types):
-            person_filters = Q(documentauthor__document__type="draft")
-
-            # filter persons
-            rfc_state = State.objects.get(type="draft", slug="rfc")
-            if document_type == "rfc":
-                person_filters &= Q(documentauthor__document__states=rfc_state)
-            elif document_type == "draft":
-                person_filters &= ~Q(documentauthor__document__states=rfc_state)
-
             if from_time:
-                # this is actually faster than joining in the database,
-                # despite the round-trip back and forth
-                docs_within_time_constraint = set(Document.objects.filter(
-                    type="draft",
-                    docevent__time__gte=from_time,
-                    docevent__type__in=["published_rfc", "new_revision"],
-                ).values_list("pk"))
-
-                person_filters &= Q(documentauthor__document__in=docs_within_time_constraint)
-
-            person_qs = Person.objects.filter(person_filters)
-
-            if document_type == "rfc":
-                doc_label = "RFC"
-            elif document_type == "draft":
-                doc_label = "draft"
-            else:
-                doc_label = "document"
+                doc_qs = doc_qs.filter(latest_time__gte=from_time)
+
+            author_qs = DocumentAuthorStats.objects.filter(document_stats__in=doc_qs)
 
             if stats_type == "author/documents":
                 stats_title = "Number of {}s per author".format(doc_label)
 
                 bins = defaultdict(set)
 
-                person_qs = Person.objects.filter(person_filters)
-
-                for name, document_count in person_qs.values_list("name").annotate(Count("documentauthor")):
+                for name, document_count in author_qs.values_list("name").annotate(Count("pk")):
                     bins[document_count or 0].add(name)
 
                 total_persons = count_bins(bins)
@@ -435,16 +349,11 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                person_qs = Person.objects.filter(person_filters)
-
                 # Since people don't write the affiliation names in the
                 # same way, and we don't want to go back and edit them
                 # either, we transform them here.
 
-                name_affiliation_set = {
-                    (name, affiliation)
-                    for name, affiliation in person_qs.values_list("name", "documentauthor__affiliation")
-                }
+                name_affiliation_set = set(author_qs.values_list("name", "affiliation").distinct())
 
                 aliases = get_aliased_affiliations(affiliation for _, affiliation in name_affiliation_set)
 
@@ -475,16 +384,11 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                person_qs = Person.objects.filter(person_filters)
-
                 # Since people don't write the country names in the
                 # same way, and we don't want to go back and edit them
                 # either, we transform them here.
 
-                name_country_set = {
-                    (name, country)
-                    for name, country in person_qs.values_list("name", "documentauthor__country")
-                }
+                name_country_set = set(author_qs.values_list("name", "country").distinct())
 
                 aliases = get_aliased_countries(country for _, country in name_country_set)
 
@@ -526,12 +430,7 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                person_qs = Person.objects.filter(person_filters)
-
-                name_country_set = {
-                    (name, country)
-                    for name, country in person_qs.values_list("name", "documentauthor__country")
-                }
+                name_country_set = set(author_qs.values_list("name", "country").distinct())
 
                 aliases = get_aliased_countries(country for _, country in name_country_set)
 
@@ -562,12 +461,9 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                cite_relationships = list(DocRelationshipName.objects.filter(slug__in=['refnorm', 'refinfo', 'refunk', 'refold']))
-                person_filters &= Q(documentauthor__document__docalias__relateddocument__relationship__in=cite_relationships)
-
-                person_qs = Person.objects.filter(person_filters)
+                cited_qs = author_qs.filter(document_stats__citations__gt=0)
 
-                for name, citations in person_qs.values_list("name").annotate(Count("documentauthor__document__docalias__relateddocument")):
+                for name, citations in cited_qs.values_list("name").annotate(Sum("document_stats__citations")):
                     bins[citations or 0].add(name)
 
                 total_persons = count_bins(bins)
@@ -586,14 +482,11 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                cite_relationships = list(DocRelationshipName.objects.filter(slug__in=['refnorm', 'refinfo', 'refunk', 'refold']))
-                person_filters &= Q(documentauthor__document__docalias__relateddocument__relationship__in=cite_relationships)
+                cited_qs = author_qs.filter(document_stats__citations__gt=0)
 
-                person_qs = Person.objects.filter(person_filters)
-
-                values = person_qs.values_list("name", "documentauthor__document").annotate(Count("documentauthor__document__docalias__relateddocument"))
-                for name, ts in itertools.groupby(values.order_by("name"), key=lambda t: t[0]):
-                    h_index = compute_hirsch_index([citations for _, document, citations in ts])
+                values = cited_qs.values_list("name", "document_stats__citations").order_by("name")
+                for name, ts in itertools.groupby(values, key=lambda t: t[0]):
+                    h_index = compute_hirsch_index([citations for _, citations in ts])
                     bins[h_index or 0].add(name)
 
                 total_persons = count_bins(bins)
@@ -608,75 +501,39 @@ def document_stats(request, stats_type=None):
                 chart_data.append({ "data": sorted(series_data, key=lambda t: t[0]) })
 
         elif any(stats_type == t[0] for t in possible_yearly_stats_types):
-
-            person_filters = Q(documentauthor__document__type="draft")
-
-            # filter persons
-            rfc_state = State.objects.get(type="draft", slug="rfc")
-            if document_type == "rfc":
-                person_filters &= Q(documentauthor__document__states=rfc_state)
-            elif document_type == "draft":
-                person_filters &= ~Q(documentauthor__document__states=rfc_state)
-
-            doc_years = defaultdict(set)
-
-            docevent_qs = DocEvent.objects.filter(
-                doc__type="draft",
-                type__in=["published_rfc", "new_revision"],
-            ).values_list("doc", "time").order_by("doc")
-
-            for doc_id, time in docevent_qs.iterator():
-                # RPC_TZINFO is used to match the timezone handling in Document.pub_date()
-                doc_years[doc_id].add(time.astimezone(RPC_TZINFO).year)
-
-            person_qs = Person.objects.filter(person_filters)
-
-            if document_type == "rfc":
-                doc_label = "RFC"
-            elif document_type == "draft":
-                doc_label = "draft"
-            else:
-                doc_label = "document"
+            # the time choice limits the years rather than the documents
+            author_qs = DocumentAuthorStats.objects.filter(document_stats__in=doc_qs)
 
             template_name = "yearly"
 
             years_from = from_time.year if from_time else 1
             years_to = timezone.now().year - 1
 
+            def years_within(years):
+                return [ y for y in (int(y) for y in years.split(",") if y) if years_from <= y <= years_to ]
 
             if stats_type == "yearly/affiliation":
                 stats_title = "Number of {} authors per affiliation over the years".format(doc_label)
 
-                person_qs = Person.objects.filter(person_filters)
+                name_affiliation_years_set = set(author_qs.values_list("name", "affiliation", "document_stats__years").distinct())
 
-                name_affiliation_doc_set = {
-                    (name, affiliation, doc)
-                    for name, affiliation, doc in person_qs.values_list("name", "documentauthor__affiliation", "documentauthor__document")
-                }
-
-                aliases = get_aliased_affiliations(affiliation for _, affiliation, _ in name_affiliation_doc_set)
+                aliases = get_aliased_affiliations(affiliation for _, affiliation, _ in name_affiliation_years_set)
 
                 bins = defaultdict(set)
-                for name, affiliation, doc in name_affiliation_doc_set:
+                for name, affiliation, years in name_affiliation_years_set:
                     a = aliases.get(affiliation, affiliation)
                     if a:
-                        for year in doc_years.get(doc):
-                            if years_from <= year <= years_to:
-                                bins[(year, a)].add(name)
+                        for year in years_within(years):
+                            bins[(year, a)].add(name)
 
                 add_labeled_top_series_from_bins(chart_data, bins, limit=8)
 
             elif stats_type == "yearly/country":
                 stats_title = "Number of {} authors per country over the years".format(doc_label)
 
-                person_qs = Person.objects.filter(person_filters)
-
-                name_country_doc_set = {
-                    (name, country, doc)
-                    for name, country, doc in person_qs.values_list("name", "documentauthor__country", "documentauthor__document")
-                }
+                name_country_years_set = set(author_qs.values_list("name", "country", "document_stats__years").distinct())
 
-                aliases = get_aliased_countries(country for _, country, _ in name_country_doc_set)
+                aliases = get_aliased_countries(country for _, country, _ in name_country_years_set)
 
                 countries = { c.name: c for c in CountryName.objects.all() }
                 eu_name = "EU"
@@ -684,18 +541,16 @@ def document_stats(request, stats_type=None):
 
                 bins = defaultdict(set)
 
-                for name, country, doc in name_country_doc_set:
+                for name, country, years in name_country_years_set:
                     country_name = aliases.get(country, country)
                     c = countries.get(country_name)
 
-                    years = doc_years.get(doc)
-                    if country_name and years:
-                        for year in years:
-                            if years_from <= year <= years_to:
-                                bins[(year, country_name)].add(name)
+                    if country_name:
+                        for year in years_within(years):
+                            bins[(year, country_name)].add(name)
 
-                                if c and c.in_eu:
-                                    bins[(year, eu_name)].add(name)
+                            if c and c.in_eu:
+                                bins[(year, eu_name)].add(name)
 
                 add_labeled_top_series_from_bins(chart_data, bins, limit=8)
 
@@ -703,27 +558,21 @@ def document_stats(request, stats_type=None):
             elif stats_type == "yearly/continent":
                 stats_title = "Number of {} authors per continent".format(doc_label)
 
-                person_qs = Person.objects.filter(person_filters)
-
-                name_country_doc_set = {
-                    (name, country, doc)
-                    for name, country, doc in person_qs.values_list("name", "documentauthor__country", "documentauthor__document")
-                }
+                name_country_years_set = set(author_qs.values_list("name", "country", "document_stats__years").distinct())
 
-                aliases = get_aliased_countries(country for _, country, _ in name_country_doc_set)
+                aliases = get_aliased_countries(country for _, country, _ in name_country_years_set)
 
                 country_to_continent = dict(CountryName.objects.values_list("name", "continent__name"))
 
                 bins = defaultdict(set)
 
-                for name, country, doc in name_country_doc_set:
+                for name, country, years in name_country_years_set:
                     country_name = aliases.get(country, country)
                     continent_name = country_to_continent.get(country_name, "")
 
                     if continent_name:
-                        for year in doc_years.get(doc):
-                            if years_from <= year <= years_to:
-                                bins[(year, continent_name)].add(name)
+                        for year in years_within(years):
+                            bins[(year, continent_name)].add(name)
 
                 add_labeled_top_series_from_bins(chart_data, bins, limit=8)
 
@@ -747,9 +596,12 @@ def document_stats(request, stats_type=None):
             "eu_countries": sorted(eu_countries or [], key=lambda c: c.name),
             "content_template": "stats/document_stats_{}.html".format(template_name),
         }
-        # Logs are full of these, but nobody is using them
-        # log("Cache miss for '%s'.  Data size: %sk" % (cache_key, len(str(data))/1000))
-        cache.set(cache_key, data, 24*60*60)
+        return data
+
+    if not stats_type:
+        return HttpResponseRedirect(build_document_stats_url(stats_type_override="authors"))
+
+    data = get_or_compute_stats(cache_key, compute_data, settings.STATS_CACHE_TIME, refresh=refresh)
     return render(request, "stats/document_stats.html", data)
 
 def known_countries_list(request, stats_type=None, acronym=None):
@@ -763,7 +615,7 @@ def known_countries_list(request, stats_type=None, acronym=None):
         "countries": countries,
     })
 
-def meeting_stats(request, num=None, stats_type=None):
+def meeting_stats(request, num=None, stats_type=None, refresh=False):
     meeting = None
     if num is not None:
         meeting = get_object_or_404(Meeting, number=num, type="ietf")
@@ -780,9 +632,9 @@ def meeting_stats(request, num=None, stats_type=None):
 
         return urlreverse(meeting_stats, kwargs={ k: v for k, v in kwargs.items() if v is not None }) + generate_query_string(request.GET, get_overrides)
 
-    cache_key = ("stats:meeting_stats:%s:%s:%s" % (num, stats_type, slugify(request.META.get('QUERY_STRING',''))))[:228]
-    data = cache.get(cache_key)
-    if not data:
+    cache_key = ("stats:meeting_stats:%s:%s:%s" % (num, stats_type, normalized_query_string(request)))[:228]
+
+    def compute_data():
         names_limit = settings.STATS_NAMES_LIMIT
         # statistics types
         if meeting:
@@ -797,9 +649,6 @@ def meeting_stats(request, num=None, stats_type=None):
                 ("continent", "Continent"),
             ], lambda slug: build_meeting_stats_url(number=None, stats_type_override=slug))
 
-        if not stats_type:
-            return HttpResponseRedirect(build_meeting_stats_url(number=num, stats_type_override=possible_stats_types[0][0]))
-
         chart_data = []
         piechart_data = []
         table_data = []
@@ -1005,10 +854,12 @@ def meeting_stats(request, num=None, stats_type=None):
             "eu_countries": sorted(eu_countries or [], key=lambda c: c.name),
             "content_template": "stats/meeting_stats_{}.html".format(template_name),
         }
-        # Logs are full of these, but nobody is using them...
-        # log("Cache miss for '%s'.  Data size: %sk" % (cache_key, len(str(data))/1000))
-        cache.set(cache_key, data, 24*60*60)
-    #
+        return data
+
+    if not stats_type:
+        return HttpResponseRedirect(build_meeting_stats_url(number=num, stats_type_override="country" if meeting else "overview"))
+
+    data = get_or_compute_stats(cache_key, compute_data, settings.STATS_CACHE_TIME, refresh=refresh)
     return render(request, "stats/meeting_stats.html", data)
 
 
@@ -1142,6 +993,16 @@ def review_stats(request, stats_type=None, acronym=None):
         group_by_objs = { r.pk: r for r in query_reviewers }
         group_by_index = ReviewAssignmentData._fields.index("reviewer")
 
+    def get_raw_aggregations(kind, compute):
+        # the aggregations depend only on these, not on the user
+        key = hashlib.md5(repr((
+            kind, level, count,
+            [t.pk for t in query_teams],
+            [r.pk for r in query_reviewers] if query_reviewers is not None else None,
+            from_time.isoformat(), to_time.isoformat(),
+        )).encode()).hexdigest()
+        return get_or_compute_stats("stats:review_stats:%s" % key, compute, settings.STATS_REVIEW_CACHE_TIME)
+
     # now filter and aggregate the data
     possible_teams = possible_completion_types = possible_results = possible_states = None
     selected_teams = selected_completion_type = selected_result = selected_state = None
@@ -1164,8 +1025,6 @@ def review_stats(request, stats_type=None, acronym=None):
         )
         query_teams = [t for t in query_teams if t.acronym in selected_teams]
 
-        extracted_data = extract_review_assignment_data(query_teams, query_reviewers, from_time, to_time)
-
         req_time_index = ReviewAssignmentData._fields.index("req_time")
 
         def time_key_fn(t):
@@ -1175,11 +1034,17 @@ def review_stats(request, stats_type=None, acronym=None):
             d -= datetime.timedelta(days=d.day-1) # monthly 
             return d
 
+        def compute_raw_aggrs():
+            extracted_data = extract_review_assignment_data(query_teams, query_reviewers, from_time, to_time)
+            return [
+                (d, aggregate_raw_period_review_assignment_stats(request_data_items, count=count))
+                for d, request_data_items in itertools.groupby(extracted_data, key=time_key_fn)
+            ]
+
         found_results = set()
         found_states = set()
         aggrs = []
-        for d, request_data_items in itertools.groupby(extracted_data, key=time_key_fn):
-            raw_aggr = aggregate_raw_period_review_assignment_stats(request_data_items, count=count)
+        for d, raw_aggr in get_raw_aggregations("time", compute_raw_aggrs):
             aggr = sum_period_review_assignment_stats(raw_aggr)
 
             aggrs.append((d, aggr))
@@ -1250,15 +1115,19 @@ def review_stats(request, stats_type=None, acronym=None):
             data = json.dumps(graph_data)
 
     else: # tabular data
-        extracted_data = extract_review_assignment_data(query_teams, query_reviewers, from_time, to_time, ordering=[level])
+        def compute_raw_aggrs():
+            extracted_data = extract_review_assignment_data(query_teams, query_reviewers, from_time, to_time, ordering=[level])
+            return [
+                (group_pk, aggregate_raw_period_review_assignment_stats(request_data_items, count=count))
+                for group_pk, request_data_items in itertools.groupby(extracted_data, key=lambda t: t[group_by_index])
+            ]
 
         data = []
 
         found_results = set()
         found_states = set()
         raw_aggrs = []
-        for group_pk, request_data_items in itertools.groupby(extracted_data, key=lambda t: t[group_by_index]):
-            raw_aggr = aggregate_raw_period_review_assignment_stats(request_data_items, count=count)
+        for group_pk, raw_aggr in get_raw_aggregations("table", compute_raw_aggrs):
             raw_aggrs.append(raw_aggr)
 
             aggr = sum_period_review_assignment_stats(raw_aggr)
@@ -16,7 +16,7 @@ import debug                            # pyflakes:ignore
 
 from ietf.utils.log import log, assertion
 from ietf.utils.models import VersionInfo
-from ietf.utils.pipe import pipe
+from ietf.utils.pipe import pipe, submit_command, command_from_template
 from ietf.utils.test_runner import set_coverage_checking
 
 class DraftSubmissionChecker(object):
@@ -62,7 +62,7 @@ class DraftIdnitsChecker(object):
         assert isinstance(options, list)
         if not "--nitcount" in options:
             options.append("--nitcount")
-        self.options = ' '.join(options)
+        self.options = options
 
     def check_file_txt(self, path):
         """
@@ -79,12 +79,12 @@ class DraftIdnitsChecker(object):
         warnstart = ['  == ', '  -- ']
         
 
-        cmd = "%s %s %s" % (settings.IDSUBMIT_IDNITS_BINARY, self.options, path)
+        cmd = [settings.IDSUBMIT_IDNITS_BINARY] + self.options + [path]
         code, out, err = pipe(cmd)
         out = out.decode('utf-8')
         err = err.decode('utf-8')
         if code != 0 or out == "":
-            message = "idnits error: %s:\n  Error %s: %s" %( cmd, code, err)
+            message = "idnits error: %s:\n  Error %s: %s" %( ' '.join(cmd), code, err)
             log(message)
             passed = False
             
@@ -189,6 +189,38 @@ class DraftYangChecker(object):
             "items": [],
         })
 
+        modpath = ':'.join([
+                            workdir,
+                            settings.SUBMIT_YANG_RFC_MODEL_DIR,
+                            settings.SUBMIT_YANG_DRAFT_MODEL_DIR,
+                            settings.SUBMIT_YANG_IANA_MODEL_DIR,
+                            settings.SUBMIT_YANG_CATALOG_MODEL_DIR,
+                        ])
+        venv_path = os.environ.get('VIRTUAL_ENV') or os.path.join(os.getcwd(), 'env')
+        venv_bin = os.path.join(venv_path, 'bin')
+        if not venv_bin in os.environ.get('PATH', '').split(':'):
+            os.environ['PATH'] = os.environ.get('PATH', '') + ":" + venv_bin
+
+        # The validators are run for all the models at once, on the command
+        # pool, and their results picked up below
+        pyang_template = settings.SUBMIT_PYANG_COMMAND
+        yanglint_template = settings.SUBMIT_YANGLINT_COMMAND
+        if not os.path.exists(settings.YANGLINT_BINARY):
+            yanglint_template = None
+        pyang_runs = {}
+        yanglint_runs = {}
+        for model in model_list:
+            path = os.path.join(workdir, model)
+            if os.path.exists(path):
+                pyang_runs[model] = submit_command(command_from_template(pyang_template, libs=modpath, model=path))
+                set_coverage_checking(False) # we can't count the following as it may or may not be run, depending on setup
+                if yanglint_template:
+                    yanglint_runs[model] = submit_command(command_from_template(yanglint_template, model=path,
+                        rfclib=settings.SUBMIT_YANG_RFC_MODEL_DIR, tmplib=workdir,
+                        draftlib=settings.SUBMIT_YANG_DRAFT_MODEL_DIR, ianalib=settings.SUBMIT_YANG_IANA_MODEL_DIR,
+                        cataloglib=settings.SUBMIT_YANG_CATALOG_MODEL_DIR, ))
+                set_coverage_checking(True)
+
         for model in model_list:
             path = os.path.join(workdir, model)
             message = ""
@@ -196,28 +228,17 @@ class DraftYangChecker(object):
             errors = 0
             warnings = 0
             items = []
-            modpath = ':'.join([
-                                workdir,
-                                settings.SUBMIT_YANG_RFC_MODEL_DIR,
-                                settings.SUBMIT_YANG_DRAFT_MODEL_DIR,
-                                settings.SUBMIT_YANG_IANA_MODEL_DIR,
-                                settings.SUBMIT_YANG_CATALOG_MODEL_DIR,
-                            ])
-            if os.path.exists(path):
+            if model in pyang_runs:
                 with io.open(path) as file:
                     text = file.readlines()
                 # pyang
-                cmd_template = settings.SUBMIT_PYANG_COMMAND
+                cmd_template = pyang_template
                 command = [ w for w in cmd_template.split() if not '=' in w ][0]
                 cmd_version = VersionInfo.objects.get(command=command).version
-                cmd = cmd_template.format(libs=modpath, model=path)
-                venv_path = os.environ.get('VIRTUAL_ENV') or os.path.join(os.getcwd(), 'env')
-                venv_bin = os.path.join(venv_path, 'bin')
-                if not venv_bin in os.environ.get('PATH', '').split(':'):
-                    os.environ['PATH'] = os.environ.get('PATH', '') + ":" + venv_bin
-                code, out, err = pipe(cmd)
-                out = out.decode('utf-8')
-                err = err.decode('utf-8')
+                result = pyang_runs[model].result()
+                code = result.code
+                out = result.out.decode('utf-8')
+                err = result.err.decode('utf-8')
                 if code > 0 or len(err.strip()) > 0 :
                     error_lines = err.splitlines()
                     assertion('len(error_lines) > 0')
@@ -242,16 +263,14 @@ class DraftYangChecker(object):
 
                 # yanglint
                 set_coverage_checking(False) # we can't count the following as it may or may not be run, depending on setup
-                if settings.SUBMIT_YANGLINT_COMMAND and os.path.exists(settings.YANGLINT_BINARY):
-                    cmd_template = settings.SUBMIT_YANGLINT_COMMAND
+                if model in yanglint_runs:
+                    cmd_template = yanglint_template
                     command = [ w for w in cmd_template.split() if not '=' in w ][0]
                     cmd_version = VersionInfo.objects.get(command=command).version
-                    cmd = cmd_template.format(model=path, rfclib=settings.SUBMIT_YANG_RFC_MODEL_DIR, tmplib=workdir,
-                        draftlib=settings.SUBMIT_YANG_DRAFT_MODEL_DIR, ianalib=settings.SUBMIT_YANG_IANA_MODEL_DIR,
-                        cataloglib=settings.SUBMIT_YANG_CATALOG_MODEL_DIR, )
-                    code, out, err = pipe(cmd)
-                    out = out.decode('utf-8')
-                    err = err.decode('utf-8')
+                    result = yanglint_runs[model].result()
+                    code = result.code
+                    out = result.out.decode('utf-8')
+                    err = result.err.decode('utf-8')
                     if code > 0 or len(err.strip()) > 0:
                         err_lines = err.splitlines()
                         for line in err_lines:
@@ -270,9 +289,6 @@ class DraftYangChecker(object):
                 errors += 1
                 message += "No such file: %s\nPossible mismatch between extracted xym file name and returned module name?\n" % (path)
 
-            dest = os.path.join(settings.SUBMIT_YANG_DRAFT_MODEL_DIR, model)
-            shutil.move(path, dest)
-
             # summary result
             results.append({
                 "name": model,
@@ -283,6 +299,12 @@ class DraftYangChecker(object):
                 "items": items,
             })
 
+        # the models are moved only now, as the validators of the other
+        # models may have been looking for them in the workdir
+        for model in model_list:
+            path = os.path.join(workdir, model)
+            dest = os.path.join(settings.SUBMIT_YANG_DRAFT_MODEL_DIR, model)
+            shutil.move(path, dest)
 
         shutil.rmtree(workdir)
 
@@ -33,6 +33,7 @@ from ietf.doc.utils import (add_state_change_event, rebuild_reference_relations,
     set_replaces_for_document, prettify_std_name, update_doc_extresources, 
     can_edit_docextresources, update_documentauthors, update_action_holders,
     bibxml_for_draft )
+from ietf.doc.tasks import prerender_documents_task
 from ietf.doc.mails import send_review_possibly_replaces_request, send_external_resource_change_request
 from ietf.group.models import Group
 from ietf.ietfauth.utils import has_role
@@ -456,6 +457,9 @@ def post_submission(request, submission, approved_doc_desc, approved_subm_desc):
     update_name_contains_indexes_with_new_doc(draft)
     log.log(f"{submission.name}: updated replaces and indexes")
 
+    # render the new revision in the background, so the first readers don't have to wait for it
+    transaction.on_commit(lambda: prerender_documents_task.delay([draft.name]))
+
     # See whether a change to external resources is requested. Test for equality of sets is ugly,
     # but works.
     draft_resources = '\n'.join(sorted(str(r) for r in draft.docextresource_set.all()))
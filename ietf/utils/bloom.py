@@ -0,0 +1,39 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+import hashlib
+import math
+
+import debug                            # pyflakes:ignore
+
+
+class BloomFilter(object):
+    """A compact set of strings.  Checking for a string which was added is
+    always true, but checking for one which wasn't is also true with the
+    probability error_rate, for up to capacity strings.  At the default
+    error rate of 1%, each string takes 1.2 bytes."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.size = max(64, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # the positions are derived from two hashes, see Kirsch and
+        # Mitzenmacher, "Less Hashing, Same Performance"
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [ (h1 + i * h2) % self.size for i in range(self.hashes) ]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
@@ -0,0 +1,332 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""File based cache backend for large values.
+
+Django's FileBasedCache keeps all entries in one directory, pickles and
+compresses every value, and culls by listing the whole directory and
+removing a random fraction of the entries whenever it holds more than
+MAX_ENTRIES.  With a cache full of PDFs, that makes a cache set take
+seconds.
+
+ShardedFileCache instead spreads the entries over two levels of
+subdirectories, stores bytes and str values as they are, and bounds the
+cache by the total size of the entries rather than their number.  The
+size is tracked in a small file, and only when it goes over MAX_SIZE is
+the cache scanned, removing expired entries and then the least recently
+used ones (by access time, which is bumped explicitly on reads) until
+the size is below CULL_TO times MAX_SIZE.  The scan runs in a thread of
+its own, so the cache set which goes over MAX_SIZE doesn't wait for it.
+Values stored as bytes can also be had as an open file with get_file(),
+for streaming responses.
+
+This module also has get_or_compute(), which makes sure that only one
+process at a time computes an expensive value for any cache.
+
+Example configuration:
+
+    'pdfized': {
+        'BACKEND': 'ietf.utils.cache.ShardedFileCache',
+        'LOCATION': '/a/cache/datatracker/pdfized',
+        'OPTIONS': {
+            'MAX_SIZE': 10 * 1024**3,   # bytes
+        },
+    },
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class ShardedFileCache(BaseCache):
+    cache_suffix = '.djcache'
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    # the kinds of values, stored in the entry header
+    BYTES = b'b'
+    STR = b's'
+    PICKLE = b'p'
+
+    def __init__(self, dir, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._dir = os.path.abspath(dir)
+        self._max_size = int(options.get('MAX_SIZE', 1024**3))
+        self._cull_to = float(options.get('CULL_TO', 0.9))
+        # don't write a new access time on every read
+        self._atime_resolution = int(options.get('ATIME_RESOLUTION', 60 * 60))
+        self._size_file = os.path.join(self._dir, 'size')
+        self._cull_lock_file = os.path.join(self._dir, 'cull.lock')
+        self._cull_thread = None
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if self.has_key(key, version):
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def get(self, key, default=None, version=None):
+        f = self._open_entry(self._key_to_file(key, version))
+        if f is None:
+            return default
+        with f:
+            kind = f.kind
+            data = f.read()
+        if kind == self.BYTES:
+            return data
+        elif kind == self.STR:
+            return data.decode('utf-8')
+        return pickle.loads(data)
+
+    def get_file(self, key, version=None):
+        """Return an open binary file positioned at the start of the value
+        for key, if the value is in the cache and was stored as bytes,
+        otherwise None.  The caller must close the file.
+
+        The file starts with the entry header, so the size of the value,
+        which e.g. a FileResponse should give as its Content-Length, is
+        f.size, not the size of the file."""
+        f = self._open_entry(self._key_to_file(key, version))
+        if f is None:
+            return None
+        if f.kind != self.BYTES:
+            f.close()
+            return None
+        f.size = os.fstat(f.fileno()).st_size - f.tell()
+        return f
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        if isinstance(value, bytes):
+            kind, data = self.BYTES, value
+        elif isinstance(value, str):
+            kind, data = self.STR, value.encode('utf-8')
+        else:
+            kind, data = self.PICKLE, pickle.dumps(value, self.pickle_protocol)
+        expiry = self.get_backend_timeout(timeout)
+
+        dirname = os.path.dirname(fname)
+        os.makedirs(dirname, 0o700, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname)
+        renamed = False
+        try:
+            with open(fd, 'wb') as f:
+                f.write(b'%s %r\n' % (kind, expiry or 0.0))
+                f.write(data)
+                size = f.tell()
+            old_size = self._file_size(fname)
+            os.replace(tmp_path, fname)
+            renamed = True
+        finally:
+            if not renamed:
+                os.remove(tmp_path)
+        self._update_size(size - old_size)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self.get(key, self, version)
+        if value is self:
+            return False
+        self.set(key, value, timeout, version)
+        return True
+
+    def delete(self, key, version=None):
+        self._delete(self._key_to_file(key, version))
+
+    def has_key(self, key, version=None):
+        f = self._open_entry(self._key_to_file(key, version), bump_atime=False)
+        if f is None:
+            return False
+        f.close()
+        return True
+
+    def clear(self):
+        if os.path.exists(self._dir):
+            for name in os.listdir(self._dir):
+                path = os.path.join(self._dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+            self._update_size(None)
+
+    def _key_to_file(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        digest = hashlib.md5(key.encode()).hexdigest()
+        return os.path.join(self._dir, digest[:2], digest[2:4], digest + self.cache_suffix)
+
+    def _open_entry(self, fname, bump_atime=True):
+        """Open the entry in fname and read its header.  Returns the file
+        with the kind of the value as f.kind, or None if there's no
+        entry or it has expired."""
+        try:
+            f = open(fname, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            kind, expiry = f.readline().split()
+            expiry = float(expiry)
+        except ValueError:
+            f.close()
+            self._delete(fname)
+            return None
+        if expiry and expiry < time.time():
+            f.close()
+            self._delete(fname)
+            return None
+        f.kind = kind
+        if bump_atime:
+            try:
+                st = os.fstat(f.fileno())
+                now = time.time()
+                if st.st_atime < now - self._atime_resolution:
+                    os.utime(fname, (now, st.st_mtime))
+            except OSError:
+                pass
+        return f
+
+    def _file_size(self, fname):
+        try:
+            return os.stat(fname).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _delete(self, fname):
+        size = self._file_size(fname)
+        try:
+            os.remove(fname)
+        except FileNotFoundError:
+            return False
+        self._update_size(-size)
+        return True
+
+    def _update_size(self, delta):
+        """Add delta to the tracked total size of the cache, or reset it
+        if delta is None, and cull if it has grown too large."""
+        os.makedirs(self._dir, 0o700, exist_ok=True)
+        with open(self._size_file, 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                size = int(f.read() or 0)
+            except ValueError:
+                size = 0
+            size = 0 if delta is None else max(size + delta, 0)
+            f.seek(0)
+            f.truncate()
+            f.write(str(size))
+        if size > self._max_size and not (self._cull_thread and self._cull_thread.is_alive()):
+            self._cull_thread = threading.Thread(target=self._cull, name='cache-cull', daemon=True)
+            self._cull_thread.start()
+
+    def _cull(self):
+        """Remove the expired entries, and then the least recently used
+        ones until the cache is below its cull target size.  Only one
+        process culls at a time, the others just carry on."""
+        with open(self._cull_lock_file, 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EACCES):
+                    return
+                raise
+
+            now = time.time()
+            entries = []
+            total = 0
+            for dirpath, dirnames, filenames in os.walk(self._dir):
+                for name in filenames:
+                    if not name.endswith(self.cache_suffix):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                        with open(path, 'rb') as f:
+                            expiry = float(f.readline().split()[1])
+                    except (OSError, ValueError, IndexError):
+                        continue
+                    if expiry and expiry < now:
+                        self._remove_quietly(path)
+                    else:
+                        entries.append((st.st_atime, st.st_size, path))
+                        total += st.st_size
+
+            target = self._max_size * self._cull_to
+            entries.sort()
+            for atime, size, path in entries:
+                if total <= target:
+                    break
+                if self._remove_quietly(path):
+                    total -= size
+
+            with open(self._size_file, 'a+') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                f.truncate()
+                f.write(str(total))
+
+    def _remove_quietly(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+
+class ComputeInProgress(Exception):
+    """Raised by get_or_compute() when it isn't to wait for the value
+    another process is computing"""
+    pass
+
+def get_or_compute(cache, key, compute, timeout, lock_timeout, stale_timeout=None, refresh=False, prefix="compute", wait=True):
+    """Return the value cached under key, computing it with compute() and
+    caching it if it isn't cached, or if refresh is set.
+
+    Only one process computes the value for a key at a time, the others
+    wait for the value to show up in the cache, or for lock_timeout
+    seconds at most, after which they assume that the computing process
+    has gone away and compute the value themselves.  With stale_timeout,
+    a copy of the value is also kept for that long under a separate key,
+    and served to the waiting processes if there is one.  Without wait,
+    ComputeInProgress is raised instead of waiting."""
+    if not refresh:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+    # the key may already be close to the memcached key length limit
+    digest = hashlib.md5(key.encode()).hexdigest()
+    lock_key = "%s:lock:%s" % (prefix, digest)
+    stale_key = "%s:stale:%s" % (prefix, digest)
+
+    waited = 0
+    while not cache.add(lock_key, True, lock_timeout):
+        if not refresh and stale_timeout:
+            value = cache.get(stale_key)
+            if value is not None:
+                return value
+        if not wait:
+            raise ComputeInProgress(key)
+        if waited >= lock_timeout:
+            break
+        time.sleep(1)
+        waited += 1
+        if not refresh:
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+        if stale_timeout:
+            cache.set(stale_key, value, stale_timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
@@ -4,13 +4,17 @@
 
 import copy
 #import logging
+import os
 import re
 import smtplib
 import sys
 import textwrap
+import threading
 import time
 import traceback
 
+from contextlib import contextmanager
+
 from email.utils import make_msgid, formatdate, formataddr as simple_formataddr, parseaddr as simple_parseaddr, getaddresses
 from email.message import Message       # pyflakes:ignore
 from email.mime.text import MIMEText
@@ -23,6 +27,7 @@ from email import charset as Charset
 from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.signals import request_finished
 from django.core.validators import validate_email
 from django.template.loader import render_to_string
 from django.template import Context,RequestContext
@@ -80,6 +85,115 @@ class SMTPSomeRefusedRecipients(smtplib.SMTPException):
     def summary_refusals(self):
         return ", ".join(["%s (%s)"%(x,self.refusals[x][0]) for x in self.refusals])
 
+# Outgoing SMTP connections are kept open and reused, one per thread, so
+# that sending many messages in a row doesn't take a connect, EHLO,
+# STARTTLS and login for each of them.  Web threads close theirs at the
+# end of each request.
+_smtp = threading.local()
+
+def smtp_connect():
+    """Open an SMTP connection to the mail server, logged in if a user and
+    password are configured"""
+    server = smtplib.SMTP()
+    #log("SMTP server: %s" % repr(server))
+    #if settings.DEBUG:
+    #    server.set_debuglevel(1)
+    conn_code, conn_msg = server.connect(SMTP_ADDR['ip4'], SMTP_ADDR['port'])
+    #log("SMTP connect: code: %s; msg: %s" % (conn_code, conn_msg))
+    try:
+        if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
+            server.ehlo()
+            if 'starttls' not in server.esmtp_features:
+                raise ImproperlyConfigured('password configured but starttls not supported')
+            (retval, retmsg) = server.starttls()
+            if retval != 220:
+                raise ImproperlyConfigured('password configured but tls failed: %d %s' % ( retval, retmsg ))
+            # Send a new EHLO, since without TLS the server might not
+            # advertise the AUTH capability.
+            server.ehlo()
+            server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+def close_smtp_connection():
+    """Close the SMTP connection of this thread, if any"""
+    conn = getattr(_smtp, 'conn', None)
+    _smtp.conn = None
+    # a connection inherited from the parent of a forked process is the
+    # parent's to close
+    if conn and conn['pid'] == os.getpid():
+        try:
+            conn['server'].quit()
+        except (smtplib.SMTPException, OSError):
+            conn['server'].close()
+
+def close_smtp_connection_after_request(**kwargs):
+    # an smtp_batch() around a request is left to close its connection
+    if not getattr(_smtp, 'batch', 0):
+        close_smtp_connection()
+
+request_finished.connect(close_smtp_connection_after_request)
+
+def smtp_connection():
+    """The SMTP connection of this thread.  It is reused for the messages
+    sent within settings.EMAIL_CONNECTION_MAX_IDLE seconds of each other,
+    or within an smtp_batch(), up to settings.EMAIL_CONNECTION_MAX_MESSAGES
+    messages; after that, a new connection is opened."""
+    conn = getattr(_smtp, 'conn', None)
+    address = (SMTP_ADDR['ip4'], SMTP_ADDR['port'])
+    if conn is not None:
+        idle = time.time() - conn['used']
+        if (conn['pid'] != os.getpid() or conn['address'] != address
+            or conn['sent'] >= settings.EMAIL_CONNECTION_MAX_MESSAGES
+            or (idle > settings.EMAIL_CONNECTION_MAX_IDLE and not getattr(_smtp, 'batch', 0))):
+            close_smtp_connection()
+            conn = None
+    if conn is None:
+        conn = _smtp.conn = dict(server=smtp_connect(), address=address, pid=os.getpid(), sent=0, used=time.time())
+    return conn
+
+def smtp_sendmail(frm, to, msg):
+    """Send msg, a bytes string, from frm to the list of addresses to over
+    the SMTP connection of this thread.  If a connection which has already
+    been used turns out to have been closed by the server, the message is
+    sent again over a new one.  Returns the refused recipients, as
+    smtplib.SMTP.sendmail() does."""
+    while True:
+        conn = smtp_connection()
+        try:
+            unhandled = conn['server'].sendmail(frm, to, msg)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # the message was refused, but the connection is fine
+            conn['used'] = time.time()
+            raise
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            _smtp.conn = None
+            conn['server'].close()
+            if conn['sent'] == 0:
+                raise
+        except Exception:
+            close_smtp_connection()
+            raise
+        else:
+            conn['sent'] += 1
+            conn['used'] = time.time()
+            return unhandled
+
+@contextmanager
+def smtp_batch():
+    """Keep the SMTP connection of this thread open for all the mail sent
+    within, however long it takes, and close it at the end.  Can also be
+    used as a function decorator."""
+    _smtp.batch = getattr(_smtp, 'batch', 0) + 1
+    try:
+        yield
+    finally:
+        _smtp.batch -= 1
+        if not _smtp.batch:
+            close_smtp_connection()
+
 def send_smtp(msg, bcc=None):
     '''
     Send a Message via SMTP, based on the django email server settings.
@@ -102,26 +216,8 @@ def send_smtp(msg, bcc=None):
     else:
         if test_mode:
             outbox.append(msg)
-        server = None
         try:
-            server = smtplib.SMTP()
-            #log("SMTP server: %s" % repr(server))
-            #if settings.DEBUG:
-            #    server.set_debuglevel(1)
-            conn_code, conn_msg = server.connect(SMTP_ADDR['ip4'], SMTP_ADDR['port'])
-            #log("SMTP connect: code: %s; msg: %s" % (conn_code, conn_msg))
-            if settings.EMAIL_HOST_USER and settings.EMAIL_HOST_PASSWORD:
-                server.ehlo()
-                if 'starttls' not in server.esmtp_features:
-                    raise ImproperlyConfigured('password configured but starttls not supported')
-                (retval, retmsg) = server.starttls()
-                if retval != 220:
-                    raise ImproperlyConfigured('password configured but tls failed: %d %s' % ( retval, retmsg ))
-                # Send a new EHLO, since without TLS the server might not
-                # advertise the AUTH capability.
-                server.ehlo()
-                server.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
-            unhandled = server.sendmail(frm, to, force_bytes(msg.as_string()))
+            unhandled = smtp_sendmail(frm, to, force_bytes(msg.as_string()))
             if unhandled != {}:
                 raise SMTPSomeRefusedRecipients(message="%d addresses were refused"%len(unhandled),original_msg=msg,refusals=unhandled)
         except Exception as e:
@@ -132,15 +228,23 @@ def send_smtp(msg, bcc=None):
                 raise 
             else:
                 raise smtplib.SMTPException({'really': sys.exc_info()[0], 'value': sys.exc_info()[1], 'tb': traceback.format_tb(sys.exc_info()[2])})
-        finally:
-            try:
-                server.quit()
-            except smtplib.SMTPServerDisconnected:
-                pass
         subj = force_text(msg.get('Subject', '[no subject]'))
         tau = time.time() - mark
         log("sent email (%.3fs) from '%s' to %s id %s subject '%s'" % (tau, frm, to, msg.get('Message-ID', ''), subj))
-    
+
+def send_many(msgs, bcc=None):
+    """Send a number of Messages as send_smtp() does, over one SMTP
+    connection.  A message which can't be sent doesn't stop the others;
+    returns a list of (message, exception) for those."""
+    failed = []
+    with smtp_batch():
+        for msg in msgs:
+            try:
+                send_smtp(msg, bcc)
+            except smtplib.SMTPException as e:
+                failed.append((msg, e))
+    return failed
+
 def copy_email(msg, to, toUser=False, originalBcc=None):
     '''
     Send a copy of the given email message to the given recipient.
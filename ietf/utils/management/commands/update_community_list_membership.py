@@ -0,0 +1,26 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+
+from tqdm import tqdm
+
+from django.core.management.base import BaseCommand
+
+import debug                            # pyflakes:ignore
+
+from ietf.community.models import CommunityList
+from ietf.community.utils import update_community_list_membership
+
+class Command(BaseCommand):
+    help = ("""
+        Rebuild the materialized set of documents tracked by each community
+        list from its individually added documents and its search rules.
+        """)
+
+    def handle(self, *args, **options):
+        verbosity = options.get('verbosity', 1)
+        for clist in tqdm(CommunityList.objects.all(), disable=(verbosity!=1)):
+            count1 = clist.tracked_docs.count()
+            update_community_list_membership(clist.pk)
+            count2 = clist.tracked_docs.count()
+            if int(verbosity) > 1:
+                self.stdout.write("%-48s %5d -->%5d\n" % (str(clist)[:48], count1, count2))
@@ -11,7 +11,7 @@ from django.core.management.base import BaseCommand
 import debug                            # pyflakes:ignore
 
 from ietf.utils.models import VersionInfo
-from ietf.utils.pipe import pipe
+from ietf.utils.pipe import run_commands
 
 class Command(BaseCommand):
     """
@@ -25,11 +25,12 @@ class Command(BaseCommand):
     help = dedent(__doc__).strip()
             
     def handle(self, *filenames, **options):
-        for c in VersionInfo.objects.filter(used=True):
-            cmd = "%s %s" % (c.command, c.switch)
-            code, out, err = pipe(cmd)
-            out = out.decode('utf-8')
-            err = err.decode('utf-8')
+        commands = list(VersionInfo.objects.filter(used=True))
+        cmds = [ "%s %s" % (c.command, c.switch) for c in commands ]
+        for c, cmd, result in zip(commands, cmds, run_commands(cmds)):
+            code = result.code
+            out = result.out.decode('utf-8')
+            err = result.err.decode('utf-8')
             if code != 0:
                 sys.stderr.write("Command '%s' returned %s: \n%s\n%s\n" % (cmd, code, out, err))
             else:
@@ -0,0 +1,99 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""Counters served in the Prometheus text exposition format.
+
+A LabeledCounters holds a set of counters for each value of one label,
+such as the view of a request or the tool run by a command, and renders
+them as '<prefix>_<counter>_total{<label>="<value>"}' lines.
+
+The counters are kept in the 'metrics' cache, which is shared by all the
+worker processes, so whichever worker serves a scrape returns the totals
+of all of them.  They are updated with the atomic cache.incr(), which
+only handles integers, so counters whose name ends in 'seconds' are
+stored in microseconds.  The label values seen are kept in numbered
+slots, so that they can be listed without a scan of the cache.
+"""
+
+import hashlib
+
+from django.core.cache import caches
+
+import debug                            # pyflakes:ignore
+
+
+def prometheus_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class LabeledCounters(object):
+    """Totals of the given counters, a sequence of (name, help text)
+    pairs, for each value of the label"""
+
+    cache_alias = 'metrics'
+
+    def __init__(self, prefix, label, counters):
+        self.prefix = prefix
+        self.label = label
+        self.counters = counters
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def key(self, *parts):
+        return ':'.join((self.prefix, ) + parts)
+
+    @staticmethod
+    def digest(label_value):
+        # label values can hold characters which aren't allowed in keys
+        return hashlib.sha1(label_value.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def scale(name):
+        return 1000000 if name.endswith('seconds') else 1
+
+    def incr(self, key, delta):
+        try:
+            return self.cache.incr(key, delta)
+        except ValueError:
+            # not there yet, unless another process was quicker
+            if self.cache.add(key, delta, timeout=None):
+                return delta
+            return self.cache.incr(key, delta)
+
+    def increment(self, label_value, **amounts):
+        digest = self.digest(label_value)
+        if self.cache.add(self.key('seen', digest), True, timeout=None):
+            slot = self.incr(self.key('slots'), 1) - 1
+            self.cache.set(self.key('slot', str(slot)), label_value, timeout=None)
+        for name, amount in amounts.items():
+            delta = int(round(amount * self.scale(name)))
+            if delta:
+                self.incr(self.key('total', name, digest), delta)
+
+    def totals(self):
+        """The totals, by label value"""
+        slots = self.cache.get(self.key('slots')) or 0
+        values = set(self.cache.get_many([ self.key('slot', str(i)) for i in range(slots) ]).values())
+        keys = dict(
+            ((value, name), self.key('total', name, self.digest(value)))
+            for value in values for name, help in self.counters
+        )
+        found = self.cache.get_many(list(keys.values()))
+        totals = {}
+        for (value, name), key in keys.items():
+            total = found.get(key, 0)
+            scale = self.scale(name)
+            totals.setdefault(value, {})[name] = total / scale if scale != 1 else total
+        return totals
+
+    def prometheus(self):
+        """The totals in the Prometheus text exposition format"""
+        values = self.totals()
+        lines = []
+        for name, help in self.counters:
+            metric = '%s_%s_total' % (self.prefix, name)
+            lines.append('# HELP %s %s' % (metric, help))
+            lines.append('# TYPE %s counter' % metric)
+            for value, totals in sorted(values.items()):
+                lines.append('%s{%s="%s"} %s' % (metric, self.label, prometheus_label_value(value), totals[name]))
+        return '\n'.join(lines) + '\n'
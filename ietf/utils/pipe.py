@@ -1,34 +1,164 @@
-# Copyright The IETF Trust 2010-2020, All Rights Reserved
+# Copyright The IETF Trust 2010-2026, All Rights Reserved
 # -*- coding: utf-8 -*-
+"""Running external commands.
 
+run_command() runs a command, feeding it input and reading its stdout and
+stderr at the same time, so that it can't get stuck on a full pipe, and
+kills it, with any processes it started, if it runs longer than its
+timeout.  Commands are never run through a shell; a command line given
+as a string is split into arguments with shlex.split().  Memory and CPU
+time limits are set with prlimit(1) before the command is started, so
+that they also hold for the processes it starts.
+submit_command() and run_commands() run commands on a bounded pool of
+worker threads, so that several tools can run at once without starting
+more processes than settings.EXTERNAL_COMMAND_WORKERS.
 
-# Simplified interface to os.popen3()
-
-def pipe(cmd, str=None):
-    from subprocess import Popen, PIPE
-    bufsize = 4096
-    MAX = 65536*16
-
-    if str and len(str) > 4096:                 # XXX: Hardcoded Linux 2.4, 2.6 pipe buffer size
-        bufsize = len(str)
-
-    pipe = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, bufsize=bufsize, shell=True)
-    if not str is None:
-        pipe.stdin.write(str)
-        pipe.stdin.close()
-
-    out = b""
-    err = b""
-    while True:
-        str = pipe.stdout.read()
-        if str:
-            out += str
-        code = pipe.poll()
-        if code != None:
-            err = pipe.stderr.read()
-            break
-        if len(out) >= MAX:
-            err = "Output exceeds %s bytes and has been truncated" % MAX
-            break
-
-    return (code, out, err)
+The time each tool takes is logged to the datatracker.commands logger,
+and added to the per-tool totals in COMMAND_STATS, which can be read in
+the Prometheus text format at /api/metrics/external-commands.
+"""
+
+import json
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.metrics import LabeledCounters
+
+
+logger = logging.getLogger('datatracker.commands')
+
+CommandResult = namedtuple('CommandResult', ['code', 'out', 'err', 'duration', 'timed_out'])
+
+
+def command_name(cmd):
+    """The name of the tool a command runs, for the metrics"""
+    words = shlex.split(cmd) if isinstance(cmd, str) else cmd
+    words = [ w for w in words if not '=' in w ]
+    return os.path.basename(words[0]) if words else ''
+
+def command_from_template(template, **kwargs):
+    """Split a command line template, such as settings.SUBMIT_PYANG_COMMAND,
+    into arguments and fill in the {name} fields of each from kwargs, so
+    that the values are single arguments whatever characters they hold"""
+    return [ word.format(**kwargs) for word in shlex.split(template) ]
+
+def limited_command(cmd, memory_limit=None, cpu_limit=None):
+    """cmd, a list of arguments, started through prlimit with at most
+    memory_limit bytes of address space and cpu_limit seconds of CPU time"""
+    limits = []
+    if memory_limit:
+        limits.append('--as=%d' % memory_limit)
+    if cpu_limit:
+        # the command gets SIGXCPU at the soft limit; the hard limit, a
+        # second later, is for commands which catch it, and gets SIGKILL
+        limits.append('--cpu=%d:%d' % (cpu_limit, cpu_limit + 1))
+    if not limits:
+        return cmd
+    return [settings.PRLIMIT_COMMAND] + limits + ['--'] + cmd
+
+def run_command(cmd, input=None, timeout=None, tool=None, memory_limit=None, cpu_limit=None):
+    """Run cmd, a list of arguments or a command line which is split with
+    shlex.split(), with input, a bytes string, as its stdin, and return a
+    CommandResult with its exit code, stdout and stderr.  The command is
+    not run through a shell.  A command which runs longer than timeout
+    seconds (default settings.EXTERNAL_COMMAND_TIMEOUT) is killed, with
+    the processes it started, and gets the code -SIGKILL.
+
+    The command can use at most memory_limit bytes of address space and
+    cpu_limit seconds of CPU time, after which it gets the code -SIGXCPU.
+    For the tools in settings.EXTERNAL_COMMAND_LIMITED_TOOLS, these
+    default to settings.EXTERNAL_COMMAND_MEMORY_LIMIT and
+    settings.EXTERNAL_COMMAND_CPU_LIMIT."""
+    if timeout is None:
+        timeout = settings.EXTERNAL_COMMAND_TIMEOUT
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    tool = tool or command_name(cmd)
+    if tool in settings.EXTERNAL_COMMAND_LIMITED_TOOLS:
+        if memory_limit is None:
+            memory_limit = settings.EXTERNAL_COMMAND_MEMORY_LIMIT
+        if cpu_limit is None:
+            cpu_limit = settings.EXTERNAL_COMMAND_CPU_LIMIT
+    start = time.perf_counter()
+    timed_out = False
+    # the command gets a session of its own, so that on a timeout the
+    # processes it started can be killed with it
+    with subprocess.Popen(limited_command(cmd, memory_limit, cpu_limit),
+                          stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          start_new_session=True) as proc:
+        try:
+            out, err = proc.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            out, err = proc.communicate()
+            err += b"\nKilled after running for more than %d seconds" % timeout
+    duration = time.perf_counter() - start
+    code = proc.returncode
+    if code == -signal.SIGXCPU:
+        err += b"\nKilled after using more than %d seconds of CPU time" % cpu_limit
+    COMMAND_STATS.add(tool, duration, code, timed_out)
+    logger.info(json.dumps({'tool': tool, 'code': code, 'seconds': round(duration, 6), 'timed_out': timed_out}))
+    return CommandResult(code, out, err, duration, timed_out)
+
+
+def pipe(cmd, str=None, **kwargs):
+    """Run cmd with str as its stdin, and return its exit code, stdout and
+    stderr.  See run_command() for the other arguments."""
+    result = run_command(cmd, input=str, **kwargs)
+    return (result.code, result.out, result.err)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_command_pool():
+    """The pool of threads which run the commands given to submit_command()"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.EXTERNAL_COMMAND_WORKERS, thread_name_prefix='command')
+        return _pool
+
+def submit_command(cmd, **kwargs):
+    """Start running cmd on the command pool, and return a Future of its
+    CommandResult.  See run_command() for the arguments."""
+    return get_command_pool().submit(run_command, cmd, **kwargs)
+
+def run_commands(cmds, **kwargs):
+    """Run the commands on the command pool, and return their
+    CommandResults in the same order"""
+    futures = [ submit_command(cmd, **kwargs) for cmd in cmds ]
+    return [ f.result() for f in futures ]
+
+
+class CommandStats(LabeledCounters):
+    """Per-tool totals of the commands run by all the processes"""
+
+    def __init__(self):
+        super().__init__('datatracker_external_command', 'tool', (
+            ('runs', 'Number of runs'),
+            ('failures', 'Number of runs with a non-zero exit code'),
+            ('timeouts', 'Number of runs killed for running too long'),
+            ('seconds', 'Time spent running the tool'),
+        ))
+
+    def add(self, tool, duration, code, timed_out):
+        self.increment(tool, runs=1, failures=int(code != 0), timeouts=int(timed_out), seconds=duration)
+
+COMMAND_STATS = CommandStats()
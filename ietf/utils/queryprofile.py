@@ -0,0 +1,172 @@
+# Copyright The IETF Trust 2026, All Rights Reserved
+# -*- coding: utf-8 -*-
+"""Per-request profiles of database queries and template rendering.
+
+A QueryProfile hooks into the database connections with an execute
+wrapper, so unlike connection.queries it works without DEBUG, and
+records the number of queries, the time spent in the database, the
+number of writes, and how often each query fingerprint (the SQL with the
+literal values taken out) was run.  A fingerprint which is run many
+times within one request is usually an N+1 query in a loop.  The time
+spent rendering templates is recorded too; Template.render is wrapped
+for that only while a profile is active.
+
+The sql_profile_middleware in ietf.middleware profiles a sample of the
+requests, logs each profile as a line of JSON, and adds it to the
+per-view totals in PROFILE_STATS, which can be read in the Prometheus
+text format at /api/metrics/sql-profile.  Tests can use a QueryProfile
+to keep the queries of a view within a budget, see
+ietf.utils.test_utils.assert_query_budget.
+"""
+
+import re
+import threading
+import time
+
+from collections import Counter
+
+from django.db import connections
+from django.template.base import Template
+
+import debug                            # pyflakes:ignore
+
+from ietf.utils.metrics import LabeledCounters
+
+
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r"\b\d+(\.\d+)?\b")
+_list_re = re.compile(r"\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)")
+_space_re = re.compile(r"\s+")
+
+def fingerprint(sql):
+    """The SQL with string and number literals and the length of value
+    lists taken out, so that the same query with other values gives the
+    same fingerprint"""
+    sql = _string_re.sub("?", sql)
+    sql = _number_re.sub("?", sql)
+    sql = _list_re.sub("(...)", sql)
+    return _space_re.sub(" ", sql).strip()
+
+
+_local = threading.local()
+
+def _profiled_render(self, context):
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        return _template_render(self, context)
+    # only time the outermost template, the included ones are part of it
+    profile.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _template_render(self, context)
+    finally:
+        profile.template_depth -= 1
+        if profile.template_depth == 0:
+            profile.template_time += time.perf_counter() - start
+
+_template_render = Template.render
+_active_profiles = 0
+_active_profiles_lock = threading.Lock()
+
+def _start_template_profiling():
+    global _active_profiles, _template_render
+    with _active_profiles_lock:
+        if _active_profiles == 0:
+            _template_render = Template.render
+            Template.render = _profiled_render
+        _active_profiles += 1
+
+def _stop_template_profiling():
+    global _active_profiles
+    with _active_profiles_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0:
+            Template.render = _template_render
+
+
+class QueryProfile(object):
+    """Context manager which profiles the queries run, and the templates
+    rendered, by the current thread within it"""
+
+    def __init__(self):
+        self.count = 0
+        self.writes = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.total_time = 0.0
+        self.fingerprints = Counter()
+        self._wrappers = []
+
+    def __enter__(self):
+        self._previous = getattr(_local, 'profile', None)
+        _local.profile = self
+        _start_template_profiling()
+        for conn in connections.all():
+            wrapper = conn.execute_wrapper(self)
+            wrapper.__enter__()
+            self._wrappers.append(wrapper)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total_time = time.perf_counter() - self._start
+        for wrapper in reversed(self._wrappers):
+            wrapper.__exit__(*exc_info)
+        self._wrappers = []
+        _stop_template_profiling()
+        _local.profile = self._previous
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+            if re.match(r'\s*(insert|update|delete)\b', sql, re.IGNORECASE):
+                self.writes += 1
+
+    def duplicates(self, threshold=2):
+        """The fingerprints run at least threshold times, with their counts,
+        most frequent first"""
+        return [ (fp, n) for fp, n in self.fingerprints.most_common() if n >= threshold ]
+
+    def as_dict(self, duplicate_threshold=2):
+        return {
+            'queries': self.count,
+            'writes': self.writes,
+            'db_time': round(self.db_time, 6),
+            'template_time': round(self.template_time, 6),
+            'total_time': round(self.total_time, 6),
+            'duplicates': [ {'fingerprint': fp, 'count': n} for fp, n in self.duplicates(duplicate_threshold) ],
+        }
+
+
+class ProfileStats(LabeledCounters):
+    """Per-view totals of the profiled requests of all the processes"""
+
+    def __init__(self):
+        super().__init__('datatracker_sql_profile', 'view', (
+            ('requests', 'Number of profiled requests'),
+            ('queries', 'Number of database queries'),
+            ('writes', 'Number of database writes'),
+            ('duplicate_queries', 'Number of queries beyond the first of a repeated fingerprint'),
+            ('db_seconds', 'Time spent in the database'),
+            ('template_seconds', 'Time spent rendering templates'),
+            ('seconds', 'Time spent handling the requests'),
+        ))
+
+    def add(self, view, profile):
+        self.increment(view,
+            requests=1,
+            queries=profile.count,
+            writes=profile.writes,
+            duplicate_queries=sum(n - 1 for fp, n in profile.duplicates()),
+            db_seconds=profile.db_time,
+            template_seconds=profile.template_time,
+            seconds=profile.total_time,
+        )
+
+PROFILE_STATS = ProfileStats()
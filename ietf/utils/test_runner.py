@@ -48,10 +48,15 @@ import pathlib
 import subprocess
 import tempfile
 import copy
+import shutil
+import ctypes
+import multiprocessing
+import coverage
 import factory.random
 import urllib3
 import warnings
 from urllib.parse import urlencode
+from unittest.util import strclass
 
 from fnmatch import fnmatch
 
@@ -68,7 +73,7 @@ from django.db.migrations.operations.models import ModelOperation
 from django.db.migrations.operations.base import Operation
 from django.template import TemplateDoesNotExist
 from django.template.loaders.filesystem import Loader as BaseLoader
-from django.test.runner import DiscoverRunner
+from django.test.runner import DiscoverRunner, ParallelTestSuite
 from django.core.management import call_command
 from django.urls import URLResolver # type: ignore
 from django.template.backends.django import DjangoTemplates
@@ -687,6 +692,168 @@ class InvalidString(str):
         raise TemplateSyntaxError(
             "Undefined variable or unknown value for: \"%s\"" % other)
 
+def init_parallel_worker(counter, coverage_dir):
+    """Switch a parallel test worker to its own clone of the test database,
+    and, if coverage_dir is given, measure the code coverage of the worker
+    into a data file of its own in coverage_dir, saved when the worker exits"""
+    ParallelTestSuite.init_worker(counter)
+    if coverage_dir:
+        checker = settings.TEST_CODE_COVERAGE_CHECKER
+        checker.stop()
+        worker_checker = coverage.Coverage(data_file=os.path.join(coverage_dir, '.coverage'), data_suffix=True,
+            source=checker.config.source, cover_pylib=checker.config.cover_pylib, omit=checker.config.run_omit)
+        worker_checker.start()
+        settings.TEST_CODE_COVERAGE_CHECKER = worker_checker
+        multiprocessing.util.Finalize(None, worker_checker.save, exitpriority=16)
+
+_multiprocessing_context = multiprocessing.get_context()
+
+class NonDaemonicProcess(_multiprocessing_context.Process):
+    """A process which stays non-daemonic when multiprocessing.Pool makes
+    it a worker, so that the tests it runs can start processes of their
+    own, as e.g. the schedule generator does"""
+
+    @property
+    def daemon(self):
+        return False
+
+    @daemon.setter
+    def daemon(self, daemonic):
+        pass
+
+class NonDaemonicContext(type(_multiprocessing_context)):
+    Process = NonDaemonicProcess
+
+def run_parallel_subsuite(args):
+    """Run a subsuite in a parallel test worker, and also pass back how long
+    it took, and the templates, urls and HTML collected while running it, for
+    the coverage and template validation tests in the main process"""
+    start = time.time()
+    subsuite_index, events = ParallelTestSuite.run_subsuite(args)
+    duration = time.time() - start
+    templates, urls = set(loaded_templates), set(visited_urls)
+    loaded_templates.clear()
+    visited_urls.clear()
+    batches = None
+    if settings.validate_html:
+        batches = settings.validate_html.batches
+        settings.validate_html.batches = dict( (kind, []) for kind in batches )
+    return subsuite_index, events, duration, templates, urls, batches
+
+class IetfParallelTestSuite(ParallelTestSuite):
+    """Run the tests in parallel worker processes, each with its own clone
+    of the test database, one test case class at a time, starting with the
+    classes which took the longest in earlier runs.  The templates, urls,
+    code coverage and HTML collected by the workers are merged in the main
+    process, which then runs the coverage and template validation tests.
+    """
+
+    init_worker = init_parallel_worker
+    run_subsuite = run_parallel_subsuite
+
+    # These tests check what all the other tests did, or refer to the test
+    # runner, so they run in the main process once the workers are done
+    main_process_tests = (PyFlakesTestCase, MyPyTest, TemplateValidationTests, CoverageTest, )
+
+    def __init__(self, suite, processes, failfast=False, runner=None):
+        super(IetfParallelTestSuite, self).__init__(suite, processes, failfast)
+        self.runner = runner
+        self.main_process_subsuites = [ s for s in self.subsuites if self.runs_in_main_process(s) ]
+        subsuites = [ s for s in self.subsuites if not self.runs_in_main_process(s) ]
+        self.durations = self.load_durations()
+        # Longest first, so that the long test case classes don't end up
+        # holding up the end of the run.  Classes without an earlier
+        # duration are estimated by the mean time per test.
+        known = [ (self.durations[self.label(s)], len(list(s))) for s in subsuites if self.label(s) in self.durations ]
+        per_test = sum(d for d, n in known) / max(1, sum(n for d, n in known))
+        self.subsuites = sorted(subsuites, reverse=True,
+            key=lambda s: self.durations.get(self.label(s), per_test * len(list(s))))
+
+    def runs_in_main_process(self, subsuite):
+        return isinstance(next(iter(subsuite)), self.main_process_tests)
+
+    @staticmethod
+    def label(subsuite):
+        return strclass(next(iter(subsuite)).__class__)
+
+    @staticmethod
+    def load_durations():
+        if os.path.exists(settings.TEST_DURATIONS_FILE):
+            with io.open(settings.TEST_DURATIONS_FILE, encoding='utf-8') as file:
+                return json.load(file)
+        return {}
+
+    def save_durations(self):
+        with io.open(settings.TEST_DURATIONS_FILE, "w", encoding='utf-8') as file:
+            json.dump(self.durations, file, indent=2, sort_keys=True)
+
+    def run(self, result):
+        """Like ParallelTestSuite.run(), but also merges what the workers
+        collected, and then runs the main process tests"""
+        global loaded_templates, visited_urls
+        check_coverage = self.runner is not None and self.runner.check_coverage
+        coverage_dir = tempfile.mkdtemp(prefix="coverage-") if check_coverage else None
+        validated = set()
+
+        counter = multiprocessing.Value(ctypes.c_int, 0)
+        pool = NonDaemonicContext().Pool(
+            processes=self.processes,
+            initializer=self.init_worker.__func__,
+            initargs=[counter, coverage_dir],
+        )
+        args = [
+            (self.runner_class, index, subsuite, self.failfast)
+            for index, subsuite in enumerate(self.subsuites)
+        ]
+        test_results = pool.imap_unordered(self.run_subsuite.__func__, args)
+
+        while True:
+            if result.shouldStop:
+                pool.terminate()
+                break
+
+            try:
+                subsuite_index, events, duration, templates, urls, batches = test_results.next(timeout=0.1)
+            except multiprocessing.TimeoutError:
+                continue
+            except StopIteration:
+                pool.close()
+                break
+
+            self.durations[self.label(self.subsuites[subsuite_index])] = duration
+            loaded_templates |= templates
+            visited_urls |= urls
+            if batches:
+                for kind in batches:
+                    for batch in batches[kind]:
+                        if batch[2] not in validated:
+                            validated.add(batch[2])
+                            settings.validate_html.batches[kind].append(batch)
+
+            tests = list(self.subsuites[subsuite_index])
+            for event in events:
+                event_name = event[0]
+                handler = getattr(result, event_name, None)
+                if handler is None:
+                    continue
+                test = tests[event[1]]
+                args = event[2:]
+                handler(test, *args)
+
+        pool.join()
+
+        if coverage_dir:
+            # the workers have saved their data files when exiting
+            settings.TEST_CODE_COVERAGE_CHECKER.combine(data_paths=[coverage_dir])
+            shutil.rmtree(coverage_dir)
+        self.save_durations()
+
+        # as one suite, so that each test class is torn down just once
+        if not result.shouldStop:
+            unittest.TestSuite(self.main_process_subsuites).run(result)
+
+        return result
+
 class IetfTestRunner(DiscoverRunner):
 
     @classmethod
@@ -735,12 +902,9 @@ class IetfTestRunner(DiscoverRunner):
         self.root_dir = os.path.dirname(settings.BASE_DIR)
         self.coverage_file = os.path.join(self.root_dir, settings.TEST_COVERAGE_MAIN_FILE)
         super(IetfTestRunner, self).__init__(**kwargs)
-        if self.parallel > 1:
-            if self.html_report == True:
-                sys.stderr.write("The switches --parallel and --html-report cannot be combined, "
-                                 "as the collection of test coverage data isn't currently threadsafe.")
-                sys.exit(1)
-            self.check_coverage = False
+
+    def parallel_test_suite(self, suite, processes, failfast=False):
+        return IetfParallelTestSuite(suite, processes, failfast, runner=self)
 
     def setup_test_environment(self, **kwargs):
         global template_coverage_collection
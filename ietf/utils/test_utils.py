@@ -51,11 +51,13 @@ from tempfile import NamedTemporaryFile
 
 import django.test
 from django.conf import settings
+from django.http import HttpResponse
 from django.utils.text import slugify
 
 import debug                            # pyflakes:ignore
 
 from ietf.utils.mail import get_payload_text
+from ietf.utils.queryprofile import QueryProfile
 
 real_database_name = settings.DATABASES["default"]["NAME"]
 
@@ -88,6 +90,15 @@ def unicontent(r):
     "Return a HttpResponse object's content as unicode"
     return r.content.decode(r.charset)
 
+def buffered_response(r):
+    "Read a streaming response into an HttpResponse, so its content can be checked more than once"
+    if not r.streaming:
+        return r
+    buffered = HttpResponse(b"".join(r.streaming_content), status=r.status_code)
+    for header, value in r.items():
+        buffered[header] = value
+    return buffered
+
 def textcontent(r):
     text = BeautifulSoup(r.content, 'lxml').get_text()
     text = re.sub(r'(\n\s+){2,}', '\n\n', text)
@@ -123,6 +134,7 @@ def assert_ical_response_is_valid(test_inst, response, expected_event_summaries=
     expected_event_count if you want to reject additional events. If any of these are None,
     the check for that property is skipped.
     """
+    response = buffered_response(response)
     test_inst.assertEqual(response.get('Content-Type'), "text/calendar")
 
     # Validate iCalendar object
@@ -151,6 +163,22 @@ def assert_ical_response_is_valid(test_inst, response, expected_event_summaries=
     test_inst.assertNotContains(response, 'DTSTAMP::')
 
 
+@contextmanager
+def assert_query_budget(test_inst, max_queries, max_repeats=None):
+    """Check that the code within runs at most max_queries database queries,
+    and, if max_repeats is given, no query more than max_repeats times with
+    other values, which would suggest an N+1 query in a loop"""
+    with QueryProfile() as profile:
+        yield profile
+    worst = "\n".join("%4d  %s" % (n, fp[:200]) for fp, n in profile.fingerprints.most_common(5))
+    test_inst.assertLessEqual(profile.count, max_queries,
+        "%d queries, over the budget of %d; the most frequent:\n%s" % (profile.count, max_queries, worst))
+    if max_repeats is not None:
+        repeats = profile.fingerprints.most_common(1)[0][1] if profile.fingerprints else 0
+        test_inst.assertLessEqual(repeats, max_repeats,
+            "A query was run %d times, more than the %d allowed; the most frequent:\n%s" % (repeats, max_repeats, worst))
+
+
 class ReverseLazyTest(django.test.TestCase):
     def test_redirect_with_lazy_reverse(self):
         response = self.client.get('/ipr/update/')
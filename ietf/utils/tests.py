@@ -8,7 +8,10 @@ import json
 import os.path
 import pytz
 import shutil
+import signal
+import sys
 import types
+import unittest
 
 from mock import patch
 from pyquery import PyQuery
@@ -18,6 +21,7 @@ from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from fnmatch import fnmatch
+from smtplib import SMTPException
 from importlib import import_module
 from textwrap import dedent
 from tempfile import mkdtemp
@@ -25,23 +29,32 @@ from tempfile import mkdtemp
 from django.apps import apps
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished
 from django.forms import Form
 from django.template import Context
 from django.template import Template    # pyflakes:ignore
+from django.template.base import Template as BaseTemplate
 from django.template.defaulttags import URLNode
 from django.template.loader import get_template, render_to_string
 from django.templatetags.static import StaticNode
+from django.test import override_settings
 from django.urls import reverse as urlreverse
 
 import debug                            # pyflakes:ignore
 
 from ietf.person.name import name_parts, unidecode_name
 from ietf.submit.tests import submission_file
+from ietf.utils.bloom import BloomFilter
+from ietf.utils.cache import ShardedFileCache
 from ietf.utils.draft import PlaintextDraft, getmeta
 from ietf.utils.fields import SearchableField
 from ietf.utils.log import unreachable, assertion
-from ietf.utils.mail import send_mail_preformatted, send_mail_text, send_mail_mime, outbox, get_payload_text
-from ietf.utils.test_runner import get_template_paths, set_coverage_checking
+from ietf.utils.pipe import pipe, run_command, run_commands, command_name, command_from_template, CommandStats
+from ietf.utils.queryprofile import fingerprint, QueryProfile, ProfileStats
+import ietf.utils.mail
+from ietf.utils.mail import send_mail_preformatted, send_mail_text, send_mail_mime, outbox, get_payload_text, send_many, send_smtp, smtp_batch, close_smtp_connection
+from ietf.utils.test_runner import get_template_paths, set_coverage_checking, IetfParallelTestSuite, CoverageTest
 from ietf.utils.test_utils import TestCase, unicontent
 from ietf.utils.text import parse_unicode
 from ietf.utils.timezone import timezone_not_near_midnight
@@ -146,6 +159,64 @@ class TestSMTPServer(TestCase):
         send_complex_mail('good@example.com,poison@example.com')
         self.assertEqual(len(outbox),len_before+2)
 
+    def make_message(self, to, subject):
+        msg = MIMEText("dummy body")
+        msg['To'] = to
+        msg['From'] = settings.DEFAULT_FROM_EMAIL
+        msg['Subject'] = subject
+        return msg
+
+    def test_send_many_reuses_connection(self):
+        close_smtp_connection()
+        msgs = [ self.make_message('good%d@example.com' % i, 'Batch %d' % i) for i in range(3) ]
+        msgs.insert(1, self.make_message('poison@example.com', 'Refused'))
+        len_before = len(outbox)
+        with patch('ietf.utils.mail.smtp_connect', wraps=ietf.utils.mail.smtp_connect) as smtp_connect:
+            failed = send_many(msgs)
+        self.assertEqual(smtp_connect.call_count, 1)
+        self.assertEqual([ msg['Subject'] for msg, e in failed ], ['Refused'])
+        self.assertEqual(len(outbox), len_before+4)
+        # the connection is closed at the end of the batch
+        self.assertIsNone(ietf.utils.mail._smtp.conn)
+
+    def test_smtp_batch_reuses_connection(self):
+        close_smtp_connection()
+        len_before = len(outbox)
+        with patch('ietf.utils.mail.smtp_connect', wraps=ietf.utils.mail.smtp_connect) as smtp_connect:
+            with smtp_batch():
+                for i in range(3):
+                    send_smtp(self.make_message('good%d@example.com' % i, 'Batch %d' % i))
+                    if i == 0:
+                        with self.assertRaises(SMTPException):
+                            send_smtp(self.make_message('poison@example.com', 'Refused'))
+                # a request within the batch leaves the connection open
+                request_finished.send(sender=None)
+                self.assertIsNotNone(ietf.utils.mail._smtp.conn)
+        self.assertEqual(smtp_connect.call_count, 1)
+        self.assertEqual(len(outbox), len_before+4)
+        # the connection is closed at the end of the batch
+        self.assertIsNone(ietf.utils.mail._smtp.conn)
+
+    def test_connection_closed_after_request(self):
+        close_smtp_connection()
+        send_smtp(self.make_message('good@example.com', 'In a request'))
+        self.assertIsNotNone(ietf.utils.mail._smtp.conn)
+        request_finished.send(sender=None)
+        self.assertIsNone(ietf.utils.mail._smtp.conn)
+
+    def test_reconnect_after_disconnect(self):
+        close_smtp_connection()
+        with patch('ietf.utils.mail.smtp_connect', wraps=ietf.utils.mail.smtp_connect) as smtp_connect:
+            send_smtp(self.make_message('good@example.com', 'First'))
+            send_smtp(self.make_message('good@example.com', 'Second'))
+            self.assertEqual(smtp_connect.call_count, 1)
+            # as if the server had timed out the idle connection
+            ietf.utils.mail._smtp.conn['server'].close()
+            send_smtp(self.make_message('good@example.com', 'Third'))
+            self.assertEqual(smtp_connect.call_count, 2)
+        self.assertEqual(ietf.utils.mail._smtp.conn['sent'], 1)
+        close_smtp_connection()
+
 
 def get_callbacks(urllist, namespace=None):
     callbacks = set()
@@ -541,3 +612,237 @@ class SearchableFieldTests(TestCase):
         self.assertTrue(changed_form.has_changed())
         unchanged_form = TestForm(initial={'test_field': [1]}, data={'test_field': [1]})
         self.assertFalse(unchanged_form.has_changed())
+
+
+class ParallelTestSuiteTests(TestCase):
+    def test_subsuite_order(self):
+        loader = unittest.defaultTestLoader
+        suite = unittest.TestSuite()
+        for case in (NameTests, TimezoneTests, LogUtilTests):
+            suite.addTests(loader.loadTestsFromTestCase(case))
+        suite.addTest(CoverageTest(methodName='code_coverage_test'))
+        dir = mkdtemp()
+        try:
+            durations_file = os.path.join(dir, 'durations.json')
+            with open(durations_file, 'w') as file:
+                json.dump({'ietf.utils.tests.NameTests': 1.0, 'ietf.utils.tests.LogUtilTests': 10.0}, file)
+            with override_settings(TEST_DURATIONS_FILE=durations_file):
+                parallel_suite = IetfParallelTestSuite(suite, 2)
+        finally:
+            shutil.rmtree(dir)
+        # longest first, TimezoneTests estimated by the mean time per test
+        self.assertEqual([ parallel_suite.label(s) for s in parallel_suite.subsuites ],
+            ['ietf.utils.tests.LogUtilTests', 'ietf.utils.tests.TimezoneTests', 'ietf.utils.tests.NameTests'])
+        self.assertEqual([ parallel_suite.label(s) for s in parallel_suite.main_process_subsuites ],
+            ['ietf.utils.test_runner.CoverageTest'])
+
+
+class BloomFilterTests(TestCase):
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000)
+        bloom.update('draft-%d' % i for i in range(1000))
+        for i in range(1000):
+            self.assertIn('draft-%d' % i, bloom)
+        # about 1% false positives
+        false_positives = sum(1 for i in range(1000, 11000) if 'draft-%d' % i in bloom)
+        self.assertLess(false_positives, 200)
+        self.assertLess(len(bloom.bits), 1300)
+
+
+class ShardedFileCacheTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dir = mkdtemp()
+        self.cache = ShardedFileCache(self.dir, { 'OPTIONS': { 'MAX_SIZE': 10000, 'CULL_TO': 0.8 } })
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        super().tearDown()
+
+    def test_values(self):
+        self.cache.set('bytes', b'%PDF raw')
+        self.cache.set('str', 'text – with unicode')
+        self.cache.set('object', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('bytes'), b'%PDF raw')
+        self.assertEqual(self.cache.get('str'), 'text – with unicode')
+        self.assertEqual(self.cache.get('object'), {'a': [1, 2]})
+        self.assertIsNone(self.cache.get('missing'))
+
+        # bytes are stored as they are, and can be read as a file
+        with self.cache.get_file('bytes') as f:
+            self.assertEqual(f.size, len(b'%PDF raw'))
+            self.assertEqual(f.read(), b'%PDF raw')
+        self.assertIsNone(self.cache.get_file('str'))
+
+        # entries are sharded
+        fname = self.cache._key_to_file('bytes')
+        self.assertEqual(os.path.dirname(os.path.dirname(os.path.dirname(fname))), self.dir)
+
+        self.assertFalse(self.cache.add('bytes', b'other'))
+        self.cache.delete('bytes')
+        self.assertFalse(self.cache.has_key('bytes'))
+        self.assertTrue(self.cache.add('bytes', b'other'))
+
+        self.cache.set('expired', b'x', timeout=-1)
+        self.assertIsNone(self.cache.get('expired'))
+
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('str'))
+
+    def test_cull_by_size(self):
+        for i in range(5):
+            self.cache.set('entry%d' % i, b'x' * 1000)
+            # make the access times well separated
+            fname = self.cache._key_to_file('entry%d' % i)
+            os.utime(fname, (1000000 + i * 10000, os.stat(fname).st_mtime))
+        # reading an entry makes it recently used
+        self.cache.get('entry0')
+        self.cache.set('big', b'x' * 6000)
+        self.cache._cull_thread.join()
+        # over the max size, so the least recently used entries are removed
+        # until the size is below 80% of the max size
+        self.assertTrue(self.cache.has_key('big'))
+        self.assertTrue(self.cache.has_key('entry0'))
+        for i in range(1, 5):
+            self.assertFalse(self.cache.has_key('entry%d' % i))
+
+
+class QueryProfileTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['metrics'].clear()
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT  a FROM t WHERE id = 17 AND name = 'it''s'\n AND x IN (%s, %s, %s)"),
+            "SELECT a FROM t WHERE id = ? AND name = ? AND x IN (...)")
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE id IN (1, 2)"),
+                         fingerprint("SELECT a FROM t WHERE id IN (3, 4, 5)"))
+
+    def test_query_profile(self):
+        users = [ User.objects.create(username='profiled%d' % i) for i in range(3) ]
+        template_render = BaseTemplate.render
+        with QueryProfile() as profile:
+            for user in users:
+                User.objects.get(pk=user.pk)
+            User.objects.filter(pk=users[0].pk).update(first_name='Profiled')
+            Template('{% for i in items %}{{ i }}{% endfor %}').render(Context({'items': range(1000)}))
+        self.assertEqual(profile.count, 4)
+        self.assertEqual(profile.writes, 1)
+        self.assertGreater(profile.template_time, 0)
+        self.assertGreaterEqual(profile.total_time, profile.db_time)
+        duplicates = profile.duplicates()
+        self.assertEqual(len(duplicates), 1)
+        self.assertEqual(duplicates[0][1], 3)
+        self.assertIn('auth_user', duplicates[0][0])
+        # nothing is recorded outside the profile
+        User.objects.count()
+        self.assertEqual(profile.count, 4)
+        # and template rendering is only wrapped within one
+        self.assertIs(BaseTemplate.render, template_render)
+
+    def test_profile_stats(self):
+        stats = ProfileStats()
+        with QueryProfile() as profile:
+            User.objects.count()
+            User.objects.count()
+        stats.add('ietf.some.view', profile)
+        stats.add('ietf.some.view', profile)
+        metrics = stats.prometheus()
+        self.assertIn('# TYPE datatracker_sql_profile_queries_total counter', metrics)
+        self.assertIn('datatracker_sql_profile_requests_total{view="ietf.some.view"} 2', metrics)
+        self.assertIn('datatracker_sql_profile_queries_total{view="ietf.some.view"} 4', metrics)
+        self.assertIn('datatracker_sql_profile_duplicate_queries_total{view="ietf.some.view"} 2', metrics)
+        # the totals are shared with the other processes
+        other = ProfileStats()
+        other.add('ietf.other.view', profile)
+        other.add('ietf.some.view', profile)
+        self.assertEqual(set(stats.totals()), set(['ietf.some.view', 'ietf.other.view']))
+        self.assertEqual(stats.totals()['ietf.some.view']['requests'], 3)
+        self.assertAlmostEqual(stats.totals()['ietf.some.view']['seconds'], 3 * profile.total_time, places=5)
+
+    def test_middleware(self):
+        stats = ProfileStats()
+        url = urlreverse('ietf.api.views.version')
+        with patch('ietf.middleware.PROFILE_STATS', stats):
+            with self.assertLogs('datatracker.sqlprofile', 'INFO') as logs:
+                with override_settings(SQL_PROFILE_SAMPLE_RATE=1.0):
+                    r = self.client.get(url)
+            self.assertEqual(r.status_code, 200)
+            record = json.loads(logs.records[0].getMessage())
+            self.assertEqual(record['view'], 'ietf.api.views.version')
+            self.assertEqual(record['path'], url)
+            self.assertEqual(record['status'], 200)
+            self.assertIn('ietf.api.views.version', stats.totals())
+            # not sampled
+            with override_settings(SQL_PROFILE_SAMPLE_RATE=0.0):
+                r = self.client.get(url)
+            self.assertEqual(stats.totals()['ietf.api.views.version']['requests'], 1)
+
+
+class RunCommandTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['metrics'].clear()
+
+    def test_run_command(self):
+        result = run_command(['sh', '-c', 'cat; echo oops >&2; exit 3'], input=b'some input')
+        self.assertEqual(result.code, 3)
+        self.assertEqual(result.out, b'some input')
+        self.assertEqual(result.err, b'oops\n')
+        self.assertFalse(result.timed_out)
+        # a command line is split into arguments, and not run by a shell
+        code, out, err = pipe("echo '$((6*7))' 'two words'")
+        self.assertEqual((code, out, err), (0, b'$((6*7)) two words\n', b''))
+        self.assertEqual(command_from_template('pyang -p {libs} {model}', libs='a b', model='m.yang; rm x'),
+                         ['pyang', '-p', 'a b', 'm.yang; rm x'])
+
+    def test_large_output(self):
+        # more than fits in the pipe buffers, on both stdout and stderr
+        result = run_command(['sh', '-c', 'head -c 1000000 /dev/zero; head -c 1000000 /dev/zero >&2'])
+        self.assertEqual(result.code, 0)
+        self.assertEqual(len(result.out), 1000000)
+        self.assertEqual(len(result.err), 1000000)
+
+    def test_timeout(self):
+        with self.assertLogs('datatracker.commands', 'INFO') as logs:
+            result = run_command(['sh', '-c', 'sleep 30 & sleep 30'], timeout=1)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.code, -signal.SIGKILL)
+        self.assertLess(result.duration, 10)
+        self.assertIn(b'Killed after running', result.err)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['tool'], 'sh')
+        self.assertTrue(record['timed_out'])
+
+    def test_resource_limits(self):
+        # over the memory limit, allocations fail
+        result = run_command([sys.executable, '-c', 'bytearray(1024*1024*1024)'], memory_limit=256*1024*1024)
+        self.assertNotEqual(result.code, 0)
+        self.assertIn(b'MemoryError', result.err)
+        self.assertEqual(run_command([sys.executable, '-c', 'bytearray(1024*1024)'], memory_limit=256*1024*1024).code, 0)
+        # over the CPU time limit, the command is killed, also when the
+        # limit comes from the settings
+        with override_settings(EXTERNAL_COMMAND_LIMITED_TOOLS=['sh'], EXTERNAL_COMMAND_CPU_LIMIT=1):
+            result = run_command(['sh', '-c', 'while :; do :; done'], timeout=30)
+        self.assertEqual(result.code, -signal.SIGXCPU)
+        self.assertFalse(result.timed_out)
+        self.assertLess(result.duration, 10)
+        self.assertIn(b'Killed after using more than 1 seconds of CPU time', result.err)
+
+    def test_run_commands(self):
+        results = run_commands([ ['sh', '-c', 'sleep 0.%d; echo %d' % (9 - i, i)] for i in range(5) ])
+        self.assertEqual([ r.out for r in results ], [ b'%d\n' % i for i in range(5) ])
+
+    def test_command_stats(self):
+        stats = CommandStats()
+        stats.add('pyang', 1.5, 0, False)
+        stats.add('pyang', 2.0, 1, False)
+        stats.add('idnits', 300.0, -9, True)
+        metrics = stats.prometheus()
+        self.assertIn('# TYPE datatracker_external_command_runs_total counter', metrics)
+        self.assertIn('datatracker_external_command_runs_total{tool="pyang"} 2', metrics)
+        self.assertIn('datatracker_external_command_failures_total{tool="pyang"} 1', metrics)
+        self.assertIn('datatracker_external_command_timeouts_total{tool="idnits"} 1', metrics)
+        self.assertIn('datatracker_external_command_seconds_total{tool="pyang"} 3.5', metrics)
+        self.assertEqual(command_name('PYTHONPATH=/x /usr/bin/pyang --ietf {model}'), 'pyang')